@@ -0,0 +1,10 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Agentic Rules Framework — local tooling.
+
+Stdlib-only reference implementations of the storage and retrieval algorithms
+the rule modules describe. The rule text in modules/ stays the source of truth;
+nothing here is required for the rules to work, and every tool degrades to the
+plain markdown store when it is not installed.
+"""
@@ -0,0 +1,74 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Small filesystem helpers shared by the memory and KG tools."""
+
+import contextlib
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+
+def atomic_write(path, data):
+    """Write bytes or text to `path` via temp file + rename.
+
+    Memory stores often live on synced volumes; a reader must never observe a
+    half-written index or manifest, so every rewrite goes through a sibling
+    temp file that is fsynced before it replaces the target. Returns the
+    `os.stat_result` of what was written, taken before the rename, so callers
+    can fingerprint their own write even if another process replaces the file
+    right after.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+            written = os.fstat(handle.fileno())
+        os.replace(tmp, path)
+        return written
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+@contextlib.contextmanager
+def file_lock(path, shared=False, blocking=True):
+    """Advisory lock on `path` (created if missing); yields True when held.
+
+    POSIX uses flock, so shared locks are real and the lock dies with the
+    process. On Windows only exclusive locks exist; a shared request is
+    granted without locking.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            try:
+                fcntl.flock(fd, flags if blocking else flags | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+        elif not shared:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            except OSError:
+                yield False
+                return
+        yield True
+    finally:
+        os.close(fd)
@@ -0,0 +1,24 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Tooling for the git-aware knowledge graph (RAG-RULES.md, MEMORY-RULES.md).
+
+A project's `knowledge_graph/` holds a base graph for the default branch and
+one overlay per feature branch, as markdown documents. This package reads
+them and implements the algorithms over them with the standard library:
+
+    python -m agentic_rules.gitkg extract --kg-dir PATH --repo . --write-base
+    python -m agentic_rules.gitkg refresh --kg-dir PATH --repo .
+    python -m agentic_rules.gitkg overlay --kg-dir PATH --repo .
+    python -m agentic_rules.gitkg merge --kg-dir PATH --branch feature/x
+    python -m agentic_rules.gitkg cross-branch --kg-dir PATH
+    python -m agentic_rules.gitkg gc --kg-dir PATH --repo . propose
+"""
+
+from .base import build_base, refresh_base
+from .manifest import Base, GitKGError, Overlay, load_base, load_overlay
+from .merge import EffectiveGraph, OverlayMerger
+from .overlay import build_overlay
+
+__all__ = ["Base", "EffectiveGraph", "GitKGError", "Overlay", "OverlayMerger", "build_base",
+           "build_overlay", "load_base", "load_overlay", "refresh_base"]
@@ -0,0 +1,262 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Command line for the git-aware KG: `python -m agentic_rules.gitkg <command>`."""
+
+import argparse
+import json
+import os
+import sys
+
+from ..memory.store import load_settings
+from . import cross_branch, extract, git, lifecycle, manifest
+from .base import build_base, refresh_base
+from .manifest import GitKGError
+from .merge import OverlayMerger
+from .overlay import build_overlay, git_aware_kg_settings
+
+
+def default_kg_dir(project=None):
+    """`<storage.base_path>/[projects/<id>/]knowledge_graph`."""
+    base = os.path.expanduser(load_settings()["storage"]["base_path"])
+    if project:
+        base = os.path.join(base, "projects", project)
+    return os.path.join(base, "knowledge_graph")
+
+
+def _add_location(parser):
+    parser.add_argument("--kg-dir", help="knowledge_graph/ directory "
+                                         "(default: under storage.base_path)")
+    parser.add_argument("--project", help="project id, for the default --kg-dir")
+
+
+def _extract(args, kg_dir):
+    if args.write_base:
+        try:
+            summary = build_base(args.repo, kg_dir, args.workers, not args.no_cache, args.force)
+        except GitKGError as exc:
+            print(f"gitkg: {exc}", file=sys.stderr)
+            return 1
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+        return 0
+    cache = None if args.no_cache else extract.ExtractCache.for_kg_dir(kg_dir)
+    stats = {}
+    files = extract.repository_files(args.repo)
+    extracted = extract.extract_files(args.repo, files, args.workers, cache, None, stats)
+    if cache is not None:
+        cache.retain(files)
+        cache.save()
+    nodes = [node for found, _ in extracted.values() for node in found]
+    edges = [edge for _, links in extracted.values() for edge in links]
+    if args.json:
+        json.dump({"nodes": nodes, "edges": edges}, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"{stats['files']} files ({stats['parsed']} parsed, {stats['cached']} cached): "
+              f"{len(nodes)} nodes, {len(edges)} edges in {stats['ms']} ms")
+    return 0
+
+
+def _refresh(args, kg_dir):
+    if args.on_pull:
+        # From a post-merge hook: quiet unless there is work, never failing the pull,
+        # and off unless the git-aware KG was switched on (it ships disabled).
+        try:
+            settings = git_aware_kg_settings()
+        except (OSError, ValueError, KeyError):
+            return 0
+        if not (settings.get("enabled", False) and settings.get("base_graph_auto_refresh", True)
+                and settings.get("base_refresh_on_pull", True)):
+            return 0
+        if not os.path.exists(os.path.join(kg_dir, manifest.BASE_DIR, manifest.BASE_MANIFEST)):
+            return 0
+        try:
+            if git.current_branch(args.repo) != git.default_branch(
+                    args.repo, settings.get("default_branch_override")):
+                return 0
+        except GitKGError:
+            return 0
+    try:
+        summary = refresh_base(args.repo, kg_dir, args.workers, not args.no_cache, args.depth,
+                               args.max_dependents, args.force)
+    except GitKGError as exc:
+        print(f"gitkg: {exc}", file=sys.stderr)
+        return 0 if args.on_pull else 1
+    if args.json:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    elif summary["mode"] != "unchanged" or not args.on_pull:
+        print(f"base {summary['mode']} @ {summary['base_commit'][:12]}: "
+              f"{summary.get('files_changed', 0)} files changed, "
+              f"{summary.get('parsed', 0)} parsed in {summary['ms']} ms"
+              + "".join(f"\n  STALE: {name}" for name in summary["stale_overlays"]))
+    return 0
+
+
+def _gc(args, kg_dir):
+    try:
+        if args.action == "status":
+            records = lifecycle.scan(args.repo, kg_dir)
+            if args.json:
+                json.dump(records, sys.stdout, indent=2)
+                print()
+                return 0
+            for record in records:
+                print(f"{record['state']:<9} {record['action'] or '-':<8} {record['branch']}"
+                      + (f"  ({record['reason']})" if record["reason"] else ""))
+            return 0
+        if args.action == "propose":
+            state = lifecycle.propose(args.repo, kg_dir)
+        elif args.action == "approve":
+            print("approved: " + (", ".join(lifecycle.approve(kg_dir, args.batch_ids)) or "none"))
+            return 0
+        else:
+            done = lifecycle.apply(args.repo, kg_dir, args.batch_ids or None, workers=args.workers)
+            json.dump(done, sys.stdout, indent=2)
+            print()
+            return 0
+    except GitKGError as exc:
+        print(f"gitkg: {exc}", file=sys.stderr)
+        return 1
+    if args.json:
+        json.dump(state, sys.stdout, indent=2)
+        print()
+        return 0
+    for batch in state["batches"]:
+        print(f"{batch['id']} [{batch['status']}] {batch['action']} "
+              f"{len(batch['overlays'])} overlays")
+        for overlay in batch["overlays"]:
+            print(f"    {overlay['branch']}  ({overlay['reason']})")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m agentic_rules.gitkg", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    merge = commands.add_parser("merge", help="print a branch's effective graph")
+    _add_location(merge)
+    merge.add_argument("--branch", help="branch to merge (default: the base alone)")
+    merge.add_argument("--json", action="store_true", help="print nodes and edges as JSON")
+
+    overlay = commands.add_parser("overlay", help="build the current branch's overlay "
+                                                  "from git diff")
+    _add_location(overlay)
+    overlay.add_argument("--repo", default=".", help="git work tree (default: .)")
+    overlay.add_argument("--branch", help="branch name to record (default: the checked-out one)")
+    overlay.add_argument("--workers", type=int, help="extraction processes (default: CPUs)")
+    overlay.add_argument("--depth", type=int,
+                         help="dependency expansion hops (default: rag-rules "
+                              "git_aware.dependency_expansion_depth)")
+    overlay.add_argument("--max-dependents", type=int,
+                         help="cap on dependent files re-analyzed (default: none)")
+
+    extracting = commands.add_parser("extract", help="extract the code graph of a repository")
+    _add_location(extracting)
+    extracting.add_argument("--repo", default=".", help="repository or directory (default: .)")
+    extracting.add_argument("--workers", type=int, help="parsing processes (default: CPUs)")
+    extracting.add_argument("--no-cache", action="store_true",
+                            help="parse every file, without the content-hash cache")
+    extracting.add_argument("--write-base", action="store_true",
+                            help="write base/base_manifest.md (git repositories, "
+                                 "default branch)")
+    extracting.add_argument("--force", action="store_true",
+                            help="with --write-base, allow a non-default branch")
+    extracting.add_argument("--json", action="store_true", help="print nodes and edges as JSON")
+
+    refresh = commands.add_parser("refresh", help="bring the base graph to HEAD, re-extracting "
+                                                  "only the files changed since its Base Commit")
+    _add_location(refresh)
+    refresh.add_argument("--repo", default=".", help="git work tree (default: .)")
+    refresh.add_argument("--workers", type=int, help="extraction processes (default: CPUs)")
+    refresh.add_argument("--no-cache", action="store_true",
+                         help="parse the changed files without the content-hash cache")
+    refresh.add_argument("--depth", type=int,
+                         help="dependency expansion hops (default: rag-rules "
+                              "git_aware.dependency_expansion_depth)")
+    refresh.add_argument("--max-dependents", type=int,
+                         help="cap on dependent files re-analyzed (default: none)")
+    refresh.add_argument("--force", action="store_true", help="allow a non-default branch")
+    refresh.add_argument("--on-pull", action="store_true",
+                         help="for git hooks: do nothing unless git_aware_kg.enabled and "
+                              "base_refresh_on_pull are on, a base exists, and the default "
+                              "branch is checked out")
+    refresh.add_argument("--json", action="store_true", help="print the summary as JSON")
+
+    collecting = commands.add_parser("gc", help="prune overlays of deleted branches and "
+                                                "rebuild stale ones")
+    _add_location(collecting)
+    collecting.add_argument("action", choices=("status", "propose", "approve", "apply"))
+    collecting.add_argument("batch_ids", nargs="*", help="batches to approve or apply")
+    collecting.add_argument("--repo", default=".", help="git work tree (default: .)")
+    collecting.add_argument("--workers", type=int, help="extraction processes for rebuilds")
+    collecting.add_argument("--json", action="store_true", help="print JSON")
+
+    cross = commands.add_parser("cross-branch", help="find conflicts between branch overlays")
+    _add_location(cross)
+    cross.add_argument("--branch", action="append", dest="branches",
+                       help="branch to include (repeatable; default: every overlay)")
+    cross.add_argument("--threshold", type=float,
+                       help="semantic conflict score to report (default: settings "
+                            "cross_branch_analysis.conflict_score_threshold)")
+    cross.add_argument("--max-branches", type=int,
+                       help="compare at most N branches, largest deltas first; 0 for all "
+                            "(default: settings cross_branch_analysis.max_branches_to_compare)")
+    cross.add_argument("--include-stale", action="store_true", help="compare STALE overlays too")
+    cross.add_argument("--json", action="store_true", help="print the report as JSON")
+    cross.add_argument("--dry-run", action="store_true",
+                       help="do not write the report to cross_branch/")
+    args = parser.parse_args(argv)
+
+    kg_dir = args.kg_dir or default_kg_dir(args.project)
+    if args.command == "overlay":
+        try:
+            summary = build_overlay(args.repo, kg_dir, args.branch, args.workers, args.depth,
+                                    args.max_dependents)
+        except GitKGError as exc:
+            print(f"gitkg: {exc}", file=sys.stderr)
+            return 1
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+        return 0
+    if args.command == "extract":
+        return _extract(args, kg_dir)
+    if args.command == "refresh":
+        return _refresh(args, kg_dir)
+    if args.command == "gc":
+        return _gc(args, kg_dir)
+    if args.command == "cross-branch":
+        report = cross_branch.analyze(kg_dir, args.branches, args.threshold, args.max_branches,
+                                      args.include_stale)
+        if not args.dry_run:
+            report["written"] = cross_branch.write_report(kg_dir, report, args.project or "project")
+        if args.json:
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            print(f"{len(report['compared'])} branches, {report['pairs_compared']} overlapping "
+                  f"pairs, {len(report['semantic'])} conflicts >= {report['threshold']}")
+            for number, (name, reason) in enumerate(report["merge_order"], 1):
+                print(f"  {number}. {name} - {reason}")
+        return 0
+
+    view = OverlayMerger(kg_dir).effective(args.branch)
+    if view is None:
+        print(f"gitkg: no base graph under {kg_dir}", file=sys.stderr)
+        return 1
+    if args.json:
+        json.dump(dict(view.summary(), **view.to_dict()), sys.stdout, indent=2)
+        print()
+    else:
+        summary = view.summary()
+        print(f"{summary['branch'] or 'base'} @ {summary['base_commit'] or '?'}: "
+              f"{summary['nodes']} nodes, {summary['edges']} edges"
+              + (" (overlay is STALE)" if summary["stale"] else ""))
+    for warning in view.warnings:
+        print(f"warning: {warning}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
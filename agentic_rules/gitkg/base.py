@@ -0,0 +1,328 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Base graph construction and refresh (RAG-RULES.md).
+
+`build_base` (Git_Aware_KG_Construction step 3) extracts every tracked file
+of the default branch's working tree (`extract.extract_files`, with the
+content-hash cache) and writes the Base KG Manifest to
+`knowledge_graph/base/base_manifest.md`, recording HEAD as the Base Commit
+that overlays are diffed against.
+
+`refresh_base` is Base_Graph_Refresh. One `git diff` from the Base Commit
+names the changed files; they and their dependents are re-extracted, and
+the manifest's registries are patched line by line: rows of untouched files
+are copied as they are, without being parsed into nodes and edges or
+rendered again, and only the touched files' rows are replaced. Overlays
+whose changes overlap the refreshed files are marked STALE; the others are
+recorded as valid against the new base.
+"""
+
+import heapq
+import os
+import time
+
+from .._fs import atomic_write
+from ..kg.temporal import now
+from ..memory.store import load_settings as load_memory_settings, parse_entry
+from . import extract, git, manifest, snapshot
+from .manifest import GitKGError
+from .overlay import changed_files, git_aware_settings
+
+TAGS = ("base", "git-aware-kg")
+NODE_COLUMNS = ("Node ID", "Type", "Source File", "Content Hash")
+EDGE_COLUMNS = ("Edge Key", "Source Node", "Target Node", "Type", "Content Hash")
+
+
+def build_base(repo, kg_dir, workers=None, use_cache=True, force=False):
+    """Extract the repository and write its Base KG Manifest; returns a summary dict.
+
+    Raises GitKGError off the default branch unless `force`, since a base
+    built from a feature branch would make every overlay wrong.
+    """
+    started = time.perf_counter()
+    if not git.is_repository(repo):
+        raise git.GitError(f"{repo} is not a git work tree")
+    override, _ = git_aware_settings()
+    branch = git.current_branch(repo)
+    default = git.default_branch(repo, override)
+    if branch != default and not force:
+        raise GitKGError(f"on {branch}, not the default branch {default}; "
+                         "build overlays here, or pass force")
+    root = git.run(repo, "rev-parse", "--show-toplevel").strip()
+    head = git.rev_parse(repo, "HEAD")
+    files = extract.repository_files(root)
+    cache = extract.ExtractCache.for_kg_dir(kg_dir) if use_cache else None
+    stats = {}
+    extracted = extract.extract_files(root, files, workers, cache, None, stats)
+    if cache is not None:
+        cache.retain(files)
+        cache.save()
+    nodes = [node for found, _ in extracted.values() for node in found]
+    edges = [edge for _, links in extracted.values() for edge in links]
+    generated = now()
+    path = os.path.join(kg_dir, manifest.BASE_DIR, manifest.BASE_MANIFEST)
+    text = manifest.render_base(
+        f"{os.path.basename(root)} - {generated}",
+        {"Version": load_memory_settings().get("version", ""), "Base Commit": head,
+         "Default Branch": default, "Generated": generated,
+         "Extractor Version": extract.EXTRACTOR_VERSION},
+        nodes, edges)
+    atomic_write(path, text)
+    # The graph is in memory already, so the snapshot costs no parse.
+    snapshot.write_for(kg_dir, manifest.Base(
+        manifest.read_metadata(path), {node["id"]: node for node in nodes},
+        {manifest.edge_key(edge): edge for edge in edges},
+        manifest.digest(text.encode("utf-8")), path))
+    return {"written": path, "base_commit": head, "branch": default, "nodes": len(nodes),
+            "edges": len(edges), "files": stats["files"], "parsed": stats["parsed"],
+            "cached": stats["cached"], "ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+def _file_of(node_id, sources):
+    """The file a node belongs to: its Source File, else the id's path part."""
+    return sources.get(node_id) or node_id.split("::", 1)[0]
+
+
+class Registries:
+    """The base manifest split into its sections, registry rows left as text.
+
+    `nodes` is [(id, source, line)] and `edges` is [(source, target, type,
+    key, line)], in file order; everything else is kept verbatim.
+    """
+
+    def __init__(self, text):
+        self.sections = []  # [(heading or None, [lines])]
+        heading, lines = None, []
+        for line in text.splitlines():
+            if line.startswith("## "):
+                self.sections.append((heading, lines))
+                heading, lines = line[3:].strip(), []
+            lines.append(line)
+        self.sections.append((heading, lines))
+        self.metadata = {}
+        self.nodes, self.edges = [], []
+        for heading, lines in self.sections:
+            if heading == "Metadata":
+                self.metadata = parse_entry("\n".join(lines))["metadata"]
+            elif heading == "Node Registry":
+                for cells, line in self._rows(lines, ("Node ID", "Source File")):
+                    if cells[0]:
+                        self.nodes.append((cells[0], cells[1], line))
+            elif heading == "Edge Registry":
+                for cells, line in self._rows(lines, ("Source Node", "Target Node", "Type",
+                                                      "Edge Key")):
+                    if cells[0] and cells[1]:
+                        self.edges.append((cells[0], cells[1], cells[2], cells[3], line))
+
+    @staticmethod
+    def _rows(lines, columns):
+        """(cells of `columns`, line) for each data row of a section's table."""
+        table = [line for line in lines if line.lstrip().startswith("|")]
+        if len(table) < 2:
+            return
+        header = manifest.split_row(table[0])
+        # Split once and clean only the wanted cells: these tables run to
+        # hundreds of thousands of rows.
+        positions = [header.index(name) + 1 if name in header else None for name in columns]
+        for line in table[2:]:
+            parts = line.split("|")
+            yield [parts[position].strip().strip("`").strip()
+                   if position is not None and position < len(parts) - 1 else ""
+                   for position in positions], line
+
+    def render(self, title, metadata, node_lines, edge_lines):
+        """The manifest with new metadata and registry rows; other sections as they were."""
+        out = [f"# Base KG Manifest: {title}"]
+        registries = {"Node Registry": (NODE_COLUMNS, node_lines),
+                      "Edge Registry": (EDGE_COLUMNS, edge_lines)}
+        for heading, lines in self.sections:
+            if heading is None:
+                continue
+            if heading == "Metadata":
+                out.append("## Metadata\n" + manifest.render_metadata(metadata))
+            elif heading in registries:
+                columns, rows = registries.pop(heading)
+                out.append(f"## {heading}\n" + "\n".join([manifest.render_table(columns, ())]
+                                                         + list(rows)))
+            else:
+                out.append("\n".join(lines).rstrip("\n"))
+        return "\n\n".join(part.rstrip("\n") for part in out) + "\n"
+
+
+def _file_dependents(registries, sources, files, depth, limit=None):
+    """Files with an edge into `files`, `depth` hops out, at most `limit` of them."""
+    into = {}
+    for source, target, _, _, _ in registries.edges:
+        source_file, target_file = _file_of(source, sources), _file_of(target, sources)
+        if source_file != target_file:
+            into.setdefault(target_file, set()).add(source_file)
+    found, frontier, seen = [], set(files), set(files)
+    for _ in range(depth):
+        following = set()
+        for path in frontier:
+            following.update(into.get(path, ()))
+        following -= seen
+        seen |= following
+        for path in sorted(following):
+            if limit is not None and len(found) >= limit:
+                return found
+            found.append(path)
+        frontier = following
+    return found
+
+
+def _overlapping(overlay, touched, removed):
+    """Whether an overlay changes a refreshed file, or a node the refresh removed."""
+    if any(path in touched for path, _ in overlay.files):
+        return True
+    for node_id in overlay.touched_nodes():
+        if node_id in removed or node_id.split("::", 1)[0] in touched:
+            return True
+    return any(key[0] in removed or key[1] in removed for key in overlay.touched_edges())
+
+
+def invalidate_overlays(kg_dir, base_commit, previous, touched, removed):
+    """Base_Graph_Refresh step 3: mark overlapping overlays STALE; returns their branches.
+
+    Overlays built against `previous` that do not overlap stay VALID, and
+    their manifest records `base_commit` as the base they are valid against.
+    """
+    stale = []
+    for name in manifest.overlay_branches(kg_dir):
+        overlay = manifest.load_overlay(kg_dir, name)
+        if overlay is None:
+            continue
+        metadata = dict(manifest.overlay_manifest_metadata(kg_dir, name))
+        metadata.update({"Branch": overlay.branch, "Generated": now()})
+        if _overlapping(overlay, touched, removed):
+            metadata.update({"Status": "STALE",
+                             "Stale Reason": f"base refreshed to {base_commit} "
+                                             "over files this overlay changes"})
+            stale.append(overlay.branch)
+        elif overlay.stale or overlay.base_commit != previous:
+            continue
+        else:
+            metadata.update({"Status": "VALID", "Validated Base Commit": base_commit})
+        path = os.path.join(kg_dir, manifest.OVERLAY_DIR, manifest.sanitize_branch(name),
+                            manifest.OVERLAY_MANIFEST)
+        atomic_write(path, manifest.render_overlay_manifest(overlay.branch, metadata))
+    return stale
+
+
+def refresh_base(repo, kg_dir, workers=None, use_cache=True, depth=None, max_dependents=None,
+                 force=False):
+    """Bring the base graph to HEAD by re-extracting only what changed; returns a summary.
+
+    Falls back to `build_base` when there is no base manifest, it was written
+    by another extractor version, or its Base Commit is unknown to git. Raises
+    GitKGError off the default branch unless `force`.
+    """
+    started = time.perf_counter()
+    if not git.is_repository(repo):
+        raise git.GitError(f"{repo} is not a git work tree")
+    override, configured_depth = git_aware_settings()
+    depth = configured_depth if depth is None else depth
+    branch = git.current_branch(repo)
+    default = git.default_branch(repo, override)
+    if branch != default and not force:
+        raise GitKGError(f"on {branch}, not the default branch {default}; "
+                         "the base follows the default branch")
+    path = os.path.join(kg_dir, manifest.BASE_DIR, manifest.BASE_MANIFEST)
+    # The Metadata alone decides whether there is work; the registries are
+    # read only when there is.
+    metadata = (manifest.base_metadata(kg_dir) if os.path.exists(path) else None) or {}
+    old_commit = metadata.get("Base Commit", "")
+    version = metadata.get("Extractor Version", "")
+
+    root = git.run(repo, "rev-parse", "--show-toplevel").strip()
+
+    def rebuild(reason):  # without a delta, every overlay may overlap
+        summary = build_base(repo, kg_dir, workers, use_cache, force)
+        summary.update(mode="full", reason=reason, stale_overlays=invalidate_overlays(
+            kg_dir, summary["base_commit"], old_commit,
+            set(extract.repository_files(root)), set()))
+        return summary
+
+    if not metadata:
+        return rebuild("no base manifest")
+    if version != str(extract.EXTRACTOR_VERSION):
+        return rebuild(f"extractor version {version or 'unknown'} is not "
+                       f"{extract.EXTRACTOR_VERSION}")
+    head = git.rev_parse(repo, "HEAD")
+    try:
+        changes = git.diff_name_status(repo, old_commit, None)
+    except GitKGError:
+        return rebuild(f"base commit {old_commit or '(none)'} is not in this repository")
+    if not changes and head == old_commit:
+        return {"mode": "unchanged", "written": None, "base_commit": head, "files_changed": 0,
+                "stale_overlays": [], "ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    try:
+        with open(path, encoding="utf-8") as handle:
+            registries = Registries(handle.read())
+    except OSError:
+        return rebuild("the base manifest is unreadable")
+    files, deleted = changed_files(changes)
+    sources = {node_id: source for node_id, source, _ in registries.nodes}
+    expanded = _file_dependents(registries, sources, [path for path, _ in files], depth,
+                                max_dependents)
+    present = [path for path, change in files if change != "deleted"]
+    analyzed = sorted(set(present) | {path for path in expanded if path not in deleted})
+    touched = set(analyzed) | deleted
+
+    def exists(node_id):  # nodes of files outside the batch are the base's
+        source = sources.get(node_id)
+        return source is not None and source not in touched
+
+    cache = extract.ExtractCache.for_kg_dir(kg_dir) if use_cache else None
+    stats = {}
+    extracted = extract.extract_files(root, analyzed, workers, cache, exists, stats)
+    if cache is not None:
+        cache.retain(extract.repository_files(root))
+        cache.save()
+    new_nodes = {node["id"]: node for found, _ in extracted.values() for node in found}
+    new_edges = {manifest.edge_key(edge): edge for _, links in extracted.values()
+                 for edge in links}
+    removed = {node_id for node_id, source, _ in registries.nodes
+               if source in touched and node_id not in new_nodes}
+
+    kept_nodes = [(node_id, line) for node_id, source, line in registries.nodes
+                  if source not in touched]
+    kept_edges, next_key = [], 1
+    for source, target, kind, key, line in registries.edges:
+        if key[:1] == "e" and key[1:].isdigit():
+            next_key = max(next_key, int(key[1:]) + 1)
+        if _file_of(source, sources) in touched or target in removed or source in removed:
+            continue
+        kept_edges.append(((source, target, kind), line))
+    added_nodes = [(node_id, manifest.render_row(
+        (node["id"], node["type"], node["source"], node["hash"])))
+        for node_id, node in sorted(new_nodes.items())]
+    added_edges = []
+    for number, (key, edge) in enumerate(sorted(new_edges.items()), next_key):
+        added_edges.append((key, manifest.render_row(
+            (f"e{number}", edge["source"], edge["target"], edge["type"],
+             edge.get("hash", "")))))
+    # Both sides are in registry order already (render_base sorts them), so
+    # a merge keeps the manifest sorted without sorting it again.
+    node_lines = [line for _, line in heapq.merge(kept_nodes, added_nodes,
+                                                  key=lambda row: row[0])]
+    edge_lines = [line for _, line in heapq.merge(kept_edges, added_edges,
+                                                  key=lambda row: row[0])]
+
+    generated = now()
+    metadata = dict(registries.metadata, **{
+        "Version": load_memory_settings().get("version", ""), "Base Commit": head,
+        "Default Branch": default, "Generated": generated,
+        "Extractor Version": extract.EXTRACTOR_VERSION, "Refreshed From": old_commit,
+        "Node Count": len(node_lines), "Edge Count": len(edge_lines)})
+    atomic_write(path, registries.render(f"{os.path.basename(root)} - {generated}", metadata,
+                                         node_lines, edge_lines))
+    stale = invalidate_overlays(kg_dir, head, old_commit, touched, removed)
+    return {"mode": "incremental", "written": path, "base_commit": head,
+            "refreshed_from": old_commit, "files_changed": len(files),
+            "files_analyzed": len(analyzed), "dependents": len(expanded),
+            "parsed": stats.get("parsed", 0), "nodes": len(node_lines), "edges": len(edge_lines),
+            "nodes_removed": len(removed), "stale_overlays": stale,
+            "ms": round((time.perf_counter() - started) * 1000, 1)}
@@ -0,0 +1,259 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Cross_Branch_KG_Analysis (RAG-RULES.md) through an inverted index.
+
+Comparing every pair of overlays costs O(b^2) full comparisons, which is
+why the algorithm caps the analysis at `max_branches_to_compare`. Almost
+every pair of branches touches disjoint parts of the graph, though. `analyze`
+reads each overlay once and builds an index from each node id and edge key
+to the branches that change it, with what each branch did to it. Only
+entities with two or more branches in the index are collisions, and only
+the branch pairs that share one are ever compared. The cost is O(total
+overlay rows + collisions), so a larger cap stays cheap.
+
+Each branch's change to an entity is reduced to a signature: what it did
+(added, removed, modified) and the resulting values. Equal signatures are
+CONVERGENT. Different ones are DIVERGENT and get a semantic_conflict_score
+from the kinds of change (removed on one side and changed on the other is
+near-certain), an interface change (Type), and whether both branches also
+changed the entity's edges differently.
+"""
+
+import collections
+import itertools
+import os
+import time
+
+from .._fs import atomic_write
+from ..kg.temporal import now
+from ..memory.store import load_settings
+from . import manifest
+from .manifest import CROSS_BRANCH_DIR, edge_key
+from .overlay import git_aware_kg_settings
+
+TAGS = ("cross-branch", "conflict-analysis", "merge-planning")
+CONVERGENT_SCORE = 0.1
+# (change in one branch, change in the other) -> base score of a divergence
+PAIR_SCORES = {
+    ("removed", "modified"): 0.9, ("removed", "added"): 0.9,
+    ("added", "added"): 0.8, ("modified", "modified"): 0.5,
+    ("added", "modified"): 0.6, ("removed", "removed"): 0.0,
+}
+INTERFACE_BONUS = 0.2
+DEPENDENCY_BONUS = 0.2
+
+
+def _settings():
+    """The memory_rules.project_support.git_aware_kg.cross_branch_analysis settings."""
+    return git_aware_kg_settings().get("cross_branch_analysis", {})
+
+
+def signatures(overlay):
+    """{("node", id) or ("edge", key): (change, detail)} for one overlay.
+
+    `detail` is hashable and equal for equal changes, so comparing two
+    branches' signatures compares what they did, not how their rows read.
+    """
+    changes = {}
+    for node_id, _ in overlay.removed_nodes:
+        changes[("node", node_id)] = ("removed", ())
+    modified = collections.defaultdict(list)
+    for node_id, field, _, new in overlay.modified_nodes:
+        modified[node_id].append((field.strip().lower(), new))
+    for node_id, fields in modified.items():
+        changes[("node", node_id)] = ("modified", tuple(sorted(fields)))
+    for node in overlay.added_nodes:
+        changes[("node", node["id"])] = ("added", (node["type"], node["source"], node["hash"]))
+    for edge in overlay.removed_edges:
+        changes[("edge", edge_key(edge))] = ("removed", ())
+    for edge in overlay.modified_edges:
+        changes[("edge", edge_key(edge))] = ("modified", (edge["change"],))
+    for edge in overlay.added_edges:
+        changes[("edge", edge_key(edge))] = ("added", (edge["hash"],))
+    changes.pop(("node", ""), None)
+    return changes
+
+
+def _describe(signature):
+    change, detail = signature
+    if change == "modified" and detail and isinstance(detail[0], tuple):
+        return "modified " + ", ".join(f"{field}={value}" for field, value in detail)
+    if change == "added" and detail and detail[0]:
+        return f"added as {detail[0]}"
+    return change
+
+
+def _edge_changes(branch_changes):
+    """{node id: frozenset of (edge key, signature)} for one branch's edge rows."""
+    by_node = collections.defaultdict(set)
+    for (kind, key), signature in branch_changes.items():
+        if kind == "edge":
+            by_node[key[0]].add((key, signature))
+            by_node[key[1]].add((key, signature))
+    return {node_id: frozenset(rows) for node_id, rows in by_node.items()}
+
+
+def conflict_score(entity, first, second, edges_first, edges_second):
+    """semantic_conflict_score of two different signatures for one entity."""
+    kinds = tuple(sorted((first[0], second[0]), reverse=True))
+    score = PAIR_SCORES.get(kinds, PAIR_SCORES.get(kinds[::-1], 0.5))
+    if entity[0] == "node":
+        fields = {field for signature in (first, second) if signature[0] == "modified"
+                  for field, _ in signature[1]}
+        if "type" in fields or (kinds == ("added", "added") and first[1][0] != second[1][0]):
+            score += INTERFACE_BONUS
+        mine, theirs = edges_first.get(entity[1]), edges_second.get(entity[1])
+        if mine and theirs and mine != theirs:
+            score += DEPENDENCY_BONUS
+    return round(min(score, 1.0), 2)
+
+
+def _entity_label(entity):
+    kind, value = entity
+    return value if kind == "node" else f"{value[0]} -> {value[1]} ({value[2]})"
+
+
+def analyze(kg_dir, branches=None, threshold=None, max_branches=None, include_stale=False):
+    """The cross-branch report as a dict; see `render` for the document.
+
+    `branches` defaults to every directory under overlays/. Stale overlays
+    (marked STALE, or built against another base commit) are listed but not
+    compared unless `include_stale`. `threshold` and `max_branches` default
+    to the settings; a `max_branches` of 0 compares every branch.
+    """
+    started = time.perf_counter()
+    settings = _settings()
+    threshold = settings.get("conflict_score_threshold", 0.5) if threshold is None else threshold
+    if max_branches is None:
+        max_branches = settings.get("max_branches_to_compare")
+    base_commit = (manifest.base_metadata(kg_dir) or {}).get("Base Commit", "")
+    names = branches if branches is not None else manifest.overlay_branches(kg_dir)
+    summary, active = [], {}
+    for name in names:
+        overlay = manifest.load_overlay(kg_dir, name)
+        if overlay is None:
+            continue
+        behind = bool(base_commit and overlay.base_commit and
+                      not base_commit.startswith(overlay.base_commit) and
+                      not overlay.base_commit.startswith(base_commit))
+        status = "STALE" if overlay.stale or behind else "VALID"
+        added = len(overlay.added_nodes) + len(overlay.added_edges)
+        removed = len(overlay.removed_nodes) + len(overlay.removed_edges)
+        modified = len(overlay.modified_nodes) + len(overlay.modified_edges)
+        summary.append({"branch": overlay.branch, "delta": added + removed + modified,
+                        "added": added, "removed": removed, "modified": modified,
+                        "status": status})
+        if status == "VALID" or include_stale:
+            active[overlay.branch] = overlay
+    if max_branches and len(active) > max_branches:
+        # Keep the largest deltas: they are the likeliest to collide.
+        sizes = {row["branch"]: row["delta"] for row in summary}
+        keep = sorted(active, key=lambda name: (-sizes[name], name))[:max_branches]
+        active = {name: active[name] for name in sorted(keep)}
+
+    # entity -> {branch: signature}; only entities two branches share matter.
+    changes = {name: signatures(overlay) for name, overlay in active.items()}
+    index = collections.defaultdict(dict)
+    for name, branch_changes in changes.items():
+        for entity, signature in branch_changes.items():
+            index[entity][name] = signature
+    collisions = {entity: touched for entity, touched in index.items() if len(touched) > 1}
+    edge_changes = {}
+
+    def edges_of(name):
+        if name not in edge_changes:
+            edge_changes[name] = _edge_changes(changes[name])
+        return edge_changes[name]
+
+    conflicts, semantic = [], []
+    pairs = collections.defaultdict(lambda: {"shared": 0, "risk": 0.0, "conflicts": 0})
+    for entity, touched in collisions.items():
+        names_touching = sorted(touched)
+        divergent = len(set(touched.values())) > 1
+        risk = 0.0
+        for first, second in itertools.combinations(names_touching, 2):
+            pair = pairs[(first, second)]
+            pair["shared"] += 1
+            if touched[first] == touched[second]:
+                score = CONVERGENT_SCORE
+            else:
+                score = conflict_score(entity, touched[first], touched[second],
+                                       edges_of(first), edges_of(second))
+            risk = max(risk, score)
+            if score >= threshold:
+                pair["conflicts"] += 1
+                pair["risk"] = max(pair["risk"], score)
+                semantic.append({
+                    "entity": _entity_label(entity), "type": entity[0],
+                    "branch_a": f"{first}: {_describe(touched[first])}",
+                    "branch_b": f"{second}: {_describe(touched[second])}",
+                    "score": score})
+        conflicts.append({"entity": _entity_label(entity), "branches": names_touching,
+                          "kind": "DIVERGENT" if divergent else "CONVERGENT", "risk": risk})
+    conflicts.sort(key=lambda row: (-row["risk"], row["entity"]))
+    semantic.sort(key=lambda row: (-row["score"], row["entity"], row["branch_a"]))
+
+    order = merge_order(active, summary, pairs)
+    return {"generated": now(), "threshold": threshold, "branches": summary,
+            "compared": sorted(active), "pairs_compared": len(pairs),
+            "conflicts": conflicts, "semantic": semantic, "merge_order": order,
+            "ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+def merge_order(active, summary, pairs):
+    """[(branch, reason)], least conflicting first, then smallest delta first."""
+    sizes = {row["branch"]: row["delta"] for row in summary}
+    weight = collections.Counter()
+    partners = collections.defaultdict(list)
+    for (first, second), pair in pairs.items():
+        if pair["conflicts"]:
+            weight[first] += pair["conflicts"]
+            weight[second] += pair["conflicts"]
+            partners[first].append(second)
+            partners[second].append(first)
+    order = []
+    for name in sorted(active, key=lambda name: (weight[name], sizes.get(name, 0), name)):
+        if weight[name]:
+            reason = (f"{weight[name]} conflicting change(s) with "
+                      f"{', '.join(sorted(partners[name]))}")
+        else:
+            reason = f"no conflicts; delta of {sizes.get(name, 0)}"
+        order.append((name, reason))
+    return order
+
+
+def render(report, title="project"):
+    """The Cross-Branch Analysis Template for an `analyze` report."""
+    order = "\n".join(f"{number}. {name} - {reason}"
+                      for number, (name, reason) in enumerate(report["merge_order"], 1))
+    return "\n\n".join([
+        f"# Cross-Branch KG Analysis: {title} - {report['generated']}",
+        "## Metadata\n" + manifest.render_metadata({
+            "Version": load_settings().get("version", ""),
+            "Branches Analyzed": len(report["compared"]),
+            "Generated": report["generated"],
+            "Conflict Score Threshold": report["threshold"]}),
+        "## Branch Summary\n" + manifest.render_table(
+            ["Branch", "Delta Size", "Added", "Removed", "Modified", "Status"],
+            ((row["branch"], row["delta"], row["added"], row["removed"], row["modified"],
+              row["status"]) for row in report["branches"])),
+        "## Potential Merge Conflicts\n" + manifest.render_table(
+            ["Entity", "Branches", "Conflict Type", "Risk Score"],
+            ((row["entity"], ", ".join(row["branches"]), row["kind"], f"{row['risk']:.2f}")
+             for row in report["conflicts"])),
+        "## Semantic Conflicts\n" + manifest.render_table(
+            ["Entity", "Type", "Branch A Change", "Branch B Change", "Assessment"],
+            ((row["entity"], row["type"], row["branch_a"], row["branch_b"],
+              f"DIVERGENT, score {row['score']:.2f}") for row in report["semantic"])),
+        "## Merge Order Recommendation\n" + (order or "No active overlays."),
+        "## Tags\n[" + ", ".join(TAGS) + "]",
+    ]) + "\n"
+
+
+def write_report(kg_dir, report, title="project"):
+    """Write `cross_branch/[timestamp]_cross_branch.md`; returns its path."""
+    stamp = time.strftime("%Y-%m-%dT%H%M", time.gmtime())
+    path = os.path.join(kg_dir, CROSS_BRANCH_DIR, f"{stamp}_cross_branch.md")
+    atomic_write(path, render(report, title))
+    return path
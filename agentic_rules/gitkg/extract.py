@@ -0,0 +1,471 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Code graph extraction for base graphs and overlays (Python_Enhanced_KG_Construction).
+
+Every file becomes a node whose id is its repository-relative path (type
+`module` for Python, `file` otherwise) and whose hash is a digest of its
+bytes. Python files are parsed with `ast` into:
+
+- `class`, `function`, and `method` nodes, with ids `path::Name` and
+  `path::Class.method`, hashed over their own source lines so an edit to
+  one function leaves its siblings unchanged;
+- `defines` edges from a module to its top-level definitions and from a
+  class to its methods;
+- `imports` edges from a module to the modules it imports that live in
+  the same repository (standard library and third-party imports are not
+  nodes);
+- `inherits` edges from a class to the base classes it names, and `calls`
+  edges from a function, method, or module to the definitions it calls
+  (`name()`, `module.name()`, `self.method()`, `Class()`).
+
+Extraction has two phases. **Parsing** depends only on a file's bytes: it
+records definitions, import statements, and the dotted names each scope
+calls or inherits from. It is the expensive part, so it runs in a process
+pool for large batches and its results are cached by content hash
+(`ExtractCache`): a re-run re-reads only files whose (mtime, size)
+changed, and re-parses only those whose content did. A rename or a copy is
+a cache hit. **Linking** turns the parsed facts into nodes and edges,
+resolving names against the files on disk and the node ids that exist. It
+is a pass over the facts with no parsing, so it is redone every time and
+a new file that makes an old import resolve is picked up without
+re-parsing the importer.
+
+Bump EXTRACTOR_VERSION when what parsing records changes; caches written
+by another version are ignored.
+"""
+
+import ast
+import concurrent.futures
+import hashlib
+import json
+import os
+import time
+
+from .._fs import atomic_write
+from . import git
+
+EXTRACTOR_VERSION = 2
+CACHE_FILE = os.path.join(".cache", "extract_cache.json")  # under knowledge_graph/
+POOL_MIN_FILES = 32
+CHUNK_FILES = 16
+SOURCE_ROOTS = ("", "src/", "lib/")
+SELF_NAMES = ("self", "cls")
+_DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+# --- parsing ---------------------------------------------------------------------
+
+def _statements(tree):
+    """Every statement, nested ones included, without visiting expressions."""
+    stack = list(reversed(tree.body))
+    while stack:
+        statement = stack.pop()
+        yield statement
+        for field in ("body", "orelse", "finalbody", "handlers", "cases"):
+            children = getattr(statement, field, None)
+            if isinstance(children, list):
+                stack.extend(reversed(children))
+
+
+def _dotted(expression):
+    """`a.b.c` for a Name/Attribute chain, else None."""
+    parts = []
+    while isinstance(expression, ast.Attribute):
+        parts.append(expression.attr)
+        expression = expression.value
+    if not isinstance(expression, ast.Name):
+        return None
+    parts.append(expression.id)
+    return ".".join(reversed(parts))
+
+
+def _calls(statements):
+    """Sorted dotted names called anywhere in `statements`."""
+    found = set()
+    stack = list(statements)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Call):
+            name = _dotted(node.func)
+            if name:
+                found.add(name)
+        stack.extend(ast.iter_child_nodes(node))
+    return sorted(found)
+
+
+def _parse_definitions(lines, body, prefix, facts):
+    for statement in body:
+        if not isinstance(statement, _DEFINITIONS):
+            continue
+        name = prefix + statement.name
+        if isinstance(statement, ast.ClassDef):
+            kind = "class"
+        else:
+            kind = "method" if prefix else "function"
+        start = min([statement.lineno] + [d.lineno for d in statement.decorator_list])
+        end = getattr(statement, "end_lineno", None) or statement.lineno
+        segment = "\n".join(lines[start - 1:end]).encode("utf-8")
+        facts["defs"].append([name, kind, statement.lineno, content_hash(segment)])
+        own = [child for child in statement.body if not isinstance(child, _DEFINITIONS)] \
+            if kind == "class" else statement.body
+        calls = _calls(own)
+        if calls:
+            facts["calls"][name] = calls
+        if kind == "class":
+            bases = [base for base in (_dotted(expression) for expression in statement.bases)
+                     if base]
+            if bases:
+                facts["bases"][name] = bases
+            _parse_definitions(lines, statement.body, name + ".", facts)
+
+
+def parse_source(data, python=True):
+    """The facts linking needs about one file; a pure function of its bytes.
+
+    {"hash", "python", "unparsed", "defs": [[name, kind, line, hash]],
+     "imports": [[level, module, names or None]], "aliases": {local: [level, dotted]},
+     "bases": {class: [dotted]}, "calls": {scope: [dotted]}}; scope "" is the module.
+    """
+    facts = {"hash": content_hash(data), "python": python, "unparsed": False, "defs": [],
+             "imports": [], "aliases": {}, "bases": {}, "calls": {}}
+    if not python:
+        return facts
+    text = data.decode("utf-8", errors="replace")
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        facts["unparsed"] = True
+        return facts
+    _parse_definitions(text.splitlines(), tree.body, "", facts)
+    calls = _calls([s for s in tree.body if not isinstance(s, _DEFINITIONS)])
+    if calls:
+        facts["calls"][""] = calls
+    for statement in _statements(tree):
+        if isinstance(statement, ast.Import):
+            for alias in statement.names:
+                facts["imports"].append([0, alias.name, None])
+                if alias.asname:
+                    facts["aliases"][alias.asname] = [0, alias.name]
+                else:
+                    head = alias.name.split(".")[0]
+                    facts["aliases"][head] = [0, head]
+        elif isinstance(statement, ast.ImportFrom):
+            module = statement.module or ""
+            names = [alias.name for alias in statement.names if alias.name != "*"]
+            facts["imports"].append([statement.level, module, names])
+            for alias in statement.names:
+                if alias.name != "*":
+                    dotted = f"{module}.{alias.name}" if module else alias.name
+                    facts["aliases"][alias.asname or alias.name] = [statement.level, dotted]
+    return facts
+
+
+def parse_file(root, relpath):
+    """(relpath, (mtime_ns, size), facts), or facts None if it cannot be read."""
+    path = os.path.join(root, relpath)
+    try:
+        stat = os.stat(path)
+        with open(path, "rb") as handle:
+            data = handle.read()
+    except OSError:
+        return relpath, None, None
+    return relpath, (stat.st_mtime_ns, stat.st_size), parse_source(data, relpath.endswith(".py"))
+
+
+def parse_chunk(root, relpaths):
+    return [parse_file(root, relpath) for relpath in relpaths]
+
+
+# --- linking ---------------------------------------------------------------------
+
+def _relative_module(relpath, level, module):
+    """Dotted path for `from <level dots><module> import ...` inside `relpath`."""
+    package = os.path.dirname(relpath).split("/") if os.path.dirname(relpath) else []
+    if level > 1:
+        package = package[:len(package) - (level - 1)] if level - 1 <= len(package) else []
+    return ".".join(part for part in package + (module.split(".") if module else []) if part)
+
+
+class Linker:
+    """Resolves dotted names to node ids for one batch of parsed files.
+
+    `exists(node_id)` says whether a node outside the batch exists; the
+    batch's own node ids always do. Module lookups list each directory once.
+    """
+
+    def __init__(self, root, batch_ids, exists=None):
+        self.root = root
+        self.batch_ids = batch_ids
+        self.exists = exists
+        self._modules = {}
+        self._listings = {}
+
+    def defined(self, node_id):
+        return node_id in self.batch_ids or bool(self.exists and self.exists(node_id))
+
+    def module(self, dotted):
+        """(module file, remaining parts) for the longest module prefix of `dotted`."""
+        if dotted not in self._modules:
+            self._modules[dotted] = self._find_module(dotted.split(".") if dotted else [])
+        return self._modules[dotted]
+
+    def _find_module(self, parts):
+        for prefix in SOURCE_ROOTS:
+            for length in range(len(parts), 0, -1):
+                stem = prefix + "/".join(parts[:length])
+                for candidate in (stem + ".py", stem + "/__init__.py"):
+                    if self._is_file(candidate):
+                        return candidate, parts[length:]
+        return None, []
+
+    def _is_file(self, relpath):
+        directory, _, name = relpath.rpartition("/")
+        entries = self._listing(directory)
+        return entries is not None and name in entries
+
+    def _listing(self, directory):
+        """Names in `directory`, or None if it does not exist; one listdir each.
+
+        A missing directory is found missing from its parent's listing, so
+        the candidates for `a.b.f` cost no system call once `a/` is listed.
+        """
+        if directory in self._listings:
+            return self._listings[directory]
+        entries = None
+        parent, _, name = directory.rpartition("/")
+        if not directory or name in (self._listing(parent) or ()):
+            try:
+                entries = frozenset(os.listdir(os.path.join(self.root, directory)))
+            except OSError:
+                entries = None
+        self._listings[directory] = entries
+        return entries
+
+    def _symbol(self, path, parts):
+        """The longest defined `path::a.b` for `parts`, else None."""
+        for length in range(len(parts), 0, -1):
+            node_id = f"{path}::{'.'.join(parts[:length])}"
+            if self.defined(node_id):
+                return node_id
+        return None
+
+    def resolve(self, relpath, facts, scope, dotted):
+        """Node id that `dotted`, used in `scope` of `relpath`, refers to; or None."""
+        parts = dotted.split(".")
+        head = parts[0]
+        if head in SELF_NAMES and len(parts) > 1 and "." in scope:
+            owner = scope.rsplit(".", 1)[0]
+            return self._symbol(relpath, owner.split(".") + parts[1:2])
+        if head in facts["aliases"]:
+            level, target = facts["aliases"][head]
+            if level:
+                target = _relative_module(relpath, level, target)
+            path, rest = self.module(".".join([target] + parts[1:]))
+            if path is None:
+                return None
+            if not rest:
+                return path if self.defined(path) else None
+            return self._symbol(path, rest)
+        return self._symbol(relpath, parts)
+
+    def link(self, relpath, facts):
+        """(nodes, edges) of one parsed file."""
+        python = facts["python"]
+        module = {"id": relpath, "type": "module" if python else "file", "source": relpath,
+                  "hash": facts["hash"], "attributes": "unparsed" if facts["unparsed"] else ""}
+        nodes, edges, seen = [module], [], set()
+
+        def add(source, target, kind):
+            if target and target != source and (source, target, kind) not in seen:
+                seen.add((source, target, kind))
+                edges.append({"source": source, "target": target, "type": kind, "hash": ""})
+
+        for name, kind, line, node_hash in facts["defs"]:
+            node_id = f"{relpath}::{name}"
+            nodes.append({"id": node_id, "type": kind, "source": relpath, "hash": node_hash,
+                          "attributes": f"line={line}"})
+            parent = f"{relpath}::{name.rsplit('.', 1)[0]}" if "." in name else relpath
+            add(parent, node_id, "defines")
+        for level, module_name, names in facts["imports"]:
+            base = _relative_module(relpath, level, module_name) if level else module_name
+            for dotted in ([f"{base}.{name}" if base else name for name in names]
+                           if names else [base]):
+                path, _ = self.module(dotted) if dotted else (None, [])
+                if path and self.defined(path):
+                    add(relpath, path, "imports")
+        for name, bases in facts["bases"].items():
+            for dotted in bases:
+                target = self.resolve(relpath, facts, name, dotted)
+                if target and "::" in target:
+                    add(f"{relpath}::{name}", target, "inherits")
+        for scope, calls in facts["calls"].items():
+            source = f"{relpath}::{scope}" if scope else relpath
+            for dotted in calls:
+                target = self.resolve(relpath, facts, scope, dotted)
+                if target and "::" in target:
+                    add(source, target, "calls")
+        return nodes, edges
+
+
+def node_ids(relpath, facts):
+    return [relpath] + [f"{relpath}::{name}" for name, _, _, _ in facts["defs"]]
+
+
+# --- the cache and the batch API ----------------------------------------------------
+
+class ExtractCache:
+    """Parsed facts by content hash, plus each file's last (mtime_ns, size, hash).
+
+    Stored as one JSON file. A file whose stamp is unchanged is not read; one
+    whose content hash is known is not parsed again.
+    """
+
+    VERSION = 1
+
+    @classmethod
+    def for_kg_dir(cls, kg_dir):
+        return cls(os.path.join(kg_dir, CACHE_FILE))
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}  # relpath -> [mtime_ns, size, hash]
+        self.facts = {}  # hash -> facts
+        self.dirty = False
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == self.VERSION and data.get("extractor") == EXTRACTOR_VERSION:
+            self.files = data.get("files", {})
+            self.facts = data.get("facts", {})
+
+    def lookup(self, root, relpath):
+        """Cached facts for `relpath`, or None when it must be parsed.
+
+        An unchanged stamp is a hit without reading the file. Otherwise the
+        file is read and hashed, which is much cheaper than parsing it, so a
+        checkout that only touched mtimes, a rename, or a copy is still a hit.
+        """
+        path = os.path.join(root, relpath)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        known = self.files.get(relpath)
+        if known is not None and [stat.st_mtime_ns, stat.st_size] == known[:2]:
+            facts = self.facts.get(known[2])
+            if facts is not None:
+                return facts
+        if not self.facts:
+            return None
+        try:
+            with open(path, "rb") as handle:
+                facts = self.facts.get(content_hash(handle.read()))
+        except OSError:
+            return None
+        if facts is None or facts["python"] != relpath.endswith(".py"):
+            return None
+        self.store(relpath, (stat.st_mtime_ns, stat.st_size), facts)
+        return facts
+
+    def store(self, relpath, stamp, facts):
+        self.files[relpath] = [stamp[0], stamp[1], facts["hash"]]
+        self.facts[facts["hash"]] = facts
+        self.dirty = True
+
+    def retain(self, relpaths):
+        """Forget files not in `relpaths` (after a full-repository run)."""
+        keep = set(relpaths)
+        for relpath in [relpath for relpath in self.files if relpath not in keep]:
+            del self.files[relpath]
+            self.dirty = True
+
+    def save(self):
+        """Write the cache, dropping facts no file refers to any more."""
+        if not self.dirty:
+            return
+        used = {entry[2] for entry in self.files.values()}
+        self.facts = {key: value for key, value in self.facts.items() if key in used}
+        try:
+            atomic_write(self.path, json.dumps({
+                "version": self.VERSION, "extractor": EXTRACTOR_VERSION,
+                "files": self.files, "facts": self.facts}, sort_keys=True))
+            self.dirty = False
+        except OSError:
+            pass  # a read-only location still works, it just starts cold next time
+
+
+def _parse_all(root, relpaths, workers):
+    if len(relpaths) < POOL_MIN_FILES or workers == 1:
+        return parse_chunk(root, relpaths)
+    chunks = [relpaths[start:start + CHUNK_FILES]
+              for start in range(0, len(relpaths), CHUNK_FILES)]
+    results = []
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            for batch in pool.map(parse_chunk, [root] * len(chunks), chunks):
+                results.extend(batch)
+    except (OSError, RuntimeError):  # includes BrokenProcessPool
+        done = {relpath for relpath, _, _ in results}
+        results.extend(parse_chunk(root, [path for path in relpaths if path not in done]))
+    return results
+
+
+def extract_files(root, relpaths, workers=None, cache=None, exists=None, stats=None):
+    """{relpath: (nodes, edges)} for `relpaths` under `root`.
+
+    `cache` is an ExtractCache (or None). `exists(node_id)` tells the
+    linker about nodes outside this batch; by default only the batch's own
+    nodes are link targets. `stats`, if given, is filled with counts and
+    timings. Unreadable files are left out.
+    """
+    started = time.perf_counter()
+    relpaths = list(relpaths)
+    parsed, pending = {}, []
+    for relpath in relpaths:
+        facts = cache.lookup(root, relpath) if cache is not None else None
+        if facts is None:
+            pending.append(relpath)
+        else:
+            parsed[relpath] = facts
+    cached = len(parsed)
+    for relpath, stamp, facts in _parse_all(root, pending, workers):
+        if facts is None:
+            continue
+        if cache is not None:
+            cache.store(relpath, stamp, facts)
+        parsed[relpath] = facts
+    parse_ms = (time.perf_counter() - started) * 1000
+
+    batch_ids = set()
+    for relpath, facts in parsed.items():
+        batch_ids.update(node_ids(relpath, facts))
+    linker = Linker(root, batch_ids, exists)
+    results = {relpath: linker.link(relpath, parsed[relpath])
+               for relpath in relpaths if relpath in parsed}
+    if stats is not None:
+        stats.update(files=len(relpaths), cached=cached, parsed=len(parsed) - cached,
+                     parse_ms=round(parse_ms, 1),
+                     ms=round((time.perf_counter() - started) * 1000, 1))
+    return results
+
+
+def repository_files(root):
+    """Tracked files via one `git ls-files`, else every non-hidden file under `root`."""
+    try:
+        return sorted(path for path in git.run(root, "ls-files", "-z").split("\0") if path)
+    except git.GitError:
+        pass
+    found = []
+    for directory, subdirectories, names in os.walk(root):
+        subdirectories[:] = sorted(name for name in subdirectories if not name.startswith("."))
+        relative = os.path.relpath(directory, root).replace(os.sep, "/")
+        found.extend(name if relative == "." else f"{relative}/{name}"
+                     for name in names if not name.startswith("."))
+    return sorted(found)
@@ -0,0 +1,112 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""The few git plumbing calls the git-aware KG needs, via `subprocess`.
+
+Every helper runs one git process and parses its output; nothing here
+walks history commit by commit.
+"""
+
+import subprocess
+
+from .manifest import GitKGError
+
+DEFAULT_BRANCHES = ("main", "master")
+
+
+class GitError(GitKGError):
+    """A git command failed, or the path is not a repository."""
+
+
+def run(repo, *args):
+    """stdout of `git -C repo args...`; raises GitError on failure."""
+    try:
+        done = subprocess.run(["git", "-C", repo] + list(args), stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, check=False)
+    except OSError as exc:
+        raise GitError(f"cannot run git: {exc}") from exc
+    if done.returncode != 0:
+        message = done.stderr.decode("utf-8", errors="replace").strip().splitlines()
+        raise GitError(f"git {args[0]}: {message[-1] if message else 'failed'}")
+    return done.stdout.decode("utf-8", errors="replace")
+
+
+def is_repository(repo):
+    try:
+        return run(repo, "rev-parse", "--is-inside-work-tree").strip() == "true"
+    except GitError:
+        return False
+
+
+def rev_parse(repo, revision):
+    return run(repo, "rev-parse", "--verify", "--quiet", revision + "^{commit}").strip()
+
+
+def current_branch(repo):
+    return run(repo, "rev-parse", "--abbrev-ref", "HEAD").strip()
+
+
+def default_branch(repo, override=None):
+    """`git_aware_kg.default_branch_override`, else origin/HEAD, else main or master."""
+    if override:
+        return override
+    try:
+        remote = run(repo, "symbolic-ref", "--quiet", "refs/remotes/origin/HEAD").strip()
+        return remote.rsplit("/", 1)[-1]
+    except GitError:
+        pass
+    for name in DEFAULT_BRANCHES:
+        try:
+            rev_parse(repo, name)
+            return name
+        except GitError:
+            continue
+    return current_branch(repo)
+
+
+def merge_base(repo, a, b="HEAD"):
+    return run(repo, "merge-base", a, b).strip()
+
+
+def diff_name_status(repo, base, head="HEAD"):
+    """[(status, path, old_path)] between two trees, renames detected.
+
+    `head=None` compares `base` with the working tree instead. `status` is
+    one letter (A, M, D, T, R, C); `old_path` is set for R and C. Paths are
+    NUL-separated by `-z`, so unusual filenames survive.
+    """
+    revisions = [base] if head is None else [base, head]
+    fields = run(repo, "diff", "--name-status", "-z", "-M", *revisions).split("\0")
+    changes = []
+    position = 0
+    while position < len(fields) and fields[position]:
+        status = fields[position][0]
+        if status in "RC":
+            old, new = fields[position + 1], fields[position + 2]
+            changes.append((status, new, old))
+            position += 3
+        else:
+            changes.append((status, fields[position + 1], None))
+            position += 2
+    return changes
+
+
+def branch_refs(repo):
+    """{branch: commit} for every local and remote-tracking branch, from one git process.
+
+    Remote branches are named without their remote (`origin/feature/x` is
+    `feature/x`), so a branch pushed but not checked out locally counts as
+    existing. A local branch wins over a remote one of the same name.
+    """
+    output = run(repo, "for-each-ref", "--format=%(refname)%00%(objectname)",
+                 "refs/heads", "refs/remotes")
+    local, remote = {}, {}
+    for line in output.splitlines():
+        refname, _, commit = line.partition("\0")
+        if refname.startswith("refs/heads/"):
+            local[refname[len("refs/heads/"):]] = commit
+        elif refname.startswith("refs/remotes/"):
+            name = refname[len("refs/remotes/"):].split("/", 1)[-1]
+            if name != "HEAD":
+                remote.setdefault(name, commit)
+    return dict(remote, **local)
@@ -0,0 +1,311 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Overlay lifecycle management (Adaptive_Graph_Maintenance step 2.5, RAG-RULES.md).
+
+The algorithm checks each overlay's branch with its own `git branch --list`.
+`scan` lists every local and remote-tracking branch with one
+`git for-each-ref` and joins the result against `overlays/*`, reading only
+each overlay document's Metadata section. Each overlay is then one of:
+
+    active    its branch exists and it is current
+    stale     marked STALE, or built against another base commit
+    outdated  its branch has moved past the overlay's Head Commit
+    orphaned  its branch is gone, but it is younger than overlay_retention_days
+    expired   its branch is gone and it is older than that
+
+Expired overlays are proposed for pruning and stale or outdated ones for
+rebuilding (`project_support.git_aware_kg.stale_overlay_auto_rebuild`), in
+batches of `cleanup_guidance.batch_cleanup_limit`. The workflow is the retention
+sweeper's (memory/sweep.py), with state in `knowledge_graph/.gc/proposals.json`:
+
+    status    print the scan
+    propose   replace pending batches with fresh ones
+    approve   record the user's consent for prune batches
+    apply     prune approved batches and rebuild the rest
+
+Pruning needs consent when `cleanup_guidance.require_user_consent` is on; it
+moves the overlay directory to `overlays/.pruned/`, so nothing is destroyed.
+Rebuilding writes no history away, so its batches need none. All rebuilds
+share one detached worktree and one loaded base graph.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from .._fs import atomic_write
+from ..memory.store import format_timestamp, load_settings as load_memory_settings
+from . import git, manifest
+from .overlay import build_overlay
+
+STATE_DIR = ".gc"  # under knowledge_graph/
+PROPOSALS_FILE = "proposals.json"
+PRUNED_DIR = ".pruned"  # under overlays/
+DAY = 86400
+
+
+def lifecycle_settings(settings=None):
+    """The overlay lifecycle knobs, from memory-rules settings.json."""
+    if settings is None:
+        settings = load_memory_settings()
+    rules = settings.get("memory_rules", settings)
+    git_aware = rules["project_support"]["git_aware_kg"]
+    category = rules.get("categories", {}).get("knowledge_graph_overlay", {})
+    cleanup = rules.get("cleanup_guidance", {})
+    return {
+        "retention_days": git_aware.get("overlay_retention_days", 30),
+        "auto_rebuild": bool(git_aware.get("stale_overlay_auto_rebuild", True)),
+        "cleanup_on_branch_deletion": bool(category.get("cleanup_on_branch_deletion", True)),
+        "require_user_consent": bool(cleanup.get("require_user_consent", True)),
+        "batch_limit": max(1, int(cleanup.get("batch_cleanup_limit", 10))),
+    }
+
+
+def _same_commit(a, b):
+    """Whether two possibly abbreviated commit ids name the same commit."""
+    return a.startswith(b) or b.startswith(a)
+
+
+def overlay_metadata(kg_dir, directory):
+    """(metadata, status, generated) of one overlay directory, from Metadata sections only.
+
+    As in `manifest.load_overlay`, the status is the newest document's that
+    records one; the metadata and generation time are the newest overlay
+    document's, with its manifest's entries layered on top.
+    """
+    path = os.path.join(kg_dir, manifest.OVERLAY_DIR, directory)
+    documents = []
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return None
+    for name in names:
+        if name.endswith(".md"):
+            metadata = manifest.read_metadata(os.path.join(path, name))
+            if metadata is not None:
+                documents.append((manifest.generated_at(metadata, os.path.join(path, name)),
+                                  name, metadata))
+    documents.sort(key=lambda document: (document[0], document[1]))
+    overlays = [document for document in documents if document[1] != manifest.OVERLAY_MANIFEST
+                and document[1].endswith(manifest.OVERLAY_SUFFIX)]
+    if not overlays:
+        return None
+    generated, _, newest = overlays[-1]
+    metadata, status = dict(newest), "VALID"
+    for when, name, fields in documents:
+        value = fields.get("Status", "").strip()
+        if value and not value.startswith("["):
+            status = value
+        if name == manifest.OVERLAY_MANIFEST and when >= generated:
+            metadata.update((key, value) for key, value in fields.items() if value)
+    return metadata, status, generated
+
+
+def scan(repo, kg_dir, settings=None, now=None):
+    """One record per overlay directory, classified against the repository's branches."""
+    now = time.time() if now is None else now
+    config = lifecycle_settings(settings)
+    refs = git.branch_refs(repo)
+    base_commit = (manifest.base_metadata(kg_dir) or {}).get("Base Commit", "")
+    records = []
+    for directory in manifest.overlay_branches(kg_dir):
+        found = overlay_metadata(kg_dir, directory)
+        if found is None:
+            continue
+        metadata, status, generated = found
+        branch = metadata.get("Branch") or directory
+        built_on = (metadata.get("Validated Base Commit")
+                    or metadata.get("Merge Base Commit", "")).strip()
+        head = metadata.get("Head Commit", "").strip()
+        tip = refs.get(branch)
+        record = {"directory": directory, "branch": branch, "status": status,
+                  "generated": format_timestamp(generated),
+                  "age_days": round((now - generated) / DAY, 1), "head": head, "tip": tip,
+                  "action": None, "reason": ""}
+        if tip is None:
+            if record["age_days"] <= config["retention_days"]:
+                record.update(state="orphaned", reason=f"branch deleted; kept until "
+                              f"{config['retention_days']} days old")
+            elif not config["cleanup_on_branch_deletion"]:
+                record.update(state="expired", reason="branch deleted; "
+                              "cleanup_on_branch_deletion is off")
+            else:
+                record.update(state="expired", action="prune",
+                              reason=f"branch deleted; {record['age_days']} days old")
+        elif status.upper().startswith("STALE") or (
+                base_commit and built_on and not _same_commit(base_commit, built_on)):
+            record.update(state="stale", reason=metadata.get("Stale Reason") or status
+                          if status.upper().startswith("STALE")
+                          else f"built against {built_on}, base is {base_commit}")
+        elif head and not _same_commit(tip, head):
+            record.update(state="outdated", reason=f"branch moved from {head[:12]} "
+                                                   f"to {tip[:12]}")
+        else:
+            record["state"] = "active"
+        if record["state"] in ("stale", "outdated") and config["auto_rebuild"]:
+            record["action"] = "rebuild"
+        records.append(record)
+    return records
+
+
+# --- proposal state ------------------------------------------------------------
+
+def _state_path(kg_dir):
+    return os.path.join(kg_dir, STATE_DIR, PROPOSALS_FILE)
+
+
+def load_proposals(kg_dir):
+    try:
+        with open(_state_path(kg_dir), "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return {"batches": []}
+
+
+def save_proposals(kg_dir, state):
+    atomic_write(_state_path(kg_dir), json.dumps(state, indent=2) + "\n")
+
+
+def _batch_id(action, directories):
+    digest = hashlib.sha1("\n".join([action] + directories).encode("utf-8")).hexdigest()
+    return f"{action[0]}-{digest[:10]}"
+
+
+def propose(repo, kg_dir, settings=None, now=None):
+    """Replace pending batches with fresh ones from a scan; approved batches are kept.
+
+    Rebuild batches are approved as they are proposed: rebuilding an
+    overlay replaces a derived document and removes nothing.
+    """
+    now = time.time() if now is None else now
+    config = lifecycle_settings(settings)
+    state = load_proposals(kg_dir)
+    kept = [batch for batch in state["batches"] if batch["status"] == "approved"]
+    claimed = {overlay["directory"] for batch in kept for overlay in batch["overlays"]}
+    created = format_timestamp(now)
+    records = [record for record in scan(repo, kg_dir, settings, now)
+               if record["action"] and record["directory"] not in claimed]
+    fresh = []
+    for action in ("prune", "rebuild"):
+        chosen = [record for record in records if record["action"] == action]
+        for start in range(0, len(chosen), config["batch_limit"]):
+            overlays = [{key: record[key] for key in
+                         ("directory", "branch", "state", "reason", "generated", "tip")}
+                        for record in chosen[start:start + config["batch_limit"]]]
+            batch = {"id": _batch_id(action, [overlay["directory"] for overlay in overlays]),
+                     "action": action, "status": "pending", "created": created,
+                     "overlays": overlays}
+            if action == "rebuild":
+                batch.update(status="approved", approved=created)
+            fresh.append(batch)
+    state["batches"] = kept + fresh
+    save_proposals(kg_dir, state)
+    return state
+
+
+def approve(kg_dir, batch_ids, now=None):
+    """Record consent for the given prune batch ids; returns the ids approved."""
+    state = load_proposals(kg_dir)
+    approved = []
+    for batch in state["batches"]:
+        if batch["id"] in batch_ids and batch["status"] == "pending":
+            batch["status"] = "approved"
+            batch["approved"] = format_timestamp(time.time() if now is None else now)
+            approved.append(batch["id"])
+    save_proposals(kg_dir, state)
+    return approved
+
+
+def prune(kg_dir, directory, stamp):
+    """Move an overlay directory under overlays/.pruned/; returns the new path."""
+    overlays = os.path.join(kg_dir, manifest.OVERLAY_DIR)
+    target = os.path.join(overlays, PRUNED_DIR, f"{directory}@{stamp.replace(':', '')}")
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(os.path.join(overlays, directory), target)
+    return target
+
+
+def rebuild(repo, kg_dir, overlays, workers=None):
+    """Rebuild overlays at their branch tips in one detached worktree; returns their summaries.
+
+    The base graph is loaded once for the whole batch, and each rebuild is
+    one checkout of the shared worktree.
+    """
+    base = manifest.load_base(kg_dir)
+    if base is None:
+        raise manifest.GitKGError(f"no base graph under {kg_dir}; build one first")
+    parent = tempfile.mkdtemp(prefix="gitkg-gc-")
+    worktree = os.path.join(parent, "tree")
+    summaries = []
+    try:
+        git.run(repo, "worktree", "add", "--quiet", "--detach", worktree, overlays[0]["tip"])
+        for overlay in overlays:
+            git.run(worktree, "checkout", "--quiet", "--detach", overlay["tip"])
+            summaries.append(build_overlay(worktree, kg_dir, overlay["branch"], workers,
+                                           base=base))
+    finally:
+        try:
+            git.run(repo, "worktree", "remove", "--force", worktree)
+        except git.GitError:
+            pass
+        shutil.rmtree(parent, ignore_errors=True)
+        try:
+            git.run(repo, "worktree", "prune")
+        except git.GitError:
+            pass
+    return summaries
+
+
+def apply(repo, kg_dir, batch_ids=None, settings=None, workers=None, now=None):
+    """Prune and rebuild the overlays of approved batches; returns what was done.
+
+    Without consent required, pending batches named in `batch_ids` may be
+    applied too. Branch tips are read again first (one `for-each-ref`): an
+    overlay whose branch has come back is not pruned, and rebuilds use the
+    current tip.
+    """
+    config = lifecycle_settings(settings)
+    state = load_proposals(kg_dir)
+    chosen = []
+    for batch in state["batches"]:
+        if batch_ids is not None and batch["id"] not in batch_ids:
+            continue
+        if batch["status"] == "approved" or (
+                batch["status"] == "pending" and not config["require_user_consent"]
+                and batch_ids is not None):
+            chosen.append(batch)
+    done = {"pruned": [], "rebuilt": [], "skipped": []}
+    if not chosen:
+        return done
+
+    refs = git.branch_refs(repo)
+    stamp = format_timestamp(time.time() if now is None else now)
+    present = set(manifest.overlay_branches(kg_dir))
+    to_rebuild = []
+    for batch in chosen:
+        for overlay in batch["overlays"]:
+            directory = overlay["directory"]
+            if directory not in present:
+                done["skipped"].append(f"{directory}: no longer in overlays/")
+            elif batch["action"] == "prune":
+                if overlay["branch"] in refs:
+                    done["skipped"].append(f"{directory}: branch {overlay['branch']} exists again")
+                else:
+                    prune(kg_dir, directory, stamp)
+                    done["pruned"].append(overlay["branch"])
+            elif overlay["branch"] not in refs:
+                done["skipped"].append(f"{directory}: branch {overlay['branch']} is gone")
+            else:
+                to_rebuild.append(dict(overlay, tip=refs[overlay["branch"]]))
+    if to_rebuild:
+        for summary in rebuild(repo, kg_dir, to_rebuild, workers):
+            done["rebuilt"].append(summary["branch"])
+    for batch in chosen:
+        batch["status"] = "applied"
+        batch["applied"] = stamp
+    save_proposals(kg_dir, state)
+    return done
@@ -0,0 +1,419 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Read the git-aware KG documents of MEMORY-RULES.md.
+
+A project's `knowledge_graph/` directory holds:
+
+    base/base_manifest.md            Base KG Manifest (Node and Edge Registry)
+    base/[ts]_base_kg.md             the base graph itself
+    base/base_graph.bin              binary snapshot of the manifest (snapshot.py)
+    overlays/<branch>/[ts]_overlay.md   KG Branch Overlay (or overlay.md)
+    overlays/<branch>/overlay_manifest.md   timestamp and validity
+    cross_branch/[ts]_analysis.md    Cross-Branch KG Analysis
+
+`<branch>` is the branch name with `/` replaced by `--`. Nodes are dicts
+`{id, type, source, hash, attributes}` and edges are dicts
+`{source, target, type, hash}`. An edge is identified by its
+(source, target, type) triple, which is the key RAG-RULES.md compares
+relationships by; the registry's own Edge Key column is kept as `key`.
+"""
+
+import hashlib
+import os
+import re
+
+from ..memory.graph import parse_tables
+from ..memory.store import parse_entry, parse_timestamp
+
+BASE_DIR = "base"
+OVERLAY_DIR = "overlays"
+CROSS_BRANCH_DIR = "cross_branch"
+BASE_MANIFEST = "base_manifest.md"
+OVERLAY_MANIFEST = "overlay_manifest.md"
+OVERLAY_SUFFIX = "overlay.md"
+
+NODE_SECTIONS = ("Added Nodes", "Removed Nodes", "Modified Nodes")
+EDGE_SECTIONS = ("Added Edges", "Removed Edges", "Modified Edges")
+
+# Modified Nodes "Field Changed" values that name a node column.
+NODE_FIELDS = {"type": "type", "source": "source", "source file": "source",
+               "hash": "hash", "content hash": "hash"}
+
+_HASH_ATTRIBUTE = re.compile(r"(?:^|[\s,;])hash=([0-9a-f]+)")
+
+
+class GitKGError(Exception):
+    """A git-aware KG operation cannot proceed (no base graph, not a repository, ...)."""
+
+
+def sanitize_branch(name):
+    """Directory name of a branch's overlay (`feature/x` -> `feature--x`)."""
+    return name.replace("/", "--")
+
+
+def edge_key(edge):
+    return edge["source"], edge["target"], edge["type"]
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _cell(row, *names):
+    for name in names:
+        value = row.get(name, "").strip().strip("`").strip()
+        if value:
+            return value
+    return ""
+
+
+def node_from_row(row):
+    """A node from a Node Registry or Added Nodes row.
+
+    Added Nodes has no Content Hash column, so tools write `hash=...` into
+    Attributes instead.
+    """
+    attributes = _cell(row, "Attributes")
+    node_hash = _cell(row, "Content Hash")
+    if not node_hash:
+        match = _HASH_ATTRIBUTE.search(attributes)
+        node_hash = match.group(1) if match else ""
+    return {"id": _cell(row, "Node ID"), "type": _cell(row, "Type"),
+            "source": _cell(row, "Source File"), "hash": node_hash,
+            "attributes": attributes}
+
+
+def edge_from_row(row):
+    edge = {"source": _cell(row, "Source Node", "Source"),
+            "target": _cell(row, "Target Node", "Target"),
+            "type": _cell(row, "Type"), "hash": _cell(row, "Content Hash")}
+    key = _cell(row, "Edge Key")
+    if key:
+        edge["key"] = key
+    return edge
+
+
+def read_document(path):
+    """(metadata, tables, digest) of one markdown document, or None if unreadable."""
+    try:
+        with open(path, "rb") as handle:
+            data = handle.read()
+    except OSError:
+        return None
+    text = data.decode("utf-8", errors="replace")
+    return parse_entry(text)["metadata"], parse_tables(text), digest(data)
+
+
+def generated_at(metadata, path):
+    """When a document was written: Generated, else its filename, else its mtime."""
+    when = parse_timestamp(metadata.get("Generated")) or parse_timestamp(os.path.basename(path))
+    if when is None:
+        try:
+            when = os.path.getmtime(path)
+        except OSError:
+            when = 0.0
+    return when
+
+
+def _newest(paths):
+    """[(when, path, (metadata, tables, digest))] for readable `paths`, oldest first."""
+    documents = []
+    for path in paths:
+        document = read_document(path)
+        if document is not None:
+            documents.append((generated_at(document[0], path), path, document))
+    documents.sort()
+    return documents
+
+
+class Base:
+    """The base graph, as its manifest's Node and Edge Registries describe it."""
+
+    def __init__(self, metadata, nodes, edges, digest, path=None):
+        self.metadata = metadata
+        self.commit = metadata.get("Base Commit", "")
+        self.branch = metadata.get("Default Branch", "")
+        self.nodes = nodes  # id -> node
+        self.edges = edges  # (source, target, type) -> edge
+        self.digest = digest
+        self.path = path
+        self._incident = None
+
+    def incident(self, node_id):
+        """Keys of the edges that start or end at `node_id` (index built once)."""
+        if self._incident is None:
+            incident = {}
+            for key in self.edges:
+                incident.setdefault(key[0], []).append(key)
+                if key[1] != key[0]:
+                    incident.setdefault(key[1], []).append(key)
+            self._incident = incident
+        return self._incident.get(node_id, ())
+
+    @classmethod
+    def from_tables(cls, metadata, tables, digest, path=None):
+        nodes, edges = {}, {}
+        for row in tables.get("Node Registry", ()):
+            node = node_from_row(row)
+            if node["id"]:
+                nodes[node["id"]] = node
+        for row in tables.get("Edge Registry", ()):
+            edge = edge_from_row(row)
+            if edge["source"] and edge["target"]:
+                edges[edge_key(edge)] = edge
+        return cls(metadata, nodes, edges, digest, path)
+
+
+def base_paths(kg_dir):
+    """The base manifest, or else the newest `[ts]_base_kg.md`, that exists."""
+    directory = os.path.join(kg_dir, BASE_DIR)
+    manifest = os.path.join(directory, BASE_MANIFEST)
+    if os.path.exists(manifest):
+        return [manifest]
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.endswith("_base_kg.md"))
+    except OSError:
+        return []
+    return [os.path.join(directory, name) for name in names]
+
+
+def load_base(kg_dir, use_snapshot=True):
+    """The project's Base, or None when no base graph has been built.
+
+    A base_manifest.md is read from its binary snapshot while that matches
+    it (see snapshot.py); after parsing the markdown, the snapshot is
+    written again.
+    """
+    from . import snapshot  # snapshot builds on this module
+    paths = base_paths(kg_dir)
+    manifest = os.path.join(kg_dir, BASE_DIR, BASE_MANIFEST)
+    if use_snapshot and paths == [manifest]:
+        cached = snapshot.open_for(kg_dir)
+        if cached is not None:
+            return cached
+    documents = _newest(paths)
+    if not documents:
+        return None
+    _, path, (metadata, tables, data_digest) = documents[-1]
+    base = Base.from_tables(metadata, tables, data_digest, path)
+    if use_snapshot and path == manifest:
+        try:
+            snapshot.write_for(kg_dir, base)
+        except OSError:
+            pass  # a read-only knowledge_graph/ still loads, only slower
+    return base
+
+
+def read_metadata(path):
+    """A document's Metadata section alone, reading no further; None if unreadable."""
+    head = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as handle:
+            for line in handle:
+                if line.startswith("## ") and not line.startswith("## Metadata"):
+                    break
+                head.append(line)
+    except OSError:
+        return None
+    return parse_entry("".join(head))["metadata"]
+
+
+def base_metadata(kg_dir):
+    """The base's Metadata section alone, without parsing its registries; or None."""
+    for path in reversed(base_paths(kg_dir)):
+        metadata = read_metadata(path)
+        if metadata is not None:
+            return metadata
+    return None
+
+
+class Overlay:
+    """One branch's delta from the base, from its newest overlay document."""
+
+    def __init__(self, branch, metadata, tables, digest, status="VALID", path=None,
+                 validated=""):
+        self.branch = metadata.get("Branch") or branch
+        self.directory = branch
+        self.metadata = metadata
+        self.merge_base = metadata.get("Merge Base Commit", "")
+        # A base refresh that left this overlay's files alone records the new
+        # base commit; the delta is still right against that base.
+        self.base_commit = validated or self.merge_base
+        self.status = status
+        self.digest = digest
+        self.path = path
+        self.files = [(_cell(row, "File"), _cell(row, "Change Type").lower())
+                      for row in tables.get("File Diff Summary", ()) if _cell(row, "File")]
+        self.added_nodes = [node_from_row(row) for row in tables.get("Added Nodes", ())]
+        self.removed_nodes = [(_cell(row, "Node ID"), _cell(row, "Reason"))
+                              for row in tables.get("Removed Nodes", ())]
+        self.modified_nodes = [(_cell(row, "Node ID"), _cell(row, "Field Changed"),
+                                _cell(row, "Old Value Summary"), _cell(row, "New Value Summary"))
+                               for row in tables.get("Modified Nodes", ())]
+        self.added_edges = []
+        for row in tables.get("Added Edges", ()):
+            edge = edge_from_row(row)
+            edge["confidence"] = _cell(row, "Confidence")
+            self.added_edges.append(edge)
+        self.removed_edges = [dict(edge_from_row(row), reason=_cell(row, "Reason"))
+                              for row in tables.get("Removed Edges", ())]
+        self.modified_edges = [dict(edge_from_row(row), change=_cell(row, "Change"))
+                               for row in tables.get("Modified Edges", ())]
+
+    @property
+    def stale(self):
+        return self.status.upper().startswith("STALE")
+
+    def touched_nodes(self):
+        """Ids of every node the overlay adds, removes, or modifies."""
+        touched = {node["id"] for node in self.added_nodes}
+        touched.update(node_id for node_id, _ in self.removed_nodes)
+        touched.update(row[0] for row in self.modified_nodes)
+        touched.discard("")
+        return touched
+
+    def touched_edges(self):
+        """(source, target, type) of every edge the overlay adds, removes, or modifies."""
+        return {edge_key(edge) for edges in (self.added_edges, self.removed_edges,
+                                             self.modified_edges) for edge in edges}
+
+
+def overlay_branches(kg_dir):
+    """Directory names under overlays/, sorted."""
+    try:
+        return sorted(entry.name for entry in os.scandir(os.path.join(kg_dir, OVERLAY_DIR))
+                      if entry.is_dir() and not entry.name.startswith("."))
+    except OSError:
+        return []
+
+
+def overlay_stamp(kg_dir, branch):
+    """(name, mtime_ns, size) of every file in a branch's overlay directory."""
+    stamps = []
+    try:
+        with os.scandir(os.path.join(kg_dir, OVERLAY_DIR, sanitize_branch(branch))) as entries:
+            for entry in entries:
+                if entry.name.endswith(".md"):
+                    stat = entry.stat()
+                    stamps.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    except OSError:
+        return ()
+    return tuple(sorted(stamps))
+
+
+def load_overlay(kg_dir, branch):
+    """A branch's Overlay, or None when it has none.
+
+    The newest overlay document holds the delta. Its status is that of the
+    newest document (overlay or overlay manifest) that records one, so a
+    manifest marking the overlay STALE after it was written wins.
+    """
+    directory = os.path.join(kg_dir, OVERLAY_DIR, sanitize_branch(branch))
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return None
+    documents = _newest(os.path.join(directory, name) for name in names
+                        if name.endswith(".md"))
+    overlays = [item for item in documents
+                if os.path.basename(item[1]) != OVERLAY_MANIFEST
+                and item[1].endswith(OVERLAY_SUFFIX)]
+    if not overlays:
+        return None
+    status, validated = "VALID", ""
+    newest_overlay = overlays[-1][0]
+    for when, _, (metadata, _, _) in documents:
+        value = metadata.get("Status", "").strip()
+        if value and not value.startswith("["):
+            status = value
+        if when >= newest_overlay:
+            validated = metadata.get("Validated Base Commit", "").strip() or validated
+    _, path, (metadata, tables, data_digest) = overlays[-1]
+    return Overlay(sanitize_branch(branch), metadata, tables, data_digest, status, path,
+                   validated)
+
+
+def overlay_manifest_metadata(kg_dir, branch):
+    """The Metadata of a branch's overlay_manifest.md, or {} if it has none."""
+    path = os.path.join(kg_dir, OVERLAY_DIR, sanitize_branch(branch), OVERLAY_MANIFEST)
+    document = read_document(path)
+    return document[0] if document else {}
+
+
+# --- rendering -----------------------------------------------------------------
+
+def _escape(value):
+    return str(value).replace("|", "/").replace("\n", " ").strip()
+
+
+def render_row(cells):
+    return "| " + " | ".join(_escape(cell) for cell in cells) + " |"
+
+
+def split_row(line):
+    """The cells of one markdown table row, stripped (backticks too)."""
+    return [cell.strip().strip("`").strip() for cell in line.strip().strip("|").split("|")]
+
+
+def render_table(header, rows):
+    lines = ["| " + " | ".join(header) + " |",
+             "|" + "|".join("-" * (len(name) + 2) for name in header) + "|"]
+    lines.extend(render_row(row) for row in rows)
+    return "\n".join(lines)
+
+
+def render_metadata(metadata):
+    return "\n".join(f"- **{key}**: {value}" for key, value in metadata.items())
+
+
+def render_base(title, metadata, nodes, edges):
+    """A Base KG Manifest; `nodes` and `edges` are iterables of node and edge dicts."""
+    nodes = sorted(nodes, key=lambda node: node["id"])
+    edges = sorted(edges, key=edge_key)
+    metadata = dict(metadata, **{"Node Count": len(nodes), "Edge Count": len(edges)})
+    return "\n\n".join([
+        f"# Base KG Manifest: {title}",
+        "## Metadata\n" + render_metadata(metadata),
+        "## Node Registry\n" + render_table(
+            ["Node ID", "Type", "Source File", "Content Hash"],
+            ((node["id"], node["type"], node["source"], node["hash"]) for node in nodes)),
+        "## Edge Registry\n" + render_table(
+            ["Edge Key", "Source Node", "Target Node", "Type", "Content Hash"],
+            ((edge.get("key") or f"e{number}", edge["source"], edge["target"], edge["type"],
+              edge.get("hash", "")) for number, edge in enumerate(edges, 1))),
+    ]) + "\n"
+
+
+def render_overlay(title, metadata, delta, tags):
+    """A KG Branch Overlay; `delta` has the Overlay attributes' shapes (see Overlay)."""
+    return "\n\n".join([
+        f"# KG Branch Overlay: {title}",
+        "## Metadata\n" + render_metadata(metadata),
+        "## File Diff Summary\n" + render_table(["File", "Change Type"], delta["files"]),
+        "## Added Nodes\n" + render_table(
+            ["Node ID", "Type", "Source File", "Attributes"],
+            ((node["id"], node["type"], node["source"], node["attributes"])
+             for node in delta["added_nodes"])),
+        "## Removed Nodes\n" + render_table(["Node ID", "Reason"], delta["removed_nodes"]),
+        "## Modified Nodes\n" + render_table(
+            ["Node ID", "Field Changed", "Old Value Summary", "New Value Summary"],
+            delta["modified_nodes"]),
+        "## Added Edges\n" + render_table(
+            ["Source", "Target", "Type", "Confidence"],
+            ((edge["source"], edge["target"], edge["type"], edge.get("confidence", ""))
+             for edge in delta["added_edges"])),
+        "## Removed Edges\n" + render_table(
+            ["Source", "Target", "Type", "Reason"],
+            ((edge["source"], edge["target"], edge["type"], edge.get("reason", ""))
+             for edge in delta["removed_edges"])),
+        "## Modified Edges\n" + render_table(
+            ["Source", "Target", "Type", "Change"],
+            ((edge["source"], edge["target"], edge["type"], edge.get("change", ""))
+             for edge in delta["modified_edges"])),
+        "## Tags\n[" + ", ".join(tags) + "]",
+    ]) + "\n"
+
+
+def render_overlay_manifest(title, metadata):
+    return f"# Overlay Manifest: {title}\n\n## Metadata\n{render_metadata(metadata)}\n"
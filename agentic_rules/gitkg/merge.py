@@ -0,0 +1,280 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Overlay_Merge_Resolution (RAG-RULES.md) without copying the base graph.
+
+The algorithm starts from "a deep copy of base_graph" and applies one
+overlay's removals, then modifications, then additions. Copying is the
+expensive part, and it is paid on every query on a non-default branch.
+`EffectiveGraph` applies the same steps to a copy-on-write view instead:
+the base's dicts are shared, and the view records only what the overlay
+changes (removed node ids, dropped edge keys, and replaced or added nodes
+and edges). Lookups check the overlay's layer first, then the base. A
+merge therefore costs O(overlay rows), plus the degree of removed nodes
+for the cascade, however large the base is.
+
+`OverlayMerger` caches views per (base commit, base digest, overlay
+digest and status) in a small LRU. Overlay directories are stat'ed, not
+read, on each call, so switching between branches whose overlays did not
+change is a dictionary lookup. When one overlay changes, only that branch
+is merged again; the base and every other branch's view are reused.
+"""
+
+import collections
+import os
+import threading
+import time
+
+from . import manifest
+from .manifest import NODE_FIELDS, edge_key
+
+
+class EffectiveGraph:
+    """A base graph plus at most one branch overlay."""
+
+    def __init__(self, base, overlay=None):
+        self.base = base
+        self.overlay = overlay
+        self.removed = set()  # base node ids the overlay removed
+        self.dropped = set()  # base edge keys the overlay removed or replaced
+        self.changed_nodes = {}  # id -> node: modified base nodes and added nodes
+        self.changed_edges = {}  # key -> edge: modified base edges and added edges
+        self._incident = collections.defaultdict(set)  # node id -> keys in changed_edges
+        self.warnings = []
+        if overlay is not None:
+            self._merge(overlay)
+
+    # -- reads ----------------------------------------------------------------
+
+    def has_node(self, node_id):
+        return node_id in self.changed_nodes or (
+            node_id in self.base.nodes and node_id not in self.removed)
+
+    def node(self, node_id):
+        node = self.changed_nodes.get(node_id)
+        if node is None and node_id not in self.removed:
+            node = self.base.nodes.get(node_id)
+        return node
+
+    def has_edge(self, key):
+        return key in self.changed_edges or (key in self.base.edges and key not in self.dropped)
+
+    def edge(self, key):
+        edge = self.changed_edges.get(key)
+        if edge is None and key not in self.dropped:
+            edge = self.base.edges.get(key)
+        return edge
+
+    def nodes(self):
+        changed, removed = self.changed_nodes, self.removed
+        for node_id, node in self.base.nodes.items():
+            if node_id not in removed and node_id not in changed:
+                yield node
+        yield from changed.values()
+
+    def edges(self):
+        changed, dropped = self.changed_edges, self.dropped
+        for key, edge in self.base.edges.items():
+            if key not in dropped and key not in changed:
+                yield edge
+        yield from changed.values()
+
+    def edges_of(self, node_id):
+        """Keys of the edges that start or end at `node_id`."""
+        keys = [key for key in self.base.incident(node_id)
+                if key not in self.dropped and key not in self.changed_edges]
+        keys.extend(self._incident.get(node_id, ()))
+        return keys
+
+    @property
+    def node_count(self):
+        base = self.base.nodes
+        return len(base) - len(self.removed) + sum(
+            1 for node_id in self.changed_nodes if node_id not in base)
+
+    @property
+    def edge_count(self):
+        # A replaced base edge is both dropped and changed, so it counts once.
+        return len(self.base.edges) - len(self.dropped) + len(self.changed_edges)
+
+    def to_dict(self):
+        """{nodes, edges} sorted by id and key, for export and comparison."""
+        return {"nodes": sorted(self.nodes(), key=lambda node: node["id"]),
+                "edges": sorted(self.edges(), key=edge_key)}
+
+    def summary(self):
+        overlay = self.overlay
+        return {"branch": overlay.branch if overlay else self.base.branch,
+                "base_commit": self.base.commit,
+                "merge_base": overlay.merge_base if overlay else self.base.commit,
+                "stale": bool(overlay and overlay.stale),
+                "nodes": self.node_count, "edges": self.edge_count,
+                "warnings": len(self.warnings)}
+
+    # -- merge ----------------------------------------------------------------
+
+    def _warn(self, message):
+        self.warnings.append(message)
+
+    def _put_node(self, node):
+        self.changed_nodes[node["id"]] = node
+        self.removed.discard(node["id"])
+
+    def _remove_node(self, node_id):
+        for key in self.edges_of(node_id):
+            self._remove_edge(key)
+        self.changed_nodes.pop(node_id, None)
+        if node_id in self.base.nodes:
+            self.removed.add(node_id)
+
+    def _put_edge(self, edge):
+        key = edge_key(edge)
+        self.changed_edges[key] = edge
+        if key in self.base.edges:
+            self.dropped.add(key)  # the base copy is shadowed
+        self._incident[key[0]].add(key)
+        self._incident[key[1]].add(key)
+
+    def _remove_edge(self, key):
+        if self.changed_edges.pop(key, None) is not None:
+            for node_id in key[:2]:
+                self._incident[node_id].discard(key)
+        if key in self.base.edges:
+            self.dropped.add(key)
+
+    def _matching(self, edge):
+        """The edge a Removed/Modified row means: the exact triple, else any
+        edge between the same endpoints."""
+        key = edge_key(edge)
+        if self.has_edge(key):
+            return [key]
+        return [other for other in self.edges_of(edge["source"])
+                if other[0] == edge["source"] and other[1] == edge["target"]]
+
+    def _merge(self, overlay):
+        if overlay.stale:
+            self._warn(f"overlay {overlay.branch} is marked {overlay.status}")
+        if overlay.base_commit and self.base.commit and \
+                not self.base.commit.startswith(overlay.base_commit) and \
+                not overlay.base_commit.startswith(self.base.commit):
+            self._warn(f"overlay {overlay.branch} was built against {overlay.base_commit}, "
+                       f"base is {self.base.commit}")
+        # 2. removals
+        for node_id, _ in overlay.removed_nodes:
+            if self.has_node(node_id):
+                self._remove_node(node_id)
+            else:
+                self._warn(f"removed node {node_id} is not in the base")
+        removed_ids = {node_id for node_id, _ in overlay.removed_nodes}
+        for edge in overlay.removed_edges:
+            keys = self._matching(edge)
+            # Overlays list the edges of removed nodes too; the cascade took them.
+            if not keys and not removed_ids.intersection((edge["source"], edge["target"])):
+                self._warn(f"removed edge {edge['source']} -> {edge['target']} matches no edge")
+            for key in keys:
+                self._remove_edge(key)
+        # 3. modifications
+        for node_id, field, _, new in overlay.modified_nodes:
+            node = self.node(node_id)
+            if node is None:
+                self._warn(f"modified node {node_id} does not exist")
+                continue
+            column = NODE_FIELDS.get(field.strip().lower())
+            if column:
+                node = dict(node, **{column: new})
+            else:
+                node = dict(node, changes=dict(node.get("changes", {}), **{field: new}))
+            self._put_node(node)
+        for edge in overlay.modified_edges:
+            keys = self._matching(edge)
+            if not keys:
+                self._warn(f"modified edge {edge['source']} -> {edge['target']} matches no edge")
+            for key in keys:
+                replaced = dict(self.edge(key), type=edge["type"] or key[2])
+                if edge["change"]:
+                    replaced["change"] = edge["change"]
+                self._remove_edge(key)
+                self._put_edge(replaced)
+        # 4. additions
+        for node in overlay.added_nodes:
+            if not node["id"]:
+                continue
+            if self.has_node(node["id"]):
+                self._warn(f"added node {node['id']} already exists; the overlay's version wins")
+            self._put_node(node)
+        for edge in overlay.added_edges:
+            missing = [end for end in (edge["source"], edge["target"]) if not self.has_node(end)]
+            if missing:
+                self._warn(f"added edge {edge['source']} -> {edge['target']} is orphaned: "
+                           f"no node {', '.join(missing)}")
+                continue
+            self._put_edge(edge)
+
+
+class OverlayMerger:
+    """Effective graphs for the branches of one `knowledge_graph/` directory."""
+
+    def __init__(self, kg_dir, max_views=16):
+        self.kg_dir = kg_dir
+        self.max_views = max_views
+        self._base = (None, None)  # (stamp, Base)
+        self._overlays = {}  # branch -> (stamp, Overlay or None)
+        self._views = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        self.merge_ms = 0.0
+
+    def base(self):
+        """The current Base (re-read only when its files change), or None."""
+        paths = manifest.base_paths(self.kg_dir)
+        stamp = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stamp.append((path, stat.st_mtime_ns, stat.st_size))
+        stamp = tuple(stamp)
+        if stamp != self._base[0]:
+            self._base = (stamp, manifest.load_base(self.kg_dir) if stamp else None)
+        return self._base[1]
+
+    def overlay(self, branch):
+        """A branch's Overlay (re-read only when its directory changes), or None."""
+        stamp = manifest.overlay_stamp(self.kg_dir, branch)
+        known = self._overlays.get(branch)
+        if known is None or known[0] != stamp:
+            known = self._overlays[branch] = (
+                stamp, manifest.load_overlay(self.kg_dir, branch) if stamp else None)
+        return known[1]
+
+    def effective(self, branch=None):
+        """The effective graph for `branch` (the base alone for the default branch
+        or a branch without an overlay); None when there is no base graph."""
+        with self._lock:
+            base = self.base()
+            if base is None:
+                return None
+            overlay = None
+            if branch and branch != base.branch:
+                overlay = self.overlay(branch)
+            # The status can come from a newer overlay manifest than the delta.
+            key = (base.commit, base.digest,
+                   (overlay.digest, overlay.status) if overlay else None)
+            view = self._views.get(key)
+            if view is not None:
+                self._views.move_to_end(key)
+                self.hits += 1
+                return view
+            self.misses += 1
+            started = time.perf_counter()
+            view = EffectiveGraph(base, overlay)
+            self.merge_ms += (time.perf_counter() - started) * 1000
+            self._views[key] = view
+            while len(self._views) > self.max_views:
+                self._views.popitem(last=False)
+            return view
+
+    def stats(self):
+        return {"views": len(self._views), "hits": self.hits, "misses": self.misses,
+                "merge_ms": round(self.merge_ms, 1)}
@@ -0,0 +1,231 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Diff_Based_Overlay_Construction (RAG-RULES.md) from one `git diff`.
+
+`build_overlay` asks git once for every file that differs between the base
+graph's commit and the working tree (`git diff --name-status -M`), adds
+the files that depend on them through the base graph's edges
+(`dependency_expansion_depth` hops), extracts entities from all of them
+(`extract.extract_files`: a process pool, and a content-hash cache in
+`knowledge_graph/.cache/`), and diffs the result against the base's
+entities for those files only. The delta is written in the KG
+Branch Overlay Template to `overlays/<branch>/overlay.md`, with an
+`overlay_manifest.md` next to it.
+
+The cost is one git process plus extraction of the changed files, so the
+`max_overlay_analysis_files` cap the algorithm describes is not needed to
+keep a large branch affordable. It is only applied when asked for, and
+then only to the dependents, never to the changed files themselves: an
+overlay that skips a changed file is wrong, not merely incomplete.
+"""
+
+import os
+import time
+
+from .._fs import atomic_write
+from ..kg.retrieval import load_settings as load_rag_settings
+from ..kg.temporal import now
+from ..memory.store import load_settings as load_memory_settings
+from . import extract, git, manifest
+from .manifest import GitKGError, edge_key, sanitize_branch
+
+TAGS = ("overlay", "git-aware-kg")
+CHANGE_TYPES = {"A": "added", "C": "added", "D": "deleted"}
+
+
+def git_aware_kg_settings(settings=None):
+    """The memory_rules.project_support.git_aware_kg block of memory-rules settings.
+
+    A settings file without it raises KeyError rather than passing for one
+    that left every option at its default.
+    """
+    if settings is None:
+        settings = load_memory_settings()
+    return settings["memory_rules"]["project_support"]["git_aware_kg"]
+
+
+def git_aware_settings():
+    """(default_branch_override, dependency_expansion_depth) from settings.json."""
+    try:
+        override = git_aware_kg_settings().get("default_branch_override")
+    except (OSError, ValueError):
+        override = None
+    try:
+        depth = load_rag_settings().get("git_aware", {}).get("dependency_expansion_depth", 1)
+    except (OSError, ValueError):
+        depth = 1
+    return override, depth
+
+
+def changed_files(changes):
+    """[(path, change type)] for the File Diff Summary, and the deleted paths.
+
+    A rename is its old path deleted and its new path added, which is what
+    it is to the graph: every node id starts with the file's path.
+    """
+    files, deleted = [], set()
+    for status, path, old_path in changes:
+        if status == "R":
+            files.append((old_path, "deleted"))
+            deleted.add(old_path)
+            files.append((path, "added"))
+        elif status == "D":
+            files.append((path, "deleted"))
+            deleted.add(path)
+        else:
+            files.append((path, CHANGE_TYPES.get(status, "modified")))
+    return sorted(files), deleted
+
+
+def _by_source(base):
+    by_source = {}
+    for node in base.nodes.values():
+        by_source.setdefault(node["source"], []).append(node["id"])
+    return by_source
+
+
+def dependents(base, by_source, files, depth, limit=None):
+    """Files with a base edge into `files`, `depth` hops out, at most `limit` of them."""
+    found, frontier = [], set(files)
+    seen = set(files)
+    for _ in range(depth):
+        following = set()
+        for path in sorted(frontier):
+            for node_id in by_source.get(path, ()):
+                for key in base.incident(node_id):
+                    if key[1] != node_id:
+                        continue
+                    source = base.nodes.get(key[0])
+                    if source is not None and source["source"] not in seen:
+                        seen.add(source["source"])
+                        following.add(source["source"])
+        for path in sorted(following):
+            if limit is not None and len(found) >= limit:
+                return found
+            found.append(path)
+        frontier = following
+    return found
+
+
+def compute_delta(base, by_source, extracted, deleted):
+    """The overlay's sections for the files in `extracted` and `deleted`."""
+    old_ids = set()
+    for path in list(extracted) + sorted(deleted):
+        old_ids.update(by_source.get(path, ()))
+    new_nodes, new_edges = {}, {}
+    for path in sorted(extracted):
+        nodes, edges = extracted[path]
+        for node in nodes:
+            new_nodes[node["id"]] = node
+        for edge in edges:
+            new_edges[edge_key(edge)] = edge
+
+    delta = {"added_nodes": [], "removed_nodes": [], "modified_nodes": [],
+             "added_edges": [], "removed_edges": [], "modified_edges": []}
+    for node_id, node in sorted(new_nodes.items()):
+        old = base.nodes.get(node_id)
+        if old is None:
+            attributes = ", ".join(part for part in (f"hash={node['hash']}",
+                                                     node["attributes"]) if part)
+            delta["added_nodes"].append(dict(node, attributes=attributes))
+            continue
+        for field, column in (("Type", "type"), ("Source File", "source"),
+                              ("Content Hash", "hash")):
+            if old[column] != node[column]:
+                delta["modified_nodes"].append((node_id, field, old[column], node[column]))
+    removed = set()
+    for node_id in sorted(old_ids - set(new_nodes)):
+        source = base.nodes[node_id]["source"]
+        reason = "file deleted" if source in deleted else "no longer defined"
+        delta["removed_nodes"].append((node_id, reason))
+        removed.add(node_id)
+
+    # A file's edges are the ones that start at its nodes.
+    for node_id in sorted(old_ids):
+        for key in base.incident(node_id):
+            if key[0] != node_id or key in new_edges:
+                continue
+            if removed.intersection(key[:2]):
+                reason = "endpoint removed"
+            else:
+                reason = "no longer extracted"
+            delta["removed_edges"].append(dict(base.edges[key], reason=reason))
+    for key, edge in sorted(new_edges.items()):
+        old = base.edges.get(key)
+        if old is None:
+            delta["added_edges"].append(dict(edge, confidence="1.0"))
+        elif edge.get("hash") and old.get("hash") != edge["hash"]:
+            delta["modified_edges"].append(dict(edge, change=f"hash {old.get('hash') or '-'} "
+                                                             f"-> {edge['hash']}"))
+    return delta
+
+
+def build_overlay(repo, kg_dir, branch=None, workers=None, depth=None, max_dependents=None,
+                  use_cache=True, base=None):
+    """Build and write the current branch's overlay; returns a summary dict.
+
+    Raises GitKGError when there is no base graph or `repo` is not a git
+    work tree. On the default branch nothing is written: its graph is the
+    base. `base` is the loaded Base, for callers building several overlays.
+    """
+    started = time.perf_counter()
+    base = base or manifest.load_base(kg_dir)
+    if base is None:
+        raise GitKGError(f"no base graph under {kg_dir}; build one first")
+    if not git.is_repository(repo):
+        raise git.GitError(f"{repo} is not a git work tree")
+    override, configured_depth = git_aware_settings()
+    depth = configured_depth if depth is None else depth
+    branch = branch or git.current_branch(repo)
+    default = base.branch or git.default_branch(repo, override)
+    summary = {"branch": branch, "written": None, "files_changed": 0, "files_analyzed": 0}
+    if branch == default:
+        return dict(summary, skipped="default branch; its graph is the base")
+    if not base.commit:
+        raise GitKGError("the base manifest records no Base Commit to diff against")
+
+    head = git.rev_parse(repo, "HEAD")
+    root = git.run(repo, "rev-parse", "--show-toplevel").strip()
+    # Against the working tree, which is what the extractor reads.
+    changes = git.diff_name_status(repo, base.commit, None)
+    files, deleted = changed_files(changes)
+    present = [path for path, change in files if change != "deleted"]
+    by_source = _by_source(base)
+    expanded = dependents(base, by_source, [path for path, _ in files], depth, max_dependents)
+    analyzed = sorted(set(present) | {path for path in expanded if path not in deleted})
+    touched = set(analyzed) | deleted
+
+    def exists(node_id):  # nodes of files outside the batch are the base's
+        node = base.nodes.get(node_id)
+        return node is not None and node["source"] not in touched
+
+    cache = extract.ExtractCache.for_kg_dir(kg_dir) if use_cache else None
+    stats = {}
+    extracted = extract.extract_files(root, analyzed, workers, cache, exists, stats)
+    if cache is not None:
+        cache.save()
+    delta = compute_delta(base, by_source, extracted, deleted)
+    delta["files"] = files
+
+    generated = now()
+    directory = os.path.join(kg_dir, manifest.OVERLAY_DIR, sanitize_branch(branch))
+    version = load_memory_settings().get("version", "")
+    text = manifest.render_overlay(f"{branch} - {generated}", {
+        "Version": version, "Branch": branch, "Merge Base Commit": base.commit,
+        "Head Commit": head, "Base Graph Timestamp": base.metadata.get("Generated", ""),
+        "Generated": generated, "Files Changed": len(files), "Status": "VALID",
+    }, delta, [TAGS[0], sanitize_branch(branch), TAGS[1]])
+    path = os.path.join(directory, manifest.OVERLAY_SUFFIX)
+    atomic_write(path, text)
+    atomic_write(os.path.join(directory, manifest.OVERLAY_MANIFEST),
+                 manifest.render_overlay_manifest(branch, {
+                     "Version": version, "Branch": branch, "Overlay File": manifest.OVERLAY_SUFFIX,
+                     "Overlay Digest": manifest.digest(text.encode("utf-8")),
+                     "Merge Base Commit": base.commit, "Head Commit": head,
+                     "Generated": generated, "Files Changed": len(files),
+                     "Files Analyzed": len(analyzed), "Status": "VALID"}))
+    counts = {name: len(rows) for name, rows in delta.items() if name != "files"}
+    return dict(summary, written=path, files_changed=len(files), files_analyzed=len(analyzed),
+                dependents=len(expanded), ms=round((time.perf_counter() - started) * 1000, 1),
+                parsed=stats.get("parsed", 0), **counts)
@@ -0,0 +1,423 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Binary snapshot of the base graph: CSR arrays, memory-mapped, read in place.
+
+`base_manifest.md` stays the human view and the source of truth. Whenever a
+tool writes it, `base/base_graph.bin` is written next to it with the same
+graph:
+
+    header     magic, version, counts, base_manifest.md fingerprint and digest
+    stroff     uint32[s+1]  string offsets into the blob
+    node_type  uint32[n]    per node: string of its Type (NONE: not in the registry)
+    node_source uint32[n]   string of its Source File
+    node_hash  uint32[n]    string of its Content Hash
+    out_off    uint32[n+1]  CSR: node i's outgoing edges are out_off[i]..out_off[i+1]
+    out_target uint32[m]    node of each edge's target
+    out_type   uint32[m]    string of each edge's Type
+    out_hash   uint32[m]    string of each edge's Content Hash
+    out_key    uint32[m]    string of each edge's Edge Key
+    in_off     uint32[n+1]  CSR of incoming edges, as positions in the out_ arrays
+    in_edge    uint32[m]
+    blob       UTF-8 strings, interned; string i is node i's id for i < n
+    metadata   JSON of the manifest's Metadata section
+
+Nodes are every id in the Node Registry or at an edge's end, sorted as the
+registry is, so a lookup by id is a binary search over the blob, comparing
+bytes without decoding. Opening the file maps it and decodes the header and
+the metadata JSON; nothing is read per node or edge until it is looked up.
+`SnapshotBase` then stands in for `manifest.Base`, with `nodes` and `edges`
+as read-only mappings over the arrays.
+
+The header records the inode, size, and mtime of the manifest it was built
+from, and its digest. A manifest whose stat differs is hashed, so a touched
+or copied manifest still matches. If the content differs (a hand edit), the
+snapshot counts as stale, and `manifest.load_base` parses the markdown and
+writes a new one.
+"""
+
+import array
+import bisect
+import collections.abc
+import json
+import mmap
+import os
+import struct
+import sys
+
+from .._fs import atomic_write
+from . import manifest
+
+SNAPSHOT_FILE = "base_graph.bin"  # under knowledge_graph/base/
+MAGIC = b"ARKG"
+VERSION = 1
+NONE = 0xFFFFFFFF
+
+# magic, version, flags, nodes, registry nodes, edges, strings, blob bytes,
+# metadata bytes, manifest inode, size, mtime_ns, manifest digest
+_HEADER = struct.Struct("<4sHHIIIIQIQQq16s")
+_HEADER_SIZE = 96
+_SOURCE = struct.Struct("<QQq")  # the fingerprint fields, at _SOURCE_OFFSET
+_SOURCE_OFFSET = 36
+
+
+def _pad(size):
+    return -size % 8
+
+
+def _sections(nodes, edges, strings, blob_len):
+    """Byte offsets of each section for a file of these sizes."""
+    offsets = {}
+    position = _HEADER_SIZE
+    for name, items in (("stroff", strings + 1), ("node_type", nodes), ("node_source", nodes),
+                        ("node_hash", nodes), ("out_off", nodes + 1), ("out_target", edges),
+                        ("out_type", edges), ("out_hash", edges), ("out_key", edges),
+                        ("in_off", nodes + 1), ("in_edge", edges)):
+        offsets[name] = position
+        position += 4 * items
+        position += _pad(position)
+    offsets["blob"] = position
+    offsets["metadata"] = position + blob_len + _pad(blob_len)
+    return offsets
+
+
+def _fingerprint(stat):
+    return (stat.st_ino & 0xFFFFFFFFFFFFFFFF, stat.st_size, stat.st_mtime_ns)
+
+
+def snapshot_path(kg_dir):
+    return os.path.join(kg_dir, manifest.BASE_DIR, SNAPSHOT_FILE)
+
+
+def write_snapshot(path, base, source_stat):
+    """Write the snapshot of `base` (a Base), read from a manifest with `source_stat`."""
+    ids = set(base.nodes)
+    for source, target, _ in base.edges:
+        ids.add(source)
+        ids.add(target)
+    ids = sorted(ids)
+    index = {node_id: position for position, node_id in enumerate(ids)}
+    strings = dict(index)
+
+    def intern(text):
+        code = strings.get(text)
+        if code is None:
+            code = strings[text] = len(strings)
+        return code
+
+    count = len(ids)
+    node_type = array.array("I", [NONE]) * count
+    node_source = array.array("I", [NONE]) * count
+    node_hash = array.array("I", [NONE]) * count
+    for node_id, node in base.nodes.items():
+        position = index[node_id]
+        node_type[position] = intern(node.get("type", ""))
+        node_source[position] = intern(node.get("source", ""))
+        node_hash[position] = intern(node.get("hash", ""))
+
+    # render_base sorts edges by (source, target, type), which is CSR order;
+    # sorting by node position keeps that true for any Base.
+    edges = sorted(base.edges.values(), key=lambda edge: (
+        index[edge["source"]], edge["target"], edge["type"]))
+    out_off, in_count = array.array("I", [0]) * (count + 1), [0] * count
+    out_target, out_type, out_hash, out_key = (array.array("I") for _ in range(4))
+    for number, edge in enumerate(edges, 1):
+        target = index[edge["target"]]
+        out_off[index[edge["source"]] + 1] += 1
+        in_count[target] += 1
+        out_target.append(target)
+        out_type.append(intern(edge["type"]))
+        out_hash.append(intern(edge.get("hash", "")))
+        out_key.append(intern(edge.get("key") or f"e{number}"))
+    for position in range(count):
+        out_off[position + 1] += out_off[position]
+    in_off = array.array("I", [0]) * (count + 1)
+    for position in range(count):
+        in_off[position + 1] = in_off[position] + in_count[position]
+    in_edge = array.array("I", [0]) * len(edges)
+    filled = array.array("I", in_off[:count])
+    for source in range(count):
+        for position in range(out_off[source], out_off[source + 1]):
+            target = out_target[position]
+            in_edge[filled[target]] = position
+            filled[target] += 1
+
+    stroff = array.array("I", [0])
+    chunks, length = [], 0
+    for text in strings:  # insertion order is code order
+        data = text.encode("utf-8")
+        chunks.append(data)
+        length += len(data)
+        stroff.append(length)
+    blob = b"".join(chunks)
+    metadata = json.dumps(base.metadata).encode("utf-8")
+
+    columns = [stroff, node_type, node_source, node_hash, out_off, out_target, out_type,
+               out_hash, out_key, in_off, in_edge]
+    if sys.byteorder != "little":
+        for column in columns:
+            column.byteswap()
+    inode, size, mtime_ns = _fingerprint(source_stat)
+    header = _HEADER.pack(MAGIC, VERSION, 0, count, len(base.nodes), len(edges), len(strings),
+                          len(blob), len(metadata), inode, size, mtime_ns,
+                          base.digest.encode("ascii")[:16])
+    parts = [header, bytes(_HEADER_SIZE - len(header))]
+    for column in columns:
+        data = column.tobytes()
+        parts += [data, bytes(_pad(len(data)))]
+    parts += [blob, bytes(_pad(len(blob))), metadata]
+    atomic_write(path, b"".join(parts))
+
+
+class Snapshot:
+    """A mapped `base_graph.bin`. Use `open_for(kg_dir)`, which checks freshness."""
+
+    def __init__(self, path):
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            (magic, version, _, count, registered, edges, strings, blob_len, metadata_len,
+             inode, size, mtime_ns, digest) = _HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path}: not a version {VERSION} graph snapshot")
+            self.manifest_stat = (inode, size, mtime_ns)
+            self.digest = digest.rstrip(b"\0").decode("ascii")
+            self.count, self.registered, self.edge_count = count, registered, edges
+            offsets = _sections(count, edges, strings, blob_len)
+            for name, items in (("stroff", strings + 1), ("node_type", count),
+                                ("node_source", count), ("node_hash", count),
+                                ("out_off", count + 1), ("out_target", edges),
+                                ("out_type", edges), ("out_hash", edges), ("out_key", edges),
+                                ("in_off", count + 1), ("in_edge", edges)):
+                setattr(self, name, self._column(offsets[name], items))
+            self._blob = offsets["blob"]
+            start = offsets["metadata"]
+            self.metadata = json.loads(self._map[start:start + metadata_len])
+        except Exception:
+            self.close()
+            raise
+        self._strings = {}
+
+    def _column(self, offset, items):
+        view = memoryview(self._map)[offset:offset + 4 * items]
+        if sys.byteorder != "little":
+            column = array.array("I", view.tobytes())
+            view.release()
+            column.byteswap()
+            return column
+        self._views.append(view)
+        view = view.cast("I")
+        self._views.append(view)
+        return view
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+
+    # -- decoding ---------------------------------------------------------------
+
+    def _bytes(self, code):
+        return self._map[self._blob + self.stroff[code]:self._blob + self.stroff[code + 1]]
+
+    def string(self, code):
+        text = self._strings.get(code)
+        if text is None:
+            text = self._strings[code] = self._bytes(code).decode("utf-8")
+        return text
+
+    def position(self, node_id):
+        """Node position of `node_id` (registered or an edge's end), or None."""
+        key = node_id.encode("utf-8")
+        # UTF-8 bytes sort as the code points they encode, so the byte order
+        # of the ids is the order render_base sorted them in.
+        position = bisect.bisect_left(_Keys(self), key)
+        if position < self.count and self._bytes(position) == key:
+            return position
+        return None
+
+    def node(self, position):
+        return {"id": self.string(position), "type": self.string(self.node_type[position]),
+                "source": self.string(self.node_source[position]),
+                "hash": self.string(self.node_hash[position]), "attributes": ""}
+
+    def edge_key(self, source, position):
+        return (self.string(source), self.string(self.out_target[position]),
+                self.string(self.out_type[position]))
+
+    def edge(self, source, position):
+        source_id, target_id, kind = self.edge_key(source, position)
+        return {"source": source_id, "target": target_id, "type": kind,
+                "hash": self.string(self.out_hash[position]),
+                "key": self.string(self.out_key[position])}
+
+    def find_edge(self, key):
+        """(source position, edge position) of an edge key, or None."""
+        source = self.position(key[0])
+        if source is None:
+            return None
+        for position in range(self.out_off[source], self.out_off[source + 1]):
+            if self.edge_key(source, position)[1:] == tuple(key[1:]):
+                return source, position
+        return None
+
+    def edge_source(self, position):
+        """The source node of the edge at `position` in the out_ arrays."""
+        return bisect.bisect_right(self.out_off, position) - 1
+
+
+class _Keys:
+    """The node id bytes as a sequence, for bisect."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __len__(self):
+        return self.snapshot.count
+
+    def __getitem__(self, position):
+        return self.snapshot._bytes(position)
+
+
+class NodeTable(collections.abc.Mapping):
+    """Registry nodes by id, decoded on lookup."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __getitem__(self, node_id):
+        position = self.snapshot.position(node_id)
+        if position is None or self.snapshot.node_type[position] == NONE:
+            raise KeyError(node_id)
+        return self.snapshot.node(position)
+
+    def __contains__(self, node_id):
+        position = self.snapshot.position(node_id)
+        return position is not None and self.snapshot.node_type[position] != NONE
+
+    def __len__(self):
+        return self.snapshot.registered
+
+    def __iter__(self):
+        snapshot = self.snapshot
+        for position in range(snapshot.count):
+            if snapshot.node_type[position] != NONE:
+                yield snapshot.string(position)
+
+    def items(self):
+        snapshot = self.snapshot
+        for position in range(snapshot.count):
+            if snapshot.node_type[position] != NONE:
+                yield snapshot.string(position), snapshot.node(position)
+
+    def values(self):
+        return (node for _, node in self.items())
+
+
+class EdgeTable(collections.abc.Mapping):
+    """Edges by (source, target, type), decoded on lookup."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __getitem__(self, key):
+        found = self.snapshot.find_edge(key)
+        if found is None:
+            raise KeyError(key)
+        return self.snapshot.edge(*found)
+
+    def __contains__(self, key):
+        return self.snapshot.find_edge(key) is not None
+
+    def __len__(self):
+        return self.snapshot.edge_count
+
+    def _positions(self):
+        out_off = self.snapshot.out_off
+        for source in range(self.snapshot.count):
+            for position in range(out_off[source], out_off[source + 1]):
+                yield source, position
+
+    def __iter__(self):
+        return (self.snapshot.edge_key(*found) for found in self._positions())
+
+    def items(self):
+        for found in self._positions():
+            edge = self.snapshot.edge(*found)
+            yield (edge["source"], edge["target"], edge["type"]), edge
+
+    def values(self):
+        return (self.snapshot.edge(*found) for found in self._positions())
+
+
+class SnapshotBase:
+    """`manifest.Base` over a Snapshot: the same attributes, nothing decoded up front."""
+
+    def __init__(self, snapshot, path=None):
+        self.snapshot = snapshot
+        self.metadata = snapshot.metadata
+        self.commit = self.metadata.get("Base Commit", "")
+        self.branch = self.metadata.get("Default Branch", "")
+        self.nodes = NodeTable(snapshot)
+        self.edges = EdgeTable(snapshot)
+        self.digest = snapshot.digest
+        self.path = path
+
+    def incident(self, node_id):
+        """Keys of the edges that start or end at `node_id`, from both CSR arrays."""
+        snapshot = self.snapshot
+        position = snapshot.position(node_id)
+        if position is None:
+            return ()
+        keys = [snapshot.edge_key(position, edge)
+                for edge in range(snapshot.out_off[position], snapshot.out_off[position + 1])]
+        for slot in range(snapshot.in_off[position], snapshot.in_off[position + 1]):
+            edge = snapshot.in_edge[slot]
+            source = snapshot.edge_source(edge)
+            if source != position:  # a self-loop is already listed
+                keys.append(snapshot.edge_key(source, edge))
+        return keys
+
+
+def _manifest_digest(path):
+    with open(path, "rb") as handle:
+        return manifest.digest(handle.read())
+
+
+def open_for(kg_dir):
+    """The base's snapshot as a SnapshotBase if it matches base_manifest.md, else None."""
+    path = os.path.join(kg_dir, manifest.BASE_DIR, manifest.BASE_MANIFEST)
+    try:
+        source = os.stat(path)
+        snapshot = Snapshot(snapshot_path(kg_dir))
+    except (OSError, ValueError, struct.error):
+        return None
+    if snapshot.manifest_stat != _fingerprint(source):
+        try:
+            fresh = snapshot.digest == _manifest_digest(path)
+        except OSError:
+            fresh = False
+        if not fresh:
+            snapshot.close()
+            return None
+        try:  # same bytes, new stat (a touch, copy, or checkout): note it
+            with open(snapshot_path(kg_dir), "r+b") as handle:
+                handle.seek(_SOURCE_OFFSET)
+                handle.write(_SOURCE.pack(*_fingerprint(source)))
+        except OSError:
+            pass
+    return SnapshotBase(snapshot, path)
+
+
+def write_for(kg_dir, base):
+    """Write the snapshot of a Base just loaded from or written to base_manifest.md."""
+    path = os.path.join(kg_dir, manifest.BASE_DIR, manifest.BASE_MANIFEST)
+    try:
+        source = os.stat(path)
+    except OSError:
+        return None
+    target = snapshot_path(kg_dir)
+    write_snapshot(target, base, source)
+    return target
@@ -0,0 +1,17 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Reference `kg` MCP server and its SQLite-backed temporal knowledge graph.
+
+RAG-RULES.md defines seven tools (`kg_context`, `kg_query`, `kg_get_node`,
+`kg_add`, `kg_link`, `kg_retire`, `kg_list`); KG_IMPLEMENTATION_GUIDE.md
+defines the schema and bi-temporal semantics behind them. This package
+implements both with the standard library only. Run it with
+
+    python -m agentic_rules.kg serve --http 8765     # kg_mcp_url = http://127.0.0.1:8765/mcp
+    python -m agentic_rules.kg serve --stdio
+"""
+
+from .graph import KGError, KnowledgeGraph
+
+__all__ = ["KGError", "KnowledgeGraph"]
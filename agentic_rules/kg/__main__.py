@@ -0,0 +1,258 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Command line for the knowledge graph: `python -m agentic_rules.kg <command>`."""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from ..memory.store import load_settings
+from . import sandbox, server, transfer
+from .graph import DEFAULT_POOL_SIZE, KGError, KnowledgeGraph
+
+DB_FILE = "kg.sqlite3"
+
+
+def default_db_path():
+    """`<storage.base_path>/knowledge_graph/kg.sqlite3` — beside the markdown KG."""
+    base = load_settings()["storage"]["base_path"]
+    return os.path.join(os.path.expanduser(base), "knowledge_graph", DB_FILE)
+
+
+def default_log_path():
+    """`<storage.base_path>/knowledge_graph/script_log.jsonl`, for analysis script runs."""
+    base = load_settings()["storage"]["base_path"]
+    return os.path.join(os.path.expanduser(base), "knowledge_graph", sandbox.LOG_FILE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m agentic_rules.kg", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="run the kg MCP server")
+    serve.add_argument("--db", help="SQLite database (default: <memory root>/knowledge_graph/"
+                                    f"{DB_FILE})")
+    transport = serve.add_mutually_exclusive_group()
+    transport.add_argument("--stdio", action="store_true", help="serve over stdin/stdout (default)")
+    transport.add_argument("--http", type=int, metavar="PORT", help="serve over local HTTP")
+    serve.add_argument("--host", default="127.0.0.1",
+                       help="HTTP bind address (default: loopback only)")
+    serve.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE)
+    serve.add_argument("--verbose", action="store_true", help="log every HTTP request")
+
+    bench = commands.add_parser("bench", help="time kg_context per retrieval stage")
+    bench.add_argument("--db", help="SQLite database (default: as for serve)")
+    bench.add_argument("--queries", type=int, default=200,
+                       help="queries to run, sampled from node titles (default: 200)")
+    bench.add_argument("--scope", help="scope passed to kg_context")
+    bench.add_argument("--repeat", type=int, default=1,
+                       help="ask the same queries this many times, to measure the result cache")
+    bench.add_argument("--json", action="store_true", help="machine-readable output")
+
+    run = commands.add_parser("run", help="run analysis scripts under the sandbox limits")
+    run.add_argument("scripts", nargs="+", metavar="SCRIPT")
+    run.add_argument("--log", help="JSONL run log (default: <memory root>/knowledge_graph/"
+                                   f"{sandbox.LOG_FILE})")
+    run.add_argument("--workers", type=int, help="scripts run at once (default: CPU count)")
+    run.add_argument("--cpu-seconds", type=int,
+                     help="CPU limit (default: python_enhancement.max_execution_time)")
+    run.add_argument("--timeout", type=float, help="wall-clock limit (default: the CPU limit)")
+    run.add_argument("--memory-mb", type=int,
+                     help="memory limit (default: python_enhancement.max_memory_mb)")
+    run.add_argument("--output-mb", type=int, default=sandbox.DEFAULT_OUTPUT_MB,
+                     help="limit on what a script may write")
+    run.add_argument("--allow", action="append", metavar="MODULE",
+                     help="allowed module, repeatable (default: "
+                          "python_enhancement.allowed_modules)")
+    run.add_argument("--cwd", help="working directory (default: each script's directory)")
+    run.add_argument("--json", action="store_true", help="machine-readable output")
+
+    log = commands.add_parser("script-log", help="show logged analysis script runs "
+                                                 "(/kg-script-log)")
+    log.add_argument("--log", help="JSONL run log (default: as for run)")
+    log.add_argument("--status", help="only runs with this status (ok, error, timeout, "
+                                      "cpu_limit, memory_limit, output_limit, import_denied)")
+    log.add_argument("--script", help="only runs whose path contains this, or sha256 prefix")
+    log.add_argument("--since", help="only runs started at or after this timestamp")
+    log.add_argument("--limit", type=int, default=20, help="runs to list (default: 20)")
+    log.add_argument("--json", action="store_true", help="machine-readable output")
+
+    export = commands.add_parser("export", help="stream the graph out as JSONL")
+    export.add_argument("output", nargs="?", default="-", help="JSONL file (default: stdout)")
+    export.add_argument("--db", help="SQLite database (default: as for serve)")
+    export.add_argument("--scope", help="only nodes in this scope, and edges between them")
+    export.add_argument("--current-only", action="store_true",
+                        help="only the current view: no superseded or retired history")
+
+    load = commands.add_parser("import", help="load a JSONL export, resumably")
+    load.add_argument("input", help="JSONL file, or - for stdin (not resumable)")
+    load.add_argument("--db", help="SQLite database (default: as for serve)")
+    load.add_argument("--batch-size", type=int, default=transfer.DEFAULT_BATCH_SIZE,
+                      help=f"records per transaction (default: {transfer.DEFAULT_BATCH_SIZE})")
+    load.add_argument("--max-batches", type=int,
+                      help="stop after this many batches; the next run resumes")
+    load.add_argument("--restart", action="store_true",
+                      help="ignore the checkpoint of an earlier, interrupted run")
+    load.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        return _export(args)
+    if args.command == "import":
+        return _import(args)
+    if args.command == "bench":
+        return _bench(args)
+    if args.command == "run":
+        return _run(args)
+    if args.command == "script-log":
+        return _script_log(args)
+
+    graph = KnowledgeGraph(args.db or default_db_path(), pool_size=args.pool_size)
+    mcp = server.MCPServer(graph)
+    try:
+        if args.http is not None:
+            server.serve_http(mcp, args.host, args.http, args.verbose)
+        else:
+            server.serve_stdio(mcp)
+    finally:
+        graph.close()
+    return 0
+
+
+def _bench(args):
+    graph = KnowledgeGraph(args.db or default_db_path())
+    try:
+        started = time.perf_counter()
+        graph.retrieval.refresh(wait=True)
+        warm_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        graph.centrality.refresh(wait=True)
+        centrality_ms = (time.perf_counter() - started) * 1000
+        with graph.pool.connection() as conn:
+            titles = [row[0] for row in conn.execute(
+                "SELECT title FROM nodes ORDER BY random() LIMIT ?", (args.queries,))]
+        rng = random.Random(0)
+        # A few words of a title: related, but not a verbatim lookup.
+        tasks = [" ".join(rng.sample(title.split(), min(len(title.split()), 3)))
+                 for title in titles]
+        timed = []
+        for _ in range(max(1, args.repeat)):
+            for task in tasks:
+                started = time.perf_counter()
+                graph.context(task, scope=args.scope)
+                timed.append((time.perf_counter() - started) * 1000)
+        stats = graph.retrieval.stats()
+        cached = graph.cache.stats()
+        timed.sort()
+        context = {"count": len(timed), "p50_ms": round(timed[len(timed) // 2], 2),
+                   "p95_ms": round(timed[int(len(timed) * 0.95)], 2)}
+    finally:
+        graph.close()
+    if args.json:
+        print(json.dumps({"warm_ms": round(warm_ms, 1), "centrality_ms": round(centrality_ms, 1),
+                          "stages": stats, "kg_context": context, "cache": cached}, indent=2))
+        return 0
+    print(f"vector index warm-up: {warm_ms:.0f} ms")
+    print(f"centrality warm-up: {centrality_ms:.0f} ms")
+    print(f"{'stage':<10} {'count':>6} {'p50 ms':>9} {'p95 ms':>9}")
+    for stage, row in stats.items():
+        print(f"{stage:<10} {row['count']:>6} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f}")
+    print(f"{'kg_context':<10} {context['count']:>6} {context['p50_ms']:>9.2f} "
+          f"{context['p95_ms']:>9.2f}")
+    print(f"result cache: hit rate {cached['hit_rate']:.0%}, {cached['hits']} hits at "
+          f"{cached['hit_ms']:.2f} ms instead of {cached['compute_ms']:.2f} ms, "
+          f"{cached['saved_ms']:.0f} ms saved")
+    return 0
+
+
+def _export(args):
+    graph = KnowledgeGraph(args.db or default_db_path())
+    try:
+        counts = transfer.export_jsonl(graph, args.output, args.scope, args.current_only)
+    finally:
+        graph.close()
+    if args.output != "-":
+        print(f"exported {counts['nodes']} nodes and {counts['edges']} edges to {args.output}")
+    return 0
+
+
+def _import(args):
+    graph = KnowledgeGraph(args.db or default_db_path())
+    try:
+        summary = transfer.import_jsonl(graph, args.input, args.batch_size, args.restart,
+                                        args.max_batches)
+    except (OSError, KGError) as exc:
+        print(f"kg: {exc}", file=sys.stderr)
+        return 2
+    finally:
+        graph.close()
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0 if summary["done"] else 3
+    if summary["resumed_at_line"]:
+        print(f"resumed {args.input} at line {summary['resumed_at_line']}")
+    print(f"imported {summary['nodes']} nodes and {summary['edges']} edges "
+          f"({summary['existing']} already present, {summary['rejected']} rejected) "
+          f"in {summary['batches']} batches")
+    for error in summary["errors"]:
+        print(f"kg: {error}", file=sys.stderr)
+    if not summary["done"]:
+        print("stopped early; run the same command again to continue")
+        return 3
+    return 0
+
+
+def _run(args):
+    problems = sandbox.check_environment()
+    if problems:
+        for problem in problems:
+            print(f"kg: {problem}", file=sys.stderr)
+        print("kg: scripts cannot be sandboxed here; fall back to text analysis",
+              file=sys.stderr)
+        return 2
+    runner = sandbox.ScriptRunner(args.log or default_log_path(), args.allow, args.cpu_seconds,
+                                  args.memory_mb, args.timeout, args.output_mb, args.workers,
+                                  args.cwd)
+    records = runner.run_many(args.scripts)
+    if args.json:
+        print(json.dumps(records, indent=2))
+    else:
+        for record in records:
+            sys.stdout.write(record["output"])
+            print(f"kg: {record['script']}: {record['status']} in {record['duration_ms']:.0f} ms, "
+                  f"{record['cpu_ms']:.0f} ms CPU, peak {record['peak_rss_kb'] // 1024} MB"
+                  + (f" ({record['reason']})" if record["reason"] else ""), file=sys.stderr)
+    return 0 if all(record["status"] == "ok" for record in records) else 1
+
+
+def _script_log(args):
+    path = args.log or default_log_path()
+    records = sandbox.read_log(path, args.status, args.script, args.since)
+    summary = sandbox.summarize(records)
+    shown = records[-args.limit:] if args.limit else records
+    if args.json:
+        print(json.dumps({"log": path, "summary": summary, "runs": shown}, indent=2))
+        return 0
+    if not records:
+        print(f"no runs logged in {path}")
+        return 0
+    print(f"{'started':<28} {'status':<14} {'ms':>8} {'cpu ms':>8} {'rss MB':>7} script")
+    for record in shown:
+        print(f"{record['started']:<28} {record['status']:<14} {record['duration_ms']:>8.0f} "
+              f"{record['cpu_ms']:>8.0f} {record['peak_rss_kb'] / 1024:>7.1f} "
+              f"{os.path.basename(record['script'])}"
+              + (f"  {record['reason']}" if record["reason"] else ""))
+    counts = ", ".join(f"{count} {status}" for status, count in
+                       sorted(summary["by_status"].items()))
+    duration = summary["duration_ms"]
+    print(f"{summary['runs']} runs ({counts}); duration p50 {duration['p50']:.0f} ms, "
+          f"p95 {duration['p95']:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
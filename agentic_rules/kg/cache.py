@@ -0,0 +1,117 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""LRU/TTL cache for `kg_context` and `kg_query` results.
+
+The SessionStart preamble asks agents to call `kg_context` before nearly
+every non-trivial task, and sessions on the same project ask much the same
+questions. `ResultCache` keeps recent answers, keyed by the normalized
+query text and the arguments that change the answer (scope, type, limit,
+as_of, include_expired).
+
+An entry records the generation of every *token* its answer depends on:
+the scope (or scope and type) slots the query reads, plus the scopes of
+the nodes in the answer, whose neighbours and status can change.
+`KnowledgeGraph` bumps the tokens of every node a write transaction
+touches, and bumps an epoch when `graph_meta`'s version shows that another
+process wrote. A lookup compares the entry's generations with the current
+ones, so a write to one project does not evict another project's answers.
+Generations are read before the answer is computed, so an answer racing
+a write is stored as already stale rather than served later.
+
+Entries also expire after `ttl` seconds, or earlier at the next moment a
+node becomes valid or ends (`valid_from` / `valid_until`), which changes
+the current view without any write.
+"""
+
+import collections
+import copy
+import re
+import threading
+import time
+
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Query text as the cache sees it: case and spacing do not matter."""
+    return _SPACE.sub(" ", str(text)).strip().lower()
+
+
+class ResultCache:
+    """Thread-safe LRU of (value, generations, expiry) with hit and savings counters."""
+
+    def __init__(self, max_entries=256, ttl=300.0):
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.stale = self.expired = self.evictions = 0
+        self._cost_ms = 0.0  # what the hits originally took to compute
+        self._hit_ms = 0.0  # what answering them from the cache took
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl > 0
+
+    def get(self, key, epoch, generations):
+        """A copy of the cached value, or None if absent, stale, or expired."""
+        started = time.perf_counter()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, (stored_epoch, depends), expires, cost_ms = entry
+            fresh = stored_epoch == epoch and all(
+                generations.get(token, 0) == generation for token, generation in depends)
+            if not fresh or time.monotonic() >= expires:
+                del self._entries[key]
+                if not fresh:
+                    self.stale += 1
+                else:
+                    self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._cost_ms += cost_ms
+        value = copy.deepcopy(value)  # callers may annotate what they get back
+        with self._lock:
+            self._hit_ms += (time.perf_counter() - started) * 1000
+        return value
+
+    def put(self, key, value, epoch, depends, cost_ms, expires_in=None):
+        """Store `value`, computed in `cost_ms` under `epoch` and the
+        `depends` {token: generation} read before computing it."""
+        ttl = self.ttl if expires_in is None else min(self.ttl, expires_in)
+        if not self.enabled or ttl <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (value, (epoch, tuple(depends.items())),
+                                  time.monotonic() + ttl, cost_ms)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stale": self.stale,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "saved_ms": round(self._cost_ms - self._hit_ms, 1),
+                "hit_ms": round(self._hit_ms / self.hits, 3) if self.hits else 0.0,
+                "compute_ms": round(self._cost_ms / self.hits, 3) if self.hits else 0.0,
+            }
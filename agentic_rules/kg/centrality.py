@@ -0,0 +1,303 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Precomputed centrality and neighbourhood summaries for the boost stage.
+
+RAG-RULES.md's Semantic_Graph_Query asks for centrality scoring and 2-3 hop
+expansion on every query, and Adaptive_Graph_Maintenance asks to
+"pre-compute frequently accessed subgraphs". Doing either with SQL per
+query is a traversal. `Centrality` does the work ahead of time and keeps
+the results in compact arrays (`Tables`) indexed by node ordinal (nodes
+in rowid order):
+
+- `src`, `dst`, `weight`, `kind`: every edge except `supersedes`, in the
+  order it was loaded;
+- `degree_in`, `degree_out`, and the weighted out-degree used by PageRank;
+- `pagerank` (damping 0.85, dangling mass spread uniformly), and `rank`,
+  the same values scaled to 0..1 on a log scale for boosting;
+- `hop1`, `hop2`: distinct neighbours within one and two hops, undirected,
+  capped at `HOP_CAP`.
+
+`contradicts` edges count toward the neighbourhoods but pass no PageRank,
+since a conflict is not an endorsement. `related_to` passes rank both ways.
+
+Nodes and edges are append-only apart from weight upserts. A refresh can
+therefore load edges with a higher rowid, recount the neighbourhoods of
+the nodes they touch, and run PageRank again starting from the previous
+vector. A weight checksum catches upserts and hand edits, and triggers a
+full rebuild. As with the vector index, a small backlog on a small graph
+is applied inline; anything else runs on a background thread while queries
+keep reading the previous arrays. A refresh only appends to the arrays, or
+builds a new `Tables` and swaps it in whole, so readers never take a lock.
+"""
+
+import array
+import math
+import operator
+import threading
+
+DAMPING = 0.85
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 60
+HOP_CAP = 1000
+HUB_DEGREE = 256
+SYNC_EDGES = 5000
+SYNC_NODES = 20000
+
+# How an edge passes PageRank: not at all, source -> target, or both ways.
+NO_RANK, DIRECTED, SYMMETRIC = 0, 1, 2
+_KIND = {"contradicts": NO_RANK, "related_to": SYMMETRIC}
+
+
+class Tables:
+    """One consistent set of centrality arrays."""
+
+    def __init__(self):
+        self.ids = []
+        self.ordinal = {}
+        self.src = array.array("i")
+        self.dst = array.array("i")
+        self.weight = array.array("d")
+        self.kind = array.array("b")
+        self.degree_in = array.array("i")
+        self.degree_out = array.array("i")
+        self.out_weight = array.array("d")
+        self.pagerank = array.array("d")
+        self.rank = array.array("f")
+        self.hop1 = array.array("i")
+        self.hop2 = array.array("i")
+        self.adjacent = []  # per node: array of neighbour ordinals (undirected)
+        self.adjacent_weight = []
+        self.hubs = {}  # hub ordinal -> {neighbour: summed weight}, built on demand
+        self.node_rowid = 0
+        self.edge_rowid = 0
+        self.version = None
+
+
+class Centrality:
+    """Edge-derived node statistics for one KnowledgeGraph."""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.tables = Tables()
+        self._lock = threading.Lock()  # one refresher at a time
+        self._worker = None
+
+    # -- refresh --------------------------------------------------------------
+
+    def _state(self, conn):
+        version = self.graph._version(conn)
+        top_node = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM nodes").fetchone()[0]
+        top_edge, count, total = conn.execute(
+            "SELECT COALESCE(MAX(rowid), 0), COUNT(*), TOTAL(weight) FROM edges "
+            "WHERE relation != 'supersedes'").fetchone()
+        return version, top_node, top_edge, (count, total)
+
+    def refresh(self, wait=True):
+        """Bring the arrays up to the database; True when they are current.
+
+        With `wait=False` this never blocks a query for long: nothing
+        happens if the graph version is unchanged, and a large backlog, or
+        any backlog on a large graph (where PageRank alone takes about a
+        second), goes to a background thread.
+        """
+        tables = self.tables
+        with self.graph.pool.connection() as conn:
+            if tables.version is not None and self.graph._version(conn) == tables.version:
+                return True
+            if not wait:
+                pending = conn.execute("SELECT COUNT(*) FROM edges WHERE rowid > ?",
+                                       (tables.edge_rowid,)).fetchone()[0]
+                if pending > SYNC_EDGES or len(tables.ids) > SYNC_NODES:
+                    if self._worker is None or not self._worker.is_alive():
+                        self._worker = threading.Thread(target=self.refresh, name="kg-centrality",
+                                                        daemon=True)
+                        self._worker.start()
+                    return False
+        if not self._lock.acquire(blocking=wait):
+            return False
+        try:
+            with self.graph.pool.connection() as conn:
+                conn.execute("BEGIN")  # one snapshot for the fingerprint and the rows
+                try:
+                    self._apply(conn, *self._state(conn))
+                finally:
+                    conn.execute("COMMIT")
+        finally:
+            self._lock.release()
+        return True
+
+    def warming(self):
+        """True while a background refresh is running."""
+        return self._worker is not None and self._worker.is_alive()
+
+    def _apply(self, conn, version, top_node, top_edge, checksum):
+        tables = self.tables
+        rebuilt = tables.version is None or top_edge < tables.edge_rowid
+        if rebuilt:
+            tables = Tables()
+        touched = self._load(conn, tables, top_node, top_edge)
+        count, total = checksum
+        if not rebuilt and (count != len(tables.src)
+                            or abs(total - sum(tables.weight)) > 1e-6 * (1 + count)):
+            # A weight upsert (or an edit behind our back): start over.
+            tables, rebuilt = Tables(), True
+            touched = self._load(conn, tables, top_node, top_edge)
+        _out_weights(tables)
+        _neighbourhoods(tables, None if rebuilt or len(touched) * 4 > len(tables.ids)
+                        else touched)
+        _pagerank(tables)
+        tables.hubs = {}
+        tables.version = version
+        self.tables = tables
+
+    def _load(self, conn, tables, top_node, top_edge):
+        """Append nodes and edges above the loaded rowids; returns the touched ordinals."""
+        ordinal = tables.ordinal
+        for rowid, node_id in conn.execute(
+                "SELECT rowid, id FROM nodes WHERE rowid > ? AND rowid <= ? ORDER BY rowid",
+                (tables.node_rowid, top_node)):
+            # Columns read by lookups first: `rank` guards the rest.
+            for column in (tables.degree_in, tables.degree_out, tables.hop1, tables.hop2):
+                column.append(0)
+            tables.adjacent.append(array.array("i"))
+            tables.adjacent_weight.append(array.array("d"))
+            ordinal[node_id] = len(tables.ids)
+            tables.ids.append(node_id)
+            tables.node_rowid = rowid
+        touched = set()
+        for source, target, relation, weight in conn.execute(
+                "SELECT source_id, target_id, relation, weight FROM edges "
+                "WHERE rowid > ? AND rowid <= ? AND relation != 'supersedes' ORDER BY rowid",
+                (tables.edge_rowid, top_edge)):
+            a, b = ordinal.get(source), ordinal.get(target)
+            if a is None or b is None:
+                continue
+            tables.src.append(a)
+            tables.dst.append(b)
+            tables.weight.append(weight)
+            tables.kind.append(_KIND.get(relation, DIRECTED))
+            tables.degree_out[a] += 1
+            tables.degree_in[b] += 1
+            tables.adjacent[a].append(b)
+            tables.adjacent_weight[a].append(weight)
+            tables.adjacent[b].append(a)
+            tables.adjacent_weight[b].append(weight)
+            touched.update((a, b))
+        tables.edge_rowid = max(tables.edge_rowid, top_edge)
+        return touched
+
+    # -- lookups --------------------------------------------------------------
+
+    def summary(self, node_id):
+        """Degree, PageRank, and neighbourhood sizes of one node (None if unknown)."""
+        tables = self.tables
+        node = tables.ordinal.get(node_id)
+        if node is None or node >= len(tables.rank):
+            return None
+        return {"degree_in": tables.degree_in[node], "degree_out": tables.degree_out[node],
+                "pagerank": round(tables.pagerank[node], 8), "rank": round(tables.rank[node], 4),
+                "hop1": tables.hop1[node], "hop2": tables.hop2[node]}
+
+    def lookup(self, ids):
+        """{id: (rank 0..1, summed weight of edges to the other ids)} for the boost stage."""
+        tables = self.tables
+        rank = tables.rank
+        ordinals = {}
+        for node_id in ids:
+            node = tables.ordinal.get(node_id)
+            if node is not None and node < len(rank):
+                ordinals[node] = node_id
+        found = {}
+        for node, node_id in ordinals.items():
+            neighbours = _neighbours(tables, node)
+            if isinstance(neighbours, dict):
+                linked = sum(neighbours.get(other, 0.0) for other in ordinals if other != node)
+            else:
+                linked = sum(weight for other, weight in neighbours
+                             if other != node and other in ordinals)
+            found[node_id] = (rank[node], linked)
+        return found
+
+
+def _rank_edges(tables):
+    """(from, to, weight) for every direction that passes PageRank."""
+    for a, b, weight, kind in zip(tables.src, tables.dst, tables.weight, tables.kind):
+        if kind != NO_RANK and weight > 0:
+            yield a, b, weight
+            if kind == SYMMETRIC:
+                yield b, a, weight
+
+
+def _out_weights(tables):
+    out = array.array("d", bytes(8 * len(tables.ids)))
+    for a, _, weight in _rank_edges(tables):
+        out[a] += weight
+    tables.out_weight = out
+
+
+def _neighbourhoods(tables, touched):
+    """Recount hop1/hop2 for `touched` nodes and their neighbours (None = all)."""
+    adjacent = tables.adjacent
+    if touched is None:
+        nodes = range(len(tables.ids))
+    else:
+        nodes = set(touched)
+        for node in touched:
+            nodes.update(adjacent[node])
+    for node in nodes:
+        first = set(adjacent[node])
+        first.discard(node)
+        second = set(first)
+        for neighbour in first:
+            second.update(adjacent[neighbour])
+            if len(second) > HOP_CAP:
+                break
+        second.discard(node)
+        tables.hop1[node] = len(first)
+        tables.hop2[node] = min(len(second), HOP_CAP)
+
+
+def _pagerank(tables):
+    count = len(tables.ids)
+    if not count:
+        tables.pagerank, tables.rank = array.array("d"), array.array("f")
+        return
+    previous = tables.pagerank
+    if len(previous) == count:
+        current = list(previous)
+    else:  # warm start: keep old mass, give new nodes the uniform share
+        current = list(previous) + [1.0 / count] * (count - len(previous))
+        total = sum(current)
+        current = [value / total for value in current]
+    out_weight = tables.out_weight
+    edges = [(a, b, DAMPING * weight / out_weight[a]) for a, b, weight in _rank_edges(tables)]
+    teleport = (1.0 - DAMPING) / count
+    dangling = [node for node in range(count) if out_weight[node] <= 0]
+    for _ in range(MAX_ITERATIONS):
+        spread = DAMPING * sum(map(current.__getitem__, dangling)) / count
+        following = [teleport + spread] * count
+        for a, b, share in edges:
+            following[b] += current[a] * share
+        delta = sum(map(abs, map(operator.sub, following, current)))
+        current = following
+        if delta < TOLERANCE:
+            break
+    tables.pagerank = array.array("d", current)
+    low, high = min(current), max(current)
+    if high <= low:
+        tables.rank = array.array("f", [0.0] * count)
+    else:
+        span = math.log(high / low)
+        tables.rank = array.array("f", (math.log(value / low) / span for value in current))
+
+
+def _neighbours(tables, node):
+    if len(tables.adjacent[node]) <= HUB_DEGREE:
+        return zip(tables.adjacent[node], tables.adjacent_weight[node])
+    hub = tables.hubs.get(node)
+    if hub is None:
+        hub = tables.hubs[node] = {}
+        for neighbour, weight in zip(tables.adjacent[node], tables.adjacent_weight[node]):
+            hub[neighbour] = hub.get(neighbour, 0.0) + weight
+    return hub
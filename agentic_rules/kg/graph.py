@@ -0,0 +1,774 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""SQLite-backed temporal knowledge graph (KG_IMPLEMENTATION_GUIDE.md schema).
+
+This is the "SQLite database" rung of the guide's maturity ladder:
+markdown files -> SQLite -> MCP server. The tables are the guide's `nodes`
+and `edges`. On top of them this module adds:
+
+- indexes on type, scope, the three temporal columns, and the reverse edge
+  direction, so supersession lookups, `kg_list` filters, and current-view
+  prefilters never scan the table;
+- an FTS5 table over title, content, and tags for BM25 search. When the
+  sqlite3 build lacks FTS5, a LIKE scan is used instead;
+- a materialized current view (`current_nodes`) kept up to date by the
+  write path, so default reads never touch superseded or retired history;
+- an in-memory interval index (`interval.py`) for `as_of` reads, patched
+  incrementally by this process's writes and rebuilt when `graph_meta`'s
+  version shows that another process wrote;
+- a supersession index (`versions`, `chains`) that maps any node to its
+  chain's current head and length with two primary-key lookups, however
+  deep the revision history;
+- a result cache (`cache.py`) for `kg_context` and `kg_query`, invalidated
+  per scope and type by generation counters that every write bumps;
+- precomputed PageRank, degree, and neighbourhood arrays (`centrality.py`)
+  for the boost stage and `get_node`, refreshed incrementally as edges
+  arrive;
+- WAL journaling plus a small connection pool. Readers never block the
+  writer, and many MCP sessions can share one database file.
+
+Writes follow the guide's write-path semantics exactly. `add(...,
+supersedes=old)` runs in one transaction, `supersedes` edges invalidate
+their target only if it is still valid, and `retire` never deletes.
+"""
+
+import collections
+import contextlib
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+from . import cache, centrality, retrieval, temporal
+from .interval import END_OF_TIME, IntervalIndex
+
+NODE_TYPES = ("rule", "pattern", "fact", "procedure", "gotcha")
+RELATIONS = ("applies_to", "depends_on", "part_of", "related_to", "supersedes", "contradicts")
+RETIRE_MODES = ("invalid", "expired", "restore")
+DEFAULT_SCOPE = "global"
+DEFAULT_POOL_SIZE = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL CHECK(type IN ('rule','pattern','fact','procedure','gotcha')),
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    scope TEXT NOT NULL DEFAULT 'global',
+    tags TEXT DEFAULT '',
+    priority INTEGER DEFAULT 5 CHECK(priority BETWEEN 1 AND 10),
+    source TEXT DEFAULT '',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    valid_at TEXT,
+    invalid_at TEXT,
+    expired_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS edges (
+    source_id TEXT NOT NULL REFERENCES nodes(id) ON DELETE CASCADE,
+    target_id TEXT NOT NULL REFERENCES nodes(id) ON DELETE CASCADE,
+    relation TEXT NOT NULL CHECK(relation IN
+        ('applies_to','depends_on','part_of','related_to','supersedes','contradicts')),
+    weight REAL DEFAULT 0.5,
+    created_at TEXT,
+    PRIMARY KEY (source_id, target_id, relation)
+);
+
+CREATE INDEX IF NOT EXISTS idx_nodes_type ON nodes(type);
+CREATE INDEX IF NOT EXISTS idx_nodes_scope ON nodes(scope, type);
+CREATE INDEX IF NOT EXISTS idx_nodes_valid ON nodes(valid_at);
+CREATE INDEX IF NOT EXISTS idx_nodes_invalid ON nodes(invalid_at);
+CREATE INDEX IF NOT EXISTS idx_nodes_expired ON nodes(expired_at);
+CREATE INDEX IF NOT EXISTS idx_edges_target ON edges(target_id, relation);
+CREATE INDEX IF NOT EXISTS idx_edges_relation ON edges(relation, source_id);
+
+-- Materialized current view: every node that is neither retracted nor ended
+-- (pending nodes included, filtered by valid_at at read time). Maintained by
+-- the write path; rows whose invalid_at passes are pruned on the next write.
+CREATE TABLE IF NOT EXISTS current_nodes (
+    id TEXT PRIMARY KEY REFERENCES nodes(id) ON DELETE CASCADE,
+    type TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    updated_at TEXT NOT NULL,
+    valid_at TEXT NOT NULL,
+    invalid_at TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_current_scope ON current_nodes(scope, type);
+CREATE INDEX IF NOT EXISTS idx_current_invalid ON current_nodes(invalid_at);
+CREATE INDEX IF NOT EXISTS idx_current_valid ON current_nodes(valid_at);
+
+-- Supersession chains, as a union-find with its paths fully compressed:
+-- every version names its chain's representative (the first version)
+-- directly, and the representative's `chains` row holds the current head and
+-- the length. Nodes never involved in a supersession have no rows.
+CREATE TABLE IF NOT EXISTS versions (
+    id TEXT PRIMARY KEY REFERENCES nodes(id) ON DELETE CASCADE,
+    chain TEXT NOT NULL,
+    position INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_versions_chain ON versions(chain, position);
+CREATE TABLE IF NOT EXISTS chains (
+    id TEXT PRIMARY KEY,
+    head TEXT NOT NULL,
+    length INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- Graph version: bumped by every write transaction, so in-memory indexes
+-- can tell their own writes from another process's.
+CREATE TABLE IF NOT EXISTS graph_meta (key TEXT PRIMARY KEY, value) WITHOUT ROWID;
+INSERT OR IGNORE INTO graph_meta (key, value) VALUES ('version', 0);
+"""
+
+# Live means "could be current now or later": not retracted, not yet ended.
+_LIVE = "expired_at IS NULL AND (invalid_at IS NULL OR invalid_at > ?)"
+_CURRENT_VIEW = ("JOIN current_nodes c ON c.id = n.id",
+                 "c.valid_at <= ? AND (c.invalid_at IS NULL OR c.invalid_at > ?)")
+
+FTS_INSERT_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS nodes_fts_insert AFTER INSERT ON nodes BEGIN
+    INSERT INTO nodes_fts(rowid, title, content, tags)
+    VALUES (new.rowid, new.title, new.content, new.tags);
+END"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS nodes_fts USING fts5(
+    title, content, tags, content='nodes', content_rowid='rowid'
+);""" + FTS_INSERT_TRIGGER + """;
+CREATE TRIGGER IF NOT EXISTS nodes_fts_update AFTER UPDATE OF title, content, tags ON nodes BEGIN
+    INSERT INTO nodes_fts(nodes_fts, rowid, title, content, tags)
+    VALUES ('delete', old.rowid, old.title, old.content, old.tags);
+    INSERT INTO nodes_fts(rowid, title, content, tags)
+    VALUES (new.rowid, new.title, new.content, new.tags);
+END;
+"""
+
+_SLUG = re.compile(r"[^a-z0-9]+")
+
+
+View = collections.namedtuple("View", ["join", "where", "params", "allowed"])
+
+
+class KGError(ValueError):
+    """A tool call was rejected (bad argument, unknown id, invalid relation)."""
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+class ConnectionPool:
+    """Up to `size` SQLite connections shared by threads, created lazily."""
+
+    def __init__(self, path, size=DEFAULT_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._all = []
+
+    @contextlib.contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._created < self.size
+                if grow:
+                    self._created += 1
+            if grow:
+                conn = _connect(self.path)
+                with self._lock:
+                    self._all.append(conn)
+            else:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all = []
+            self._created = 0
+            self._idle = queue.LifoQueue()
+
+
+def _node(row):
+    node = dict(row)
+    node.pop("rowid", None)
+    node["tags"] = [t for t in (node.get("tags") or "").split(",") if t]
+    return node
+
+
+def _tags(value):
+    if isinstance(value, str):
+        value = value.split(",")
+    return ",".join(t.strip() for t in (value or ()) if t and t.strip())
+
+
+class KnowledgeGraph:
+    """The graph behind the seven `kg_*` tools. Thread-safe."""
+
+    def __init__(self, path, pool_size=DEFAULT_POOL_SIZE, settings=None, reranker=None):
+        self.path = path
+        if path == ":memory:":
+            pool_size = 1  # every connection would open its own empty database
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.pool = ConnectionPool(path, pool_size)
+        self._writer = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._interval = None  # IntervalIndex, built on the first as_of query
+        self._interval_version = None
+        self._touched = None
+        # Result-cache invalidation: token -> generation, bumped by writes.
+        self._generations = collections.Counter()
+        self._epoch = 0  # bumped when another process writes
+        self._cache_version = None
+        self._cache_lock = threading.Lock()
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+            try:
+                conn.executescript(FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError:  # sqlite3 built without FTS5
+                self.fts = False
+            migrated = {row[0] for row in conn.execute(
+                "SELECT key FROM graph_meta WHERE key IN ('current_view', 'versions')")}
+        if "current_view" not in migrated:
+            # Databases created before the view existed: materialize it once.
+            with self._write() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO current_nodes "
+                    "SELECT id, type, scope, priority, updated_at, COALESCE(valid_at, created_at), "
+                    f"invalid_at FROM nodes WHERE {_LIVE}", (temporal.now(),))
+                conn.execute("INSERT OR IGNORE INTO graph_meta (key, value) "
+                             "VALUES ('current_view', 1)")
+        if "versions" not in migrated:
+            # Databases created before the supersession index: replay the edges.
+            with self._write() as conn:
+                for new_id, old_id in conn.execute(
+                        "SELECT source_id, target_id FROM edges WHERE relation = 'supersedes' "
+                        "ORDER BY created_at, rowid").fetchall():
+                    self._link_versions(conn, new_id, old_id)
+                conn.execute("INSERT OR IGNORE INTO graph_meta (key, value) "
+                             "VALUES ('versions', 1)")
+        self.centrality = centrality.Centrality(self)
+        if settings is None:
+            settings = retrieval.load_settings()
+        self.retrieval = retrieval.Pipeline(
+            self, retrieval.config_from_settings(settings),
+            reranker=reranker or retrieval.coverage_rerank)
+        config = self.retrieval.config
+        self.cache = cache.ResultCache(config["cache_entries"], config["cache_ttl_seconds"])
+
+    def stats(self):
+        """Result-cache counters and per-stage retrieval latencies."""
+        return {"cache": self.cache.stats(), "stages": self.retrieval.stats()}
+
+    def close(self):
+        self.retrieval.close()
+        self.pool.close()
+
+    @contextlib.contextmanager
+    def _write(self):
+        """One IMMEDIATE transaction: the write lock is taken up front, so two
+        writers never deadlock upgrading from a read.
+
+        Nodes passed to `_touch` inside the transaction have their current-view
+        row rewritten before COMMIT and their `as_of` window applied to the
+        in-memory interval index after it. Their scope and type (and those of
+        nodes passed to `_dirty`) invalidate cached results after COMMIT.
+        """
+        with self._writer, self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._touched = {}
+            self._dirtied = set()
+            try:
+                yield conn
+                conn.execute("DELETE FROM current_nodes WHERE invalid_at <= ?", (temporal.now(),))
+                before = self._version(conn)
+                conn.execute("UPDATE graph_meta SET value = value + 1 WHERE key = 'version'")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                touched, self._touched = self._touched, None
+                dirtied, self._dirtied = self._dirtied, None
+            self._bump_generations(before, dirtied)
+            with self._index_lock:
+                if self._interval is not None and self._interval_version == before:
+                    for node_id, window in touched.items():
+                        self._interval.update(node_id, *window)
+                    self._interval_version = before + 1
+                else:
+                    self._interval = None  # another process wrote: rebuild on demand
+
+    def _dirty(self, node):
+        self._dirtied.add((node["scope"], node["type"]))
+
+    def _bump_generations(self, before, dirtied):
+        with self._cache_lock:
+            if self._cache_version != before:
+                self._epoch += 1  # someone else wrote since we last looked
+            self._cache_version = before + 1
+            self._generations[("all",)] += 1
+            for scope, type in dirtied:
+                self._generations.update(
+                    (("scope", scope), ("type", type), ("slot", scope, type)))
+
+    def _generation_snapshot(self):
+        """(epoch, {token: generation}) as of now, for the result cache."""
+        with self.pool.connection() as conn:
+            version = self._version(conn)
+        with self._cache_lock:
+            if version != self._cache_version:
+                self._epoch += 1
+                self._cache_version = version
+            return self._epoch, dict(self._generations)
+
+    @staticmethod
+    def _version(conn):
+        return conn.execute("SELECT value FROM graph_meta WHERE key = 'version'").fetchone()[0]
+
+    def _touch(self, conn, node_id):
+        """Refresh `node_id`'s current-view row and queue its `as_of` window."""
+        row = conn.execute(
+            "SELECT id, type, scope, priority, updated_at, "
+            "COALESCE(valid_at, created_at) AS start, invalid_at, expired_at "
+            "FROM nodes WHERE id = ?", (node_id,)).fetchone()
+        at = temporal.now()
+        if row["expired_at"] is None and (row["invalid_at"] is None or row["invalid_at"] > at):
+            conn.execute("INSERT OR REPLACE INTO current_nodes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         tuple(row)[:7])
+        else:
+            conn.execute("DELETE FROM current_nodes WHERE id = ?", (node_id,))
+        ends = [t for t in (row["invalid_at"], row["expired_at"]) if t is not None]
+        self._touched[node_id] = (row["start"], min(ends) if ends else None)
+        self._dirty(row)
+
+    @contextlib.contextmanager
+    def _bulk_insert(self, conn):
+        """Insert many nodes inside `_write`, indexing them once at the end.
+
+        The FTS insert trigger is dropped for the block and the new rows are
+        indexed with one INSERT ... SELECT, which is several times faster than
+        firing the trigger per row. Their current-view rows and `as_of`
+        windows are written as `_touch` would. The trigger is recreated before
+        COMMIT, and a rollback restores it, so other writers never see it
+        missing.
+        """
+        top = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM nodes").fetchone()[0]
+        if self.fts:
+            conn.execute("DROP TRIGGER IF EXISTS nodes_fts_insert")
+        yield
+        if self.fts:
+            conn.execute("INSERT INTO nodes_fts(rowid, title, content, tags) "
+                         "SELECT rowid, title, content, tags FROM nodes WHERE rowid > ?", (top,))
+            conn.execute(FTS_INSERT_TRIGGER)
+        rows = conn.execute(
+            "SELECT id, type, scope, priority, updated_at, "
+            "COALESCE(valid_at, created_at) AS start, invalid_at, expired_at "
+            "FROM nodes WHERE rowid > ?", (top,)).fetchall()
+        at = temporal.now()
+        conn.executemany("INSERT OR REPLACE INTO current_nodes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         [tuple(row)[:7] for row in rows if row["expired_at"] is None
+                          and (row["invalid_at"] is None or row["invalid_at"] > at)])
+        for row in rows:
+            ends = [t for t in (row["invalid_at"], row["expired_at"]) if t is not None]
+            self._touched[row["id"]] = (row["start"], min(ends) if ends else None)
+            self._dirty(row)
+
+    # -- reads ----------------------------------------------------------------
+
+    def visible_ids(self, as_of):
+        """Ids of nodes visible as of `as_of`, from the interval index."""
+        as_of = temporal.normalize(as_of)
+        with self.pool.connection() as conn:
+            version = self._version(conn)
+            with self._index_lock:
+                if self._interval is not None and self._interval_version == version:
+                    return self._interval.stab(as_of)
+            conn.execute("BEGIN")  # version and rows from one snapshot
+            try:
+                version = self._version(conn)
+                rows = conn.execute(
+                    "SELECT id, COALESCE(valid_at, created_at), "
+                    "MIN(COALESCE(invalid_at, :end), COALESCE(expired_at, :end)) FROM nodes",
+                    {"end": END_OF_TIME}).fetchall()
+            finally:
+                conn.execute("COMMIT")
+        index = IntervalIndex((r[0], r[1], r[2]) for r in rows)
+        with self._index_lock:
+            if self._interval_version is None or version >= self._interval_version:
+                self._interval, self._interval_version = index, version
+        return index.stab(as_of)
+
+    def _fetch(self, conn, node_id):
+        row = conn.execute("SELECT * FROM nodes WHERE id = ?", (node_id,)).fetchone()
+        if row is None:
+            raise KGError(f"unknown node id: {node_id}")
+        return _node(row)
+
+    def node(self, node_id):
+        with self.pool.connection() as conn:
+            return self._fetch(conn, node_id)
+
+    def edges(self, node_id):
+        with self.pool.connection() as conn:
+            out = conn.execute("SELECT * FROM edges WHERE source_id = ?", (node_id,)).fetchall()
+            inc = conn.execute("SELECT * FROM edges WHERE target_id = ?", (node_id,)).fetchall()
+        return [dict(r) for r in out], [dict(r) for r in inc]
+
+    @staticmethod
+    def _chain_of(conn, node_id):
+        """(representative, head, length, position) of `node_id`'s chain."""
+        row = conn.execute(
+            "SELECT v.chain, c.head, c.length, v.position FROM versions v "
+            "JOIN chains c ON c.id = v.chain WHERE v.id = ?", (node_id,)).fetchone()
+        return tuple(row) if row is not None else (node_id, node_id, 1, 0)
+
+    def head(self, node_id):
+        """(current head, chain length) of `node_id`'s supersession chain."""
+        with self.pool.connection() as conn:
+            _, head, length, _ = self._chain_of(conn, node_id)
+        return head, length
+
+    def chain(self, node_id):
+        """Supersession chain through `node_id`, oldest first."""
+        with self.pool.connection() as conn:
+            chain = conn.execute(
+                "SELECT id FROM versions WHERE chain = (SELECT chain FROM versions WHERE id = ?) "
+                "ORDER BY position", (node_id,)).fetchall()
+        return [row[0] for row in chain] or [node_id]
+
+    def get_node(self, node_id):
+        node = self.node(node_id)
+        outgoing, incoming = self.edges(node_id)
+        node["status"] = temporal.status(node)
+        node["edges"] = {"outgoing": outgoing, "incoming": incoming}
+        node["chain"] = self.chain(node_id)
+        node["head"] = node["chain"][-1]
+        self.centrality.refresh(wait=False)
+        node["centrality"] = self.centrality.summary(node_id)
+        return node
+
+    def list_nodes(self, type=None, scope=None, include_expired=False, limit=50, offset=0):
+        """Browse by type/scope. The default reads only the materialized current view."""
+        at = temporal.now()
+        table, join, clauses, params = "n", "", [], []
+        if not include_expired:
+            table, join = "c", _CURRENT_VIEW[0]
+            clauses.append(_CURRENT_VIEW[1])
+            params += [at, at]
+        if type is not None:
+            clauses.append(f"{table}.type = ?")
+            params.append(type)
+        if scope is not None:
+            clauses.append(f"{table}.scope = ?")
+            params.append(scope)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        sql = (f"SELECT n.* FROM nodes n {join} {where} "
+               f"ORDER BY {table}.priority DESC, {table}.updated_at DESC LIMIT ? OFFSET ?")
+        with self.pool.connection() as conn:
+            rows = conn.execute(sql, params + [int(limit), int(offset)]).fetchall()
+        nodes = [_node(r) for r in rows]
+        for node in nodes:
+            node["status"] = temporal.status(node, at)
+        return nodes
+
+    def _view(self, as_of=None, include_expired=False, type=None, scope=None):
+        """SQL join/filter (plus an id set for `as_of`) selecting the temporal view."""
+        at = temporal.now()
+        join, clauses, params, allowed = "", [], [], None
+        if include_expired:
+            pass
+        elif as_of is None:
+            join = _CURRENT_VIEW[0]
+            clauses.append(_CURRENT_VIEW[1])
+            params += [at, at]
+        else:
+            allowed = set(self.visible_ids(as_of))
+        if type is not None:
+            clauses.append("n.type = ?")
+            params.append(type)
+        if scope is not None:
+            clauses.append("n.scope IN (?, ?)")
+            params += [scope, DEFAULT_SCOPE]
+        return View(join, "".join(" AND " + c for c in clauses), params, allowed)
+
+    def _admit(self, ids, view):
+        """The subset of `ids` inside `view`."""
+        if not ids:
+            return set()
+        marks = ",".join("?" * len(ids))
+        with self.pool.connection() as conn:
+            rows = conn.execute(f"SELECT n.id FROM nodes n {view.join} "
+                                f"WHERE n.id IN ({marks}) {view.where}", list(ids) + view.params)
+            admitted = {row[0] for row in rows}
+        if view.allowed is not None:
+            admitted &= view.allowed
+        return admitted
+
+    def _nodes_by_id(self, ids):
+        """Node dicts for `ids`, in the same order."""
+        if not ids:
+            return []
+        marks = ",".join("?" * len(ids))
+        with self.pool.connection() as conn:
+            rows = conn.execute(f"SELECT * FROM nodes WHERE id IN ({marks})", list(ids))
+            found = {row["id"]: _node(row) for row in rows}
+        return [found[node_id] for node_id in ids if node_id in found]
+
+    def _cached(self, key, scope, type, as_of, compute):
+        """`compute()`, or its cached answer if nothing it depends on changed."""
+        if not self.cache.enabled:
+            return compute()
+        # Retuning the pipeline at runtime must not serve answers ranked the old way.
+        key += (self.retrieval.fingerprint(),)
+        epoch, generations = self._generation_snapshot()
+        found = self.cache.get(key, epoch, generations)
+        if found is not None:
+            return found
+        settled = not self._warming()
+        started = time.perf_counter()
+        value = compute()
+        cost_ms = (time.perf_counter() - started) * 1000
+        if not settled or self._warming():
+            return value  # ranked without vectors or fresh centrality: don't keep it
+        if scope is None:
+            tokens = [("type", type) if type else ("all",)]
+        else:
+            tokens = [("slot", s, type) if type else ("scope", s) for s in {scope, DEFAULT_SCOPE}]
+        nodes = value if isinstance(value, list) else value["nodes"] + value["related"]
+        tokens += [("scope", node["scope"]) for node in nodes]
+        depends = {token: generations.get(token, 0) for token in tokens}
+        self.cache.put(key, value, epoch, depends, cost_ms,
+                       None if as_of else self._seconds_to_boundary())
+        return value
+
+    def _warming(self):
+        return self.retrieval.warming() or self.centrality.warming()
+
+    def _seconds_to_boundary(self):
+        """Seconds until the next node becomes valid or ends, which changes
+        the current view without a write (None if no such moment)."""
+        at = temporal.now()
+        with self.pool.connection() as conn:
+            stamps = [conn.execute(f"SELECT MIN({column}) FROM current_nodes WHERE {column} > ?",
+                                   (at,)).fetchone()[0] for column in ("valid_at", "invalid_at")]
+        stamps = [stamp for stamp in stamps if stamp is not None]
+        return temporal.seconds_until(min(stamps), at) if stamps else None
+
+    def query(self, text, type=None, scope=None, limit=10, as_of=None, include_expired=False):
+        """Free-text search under the temporal view; `scope` adds global nodes.
+
+        Ranking is the hybrid pipeline in `retrieval.py`. The current view
+        joins the materialized `current_nodes` table; an `as_of` view
+        restricts matches to the interval index's answer. Answers are cached
+        until a write touches their scope (see `cache.py`).
+        """
+        as_of = temporal.normalize(as_of)
+        key = ("query", cache.normalize(text), type, scope, int(limit), as_of,
+               bool(include_expired))
+        return self._cached(key, scope, type, as_of, lambda: self._query(
+            text, type, scope, limit, as_of, include_expired))
+
+    def _query(self, text, type, scope, limit, as_of, include_expired):
+        view = self._view(as_of, include_expired, type, scope)
+        hits, _ = self.retrieval.search(text, view, int(limit), as_of)
+        at = temporal.now()
+        for node in hits:
+            node["score"] = round(node["score"], 4)
+            node["status"] = temporal.status(node, at)
+        return hits
+
+    def context(self, task, scope=None, limit=8, as_of=None, include_expired=False):
+        """Task-scoped retrieval: ranked hits plus their visible neighbours.
+
+        Superseded neighbours are not re-injected; they come back as
+        annotated pointers (`-> supersedes: old-id [invalidated <date>]`).
+        In the current view, an edge to an old version leads to its chain's
+        head instead. Answers are cached like `query`'s.
+        """
+        as_of = temporal.normalize(as_of)
+        key = ("context", cache.normalize(task), scope, int(limit), as_of, bool(include_expired))
+        answer = self._cached(key, scope, None, as_of, lambda: self._context(
+            task, scope, limit, as_of, include_expired))
+        answer["task"] = task
+        return answer
+
+    def _context(self, task, scope, limit, as_of, include_expired):
+        hits = self._query(task, None, scope, limit, as_of, include_expired)
+        shown = {hit["id"] for hit in hits}
+        pointers, related = [], []
+        follow = as_of is None and not include_expired
+        with self.pool.connection() as conn:
+            for hit in hits:
+                for edge in conn.execute(
+                        "SELECT e.relation, e.target_id, n.invalid_at, c.head FROM edges e "
+                        "JOIN nodes n ON n.id = e.target_id "
+                        "LEFT JOIN versions v ON v.id = e.target_id "
+                        "LEFT JOIN chains c ON c.id = v.chain WHERE e.source_id = ?",
+                        (hit["id"],)):
+                    target = edge["target_id"]
+                    if edge["relation"] == "supersedes":
+                        pointers.append(f"{hit['id']} -> supersedes: {target} "
+                                        f"[invalidated {edge['invalid_at'] or 'n/a'}]")
+                        continue
+                    via = f"{hit['id']} -{edge['relation']}->"
+                    if follow and edge["head"] not in (None, target):
+                        via, target = f"{via} {target} (now {edge['head']})", edge["head"]
+                    if target not in shown:
+                        related.append((via, target))
+        neighbours = []
+        at = temporal.now()
+        # Most central neighbours first, from the precomputed arrays.
+        ranks = self.centrality.lookup([target for _, target in related])
+        related.sort(key=lambda link: -ranks.get(link[1], (0.0, 0.0))[0])
+        for via, target in related:
+            if target in shown:
+                continue
+            node = self.node(target)
+            if include_expired or temporal.visible(node, as_of, at):
+                shown.add(target)
+                node["status"] = temporal.status(node, at)
+                node["via"] = via
+                neighbours.append(node)
+        return {"task": task, "nodes": hits, "related": neighbours, "pointers": pointers}
+
+    # -- writes ---------------------------------------------------------------
+
+    def _new_id(self, title):
+        slug = _SLUG.sub("-", title.lower()).strip("-")[:48] or "node"
+        return f"{slug}-{hashlib.sha1(os.urandom(16)).hexdigest()[:6]}"
+
+    def add(self, type, title, content, scope=DEFAULT_SCOPE, tags=(), priority=5, source="",
+            valid_from=None, valid_until=None, supersedes=None, id=None):
+        if type not in NODE_TYPES:
+            raise KGError(f"type must be one of {', '.join(NODE_TYPES)}")
+        if not (title or "").strip() or not (content or "").strip():
+            raise KGError("title and content are required")
+        try:
+            priority = int(priority)
+        except (TypeError, ValueError):
+            raise KGError("priority must be an integer 1-10") from None
+        if not 1 <= priority <= 10:
+            raise KGError("priority must be an integer 1-10")
+        at = temporal.now()
+        valid_at = temporal.normalize(valid_from) or at
+        invalid_at = temporal.normalize(valid_until)
+        if invalid_at is not None and invalid_at <= valid_at:
+            raise KGError("valid_until must be after valid_from")
+        node_id = id or self._new_id(title)
+        with self._write() as conn:
+            if supersedes is not None:
+                self._fetch(conn, supersedes)
+            try:
+                conn.execute(
+                    "INSERT INTO nodes (id, type, title, content, scope, tags, priority, source, "
+                    "created_at, updated_at, valid_at, invalid_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (node_id, type, title.strip(), content.strip(), scope or DEFAULT_SCOPE,
+                     _tags(tags), priority, source or "", at, at, valid_at, invalid_at))
+            except sqlite3.IntegrityError:
+                raise KGError(f"node id already exists: {node_id}") from None
+            self._touch(conn, node_id)
+            if supersedes is not None:
+                self._supersede(conn, node_id, supersedes, valid_at, at)
+            return self._fetch(conn, node_id)
+
+    def _supersede(self, conn, new_id, old_id, valid_at, at):
+        conn.execute(
+            "INSERT OR IGNORE INTO edges (source_id, target_id, relation, weight, created_at) "
+            "VALUES (?, ?, 'supersedes', 1.0, ?)", (new_id, old_id, at))
+        # Never overwrite existing history: only a still-valid target is ended.
+        conn.execute(
+            "UPDATE nodes SET invalid_at = ?, updated_at = ? WHERE id = ? AND invalid_at IS NULL",
+            (valid_at, at, old_id))
+        self._touch(conn, old_id)
+        self._link_versions(conn, new_id, old_id)
+
+    def _link_versions(self, conn, new_id, old_id):
+        """Append `new_id`'s chain after `old_id`'s in the supersession index.
+
+        Only a chain's head can be superseded in the index: when `old_id`
+        already has a successor (a fork), the index keeps the first one and
+        `new_id` keeps its own chain. Linking within one chain is ignored,
+        so the index never holds a cycle.
+        """
+        old_chain, old_head, old_length, _ = self._chain_of(conn, old_id)
+        new_chain, new_head, new_length, _ = self._chain_of(conn, new_id)
+        if old_head != old_id or new_chain == old_chain:
+            return
+        members = conn.execute("SELECT id, position FROM versions WHERE chain = ?",
+                               (new_chain,)).fetchall() or [(new_id, 0)]
+        conn.execute("INSERT OR IGNORE INTO versions VALUES (?, ?, 0)", (old_id, old_id))
+        # Usually just `new_id` itself; merging two histories relabels the newer one.
+        conn.executemany("INSERT OR REPLACE INTO versions VALUES (?, ?, ?)",
+                         [(member, old_chain, old_length + position)
+                          for member, position in members])
+        conn.execute("DELETE FROM chains WHERE id = ?", (new_chain,))
+        conn.execute("INSERT OR REPLACE INTO chains VALUES (?, ?, ?)",
+                     (old_chain, new_head, old_length + new_length))
+
+    def link(self, source_id, target_id, relation, weight=0.5):
+        if relation not in RELATIONS:
+            raise KGError(f"relation must be one of {', '.join(RELATIONS)}")
+        if source_id == target_id:
+            raise KGError("an edge needs two different nodes")
+        try:
+            weight = float(weight)
+        except (TypeError, ValueError):
+            raise KGError("weight must be a number") from None
+        at = temporal.now()
+        with self._write() as conn:
+            source = self._fetch(conn, source_id)
+            self._dirty(source)
+            self._dirty(self._fetch(conn, target_id))
+            if relation == "supersedes":
+                self._supersede(conn, source_id, target_id, temporal.effective_valid_at(source), at)
+                conn.execute("UPDATE edges SET weight = ? WHERE source_id = ? AND target_id = ? "
+                             "AND relation = 'supersedes'", (weight, source_id, target_id))
+            else:
+                conn.execute(
+                    "INSERT INTO edges (source_id, target_id, relation, weight, created_at) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT(source_id, target_id, relation) "
+                    "DO UPDATE SET weight = excluded.weight",
+                    (source_id, target_id, relation, weight, at))
+        return {"source_id": source_id, "target_id": target_id, "relation": relation,
+                "weight": weight}
+
+    def retire(self, node_id, mode, at=None):
+        if mode not in RETIRE_MODES:
+            raise KGError(f"mode must be one of {', '.join(RETIRE_MODES)}")
+        stamp = temporal.normalize(at) or temporal.now()
+        with self._write() as conn:
+            self._fetch(conn, node_id)
+            if mode == "invalid":
+                conn.execute("UPDATE nodes SET invalid_at = ?, updated_at = ? WHERE id = ?",
+                             (stamp, temporal.now(), node_id))
+            elif mode == "expired":
+                conn.execute("UPDATE nodes SET expired_at = ?, updated_at = ? WHERE id = ?",
+                             (stamp, temporal.now(), node_id))
+            else:
+                conn.execute("UPDATE nodes SET invalid_at = NULL, expired_at = NULL, "
+                             "updated_at = ? WHERE id = ?", (temporal.now(), node_id))
+            self._touch(conn, node_id)
+            return self._fetch(conn, node_id)
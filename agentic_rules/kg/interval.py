@@ -0,0 +1,116 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Interval index for `as_of` queries.
+
+A node is visible as of T when T falls inside a single half-open window:
+
+    [valid_at, min(invalid_at, expired_at))
+
+It must have become valid, must not have ended, and must not yet have been
+retracted. "Visible as of T" is therefore a stabbing query: find every
+window that contains the point T.
+
+`IntervalIndex` answers stabbing queries with a centered interval tree in
+O(log n + k). Each tree node keeps the windows that contain its center
+twice: sorted by start, and sorted by end. Each node's center is the start
+of the median window, so every level at least halves the windows still to
+place.
+
+The tree is static. An update goes into a small overlay of changed keys
+instead of restructuring it. Queries check the overlay directly, and the
+tree is rebuilt once the overlay outgrows about sqrt(n) entries. An update
+therefore costs amortized O(sqrt(n) log n), and a query costs
+O(log n + k + sqrt(n)).
+
+Endpoints are compared as plain values. The graph passes the fixed-width
+timestamps from `temporal.normalize`, and `END_OF_TIME` stands for an
+open end.
+"""
+
+END_OF_TIME = "9999-12-31T23:59:59.999999Z"
+REBUILD_MIN = 256
+
+
+def _build(windows):
+    """windows: list of (start, end, key) with start < end -> tree tuple."""
+    if not windows:
+        return None
+    windows.sort()
+    center = windows[len(windows) // 2][0]
+    left, here, right = [], [], []
+    for window in windows:
+        if window[1] <= center:
+            left.append(window)
+        elif window[0] > center:
+            right.append(window)
+        else:
+            here.append(window)
+    by_start = [(start, key) for start, _, key in here]  # already sorted by start
+    by_end = sorted(((end, key) for _, end, key in here), reverse=True)
+    return (center, by_start, by_end, _build(left), _build(right))
+
+
+class IntervalIndex:
+    """Keys with half-open [start, end) windows; `stab(t)` -> keys containing t."""
+
+    def __init__(self, windows=()):
+        self._windows = {}
+        for key, start, end in windows:
+            if start is not None and start < (end or END_OF_TIME):
+                self._windows[key] = (start, end or END_OF_TIME)
+        self._rebuild()
+
+    def __len__(self):
+        return len(self._windows)
+
+    def __contains__(self, key):
+        return key in self._windows
+
+    def window(self, key):
+        return self._windows.get(key)
+
+    def _rebuild(self):
+        self._tree = _build([(s, e, k) for k, (s, e) in self._windows.items()])
+        self._overlay = {}  # key -> window now, or None when removed/emptied
+
+    def update(self, key, start, end=None):
+        """Set `key`'s window; a None start (or an empty window) removes it."""
+        end = end or END_OF_TIME
+        if start is None or start >= end:
+            if key not in self._windows and key not in self._overlay:
+                return
+            self._windows.pop(key, None)
+            self._overlay[key] = None
+        else:
+            if self._windows.get(key) == (start, end):
+                return
+            self._windows[key] = (start, end)
+            self._overlay[key] = (start, end)
+        if len(self._overlay) > max(REBUILD_MIN, int(len(self._windows) ** 0.5)):
+            self._rebuild()
+
+    def stab(self, point):
+        """Keys whose window contains `point`."""
+        found = []
+        overlay = self._overlay
+        node = self._tree
+        while node is not None:
+            center, by_start, by_end, left, right = node
+            if point < center:
+                for start, key in by_start:
+                    if start > point:
+                        break
+                    found.append(key)
+                node = left
+            else:
+                for end, key in by_end:
+                    if end <= point:
+                        break
+                    found.append(key)
+                node = right if point > center else None
+        if overlay:
+            found = [key for key in found if key not in overlay]
+            found.extend(key for key, window in overlay.items()
+                         if window is not None and window[0] <= point < window[1])
+        return found
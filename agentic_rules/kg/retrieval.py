@@ -0,0 +1,333 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Hybrid retrieval: BM25 ∥ vectors -> fusion -> rerank -> boost -> recency.
+
+This is the chain RAG-RULES.md describes for a connected `kg` server:
+
+1. **lexical**: FTS5 BM25 over title, content, and tags. Terms in more
+   than `lexical_max_df` of the nodes are dropped first, because ranking
+   tens of thousands of stopword matches is where BM25 spends its time and
+   those terms barely move its scores anyway.
+2. **vector**: hashed TF-IDF vectors (`vectors.py`), which catch subword
+   matches BM25 misses. This stage runs in the calling thread while BM25
+   runs on a worker; sqlite3 releases the GIL, so the two overlap.
+3. **fusion**: reciprocal-rank fusion (`"rrf"`), or min-max normalised,
+   weighted score fusion (`"score"`).
+4. **rerank**: a pluggable `reranker(query, nodes) -> [0..1 scores]` over
+   the top `rerank_depth` fused candidates. It is blended in with
+   `rerank_weight`. The default, `coverage_rerank`, rewards nodes whose
+   title and tags cover the query; a cross-encoder can be dropped in with
+   the same signature.
+5. **boost**: edge-aware and priority. A candidate gains up to
+   `edge_boost`, split by `centrality_weight` between its PageRank and its
+   links to the other candidates. Both are lookups in the precomputed
+   `centrality.py` arrays, not a traversal. Priority scales the score as it
+   always has (`0.75 + priority / 20`).
+6. **recency**: a bounded half-life decay on `updated_at`. A node loses at
+   most `recency_weight` of its score, so recency only re-orders near-ties.
+   It is skipped for `as_of` views.
+
+Every stage is timed. `Pipeline.stats()` reports p50/p95 per stage over the
+recent calls, and `python -m agentic_rules.kg bench` prints them for a
+database.
+"""
+
+import collections
+import concurrent.futures
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from . import vectors
+
+STAGES = ("lexical", "vector", "fusion", "rerank", "boost", "recency", "total")
+SYNC_CATCHUP = 5000
+STATS_WINDOW = 1000
+
+DEFAULTS = {
+    "depth": 50,
+    "fusion": "rrf",
+    "rrf_k": 60,
+    "lexical_weight": 1.0,
+    "vector_weight": 0.7,
+    "lexical_max_df": 0.05,
+    "vector_max_df": 0.02,
+    "min_ceiling": 1000,
+    "rerank_depth": 30,
+    "rerank_weight": 0.3,
+    "edge_boost": 0.1,
+    "centrality_weight": 0.5,
+    "recency": True,
+    "half_life_days": 90,
+    "recency_weight": 0.1,
+    "parallel": True,
+    "cache_entries": 256,
+    "cache_ttl_seconds": 300,
+}
+
+_DEFAULT_SETTINGS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "modules", "rag-rules", "settings.json",
+)
+
+
+def load_settings(path=None):
+    """The `rag_rules.knowledge_graph` section of rag-rules settings.json."""
+    with open(path or _DEFAULT_SETTINGS, "r", encoding="utf-8") as handle:
+        return json.load(handle).get("rag_rules", {}).get("knowledge_graph", {})
+
+
+def config_from_settings(kg_settings):
+    """DEFAULTS, then the recency settings, then an optional `retrieval` object."""
+    config = dict(DEFAULTS)
+    recency = (kg_settings.get("temporal") or {}).get("recency_ranking") or {}
+    config["recency"] = bool(recency.get("enabled", config["recency"]))
+    config["half_life_days"] = recency.get("half_life_days", config["half_life_days"])
+    config.update(kg_settings.get("retrieval") or {})
+    return config
+
+
+def coverage_rerank(query, nodes):
+    """Share of query words found in each node, counting the title and tags double."""
+    wanted = set(vectors.words(query))
+    if not wanted:
+        return [0.0] * len(nodes)
+    scores = []
+    for node in nodes:
+        head = set(vectors.words(f"{node['title']} {' '.join(node['tags'])}"))
+        body = set(vectors.words(node["content"]))
+        scores.append(sum(2 if w in head else 1 if w in body else 0 for w in wanted)
+                      / (2.0 * len(wanted)))
+    return scores
+
+
+def _age_days(stamp, now):
+    then = datetime.strptime(stamp, "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
+    return max(0.0, (now - then).total_seconds() / 86400.0)
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Pipeline:
+    """Hybrid search over one KnowledgeGraph; thread-safe."""
+
+    def __init__(self, graph, config=None, reranker=coverage_rerank):
+        self.graph = graph
+        self.config = dict(DEFAULTS, **(config or {}))
+        self.reranker = reranker
+        self.vectors = vectors.VectorIndex(max_df=self.config["vector_max_df"],
+                                           min_ceiling=self.config["min_ceiling"])
+        self._loaded_rowid = 0
+        self._catchup = threading.Lock()
+        self._warming = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix="kg-lexical")
+        self._timings = collections.defaultdict(lambda: collections.deque(maxlen=STATS_WINDOW))
+        self._stats_lock = threading.Lock()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    # -- vector index upkeep -------------------------------------------------
+
+    def _load(self, conn, upto):
+        rows = conn.execute("SELECT rowid, id, title, tags, content FROM nodes "
+                            "WHERE rowid > ? AND rowid <= ? ORDER BY rowid",
+                            (self._loaded_rowid, upto))
+        for rowid, node_id, title, tags, content in rows:
+            self.vectors.append(node_id, title, tags or "", content)
+            self._loaded_rowid = rowid
+
+    def refresh(self, wait=False):
+        """Bring the vector index up to the newest node; True when it is current.
+
+        Nodes are append-only, so catching up is a rowid range scan. A small
+        backlog loads inline. A large one, such as the first query against a
+        big database, loads on a background thread while searches run
+        BM25-only.
+        """
+        with self.graph.pool.connection() as conn:
+            upto = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM nodes").fetchone()[0]
+        if upto <= self._loaded_rowid:
+            return True
+        if not wait and upto - self._loaded_rowid > SYNC_CATCHUP:
+            if self._warming is None or not self._warming.is_alive():
+                self._warming = threading.Thread(target=self.refresh, kwargs={"wait": True},
+                                                 name="kg-vectors", daemon=True)
+                self._warming.start()
+            return False
+        if not self._catchup.acquire(blocking=wait):
+            return False  # another thread is already catching up
+        try:
+            with self.graph.pool.connection() as conn:
+                self._load(conn, upto)
+        finally:
+            self._catchup.release()
+        return True
+
+    def warming(self):
+        """True while a background thread is loading the vector index."""
+        return self._warming is not None and self._warming.is_alive()
+
+    # -- stages ---------------------------------------------------------------
+
+    def _ceiling(self, share):
+        return max(self.config["min_ceiling"], int(len(self.vectors) * share))
+
+    def lexical(self, text, view, depth, use_df):
+        terms = list(dict.fromkeys(vectors.words(text)))
+        if not terms:
+            return []
+        joiner = " OR "
+        if use_df:
+            ceiling = self._ceiling(self.config["lexical_max_df"])
+            rare = [t for t in terms if self.vectors.term_df(t) <= ceiling]
+            if rare:
+                terms = rare
+            elif min(self.vectors.term_df(t) for t in terms) > 5 * ceiling:
+                return []  # nothing but stopwords
+            else:
+                joiner = " AND "  # only common terms: rank their intersection
+        with self.graph.pool.connection() as conn:
+            if self.graph.fts:
+                match = joiner.join(f'"{t}"' for t in terms)
+                sql = (f"SELECT n.id, -bm25(nodes_fts, 4.0, 1.0, 2.0) AS score "
+                       f"FROM nodes_fts JOIN nodes n ON n.rowid = nodes_fts.rowid {view.join} "
+                       f"WHERE nodes_fts MATCH ? {view.where} ORDER BY score DESC")
+                rows = conn.execute(sql, [match] + view.params)
+                pairs = []
+                for node_id, score in rows:
+                    if view.allowed is None or node_id in view.allowed:
+                        pairs.append((node_id, score))
+                        if len(pairs) == depth:
+                            break
+                return pairs
+            like = " OR ".join("(lower(n.title || ' ' || n.content || ' ' || n.tags) LIKE ?)"
+                               for _ in terms)
+            rows = conn.execute(
+                f"SELECT n.id, n.title, n.content, n.tags FROM nodes n {view.join} "
+                f"WHERE ({like}) {view.where}", [f"%{t}%" for t in terms] + view.params)
+            scored = []
+            for node_id, title, content, tags in rows:
+                if view.allowed is not None and node_id not in view.allowed:
+                    continue
+                haystack = f"{title} {title} {content} {tags}".lower()
+                scored.append((node_id, float(sum(haystack.count(t) for t in terms))))
+        scored.sort(key=lambda pair: -pair[1])
+        return scored[:depth]
+
+    def vector(self, text, view, depth):
+        pairs = self.vectors.search(text, depth * 4)
+        if not pairs:
+            return []
+        admitted = self.graph._admit([node_id for node_id, _ in pairs], view)
+        return [pair for pair in pairs if pair[0] in admitted][:depth]
+
+    def fuse(self, ranked):
+        """ranked: {channel: [(id, score), ...]} -> [(id, fused score)], best first."""
+        config = self.config
+        fused = collections.defaultdict(float)
+        for channel, pairs in ranked.items():
+            weight = config[f"{channel}_weight"]
+            if not pairs:
+                continue
+            if config["fusion"] == "score":
+                high = pairs[0][1]
+                low = min(score for _, score in pairs)
+                for node_id, score in pairs:
+                    fused[node_id] += weight * ((score - low) / (high - low) if high > low else 1.0)
+            else:
+                for rank, (node_id, _) in enumerate(pairs):
+                    fused[node_id] += weight / (config["rrf_k"] + rank + 1)
+        return sorted(fused.items(), key=lambda item: -item[1])
+
+    def rerank(self, text, nodes):
+        if self.reranker is None or not nodes:
+            return
+        weight = self.config["rerank_weight"]
+        top = max(node["score"] for node in nodes) or 1.0
+        for node, extra in zip(nodes, self.reranker(text, nodes)):
+            node["score"] = (1.0 - weight) * node["score"] / top + weight * extra
+
+    def boost(self, nodes):
+        graph_centrality = self.graph.centrality
+        graph_centrality.refresh(wait=False)  # a large backlog goes to the background
+        found = graph_centrality.lookup([node["id"] for node in nodes])
+        edge_boost = self.config["edge_boost"]
+        weight = self.config["centrality_weight"]
+        for node in nodes:
+            rank, linked = found.get(node["id"], (0.0, 0.0))
+            edge = weight * rank + (1.0 - weight) * min(1.0, linked)
+            node["score"] *= (1.0 + edge_boost * edge) * (0.75 + node["priority"] / 20.0)
+
+    def recency(self, nodes):
+        weight = self.config["recency_weight"]
+        half_life = float(self.config["half_life_days"])
+        now = datetime.now(timezone.utc)
+        for node in nodes:
+            decay = 0.5 ** (_age_days(node["updated_at"], now) / half_life)
+            node["score"] *= 1.0 - weight + weight * decay
+
+    def fingerprint(self):
+        """Hashable summary of the config and reranker, for result-cache keys."""
+        return (id(self.reranker),) + tuple(sorted(self.config.items()))
+
+    # -- driver ---------------------------------------------------------------
+
+    def search(self, text, view, limit, as_of=None):
+        """Ranked node dicts for `text` under `view`; also returns stage timings (ms)."""
+        config = self.config
+        timings = {}
+        started = time.perf_counter()
+        depth = max(int(config["depth"]), int(limit))
+        ready = self.refresh()
+
+        if config["parallel"] and ready:
+            lexical = self._executor.submit(self._timed, "lexical", timings,
+                                            self.lexical, text, view, depth, True)
+            vector = self._timed("vector", timings, self.vector, text, view, depth)
+            lexical = lexical.result()
+        else:
+            lexical = self._timed("lexical", timings, self.lexical, text, view, depth, ready)
+            vector = self._timed("vector", timings, self.vector, text, view, depth) if ready else []
+
+        mark = time.perf_counter()
+        fused = self.fuse({"lexical": lexical, "vector": vector})
+        fused = fused[:max(int(config["rerank_depth"]), int(limit))]
+        nodes = self.graph._nodes_by_id([node_id for node_id, _ in fused])
+        for node, (_, score) in zip(nodes, fused):
+            node["score"] = score
+        timings["fusion"] = (time.perf_counter() - mark) * 1000
+
+        self._timed("rerank", timings, self.rerank, text, nodes)
+        self._timed("boost", timings, self.boost, nodes)
+        if config["recency"] and as_of is None:
+            self._timed("recency", timings, self.recency, nodes)
+        nodes.sort(key=lambda node: -node["score"])
+        timings["total"] = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            for stage, elapsed in timings.items():
+                self._timings[stage].append(elapsed)
+        return nodes[:int(limit)], timings
+
+    @staticmethod
+    def _timed(stage, timings, fn, *args):
+        mark = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            timings[stage] = (time.perf_counter() - mark) * 1000
+
+    def stats(self):
+        """{stage: {"count", "p50_ms", "p95_ms"}} over the last STATS_WINDOW searches."""
+        with self._stats_lock:
+            samples = {stage: sorted(values) for stage, values in self._timings.items()}
+        return {stage: {"count": len(samples[stage]),
+                        "p50_ms": round(_percentile(samples[stage], 0.50), 3),
+                        "p95_ms": round(_percentile(samples[stage], 0.95), 3)}
+                for stage in STAGES if samples.get(stage)}
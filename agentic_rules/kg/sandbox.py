@@ -0,0 +1,348 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Runner for generated analysis scripts (Python_Enhanced_KG_Construction).
+
+RAG-RULES.md's Safety Validation Requirements ask for a module whitelist,
+CPU time and memory limits, timeout protection, and a log of every script
+that ran (`/kg-script-log`). `ScriptRunner` provides them with the standard
+library on POSIX:
+
+- `check_environment` is the Safety_Validation_Check: it reports why
+  scripts cannot be sandboxed here (no `resource` module, no /proc, no
+  interpreter), and `run` refuses to start while it reports anything.
+- Each script runs in its own `python -I` process, in a new session, with
+  an empty environment. A bootstrap sets RLIMIT_CPU, RLIMIT_FSIZE (the
+  output cap), RLIMIT_NOFILE and RLIMIT_CORE, then RLIMIT_AS at what the
+  interpreter already uses plus `max_memory_mb`, installs the import
+  allow-list, and runs the script with `runpy`.
+- A wall-clock timer kills the whole process group at `timeout`. The parent
+  reaps the child with `os.wait4`, which gives its CPU time and peak RSS.
+- `run_many` runs scripts on a thread pool, one child process per worker.
+
+The import allow-list applies to the script's own `import` statements and
+`importlib.import_module` calls; modules it imports may import what they
+need. It is a policy check that catches generated scripts reaching for the
+network or a subprocess, not a security boundary: `os` and `importlib` are
+on the default list, and they reach everything else. The enforced limits
+are the kernel's.
+
+Every run is appended to a JSONL log (`read_log`, `summarize`), and the
+script's text is kept under `scripts/<sha256>.py` next to it, so the log
+shows exactly what ran.
+"""
+
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    fcntl = resource = None
+
+from .._fs import atomic_write
+from .retrieval import load_settings
+from .temporal import now
+
+LOG_FILE = "script_log.jsonl"
+SCRIPTS_DIR = "scripts"
+DEFAULT_ALLOWED = ("ast", "inspect", "importlib", "sys", "os")
+DEFAULT_CPU_SECONDS = 30
+DEFAULT_MEMORY_MB = 50
+DEFAULT_OUTPUT_MB = 16
+MAX_OPEN_FILES = 64
+EXIT_MEMORY = 3
+EXIT_IMPORT_DENIED = 4
+EXIT_OUTPUT = 5
+
+# Runs as `python -I -c BOOTSTRAP <limits json> <script> <args...>`.
+BOOTSTRAP = r"""
+import builtins, errno, importlib, json, os, resource, runpy, sys
+limits = json.loads(sys.argv[1])
+resource.setrlimit(resource.RLIMIT_CPU, (limits["cpu"], limits["cpu"] + 1))
+resource.setrlimit(resource.RLIMIT_FSIZE, (limits["output"], limits["output"]))
+resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+resource.setrlimit(resource.RLIMIT_NOFILE, (limits["files"], limits["files"]))
+with open("/proc/self/statm") as statm:
+    used = int(statm.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+ceiling = used + limits["memory"]
+resource.setrlimit(resource.RLIMIT_AS, (ceiling, ceiling))
+allowed = frozenset(limits["allowed"])
+
+class ImportDenied(ImportError):
+    pass
+
+def check(name, caller):
+    if caller == "__main__" and name.partition(".")[0] not in allowed:
+        raise ImportDenied(f"import of {name!r} is not allowed")
+
+real_import, real_import_module = builtins.__import__, importlib.import_module
+
+def guarded_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level == 0:
+        check(name, (globals or {}).get("__name__"))
+    return real_import(name, globals, locals, fromlist, level)
+
+def guarded_import_module(name, package=None):
+    if not name.startswith("."):
+        check(name, sys._getframe(1).f_globals.get("__name__"))
+    return real_import_module(name, package)
+
+builtins.__import__, importlib.import_module = guarded_import, guarded_import_module
+sys.argv = sys.argv[2:]
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+except ImportDenied as exc:
+    print(f"sandbox: {exc}", file=sys.stderr)
+    sys.exit(%d)
+except MemoryError:
+    print(f"sandbox: memory limit of {limits['memory'] >> 20} MB reached", file=sys.stderr)
+    sys.exit(%d)
+except OSError as exc:  # Python ignores SIGXFSZ, so RLIMIT_FSIZE surfaces as EFBIG
+    if exc.errno != errno.EFBIG:
+        raise
+    print(f"sandbox: output limit of {limits['output'] >> 20} MB reached", file=sys.stderr)
+    sys.exit(%d)
+""" % (EXIT_IMPORT_DENIED, EXIT_MEMORY, EXIT_OUTPUT)
+
+
+def python_settings():
+    """rag_rules.knowledge_graph.python_enhancement from settings.json, or {}."""
+    try:
+        return load_settings().get("python_enhancement", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def check_environment(python=None):
+    """Safety_Validation_Check: a list of reasons scripts cannot be sandboxed here.
+
+    Empty when the runner can enforce every limit.
+    """
+    problems = []
+    if resource is None:
+        problems.append("the resource module is unavailable (POSIX only)")
+    if not os.path.exists("/proc/self/statm"):
+        problems.append("/proc is unavailable; the memory limit cannot be sized")
+    if not hasattr(os, "wait4") or not hasattr(os, "killpg"):
+        problems.append("os.wait4 and os.killpg are required")
+    python = python or sys.executable
+    if not python or not os.access(python, os.X_OK):
+        problems.append(f"no Python interpreter to run scripts with ({python!r})")
+    return problems
+
+
+def _status(exit_code, timed_out, cpu_seconds, cpu_limit):
+    if timed_out:
+        return "timeout"
+    if exit_code == 0:
+        return "ok"
+    if exit_code == -signal.SIGXCPU or (exit_code == -signal.SIGKILL and
+                                        cpu_seconds >= cpu_limit):
+        return "cpu_limit"
+    if exit_code in (-signal.SIGXFSZ, EXIT_OUTPUT):
+        return "output_limit"
+    if exit_code == EXIT_MEMORY:
+        return "memory_limit"
+    if exit_code == EXIT_IMPORT_DENIED:
+        return "import_denied"
+    return "error"
+
+
+def _reason(status, stderr, exit_code, limits):
+    if status == "timeout":
+        return f"killed after {limits['timeout']} s wall clock"
+    if status == "cpu_limit":
+        return f"CPU limit of {limits['cpu_seconds']} s reached"
+    if status == "output_limit":
+        return f"output limit of {limits['output_mb']} MB reached"
+    if status == "ok":
+        return ""
+    lines = [line for line in stderr.splitlines() if line.strip()]
+    if lines:
+        return lines[-1][:500]
+    return f"exit {exit_code}" if exit_code >= 0 else f"signal {-exit_code}"
+
+
+def _exit_code(status):
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+class ScriptRunner:
+    """Runs analysis scripts under the python_enhancement limits and logs each run.
+
+    Arguments left as None come from settings.json: `allowed_modules`,
+    `max_execution_time` (the CPU limit, and the wall-clock timeout unless
+    `timeout` is given) and `max_memory_mb`. `log_path` None keeps no log.
+    """
+
+    def __init__(self, log_path=None, allowed_modules=None, cpu_seconds=None, memory_mb=None,
+                 timeout=None, output_mb=DEFAULT_OUTPUT_MB, workers=None, cwd=None,
+                 python=None):
+        settings = python_settings()
+        self.log_path = log_path
+        self.allowed = tuple(sorted(set(
+            allowed_modules if allowed_modules is not None
+            else settings.get("allowed_modules", DEFAULT_ALLOWED))))
+        self.cpu_seconds = int(cpu_seconds or settings.get("max_execution_time",
+                                                           DEFAULT_CPU_SECONDS))
+        self.memory_mb = memory_mb or settings.get("max_memory_mb", DEFAULT_MEMORY_MB)
+        self.timeout = timeout or self.cpu_seconds
+        self.output_mb = output_mb
+        self.workers = workers or os.cpu_count() or 1
+        self.cwd = cwd
+        self.python = python or sys.executable
+        self.transparency = settings.get("transparency_logging", True)
+
+    def limits(self):
+        return {"cpu_seconds": self.cpu_seconds, "memory_mb": self.memory_mb,
+                "timeout": self.timeout, "output_mb": self.output_mb,
+                "allowed_modules": list(self.allowed)}
+
+    def run(self, script, args=()):
+        """Run one script file; returns its log record (with `output` added).
+
+        Raises RuntimeError when `check_environment` reports a problem, so
+        callers fall back to text analysis as the algorithm requires.
+        """
+        problems = check_environment(self.python)
+        if problems:
+            raise RuntimeError("cannot sandbox analysis scripts: " + "; ".join(problems))
+        script = os.path.abspath(script)
+        with open(script, "rb") as handle:
+            source = handle.read()
+        sha = hashlib.sha256(source).hexdigest()
+        limits = self.limits()
+        child_limits = json.dumps({
+            "cpu": self.cpu_seconds, "memory": int(self.memory_mb * 1024 * 1024),
+            "output": int(self.output_mb * 1024 * 1024), "files": MAX_OPEN_FILES,
+            "allowed": list(self.allowed)})
+        env = {"PATH": os.defpath, "PYTHONIOENCODING": "utf-8", "PYTHONDONTWRITEBYTECODE": "1"}
+        started_at = now()
+        started = time.perf_counter()
+        with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+            proc = subprocess.Popen(
+                [self.python, "-I", "-c", BOOTSTRAP, child_limits, script, *args],
+                stdin=subprocess.DEVNULL, stdout=stdout, stderr=stderr, env=env,
+                cwd=self.cwd or os.path.dirname(script), start_new_session=True)
+            timed_out = threading.Event()
+
+            def kill():
+                timed_out.set()
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+            timer = threading.Timer(self.timeout, kill)
+            timer.daemon = True
+            timer.start()
+            try:
+                _, wait_status, usage = os.wait4(proc.pid, 0)
+            finally:
+                timer.cancel()
+            proc.returncode = exit_code = _exit_code(wait_status)
+            duration_ms = (time.perf_counter() - started) * 1000
+            output_bytes = stdout.tell()
+            stdout.seek(0)
+            output = stdout.read().decode("utf-8", "replace")
+            stderr.seek(0)
+            errors = stderr.read().decode("utf-8", "replace")
+        cpu = usage.ru_utime + usage.ru_stime
+        # ru_maxrss is kilobytes on Linux, bytes on macOS.
+        peak_kb = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+        status = _status(exit_code, timed_out.is_set(), cpu, self.cpu_seconds)
+        record = {
+            "id": f"{started_at}-{sha[:12]}-{proc.pid}", "script": script, "sha256": sha,
+            "args": list(args), "started": started_at, "duration_ms": round(duration_ms, 1),
+            "cpu_ms": round(cpu * 1000, 1), "peak_rss_kb": peak_kb,
+            "output_bytes": output_bytes, "exit": exit_code, "status": status,
+            "reason": _reason(status, errors, exit_code, limits), "limits": limits,
+        }
+        if self.log_path and self.transparency:
+            keep_script(self.log_path, sha, source)
+            append(self.log_path, record)
+        return dict(record, output=output, stderr=errors)
+
+    def run_many(self, scripts):
+        """Run scripts in parallel, `workers` at a time; records in input order."""
+        jobs = [(script, ()) if isinstance(script, str) else (script[0], tuple(script[1]))
+                for script in scripts]
+        if len(jobs) <= 1 or self.workers <= 1:
+            return [self.run(script, args) for script, args in jobs]
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(jobs))) as pool:
+            return list(pool.map(lambda job: self.run(*job), jobs))
+
+
+def keep_script(log_path, sha, source):
+    """Store a script's text content-addressed beside the log, once."""
+    path = os.path.join(os.path.dirname(os.path.abspath(log_path)), SCRIPTS_DIR, f"{sha}.py")
+    if not os.path.exists(path):
+        atomic_write(path, source)
+    return path
+
+
+def append(log_path, record):
+    """Append one record with a single O_APPEND write under a shared lock."""
+    os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+    data = (json.dumps(record, sort_keys=True) + "\n").encode("utf-8")
+    fd = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def read_log(log_path, status=None, script=None, since=None, limit=None):
+    """Logged runs, oldest first, filtered; the last `limit` of them.
+
+    `script` matches a substring of the path or a sha256 prefix. `since` is
+    a timestamp in the log's own form; string comparison is chronological.
+    """
+    records = []
+    try:
+        handle = open(log_path, encoding="utf-8")
+    except FileNotFoundError:
+        return records
+    with handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a torn final line from a crashed writer
+            if status and record.get("status") != status:
+                continue
+            if script and script not in record.get("script", "") and \
+                    not record.get("sha256", "").startswith(script):
+                continue
+            if since and record.get("started", "") < since:
+                continue
+            records.append(record)
+    return records[-limit:] if limit else records
+
+
+def summarize(records):
+    """Counts by status, and duration, CPU and peak RSS percentiles."""
+    summary = {"runs": len(records), "by_status": {}}
+    for record in records:
+        summary["by_status"][record["status"]] = summary["by_status"].get(record["status"], 0) + 1
+    for field in ("duration_ms", "cpu_ms", "peak_rss_kb", "output_bytes"):
+        values = sorted(record.get(field, 0) for record in records)
+        if values:
+            summary[field] = {"p50": values[len(values) // 2],
+                              "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+                              "max": values[-1]}
+    return summary
@@ -0,0 +1,214 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Stdlib MCP server for the knowledge graph: stdio and local HTTP.
+
+The server speaks the JSON-RPC subset an MCP client needs for tools:
+`initialize`, `notifications/initialized`, `ping`, `tools/list`, and
+`tools/call`. There are two transports:
+
+- **stdio**: one JSON message per line on stdin and stdout. Logs go to
+  stderr.
+- **HTTP**: `POST /mcp` with a JSON-RPC message or batch, answered as
+  `application/json`. This is the non-streaming form of MCP's Streamable
+  HTTP transport, which is what the plugin's `kg_mcp_url` (type `http`)
+  connects to. The server binds to 127.0.0.1 unless told otherwise, and
+  each request runs on its own thread against the shared connection pool.
+  `GET /stats` returns the result-cache counters and per-stage retrieval
+  latencies as JSON.
+
+Tool failures (`KGError`) are returned as results with `isError: true`, as
+MCP prescribes. The agent sees the message and can correct the call.
+Protocol errors use JSON-RPC error codes.
+"""
+
+import json
+import sys
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import tools
+from .graph import KGError
+
+SERVER_NAME = "agentic-rules-kg"
+SERVER_VERSION = "1.5.4"
+PROTOCOL_VERSIONS = ("2025-06-18", "2025-03-26", "2024-11-05")
+MAX_BODY = 4 * 1024 * 1024
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+def _error(message_id, code, message):
+    return {"jsonrpc": "2.0", "id": message_id, "error": {"code": code, "message": message}}
+
+
+def _result(message_id, result):
+    return {"jsonrpc": "2.0", "id": message_id, "result": result}
+
+
+class MCPServer:
+    """Transport-independent JSON-RPC dispatch over one KnowledgeGraph."""
+
+    def __init__(self, graph, log=None):
+        self.graph = graph
+        self.log = log or (lambda message: print(message, file=sys.stderr, flush=True))
+
+    def handle(self, message):
+        """Answer one decoded JSON-RPC message; None for notifications."""
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0":
+            return _error(None, INVALID_REQUEST, "expected a JSON-RPC 2.0 object")
+        method = message.get("method")
+        message_id = message.get("id")
+        if "id" not in message:
+            return None  # notifications (initialized, cancelled) need no reply
+        params = message.get("params") or {}
+        try:
+            if method == "initialize":
+                return _result(message_id, self._initialize(params))
+            if method == "ping":
+                return _result(message_id, {})
+            if method == "tools/list":
+                return _result(message_id, {"tools": tools.TOOLS})
+            if method == "tools/call":
+                return _result(message_id, self._call(params))
+        except KGError as exc:
+            return _error(message_id, INVALID_PARAMS, str(exc))
+        except Exception as exc:  # noqa: BLE001 - one bad call must not kill the server
+            self.log(f"kg: {method} failed: {exc!r}")
+            return _error(message_id, INTERNAL_ERROR, f"{type(exc).__name__}: {exc}")
+        return _error(message_id, METHOD_NOT_FOUND, f"method not found: {method}")
+
+    def handle_payload(self, payload):
+        """Decode a raw message or batch; returns the reply object or None."""
+        try:
+            message = json.loads(payload)
+        except ValueError as exc:
+            return _error(None, PARSE_ERROR, f"parse error: {exc}")
+        if isinstance(message, list):
+            replies = [reply for reply in map(self.handle, message) if reply is not None]
+            return replies or None
+        return self.handle(message)
+
+    def _initialize(self, params):
+        requested = params.get("protocolVersion")
+        version = requested if requested in PROTOCOL_VERSIONS else PROTOCOL_VERSIONS[0]
+        return {
+            "protocolVersion": version,
+            "capabilities": {"tools": {"listChanged": False}},
+            "serverInfo": {"name": SERVER_NAME, "version": SERVER_VERSION},
+        }
+
+    def _call(self, params):
+        name = params.get("name")
+        if name not in tools.TOOL_NAMES:
+            raise KGError(f"unknown tool: {name}")
+        try:
+            result = tools.call(self.graph, name, params.get("arguments") or {})
+        except KGError as exc:
+            return {"content": [{"type": "text", "text": str(exc)}], "isError": True}
+        return {
+            "content": [{"type": "text", "text": json.dumps(result, ensure_ascii=False)}],
+            "structuredContent": result,
+            "isError": False,
+        }
+
+
+# --- stdio -------------------------------------------------------------------
+
+def serve_stdio(server, stdin=None, stdout=None):
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    for line in stdin:
+        if not line.strip():
+            continue
+        reply = server.handle_payload(line)
+        if reply is not None:
+            stdout.write(json.dumps(reply, ensure_ascii=False) + "\n")
+            stdout.flush()
+
+
+# --- HTTP --------------------------------------------------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = f"{SERVER_NAME}/{SERVER_VERSION}"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler API
+        if self.server.verbose:
+            self.server.mcp.log(f"kg http: {format % args}")
+
+    def _send(self, status, body=None, headers=()):
+        data = b"" if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers:
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path.split("?")[0].rstrip("/") not in ("/mcp", ""):
+            self._send(404, _error(None, INVALID_REQUEST, "POST to /mcp"))
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_BODY:
+            self._send(413 if length > MAX_BODY else 400,
+                       _error(None, INVALID_REQUEST, "bad Content-Length"))
+            return
+        reply = self.server.mcp.handle_payload(self.rfile.read(length))
+        headers = []
+        # Sessions carry no server state; the id only satisfies clients that
+        # expect one after initialize and echo it back.
+        session = self.headers.get("Mcp-Session-Id")
+        if isinstance(reply, dict) and "serverInfo" in (reply.get("result") or {}):
+            session = uuid.uuid4().hex
+        if session:
+            headers.append(("Mcp-Session-Id", session))
+        if reply is None:
+            self._send(202, headers=headers)
+        else:
+            self._send(200, reply, headers)
+
+    def do_GET(self):
+        if self.path.split("?")[0].rstrip("/") == "/stats":
+            self._send(200, self.server.mcp.graph.stats())
+            return
+        # No server-initiated stream: the spec allows 405 here.
+        self._send(405, headers=[("Allow", "POST")])
+
+    def do_DELETE(self):
+        self._send(200)
+
+
+def make_http_server(server, host="127.0.0.1", port=8765, verbose=False):
+    httpd = ThreadingHTTPServer((host, port), _Handler)
+    httpd.daemon_threads = True
+    httpd.mcp = server
+    httpd.verbose = verbose
+    return httpd
+
+
+def serve_http(server, host="127.0.0.1", port=8765, verbose=False):
+    httpd = make_http_server(server, host, port, verbose)
+    server.log(f"kg: serving MCP on http://{host}:{httpd.server_address[1]}/mcp")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+def start_http_thread(server, host="127.0.0.1", port=0):
+    """Serve on a background thread; returns the HTTP server (for tests/embedding)."""
+    httpd = make_http_server(server, host, port)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    return httpd
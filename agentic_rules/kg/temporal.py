@@ -0,0 +1,88 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Timestamps and the bi-temporal visibility predicate.
+
+KG_IMPLEMENTATION_GUIDE.md warns that mixed timestamp formats break
+lexicographic comparison (`datetime('now')` vs ISO-8601 with an offset).
+Every timestamp the graph stores therefore goes through `normalize()`, which
+writes one fixed-width UTC form with microseconds:
+
+    2026-06-16T14:30:00.000000Z
+
+Because every value has the same width, plain string comparison is
+chronological, both in Python and in SQLite indexes.
+"""
+
+from datetime import datetime, timezone
+
+_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+class TimestampError(ValueError):
+    pass
+
+
+def now():
+    return datetime.now(timezone.utc).strftime(_FORMAT)
+
+
+def normalize(value):
+    """ISO-8601 date or datetime (any offset) -> canonical UTC string; None passes."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value).strip()
+        if text.endswith("Z") or text.endswith("z"):
+            text = text[:-1] + "+00:00"
+        try:
+            parsed = datetime.fromisoformat(text)
+        except ValueError:
+            raise TimestampError(f"not an ISO-8601 timestamp: {value!r}") from None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime(_FORMAT)
+
+
+def seconds_until(stamp, at=None):
+    """Seconds from `at` (default now) to a canonical timestamp; negative if past."""
+    start = datetime.strptime(at or now(), _FORMAT)
+    return (datetime.strptime(stamp, _FORMAT) - start).total_seconds()
+
+
+def effective_valid_at(node):
+    """`valid_at`, or `created_at` when the fact carries no event time."""
+    return node["valid_at"] or node["created_at"]
+
+
+def visible(node, as_of=None, at=None):
+    """The guide's visibility predicate.
+
+    Current view (no `as_of`): live, valid at `at` (default now) and not yet
+    invalidated. The guide writes `invalid_at IS NULL`; a `valid_until` in
+    the future is honoured as well, so the current view is exactly the as-of
+    view at `at` minus expired records. As-of view: valid at T and not yet
+    retired as erroneous.
+    """
+    if as_of is None:
+        at = at or now()
+        return (node["expired_at"] is None
+                and (node["invalid_at"] is None or node["invalid_at"] > at)
+                and effective_valid_at(node) <= at)
+    return ((node["expired_at"] is None or node["expired_at"] > as_of)
+            and effective_valid_at(node) <= as_of
+            and (node["invalid_at"] is None or node["invalid_at"] > as_of))
+
+
+def status(node, at=None):
+    """Human marker for a node's temporal state in the current view."""
+    at = at or now()
+    if node["expired_at"] is not None:
+        return "expired"
+    if node["invalid_at"] is not None and node["invalid_at"] <= at:
+        return "invalid"
+    if effective_valid_at(node) > at:
+        return "pending"
+    return "current"
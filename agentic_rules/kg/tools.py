@@ -0,0 +1,169 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""The seven `kg_*` tools of RAG-RULES.md: MCP schemas and dispatch.
+
+Parameter names follow the rule text: `valid_from` / `valid_until` on the
+write API, stored as `valid_at` / `invalid_at`; `supersedes=<old-id>`; and
+`as_of` / `include_expired` on the read tools. The schemas are validated
+again by `KnowledgeGraph`, so a bad call gets a `KGError` message back
+instead of a half-applied write.
+"""
+
+from .graph import NODE_TYPES, RELATIONS, RETIRE_MODES, KGError
+
+_AS_OF = {"type": "string",
+          "description": "ISO-8601 date/time: reconstruct what was known and true then"}
+_INCLUDE_EXPIRED = {"type": "boolean", "default": False,
+                    "description": "Also return superseded/retired nodes, marked by status"}
+_SCOPE = {"type": "string",
+          "description": "'global' or a project id; reads also include global nodes"}
+
+TOOLS = [
+    {
+        "name": "kg_context",
+        "description": "Load rules, patterns, and gotchas relevant to a task description. "
+                       "Call once before non-trivial work.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "task": {"type": "string", "description": "What you are about to do"},
+                "scope": _SCOPE,
+                "limit": {"type": "integer", "minimum": 1, "maximum": 50, "default": 8},
+                "as_of": _AS_OF,
+                "include_expired": _INCLUDE_EXPIRED,
+            },
+            "required": ["task"],
+        },
+    },
+    {
+        "name": "kg_query",
+        "description": "Free-text search across the graph.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string"},
+                "type": {"type": "string", "enum": list(NODE_TYPES)},
+                "scope": _SCOPE,
+                "limit": {"type": "integer", "minimum": 1, "maximum": 100, "default": 10},
+                "as_of": _AS_OF,
+                "include_expired": _INCLUDE_EXPIRED,
+            },
+            "required": ["query"],
+        },
+    },
+    {
+        "name": "kg_get_node",
+        "description": "Fetch one node by id, with its edges, temporal status, "
+                       "supersession chain, and the chain's current head.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {"id": {"type": "string"}},
+            "required": ["id"],
+        },
+    },
+    {
+        "name": "kg_add",
+        "description": "Persist a new node. Use supersedes=<old-id> to replace outdated "
+                       "knowledge atomically; never edit or delete the old node.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "type": {"type": "string", "enum": list(NODE_TYPES)},
+                "title": {"type": "string"},
+                "content": {"type": "string"},
+                "scope": {"type": "string", "default": "global"},
+                "tags": {"type": "array", "items": {"type": "string"}},
+                "priority": {"type": "integer", "minimum": 1, "maximum": 10, "default": 5},
+                "source": {"type": "string"},
+                "valid_from": {"type": "string", "description": "Event time the fact became true"},
+                "valid_until": {"type": "string", "description": "Event time the fact ends"},
+                "supersedes": {"type": "string", "description": "Id of the node this replaces"},
+            },
+            "required": ["type", "title", "content"],
+        },
+    },
+    {
+        "name": "kg_link",
+        "description": "Create an edge between two nodes. A supersedes edge invalidates its "
+                       "target; contradicts records a conflict without hiding either side.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "source_id": {"type": "string"},
+                "target_id": {"type": "string"},
+                "relation": {"type": "string", "enum": list(RELATIONS)},
+                "weight": {"type": "number", "minimum": 0, "maximum": 1, "default": 0.5},
+            },
+            "required": ["source_id", "target_id", "relation"],
+        },
+    },
+    {
+        "name": "kg_retire",
+        "description": "End a fact with no replacement (invalid), retract an erroneous "
+                       "record (expired), or undo either (restore). Never deletes.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "id": {"type": "string"},
+                "mode": {"type": "string", "enum": list(RETIRE_MODES)},
+                "at": {"type": "string", "description": "When it ended (default: now)"},
+            },
+            "required": ["id", "mode"],
+        },
+    },
+    {
+        "name": "kg_list",
+        "description": "Browse nodes by type or scope; include_expired shows retired "
+                       "history, marked.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "type": {"type": "string", "enum": list(NODE_TYPES)},
+                "scope": {"type": "string"},
+                "include_expired": _INCLUDE_EXPIRED,
+                "limit": {"type": "integer", "minimum": 1, "maximum": 500, "default": 50},
+                "offset": {"type": "integer", "minimum": 0, "default": 0},
+            },
+        },
+    },
+]
+
+TOOL_NAMES = {tool["name"] for tool in TOOLS}
+
+
+def _pick(arguments, *names):
+    return {name: arguments[name] for name in names if arguments.get(name) is not None}
+
+
+def call(graph, name, arguments):
+    """Run one tool; returns a JSON-serializable result or raises KGError."""
+    arguments = arguments or {}
+    if name not in TOOL_NAMES:
+        raise KGError(f"unknown tool: {name}")
+    schema = next(t["inputSchema"] for t in TOOLS if t["name"] == name)
+    missing = [key for key in schema.get("required", ()) if arguments.get(key) in (None, "")]
+    if missing:
+        raise KGError(f"{name}: missing required argument(s): {', '.join(missing)}")
+    unknown = set(arguments) - set(schema["properties"])
+    if unknown:
+        raise KGError(f"{name}: unknown argument(s): {', '.join(sorted(unknown))}")
+
+    if name == "kg_context":
+        return graph.context(arguments["task"], **_pick(
+            arguments, "scope", "limit", "as_of", "include_expired"))
+    if name == "kg_query":
+        return {"results": graph.query(arguments["query"], **_pick(
+            arguments, "type", "scope", "limit", "as_of", "include_expired"))}
+    if name == "kg_get_node":
+        return graph.get_node(arguments["id"])
+    if name == "kg_add":
+        return graph.add(**_pick(
+            arguments, "type", "title", "content", "scope", "tags", "priority", "source",
+            "valid_from", "valid_until", "supersedes"))
+    if name == "kg_link":
+        return graph.link(**_pick(arguments, "source_id", "target_id", "relation", "weight"))
+    if name == "kg_retire":
+        return graph.retire(arguments["id"], arguments["mode"], arguments.get("at"))
+    return {"nodes": graph.list_nodes(**_pick(
+        arguments, "type", "scope", "include_expired", "limit", "offset"))}
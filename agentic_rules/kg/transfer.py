@@ -0,0 +1,347 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Bulk export and import of the graph as newline-delimited JSON.
+
+`kg_add` and `kg_link` write one node or edge per transaction, which is the
+wrong shape for moving a whole store in or out (the migration settings'
+`supported_source_systems`). This module streams the graph instead:
+
+- `export_jsonl` writes a header line, then every node in insertion order,
+  then every edge in creation order, from one read transaction. Rows go
+  straight from the cursor to the file, so memory stays flat however large
+  the graph is. Temporal fields are written exactly as stored.
+- `import_jsonl` reads such a file back in transactions of `batch_size`
+  records. Node and edge rows are inserted as recorded, not replayed through
+  the write path: `invalid_at` is taken from the record, and `supersedes`
+  edges only extend the supersession index. Ids and edges that already
+  exist are left alone, so importing the same file twice changes nothing.
+- Each batch stores a checkpoint (byte offset and counts) in `graph_meta`
+  in the same transaction as its rows. An interrupted import resumes from
+  the last committed batch when it is run again; a file whose first bytes
+  changed since the checkpoint starts over.
+
+Records that fail validation (unknown type or relation, missing fields, a
+bad timestamp, an edge to a node that is not in the graph) are skipped and
+reported with their line number. Nodes must come before the edges that use
+them, as they do in an export.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+from . import temporal
+from .graph import DEFAULT_SCOPE, NODE_TYPES, RELATIONS, KGError, _tags
+
+FORMAT = "agentic-rules-kg"
+FORMAT_VERSION = 1
+DEFAULT_BATCH_SIZE = 5000
+CHECKPOINT_PREFIX = "import:"
+MAX_REPORTED_ERRORS = 20
+_IDENTITY_BYTES = 4096  # a changed file is detected from its first bytes
+
+NODE_FIELDS = ("id", "type", "title", "content", "scope", "tags", "priority", "source",
+               "created_at", "updated_at", "valid_at", "invalid_at", "expired_at")
+EDGE_FIELDS = ("source_id", "target_id", "relation", "weight", "created_at")
+
+_INSERT_NODE = (f"INSERT OR IGNORE INTO nodes ({', '.join(NODE_FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(NODE_FIELDS))})")
+_INSERT_EDGE = (f"INSERT OR IGNORE INTO edges ({', '.join(EDGE_FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(EDGE_FIELDS))})")
+# Exports hold canonical timestamps already; only other forms need parsing.
+_CANONICAL = re.compile(r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{6}Z\Z")
+_IN_CHUNK = 500  # ids per IN (...) list, well under SQLite's variable limit
+
+
+# -- export ----------------------------------------------------------------
+
+
+def export_jsonl(graph, path, scope=None, current_only=False):
+    """Write the graph to `path` ("-" for stdout); returns the record counts.
+
+    `scope` keeps only nodes in that scope, and edges between them.
+    `current_only` keeps only nodes in the current view, which drops
+    superseded and retired history along with the edges that reach it.
+    """
+    if path == "-":
+        return _export(graph, sys.stdout.buffer, scope, current_only)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            counts = _export(graph, handle, scope, current_only)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp, path)  # a reader never sees half an export
+        return counts
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _selection(scope, current_only, alias):
+    joins, where, params = [], [], []
+    if current_only:
+        joins.append(f"JOIN current_nodes c_{alias} ON c_{alias}.id = {alias}.id")
+    if scope is not None:
+        where.append(f"{alias}.scope = ?")
+        params.append(scope)
+    return joins, where, params
+
+
+def _export(graph, handle, scope, current_only):
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    counts = {"nodes": 0, "edges": 0}
+    with graph.pool.connection() as conn:
+        conn.execute("BEGIN")  # one snapshot for nodes and edges alike
+        try:
+            header = {"kind": "header", "format": FORMAT, "version": FORMAT_VERSION,
+                      "exported_at": temporal.now(), "graph_version": graph._version(conn),
+                      "scope": scope, "current_only": current_only}
+            handle.write(encode(header).encode("utf-8") + b"\n")
+
+            joins, where, params = _selection(scope, current_only, "n")
+            rows = conn.execute(
+                f"SELECT {', '.join('n.' + f for f in NODE_FIELDS)} FROM nodes n "
+                f"{' '.join(joins)} {'WHERE ' + ' AND '.join(where) if where else ''} "
+                "ORDER BY n.rowid", params)
+            for row in rows:
+                record = {"kind": "node"}
+                record.update(zip(NODE_FIELDS, row))
+                record["tags"] = [t for t in (record["tags"] or "").split(",") if t]
+                handle.write(encode(record).encode("utf-8") + b"\n")
+                counts["nodes"] += 1
+
+            joins, where, params = [], [], []
+            if scope is not None or current_only:
+                for alias, column in (("s", "source_id"), ("t", "target_id")):
+                    joined, filtered, bound = _selection(scope, current_only, alias)
+                    joins += [f"JOIN nodes {alias} ON {alias}.id = e.{column}"] + joined
+                    where += filtered
+                    params += bound
+            # Creation order, so supersession chains are rebuilt in the order they grew.
+            rows = conn.execute(
+                f"SELECT {', '.join('e.' + f for f in EDGE_FIELDS)} FROM edges e "
+                f"{' '.join(joins)} {'WHERE ' + ' AND '.join(where) if where else ''} "
+                "ORDER BY e.created_at, e.rowid", params)
+            for row in rows:
+                record = {"kind": "edge"}
+                record.update(zip(EDGE_FIELDS, row))
+                handle.write(encode(record).encode("utf-8") + b"\n")
+                counts["edges"] += 1
+        finally:
+            conn.execute("COMMIT")
+    return counts
+
+
+# -- import ----------------------------------------------------------------
+
+
+def _stamp(record, field, default=None):
+    value = record.get(field)
+    if not (isinstance(value, str) and _CANONICAL.match(value)):
+        value = temporal.normalize(value)
+    return value if value is not None else default
+
+
+def _node_row(record, at):
+    node_id = record.get("id")
+    if not isinstance(node_id, str) or not node_id.strip():
+        raise KGError("node needs an id")
+    if record.get("type") not in NODE_TYPES:
+        raise KGError(f"type must be one of {', '.join(NODE_TYPES)}")
+    title, content = record.get("title"), record.get("content")
+    if not isinstance(title, str) or not title.strip() or not isinstance(content, str) \
+            or not content.strip():
+        raise KGError("title and content are required")
+    try:
+        priority = int(record.get("priority", 5))
+    except (TypeError, ValueError):
+        raise KGError("priority must be an integer 1-10") from None
+    if not 1 <= priority <= 10:
+        raise KGError("priority must be an integer 1-10")
+    created_at = _stamp(record, "created_at", at)
+    return (node_id, record["type"], title.strip(), content.strip(),
+            record.get("scope") or DEFAULT_SCOPE, _tags(record.get("tags")), priority,
+            record.get("source") or "", created_at, _stamp(record, "updated_at", created_at),
+            _stamp(record, "valid_at"), _stamp(record, "invalid_at"),
+            _stamp(record, "expired_at"))
+
+
+def _edge_row(record, at):
+    source_id, target_id = record.get("source_id"), record.get("target_id")
+    if not isinstance(source_id, str) or not isinstance(target_id, str):
+        raise KGError("edge needs source_id and target_id")
+    if source_id == target_id:
+        raise KGError("an edge needs two different nodes")
+    if record.get("relation") not in RELATIONS:
+        raise KGError(f"relation must be one of {', '.join(RELATIONS)}")
+    try:
+        weight = float(record.get("weight", 0.5))
+    except (TypeError, ValueError):
+        raise KGError("weight must be a number") from None
+    return (source_id, target_id, record["relation"], weight,
+            _stamp(record, "created_at", at))
+
+
+def _identity(path):
+    with open(path, "rb") as handle:
+        return hashlib.sha1(handle.read(_IDENTITY_BYTES)).hexdigest()
+
+
+def checkpoint_key(path):
+    """The `graph_meta` key holding an import's checkpoint for `path`."""
+    return CHECKPOINT_PREFIX + os.path.abspath(path)
+
+
+def load_checkpoint(graph, path):
+    with graph.pool.connection() as conn:
+        row = conn.execute("SELECT value FROM graph_meta WHERE key = ?",
+                           (checkpoint_key(path),)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def import_jsonl(graph, path, batch_size=DEFAULT_BATCH_SIZE, restart=False, max_batches=None):
+    """Load a JSONL export into `graph`; returns a summary of what happened.
+
+    `path` may be "-" for stdin, which cannot be resumed. `restart` ignores
+    a saved checkpoint. `max_batches` stops after that many batches, leaving
+    a checkpoint for the next run, so a large import can be spread out.
+    """
+    batch_size = max(1, int(batch_size))
+    started = time.perf_counter()
+    summary = {"source": path, "resumed_at_line": 0, "lines": 0, "nodes": 0, "edges": 0,
+               "existing": 0, "rejected": 0, "errors": [], "batches": 0, "done": False}
+    checkpoint = None
+    if path == "-":
+        handle, offset, line_no = sys.stdin.buffer, 0, 0
+    else:
+        identity = _identity(path)
+        saved = None if restart else load_checkpoint(graph, path)
+        if saved is not None and saved.get("identity") == identity:
+            if saved.get("done"):
+                summary.update(saved["summary"], resumed_at_line=saved["line"], done=True)
+                return summary
+            for field in ("nodes", "edges", "existing", "rejected"):
+                summary[field] = saved["summary"][field]
+            summary["errors"] = saved["summary"]["errors"]
+            summary["resumed_at_line"] = saved["line"]
+        else:
+            saved = {"offset": 0, "line": 0}
+        checkpoint = {"key": checkpoint_key(path), "identity": identity}
+        handle = open(path, "rb")
+        handle.seek(saved["offset"])
+        offset, line_no = saved["offset"], saved["line"]
+    try:
+        batch = []
+        for raw in handle:
+            offset += len(raw)
+            line_no += 1
+            if raw.strip():
+                batch.append((line_no, raw))
+            if len(batch) >= batch_size:
+                _import_batch(graph, batch, summary, checkpoint, offset, line_no)
+                batch = []
+                if max_batches is not None and summary["batches"] >= max_batches:
+                    summary["lines"] = line_no - summary["resumed_at_line"]
+                    return summary
+        summary["done"] = True
+        # The last (possibly empty) batch also records that the file is done.
+        _import_batch(graph, batch, summary, checkpoint, offset, line_no)
+    finally:
+        if handle is not sys.stdin.buffer:
+            handle.close()
+    summary["lines"] = line_no - summary["resumed_at_line"]
+    summary["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return summary
+
+
+def _reject(summary, line_no, message):
+    summary["rejected"] += 1
+    if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+        summary["errors"].append(f"line {line_no}: {message}")
+
+
+def _import_batch(graph, batch, summary, checkpoint, offset, line_no):
+    at = temporal.now()  # for records without a created_at
+    linked = set()
+    with graph._write() as conn, graph._bulk_insert(conn):
+        for number, raw in batch:
+            try:
+                record = json.loads(raw)
+                if not isinstance(record, dict):
+                    raise KGError("not a JSON object")
+            except ValueError as exc:
+                _reject(summary, number, exc)
+                continue
+            kind = record.get("kind")
+            if kind == "header":
+                if record.get("format") != FORMAT or record.get("version") != FORMAT_VERSION:
+                    # Not a file this module wrote: stop before importing anything from it.
+                    raise KGError(f"line {number}: unsupported export format "
+                                  f"{record.get('format')!r} version {record.get('version')!r}")
+                continue
+            try:
+                if kind == "node":
+                    _insert_node(conn, _node_row(record, at), summary)
+                elif kind == "edge":
+                    _insert_edge(graph, conn, _edge_row(record, at), summary, linked)
+                else:
+                    raise KGError(f"unknown record kind: {kind!r}")
+            except ValueError as exc:  # KGError and TimestampError are ValueErrors
+                _reject(summary, number, exc)
+        _dirty_ends(graph, conn, linked)
+        summary["batches"] += 1
+        if checkpoint is not None:
+            state = {"identity": checkpoint["identity"], "offset": offset, "line": line_no,
+                     "done": summary["done"], "updated_at": temporal.now(),
+                     "summary": {field: summary[field] for field in
+                                 ("nodes", "edges", "existing", "rejected", "errors")}}
+            conn.execute("INSERT OR REPLACE INTO graph_meta (key, value) VALUES (?, ?)",
+                         (checkpoint["key"], json.dumps(state)))
+
+
+def _insert_node(conn, row, summary):
+    if conn.execute(_INSERT_NODE, row).rowcount:
+        summary["nodes"] += 1
+    else:
+        summary["existing"] += 1
+
+
+def _insert_edge(graph, conn, row, summary, linked):
+    source_id, target_id, relation = row[:3]
+    try:
+        inserted = conn.execute(_INSERT_EDGE, row).rowcount
+    except sqlite3.IntegrityError:  # the foreign keys: an endpoint is not in the graph
+        found = {end[0] for end in conn.execute("SELECT id FROM nodes WHERE id IN (?, ?)",
+                                                (source_id, target_id))}
+        missing = [node_id for node_id in (source_id, target_id) if node_id not in found]
+        raise KGError(f"unknown node: {', '.join(missing)}") from None
+    if not inserted:
+        summary["existing"] += 1
+        return
+    linked.update((source_id, target_id))
+    if relation == "supersedes":
+        # The target's invalid_at came with its own record; only the index is rebuilt.
+        graph._link_versions(conn, source_id, target_id)
+    summary["edges"] += 1
+
+
+def _dirty_ends(graph, conn, linked):
+    """Invalidate cached results in the scopes and types the new edges touch."""
+    linked = list(linked)
+    for start in range(0, len(linked), _IN_CHUNK):
+        chunk = linked[start:start + _IN_CHUNK]
+        for row in conn.execute(f"SELECT DISTINCT scope, type FROM nodes WHERE id IN "
+                                f"({', '.join('?' * len(chunk))})", chunk):
+            graph._dirty(row)
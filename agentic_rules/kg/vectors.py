@@ -0,0 +1,161 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Hashed TF-IDF vectors: the offline "semantic" retriever.
+
+BM25 matches whole tokens only, so `connection` never finds `connections`
+and `fixture` never finds `fixtures`. This channel adds the subword
+features BM25 cannot see:
+
+- character trigrams (`^co`, `con`, ..., `ns$`) of every word in the title
+  and tags, which are short and the most telling fields;
+- six-character prefixes of every content word, a crude stemmer that puts
+  `connect`, `connected`, and `connections` into the same feature.
+
+Features are hashed into `DIMENSIONS` buckets with crc32, which is stable
+across processes (unlike `hash()`), so nothing needs a vocabulary.
+Documents are binary vectors: nodes are short, so nearly every feature
+occurs once anyway. Each feature's posting list is an `array` of document
+numbers, and each document has one L2 norm. A search scores
+sum(idf) / norm, which is the cosine of an IDF-weighted query against a
+normalised document. IDF is computed at query time from the posting
+lengths, so appending a document never requires reweighting.
+
+Two bounds keep queries cheap at 100k documents: only the `max_features`
+rarest query features are scored, and features in more than `max_df` of
+the documents (and more than `min_ceiling` documents, so small graphs skip
+nothing) are treated as stopwords and skipped.
+
+The index also counts, per FTS token, how many documents contain it
+(`term_df`). The BM25 stage uses these counts to drop stopword terms
+before it asks FTS5 to rank tens of thousands of matches.
+"""
+
+import array
+import collections
+import functools
+import heapq
+import math
+import re
+import threading
+import zlib
+
+DIMENSIONS = 1 << 20
+STEM_LENGTH = 6
+CACHE_WORDS = 200000
+_WORD = re.compile(r"[a-z0-9]{2,}")  # FTS5 unicode61 tokens, minus one-letter ones
+
+_grams_cache = {}
+_stem_cache = {}
+
+
+def _bucket(feature):
+    return zlib.crc32(feature.encode("utf-8")) & (DIMENSIONS - 1)
+
+
+def _grams(word):
+    buckets = _grams_cache.get(word)
+    if buckets is None:
+        if len(_grams_cache) > CACHE_WORDS:
+            _grams_cache.clear()
+        padded = f"^{word}$"
+        buckets = _grams_cache[word] = [
+            _bucket("t:" + padded[i:i + 3]) for i in range(len(padded) - 2)]
+    return buckets
+
+
+def _stem(word):
+    bucket = _stem_cache.get(word)
+    if bucket is None:
+        if len(_stem_cache) > CACHE_WORDS:
+            _stem_cache.clear()
+        bucket = _stem_cache[word] = _bucket("s:" + word[:STEM_LENGTH])
+    return bucket
+
+
+def words(text):
+    return _WORD.findall(text.lower())
+
+
+def _analyse(title, tags, content):
+    head = words(f"{title} {tags.replace(',', ' ')}")
+    terms = set(head)
+    terms.update(words(content))
+    buckets = {bucket for word in head for bucket in _grams(word)}
+    buckets.update(map(_stem, terms))
+    return buckets, terms
+
+
+def features(title="", tags="", content=""):
+    """Set of hashed features of one document (or query)."""
+    return _analyse(title, tags, content)[0]
+
+
+class VectorIndex:
+    """Inverted index of hashed TF-IDF vectors, appended to as nodes arrive.
+
+    Nodes are never edited or deleted, so the index only grows. `append` is
+    safe to call while other threads search.
+    """
+
+    def __init__(self, max_features=32, max_df=0.02, min_ceiling=500):
+        self.max_features = max_features
+        self.max_df = max_df
+        self.min_ceiling = min_ceiling
+        self.ids = []
+        self._docs = {}
+        # bucket -> array of doc numbers
+        self._postings = collections.defaultdict(functools.partial(array.array, "i"))
+        self._inverse_norms = array.array("f")
+        self._term_df = collections.Counter()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, node_id):
+        return node_id in self._docs
+
+    def term_df(self, term):
+        """Documents containing the FTS token `term`."""
+        return self._term_df.get(term.lower(), 0)
+
+    def append(self, node_id, title, tags, content):
+        buckets, terms = _analyse(title, tags, content)
+        if not buckets:
+            return
+        with self._lock:
+            if node_id in self._docs:
+                return
+            doc = len(self.ids)
+            # ids and norms first: a concurrent search may already see `doc`
+            # in a posting list.
+            self.ids.append(node_id)
+            self._inverse_norms.append(1.0 / math.sqrt(len(buckets)))
+            self._docs[node_id] = doc
+            self._term_df.update(terms)
+            postings = self._postings
+            for bucket in buckets:
+                postings[bucket].append(doc)
+
+    def search(self, text, limit):
+        """Best `limit` (node id, score) pairs for free text."""
+        total = len(self.ids)
+        if not total:
+            return []
+        ceiling = max(self.min_ceiling, int(total * self.max_df))
+        chosen = []
+        for bucket in features(title=text):
+            posting = self._postings.get(bucket)
+            if posting is not None and len(posting) <= ceiling:
+                chosen.append((len(posting), bucket))
+        chosen = sorted(chosen)[:self.max_features]
+        totals = {}
+        get = totals.get
+        for df, bucket in chosen:
+            idf = math.log(1.0 + total / df)
+            for doc in self._postings[bucket]:
+                totals[doc] = get(doc, 0.0) + idf
+        ids, inverse_norms = self.ids, self._inverse_norms
+        scored = ((score * inverse_norms[doc], doc) for doc, score in totals.items())
+        return [(ids[doc], score) for score, doc in heapq.nlargest(limit, scored)]
@@ -0,0 +1,8 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Tooling for the markdown memory store described in MEMORY-RULES.md."""
+
+from .store import MemoryStore, load_settings
+
+__all__ = ["MemoryStore", "load_settings"]
@@ -0,0 +1,286 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Binary sidecar for index.md: columnar, memory-mapped, filterable in place.
+
+`index.md` stays the human view and the source of truth. Whenever the store
+rewrites it, `index.bin` is written next to it with the same rows, in the
+same order:
+
+    header     magic, version, row count, index.md fingerprint, section sizes
+    ts         int64[n]   timestamp packed as YYYYMMDDhhmmss (sorts like the text)
+    tags       uint64[n]  bit k = the k-th most common tag; bit 63 = "other tags"
+    scope      uint32[n]  code into the scope vocabulary
+    category   uint16[n]  code into the category vocabulary
+    strings    uint32[3n+1] offsets, then UTF-8 blob: id, location, tags per row
+    vocab      JSON: categories, scopes, tags (low-cardinality, decoded eagerly)
+
+Opening it maps the file and decodes only the header and the small vocab
+JSON. That is well under 10 ms even at 100k rows, because nothing is
+decoded per row. Filters compare integer codes in the mapped columns, and a
+time range is two bisects, since rows are sorted oldest first. Only matching
+rows are turned into `IndexRow`s.
+
+The header records the inode, size and mtime of the `index.md` it was built
+from. If someone edits the markdown by hand, the sidecar counts as stale, and
+readers fall back to parsing `index.md` until the next rewrite.
+"""
+
+import array
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+
+from .._fs import atomic_write
+from .store import IndexRow, project_of
+
+BINARY_INDEX_FILE = "index.bin"
+MAGIC = b"ARMI"
+VERSION = 1
+OTHER_TAGS = 1 << 63
+TAG_BITS = 63
+
+# magic, version, sorted flag, rows, index.md inode, size, mtime_ns,
+# string blob bytes, vocab bytes
+_HEADER = struct.Struct("<4sHHIQQqQI")
+_HEADER_SIZE = 64
+
+
+def pack_timestamp(value):
+    """`2026-06-16T14:30:00Z` -> 20260616143000; 0 for anything malformed."""
+    digits = value[0:4] + value[5:7] + value[8:10] + value[11:13] + value[14:16] + value[17:19]
+    return int(digits) if len(digits) == 14 and digits.isdigit() else 0
+
+
+def unpack_timestamp(packed):
+    text = f"{packed:014d}"
+    return f"{text[0:4]}-{text[4:6]}-{text[6:8]}T{text[8:10]}:{text[10:12]}:{text[12:14]}Z"
+
+
+def _pad(size):
+    return -size % 8
+
+
+def _sections(count, blob_len):
+    """Byte offsets of each column for a file with `count` rows."""
+    offsets = {}
+    position = _HEADER_SIZE
+    for name, width, items in (("ts", 8, count), ("tags", 8, count), ("scope", 4, count),
+                               ("category", 2, count), ("stroff", 4, 3 * count + 1)):
+        offsets[name] = position
+        position += width * items
+        position += _pad(position)
+    offsets["blob"] = position
+    offsets["vocab"] = position + blob_len + _pad(blob_len)
+    return offsets
+
+
+def _vocab(values):
+    codes = {}
+    for value in values:
+        codes.setdefault(value, len(codes))
+    return codes
+
+
+def _fingerprint(stat):
+    # st_ino is 0 on some Windows filesystems; size + mtime still catch edits.
+    return (stat.st_ino & 0xFFFFFFFFFFFFFFFF, stat.st_size, stat.st_mtime_ns)
+
+
+def write_binary_index(path, rows, source_stat):
+    """Write the sidecar for `rows` (already in index.md order).
+
+    `source_stat` is the stat of the index.md these rows were rendered to.
+    """
+    rows = list(rows)
+    count = len(rows)
+    categories = _vocab(row.category for row in rows)
+    scopes = _vocab(row.scope for row in rows)
+    frequency = {}
+    for row in rows:
+        for tag in row.tags:
+            frequency[tag] = frequency.get(tag, 0) + 1
+    common = sorted(frequency, key=lambda t: (-frequency[t], t))[:TAG_BITS]
+    tag_bits = {tag: 1 << bit for bit, tag in enumerate(common)}
+
+    ts = array.array("q", (pack_timestamp(row.timestamp) for row in rows))
+    tags = array.array("Q")
+    for row in rows:
+        mask = 0
+        for tag in row.tags:
+            mask |= tag_bits.get(tag, OTHER_TAGS)
+        tags.append(mask)
+    scope = array.array("I", (scopes[row.scope] for row in rows))
+    category = array.array("H", (categories[row.category] for row in rows))
+
+    stroff = array.array("I", [0])
+    chunks = []
+    length = 0
+    for row in rows:
+        for text in (row.id, row.location, ", ".join(row.tags)):
+            data = text.encode("utf-8")
+            chunks.append(data)
+            length += len(data)
+            stroff.append(length)
+    blob = b"".join(chunks)
+    vocab = json.dumps({"categories": list(categories), "scopes": list(scopes),
+                        "tags": common}).encode("utf-8")
+
+    columns = [ts, tags, scope, category, stroff]
+    if sys.byteorder != "little":
+        for column in columns:
+            column.byteswap()
+    ordered = all(ts[i] <= ts[i + 1] for i in range(count - 1))
+    header = _HEADER.pack(MAGIC, VERSION, int(ordered), count, _fingerprint(source_stat)[0],
+                          source_stat.st_size, source_stat.st_mtime_ns, len(blob), len(vocab))
+    parts = [header, bytes(_HEADER_SIZE - len(header))]
+    for column in columns:
+        data = column.tobytes()
+        parts += [data, bytes(_pad(len(data)))]
+    parts += [blob, bytes(_pad(len(blob))), vocab]
+    atomic_write(path, b"".join(parts))
+
+
+class BinaryIndex:
+    """A mapped `index.bin`. Use `open_for(store)`, which checks freshness."""
+
+    def __init__(self, path):
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            (magic, version, ordered, count, inode, size, mtime_ns,
+             blob_len, vocab_len) = _HEADER.unpack_from(self._map, 0)
+            self.source = (inode, size, mtime_ns)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path}: not a version {VERSION} memory index")
+            self.count = count
+            self.ordered = bool(ordered)
+            offsets = _sections(count, blob_len)
+            self.ts = self._column(offsets["ts"], "q", count)
+            self.tags = self._column(offsets["tags"], "Q", count)
+            self.scope = self._column(offsets["scope"], "I", count)
+            self.category = self._column(offsets["category"], "H", count)
+            self._stroff = self._column(offsets["stroff"], "I", 3 * count + 1)
+            self._blob = offsets["blob"]
+            vocab = json.loads(self._map[offsets["vocab"]:offsets["vocab"] + vocab_len])
+        except Exception:
+            self.close()
+            raise
+        self.categories = vocab["categories"]
+        self.scopes = vocab["scopes"]
+        self.tag_bits = {tag: 1 << bit for bit, tag in enumerate(vocab["tags"])}
+
+    def _column(self, offset, code, items):
+        view = memoryview(self._map)[offset:offset + struct.calcsize(code) * items]
+        if sys.byteorder != "little":
+            view = memoryview(array.array(code, view.tobytes()))
+            view.obj.byteswap()
+            self._views.append(view)
+            return view
+        self._views.append(view)
+        view = view.cast(code)
+        self._views.append(view)
+        return view
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    # -- decoding -------------------------------------------------------------
+
+    def _string(self, k):
+        start, end = self._stroff[k], self._stroff[k + 1]
+        return self._map[self._blob + start:self._blob + end].decode("utf-8")
+
+    def row_tags(self, i):
+        text = self._string(3 * i + 2)
+        return tuple(t for t in text.split(", ") if t)
+
+    def row(self, i):
+        return IndexRow(
+            self._string(3 * i), self.categories[self.category[i]],
+            self.scopes[self.scope[i]], unpack_timestamp(self.ts[i]),
+            self._string(3 * i + 1), self.row_tags(i),
+        )
+
+    # -- filtering ------------------------------------------------------------
+
+    def span(self, since=None, until=None):
+        """Positions [lo, hi) whose timestamp lies in [since, until) (index strings)."""
+        if not self.ordered:
+            return 0, self.count
+        lo = 0 if since is None else bisect.bisect_left(self.ts, pack_timestamp(since))
+        hi = self.count if until is None else bisect.bisect_left(self.ts, pack_timestamp(until))
+        return lo, max(lo, hi)
+
+    def has_tag(self, i, tag):
+        bit = self.tag_bits.get(tag)
+        if bit is not None:
+            return bool(self.tags[i] & bit)
+        return bool(self.tags[i] & OTHER_TAGS) and tag in self.row_tags(i)
+
+    def select(self, category=None, project=None, scope=None, since=None, until=None,
+               tag=None):
+        """Matching row positions, oldest first; nothing is decoded per row."""
+        lo, hi = self.span(since, until)
+        positions = range(lo, hi)
+        if not self.ordered and (since is not None or until is not None):
+            packed_lo = pack_timestamp(since) if since is not None else None
+            packed_hi = pack_timestamp(until) if until is not None else None
+            ts = self.ts
+            positions = [i for i in positions
+                         if (packed_lo is None or ts[i] >= packed_lo)
+                         and (packed_hi is None or ts[i] < packed_hi)]
+        if category is not None:
+            if category not in self.categories:
+                return []
+            code, column = self.categories.index(category), self.category
+            positions = [i for i in positions if column[i] == code]
+        if project is not None or scope is not None:
+            codes = {
+                code for code, name in enumerate(self.scopes)
+                if (project is None or project_of(name) == project)
+                and (scope is None or name == scope)
+            }
+            if not codes:
+                return []
+            column = self.scope
+            positions = [i for i in positions if column[i] in codes]
+        if tag is not None:
+            column, bit = self.tags, self.tag_bits.get(tag, OTHER_TAGS)
+            positions = [i for i in positions if column[i] & bit]
+            if bit == OTHER_TAGS:
+                positions = [i for i in positions if tag in self.row_tags(i)]
+        return list(positions)
+
+
+def binary_index_path(store):
+    return os.path.join(store.root, BINARY_INDEX_FILE)
+
+
+def open_for(store):
+    """The store's sidecar if it matches index.md as it is now, else None."""
+    try:
+        source = os.stat(store.index_path)
+        index = BinaryIndex(binary_index_path(store))
+    except (OSError, ValueError, struct.error):
+        return None
+    if index.source != _fingerprint(source):
+        index.close()
+        return None
+    return index
@@ -0,0 +1,176 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Compaction engine: roll cold loose entries into compressed segments.
+
+Implements the `memory_rules.compression` block of memory-rules settings:
+
+- Runs only when `compression.enabled` is true and the loose entries exceed
+  `compression.threshold_mb` (`--force` overrides both).
+- An entry is *cold* once it is older than a fraction (default one half) of
+  its category's `suggested_retention_days`. Hot entries stay loose markdown.
+- Categories with `encryption_required` (credentials, sensitive) are never
+  compacted: a compressed segment is not an encrypted one.
+
+Compaction is non-lossy. Members are appended to segment files and read
+back, the index is rewritten to point at them, and only then are the loose
+files removed — so `MemoryStore.query()` / `read()` return the same entries
+before and after. Entries are matched to members by relpath, not by id:
+ids are filename stems, and two scopes can hold the same one.
+
+Usage:
+    python -m agentic_rules.memory.compact --root ~/memory --dry-run
+    python -m agentic_rules.memory.compact --root ~/memory --force --codec zstd
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from . import segments, wal
+from .store import MemoryStore, format_timestamp, load_settings
+
+DEFAULT_COLD_FRACTION = 0.5
+DAY = 86400
+
+
+def cold_rows(store, rows, now, cold_fraction=DEFAULT_COLD_FRACTION):
+    """Yield loose rows old enough to move to the compressed tier."""
+    cutoffs = {}
+    for row in rows:
+        if segments.is_segment_location(row.location):
+            continue
+        if row.category not in cutoffs:
+            policy = store.category_policy(row.category)
+            days = store.retention_days(row.category)
+            if policy.get("encryption_required") or days is None:
+                cutoffs[row.category] = None
+            else:
+                cutoffs[row.category] = format_timestamp(now - days * cold_fraction * DAY)
+        cutoff = cutoffs[row.category]
+        if cutoff is not None and row.timestamp < cutoff:
+            yield row
+
+
+def loose_bytes(store, rows):
+    total = 0
+    for row in rows:
+        if segments.is_segment_location(row.location):
+            continue
+        try:
+            total += os.path.getsize(store.path(row.location))
+        except OSError:
+            continue
+    return total
+
+
+def _stored(store, member, raw):
+    """True when the segment member reads back as exactly `raw`."""
+    try:
+        return segments.read_member(store.root, member.location) == raw
+    except Exception:  # noqa: BLE001 - an unreadable member is not a stored one
+        return False
+
+
+def compact(store, now=None, force=False, dry_run=False, codec=None,
+            cold_fraction=DEFAULT_COLD_FRACTION):
+    """Compact cold entries; returns a report dict (also for dry runs/skips)."""
+    with store.index_lock():
+        if not dry_run:
+            wal.fold(store)
+        return _compact(store, now, force, dry_run, codec, cold_fraction)
+
+
+def _compact(store, now, force, dry_run, codec, cold_fraction):
+    now = time.time() if now is None else now
+    config = store.settings.get("compression", {})
+    codec = segments.available_codec(codec or config.get("codec", "gzip"))
+    rows = store.rows()
+    loose = loose_bytes(store, rows)
+    threshold = int(float(config.get("threshold_mb", 50)) * 1024 * 1024)
+    report = {
+        "enabled": bool(config.get("enabled")),
+        "loose_bytes": loose,
+        "threshold_bytes": threshold,
+        "codec": codec,
+        "candidates": 0,
+        "compacted": 0,
+        "skipped": None,
+    }
+    if not force and not config.get("enabled"):
+        report["skipped"] = "compression disabled (memory_rules.compression.enabled)"
+        return report
+    if not force and loose < threshold:
+        report["skipped"] = "loose entries below compression.threshold_mb"
+        return report
+
+    candidates = list(cold_rows(store, rows, now, cold_fraction))
+    report["candidates"] = len(candidates)
+    if dry_run or not candidates:
+        return report
+
+    # Keyed by relpath: ids are filename stems, and two scopes can share one.
+    existing = {source: member for member, source in segments.iter_members(store.root)
+                if source is not None}
+    relocated = {}
+    items = []
+    for row in candidates:
+        try:
+            with open(store.path(row.location), "rb") as handle:
+                raw = handle.read()
+        except OSError:
+            continue
+        member = existing.get(row.location)
+        if member is not None and _stored(store, member, raw):
+            # Interrupted earlier run: the member is already safely stored.
+            relocated[row.location] = member
+        else:
+            items.append((row, raw))
+    appended = segments.append_members(store.root, items, codec)
+    for (row, raw), member in zip(items, appended):
+        if _stored(store, member, raw):
+            relocated[row.location] = member
+
+    store.write_index([relocated.get(row.location, row) for row in rows])
+    for row in candidates:
+        if row.location in relocated:
+            try:
+                os.unlink(store.path(row.location))
+            except OSError:
+                pass
+    report["compacted"] = len(relocated)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--root", help="memory store root (default: storage.base_path)")
+    parser.add_argument("--settings", help="memory-rules settings.json to read")
+    parser.add_argument("--dry-run", action="store_true", help="report candidates only")
+    parser.add_argument("--force", action="store_true",
+                        help="ignore compression.enabled and threshold_mb")
+    parser.add_argument("--codec", choices=sorted(segments.CODEC_EXTENSIONS))
+    parser.add_argument("--cold-fraction", type=float, default=DEFAULT_COLD_FRACTION,
+                        help="fraction of retention after which an entry is cold")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    settings = load_settings(args.settings)
+    store = MemoryStore(args.root or settings["storage"]["base_path"], settings)
+    report = compact(store, force=args.force, dry_run=args.dry_run,
+                     codec=args.codec, cold_fraction=args.cold_fraction)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    elif report["skipped"]:
+        print(f"Compaction skipped: {report['skipped']}")
+    else:
+        verb = "would compact" if args.dry_run else "compacted"
+        count = report["candidates"] if args.dry_run else report["compacted"]
+        print(f"{verb} {count} entr{'y' if count == 1 else 'ies'} ({report['codec']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,407 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Near-duplicate detection across scopes, with link or merge proposals.
+
+`technical` and `behavioral` memories are `share_across_projects`, but the
+same fact still gets recorded again under many `projects/<id>/` directories.
+This tool finds those copies without comparing every pair:
+
+1. **Signatures.** Each entry's Understanding and Decision/Action sections
+   are normalized and split into word 3-gram shingles. These are summarized
+   as a 64-slot MinHash signature. The signature uses one-permutation
+   hashing with densification, so each shingle is hashed once rather than
+   64 times. Signatures are cached in `.dedup/signatures.json` and keyed by
+   the entry's location and mtime. Copies often share a template filename,
+   and so an id, so entries are told apart by location throughout.
+2. **Candidates.** Signatures are cut into 16 bands of 4 slots each, and
+   only entries that share a band bucket are compared (LSH). The band layout
+   puts the detection threshold near Jaccard 0.5.
+3. **Proposals.** Pairs at or above `--link-threshold` are grouped into
+   clusters. Each cluster gets a canonical member: the `common/` copy if
+   there is one, otherwise the newest entry. A cluster becomes a *merge*
+   proposal when every member is at least `--merge-threshold` similar to
+   the canonical one and the merge would not hide the fact from a project.
+   That means the canonical member is in `common/`, or all members share
+   one scope. Every other cluster becomes a *link* proposal.
+
+Applying a link proposal adds `[[wiki-links]]` between the canonical entry
+and each member under `## Related Memories`. Applying a merge proposal
+archives the duplicates the same way the retention sweeper does, and notes
+them on the canonical entry. Proposals follow the sweeper's consent rules
+(`cleanup_guidance.require_user_consent`). Categories with
+`encryption_required` and the `private/` scope are never examined.
+
+Usage:
+    python -m agentic_rules.memory.dedup propose --root ~/memory
+    python -m agentic_rules.memory.dedup approve --root ~/memory d-1a2b3c4d5e
+    python -m agentic_rules.memory.dedup apply   --root ~/memory
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+from .._fs import atomic_write
+from . import segments, sweep, wal
+from .store import MemoryStore, format_timestamp, load_settings, parse_entry
+
+STATE_DIR = ".dedup"
+SIGNATURES_FILE = "signatures.json"
+PROPOSALS_FILE = "proposals.json"
+COMPARED_SECTIONS = ("Understanding", "Decision/Action")
+
+NUM_SLOTS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_SLOTS // BANDS
+SHINGLE_WORDS = 3
+MAX_BUCKET = 500  # larger buckets are boilerplate, not duplicates
+
+DEFAULT_LINK_THRESHOLD = 0.5
+DEFAULT_MERGE_THRESHOLD = 0.9
+
+_SLOT_BITS = 6  # log2(NUM_SLOTS)
+_VALUE_BITS = 64 - _SLOT_BITS
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+_WORD = re.compile(r"[a-z0-9]+")
+_PLACEHOLDER = re.compile(r"^\[.*\]$|^none\.?$", re.IGNORECASE)
+
+
+# --- signatures ----------------------------------------------------------------
+
+def comparable_text(text):
+    """The sections two copies of one fact have in common."""
+    sections = parse_entry(text)["sections"]
+    return "\n".join(sections.get(name, "") for name in COMPARED_SECTIONS)
+
+
+def shingles(text):
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def signature(text):
+    """64-slot MinHash signature (one-permutation hashing); None if no words."""
+    slots = [None] * NUM_SLOTS
+    for shingle in shingles(text):
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(),
+                           "little")
+        slot, value = h >> _VALUE_BITS, h & _VALUE_MASK
+        if slots[slot] is None or value < slots[slot]:
+            slots[slot] = value
+    if all(value is None for value in slots):
+        return None
+    # Densify: an empty slot borrows the next filled slot's value, offset by
+    # the distance so borrowed values only match the same borrowing pattern.
+    dense = list(slots)
+    for i in range(NUM_SLOTS):
+        distance = 1
+        while dense[i] is None:
+            source = slots[(i + distance) % NUM_SLOTS]
+            if source is not None:
+                dense[i] = source + distance * (1 << _VALUE_BITS)
+            distance += 1
+    return dense
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_SLOTS
+
+
+def _stamp(store, row):
+    if segments.is_segment_location(row.location):
+        return row.location  # segment members are immutable
+    try:
+        return os.stat(store.path(row.location)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _state_path(store, name):
+    return os.path.join(store.root, STATE_DIR, name)
+
+
+def eligible(store, row):
+    if row.scope == "private":
+        return False
+    return not store.category_policy(row.category).get("encryption_required")
+
+
+def signatures(store, rows):
+    """{location: signature} for `rows`, reading only entries whose cache is stale."""
+    try:
+        with open(_state_path(store, SIGNATURES_FILE), "r", encoding="utf-8") as handle:
+            cache = json.load(handle)
+    except (FileNotFoundError, ValueError):
+        cache = {}
+    fresh, changed = {}, False
+    for row in rows:
+        stamp = _stamp(store, row)
+        cached = cache.get(row.location)
+        if cached and cached.get("stamp") == stamp:
+            fresh[row.location] = cached
+            continue
+        try:
+            sig = signature(comparable_text(store.read(row)))
+        except (OSError, KeyError):
+            continue
+        fresh[row.location] = {"stamp": stamp, "sig": sig}
+        changed = True
+    if changed or len(fresh) != len(cache):
+        atomic_write(_state_path(store, SIGNATURES_FILE), json.dumps(fresh))
+    return {location: data["sig"] for location, data in fresh.items() if data["sig"]}
+
+
+def candidate_pairs(sigs):
+    """Pairs of locations sharing at least one LSH band bucket."""
+    pairs = set()
+    for band in range(BANDS):
+        buckets = collections.defaultdict(list)
+        lo = band * ROWS_PER_BAND
+        for location, sig in sigs.items():
+            buckets[tuple(sig[lo:lo + ROWS_PER_BAND])].append(location)
+        for members in buckets.values():
+            if len(members) < 2 or len(members) > MAX_BUCKET:
+                continue
+            members.sort()
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    pairs.add((a, b))
+    return pairs
+
+
+# --- proposals -----------------------------------------------------------------
+
+def _clusters(pairs):
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        parent[find(a)] = find(b)
+    groups = collections.defaultdict(list)
+    for x in list(parent):
+        groups[find(x)].append(x)
+    return list(groups.values())
+
+
+def _canonical(rows):
+    shared = [row for row in rows if row.scope == "common"]
+    return max(shared or rows, key=lambda row: (row.timestamp, row.location))
+
+
+def find_duplicates(store, link_threshold=DEFAULT_LINK_THRESHOLD,
+                    merge_threshold=DEFAULT_MERGE_THRESHOLD, same_scope=False):
+    """Yield proposal dicts for near-duplicate clusters."""
+    rows = {row.location: row for row in store.rows() if eligible(store, row)}
+    sigs = signatures(store, rows.values())
+    close = [
+        (a, b) for a, b in candidate_pairs(sigs)
+        if (same_scope or rows[a].scope != rows[b].scope)
+        and similarity(sigs[a], sigs[b]) >= link_threshold
+    ]
+    for locations in _clusters(close):
+        members = [rows[location] for location in locations]
+        canonical = _canonical(members)
+        others = sorted((row for row in members if row.location != canonical.location),
+                        key=lambda row: row.location)
+        scores = {row.location: round(similarity(sigs[canonical.location], sigs[row.location]), 3)
+                  for row in others}
+        mergeable = canonical.scope == "common" or len({row.scope for row in members}) == 1
+        action = "merge" if mergeable and min(scores.values()) >= merge_threshold else "link"
+        digest = hashlib.sha1("\n".join(sorted(locations)).encode("utf-8")).hexdigest()
+        yield {
+            "id": "d-" + digest[:10],
+            "action": action,
+            "canonical": {"id": canonical.id, "scope": canonical.scope,
+                          "location": canonical.location},
+            "members": [{"id": row.id, "scope": row.scope, "location": row.location,
+                         "similarity": scores[row.location]} for row in others],
+        }
+
+
+def load_proposals(store):
+    try:
+        with open(_state_path(store, PROPOSALS_FILE), "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return {"proposals": []}
+
+
+def save_proposals(store, state):
+    atomic_write(_state_path(store, PROPOSALS_FILE), json.dumps(state, indent=2) + "\n")
+
+
+def propose(store, now=None, **options):
+    """Replace pending proposals with fresh ones; approved ones are kept."""
+    state = load_proposals(store)
+    kept = [p for p in state["proposals"] if p["status"] == "approved"]
+    claimed = {p["id"] for p in kept}
+    created = format_timestamp(time.time() if now is None else now)
+    fresh = [dict(p, status="pending", created=created)
+             for p in find_duplicates(store, **options) if p["id"] not in claimed]
+    state["proposals"] = kept + sorted(fresh, key=lambda p: p["canonical"]["id"])
+    save_proposals(store, state)
+    return state
+
+
+def approve(store, proposal_ids, now=None):
+    state = load_proposals(store)
+    approved = []
+    for proposal in state["proposals"]:
+        if proposal["id"] in proposal_ids and proposal["status"] == "pending":
+            proposal["status"] = "approved"
+            proposal["approved"] = format_timestamp(time.time() if now is None else now)
+            approved.append(proposal["id"])
+    save_proposals(store, state)
+    return approved
+
+
+# --- applying ------------------------------------------------------------------
+
+def add_related(text, lines):
+    """Append lines to `## Related Memories`, replacing a placeholder body.
+
+    Lines already present are skipped; a missing section is added before
+    `## Tags` (or at the end).
+    """
+    out = text.splitlines()
+    start = next((i for i, line in enumerate(out) if line.strip() == "## Related Memories"), None)
+    if start is None:
+        at = next((i for i, line in enumerate(out) if line.strip() == "## Tags"), len(out))
+        out[at:at] = ["## Related Memories", ""]
+        start = at
+    end = next((i for i in range(start + 1, len(out)) if out[i].startswith("## ")), len(out))
+    body = [line for line in out[start + 1:end] if line.strip()]
+    if len(body) == 1 and _PLACEHOLDER.match(body[0].strip()):
+        body = []
+    body += [line for line in lines if line not in body]
+    out[start + 1:end] = body + [""]
+    return "\n".join(out) + "\n"
+
+
+def _link(row, stems):
+    """A wiki-link to `row`: `[[id]]`, or `[[scope/id]]` when entries share the id."""
+    if stems[row.id] > 1:
+        return f"[[{row.scope or '.'}/{row.id}]]"
+    return f"[[{row.id}]]"
+
+
+def _annotate(store, row, lines):
+    """Add related lines to a loose entry; compacted entries are read-only."""
+    if segments.is_segment_location(row.location):
+        return False
+    path = store.path(row.location)
+    with open(path, "r", encoding="utf-8") as handle:
+        text = handle.read()
+    updated = add_related(text, lines)
+    if updated != text:
+        atomic_write(path, updated)
+    return True
+
+
+def apply(store, proposal_ids=None, now=None):
+    """Apply approved proposals (or, without consent required, named pending
+    ones). Returns {"linked": [...], "archived": [...]}."""
+    state = load_proposals(store)
+    consent = bool(sweep.cleanup_settings(store).get("require_user_consent", True))
+    result = {"linked": [], "archived": []}
+    rows = {row.location: row for row in store.rows()}
+    stems = collections.Counter(row.id for row in rows.values())
+    for proposal in state["proposals"]:
+        if proposal_ids is not None and proposal["id"] not in proposal_ids:
+            continue
+        if not (proposal["status"] == "approved" or (
+                proposal["status"] == "pending" and not consent and proposal_ids is not None)):
+            continue
+        canonical = rows.get(proposal["canonical"].get("location"))
+        members = [rows[m["location"]] for m in proposal["members"]
+                   if m.get("location") in rows]
+        if canonical is None or not members:
+            proposal["status"] = "obsolete"
+            continue
+        if proposal["action"] == "merge":
+            with store.index_lock():
+                wal.fold(store)
+                archived = sweep.archive_entries(store, {row.location for row in members})
+            for row in archived:
+                rows.pop(row.location, None)
+            note = "Merged near-duplicates (archived): " + ", ".join(
+                sorted(row.location for row in archived))
+            _annotate(store, canonical, [note])
+            result["archived"].extend(sorted(row.id for row in archived))
+        else:
+            score = {m["location"]: m["similarity"] for m in proposal["members"]}
+            _annotate(store, canonical, [
+                f"{_link(row, stems)} — near-duplicate in {row.scope} "
+                f"({score[row.location]:.2f})" for row in members
+            ])
+            for row in members:
+                _annotate(store, row, [
+                    f"{_link(canonical, stems)} — near-duplicate in {canonical.scope} "
+                    f"({score[row.location]:.2f})"
+                ])
+            result["linked"].extend(row.id for row in [canonical] + members)
+        proposal["status"] = "applied"
+        proposal["applied"] = format_timestamp(time.time() if now is None else now)
+    save_proposals(store, state)
+    return result
+
+
+# --- CLI -----------------------------------------------------------------------
+
+def _print_proposals(state):
+    if not state["proposals"]:
+        print("No duplicate proposals.")
+    for proposal in state["proposals"]:
+        canonical = proposal["canonical"]
+        print(f"{proposal['id']}  [{proposal['status']}]  {proposal['action']:<5} "
+              f"{canonical.get('location', canonical['id'])}")
+        for member in proposal["members"]:
+            print(f"    {member['similarity']:.2f}  {member.get('location', member['id'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["status", "propose", "approve", "apply"])
+    parser.add_argument("ids", nargs="*", help="proposal ids (approve/apply)")
+    parser.add_argument("--root", help="memory store root (default: storage.base_path)")
+    parser.add_argument("--settings", help="memory-rules settings.json to read")
+    parser.add_argument("--link-threshold", type=float, default=DEFAULT_LINK_THRESHOLD)
+    parser.add_argument("--merge-threshold", type=float, default=DEFAULT_MERGE_THRESHOLD)
+    parser.add_argument("--same-scope", action="store_true",
+                        help="also pair entries within one scope")
+    args = parser.parse_intermixed_args(argv)  # `approve --root R d-... d-...`
+
+    settings = load_settings(args.settings)
+    store = MemoryStore(args.root or settings["storage"]["base_path"], settings)
+    if args.command == "status":
+        _print_proposals(load_proposals(store))
+    elif args.command == "propose":
+        _print_proposals(propose(store, link_threshold=args.link_threshold,
+                                 merge_threshold=args.merge_threshold,
+                                 same_scope=args.same_scope))
+    elif args.command == "approve":
+        approved = approve(store, set(args.ids))
+        print(f"Approved: {', '.join(approved) or 'nothing'}")
+    else:
+        result = apply(store, set(args.ids) if args.ids else None)
+        print(f"Linked {len(result['linked'])} entries, archived {len(result['archived'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,746 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Incremental markdown store -> graph adapter (KG_VISUALIZER_RECIPE.md Phase 1).
+
+`StoreGraph` turns a memory store into the recipe's `graph()` shape:
+
+    Node: {id, title, type, scope, tags, derived: False, meta: {location}}
+    Edge: {source, target, relation, derived: False, origin}
+
+Nodes are entries (loose files and compacted segment members). An entry's
+node id is its filename stem. Stems repeat across scopes, so when several
+entries share one, the first scanned keeps the bare stem and the others are
+named `<scope>/<stem>`. Edges come from `[[wiki-links]]` in the link
+sections (`origin: "link"`, relation `related_to`), where `[[<stem>]]`
+names the bare-stem node and `[[<scope>/<stem>]]` names one entry exactly,
+and from the manifest tables under every `knowledge_graph/`
+directory (`origin: "manifest"`), applied in the recipe's order: base
+Edge Registry, then per branch overlay its Added, Removed, and Modified
+rows. An overlay whose newest file says `Status: STALE` is skipped whole.
+
+The adapter is meant to stay open (a visualizer, an editor plugin, a
+watcher) and is incremental at every step:
+
+1. **Stat, don't read.** `refresh()` walks the tree with `os.scandir` and
+   compares each file's (mtime_ns, size) with the previous refresh.
+   Segment members are immutable, so their location is their stamp, and
+   the `.idx` files are only re-listed when one of them changes.
+2. **Parse only what changed.** Changed files are parsed in a process pool
+   once there are more than `POOL_MIN_FILES` of them, in chunks of
+   `CHUNK_FILES`; smaller batches are parsed inline, where starting
+   workers would cost more than it saves. Parse results are cached in
+   `.graph/parse_cache.json` under the same stamps, so a new process
+   re-reads only files that changed since the last one. Rewriting that
+   file costs more than parsing one entry, so a refresh writes it only
+   after a batch of `CHUNK_FILES` parses or every `SAVE_INTERVAL` seconds;
+   `save()` flushes the rest.
+3. **Re-resolve only affected edges.** Link edges are kept per source, with
+   an index from each link target to the nodes that link to it (found or
+   dangling). A changed file re-resolves its own links; a node that
+   appears or disappears re-resolves only the links pointing at it.
+   Manifest rows are re-parsed only when a manifest file changes, and
+   re-applied (a pass over the rows, no I/O) when a manifest file or the
+   node set changes.
+
+Every refresh returns the change set (nodes added, changed, removed;
+edges added, removed) and bumps `version`, which is what a watcher or a
+live view consumes. `watch()` polls on an interval, inotify-style.
+
+Usage:
+    python -m agentic_rules.memory.graph --root ~/memory
+    python -m agentic_rules.memory.graph --root ~/memory --json
+    python -m agentic_rules.memory.graph --root ~/memory --watch 2
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from .._fs import atomic_write
+from . import segments
+from .store import (ARCHIVE_DIR, INDEX_FILE, SKIP_DIRS, category_of, load_settings,
+                    parse_entry, parse_timestamp, scope_of)
+
+STATE_DIR = ".graph"
+CACHE_FILE = "parse_cache.json"
+CACHE_VERSION = 1
+KG_DIR = "knowledge_graph"
+LINK_RELATION = "related_to"
+
+POOL_MIN_FILES = 256
+CHUNK_FILES = 128
+SAVE_INTERVAL = 60.0  # seconds between parse-cache writes for small edits
+
+# Manifest tables and the columns that name an edge's endpoints.
+EDGE_TABLES = {
+    "Edge Registry": "base",
+    "Added Edges": "added",
+    "Removed Edges": "removed",
+    "Modified Edges": "modified",
+}
+_SOURCE_COLUMNS = ("Source Node", "Source")
+_TARGET_COLUMNS = ("Target Node", "Target")
+_PLACEHOLDER = re.compile(r"^\[.*\]$|^[-—]*$")
+_DIVIDER = re.compile(r"^\|?\s*:?-{3,}")
+_ENTRY_ID = re.compile(r"^\[\[(.+?)(?:[|#].*)?\]\]$|^`(.+)`$")
+
+
+# --- parsing (module level so worker processes can import it) ------------------
+
+def parse_record(relpath, text, fallback=None):
+    """The node fields and link targets of one entry.
+
+    `fallback` is (id, category, scope) for a segment member, whose index
+    line already knows the id and where the entry used to live.
+    """
+    entry = parse_entry(text)
+    if fallback:
+        node_id, category, scope = fallback
+        category = category_of("", entry["metadata"]) if entry["metadata"].get("Category") \
+            else category
+    else:
+        node_id = os.path.splitext(os.path.basename(relpath))[0]
+        category, scope = category_of(relpath, entry["metadata"]), scope_of(relpath)
+    return {
+        "id": node_id,
+        "title": entry["title"] or node_id,
+        "type": category,
+        "scope": scope,
+        "tags": entry["tags"],
+        "links": [link for link in entry["links"] if link != node_id],
+    }
+
+
+def parse_item(root, item):
+    """Parse one (key, fallback) work item; the record is None if unreadable."""
+    key, fallback = item
+    try:
+        if fallback:
+            text = segments.read_member(root, key).decode("utf-8", errors="replace")
+        else:
+            with open(os.path.join(root, key.replace("/", os.sep)), "r",
+                      encoding="utf-8", errors="replace") as handle:
+                text = handle.read()
+    except (OSError, ValueError):
+        return key, None
+    return key, parse_record(key, text, fallback)
+
+
+def parse_chunk(root, items):
+    return [parse_item(root, item) for item in items]
+
+
+def parse_tables(text):
+    """{section heading: [row dicts]} for every markdown table, placeholders dropped."""
+    tables = {}
+    section, header = None, None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            section, header = stripped.lstrip("#").strip(), None
+            continue
+        if not stripped.startswith("|") or section is None:
+            header = None if not stripped else header
+            continue
+        cells = [cell.strip() for cell in stripped.strip("|").split("|")]
+        if header is None:
+            header = cells
+        elif not _DIVIDER.match(stripped):
+            if all(_PLACEHOLDER.match(cell) for cell in cells):
+                continue
+            tables.setdefault(section, []).append(dict(zip(header, cells)))
+    return tables
+
+
+def parse_manifest(text):
+    """Metadata and edge-table rows of one knowledge_graph/ file."""
+    entry = parse_entry(text)
+    rows = []
+    for section, table in parse_tables(text).items():
+        kind = EDGE_TABLES.get(section)
+        if kind is None:
+            continue
+        for row in table:
+            source = _entry_id(_first(row, _SOURCE_COLUMNS))
+            target = _entry_id(_first(row, _TARGET_COLUMNS))
+            relation = _entry_id(row.get("Type", "")) or LINK_RELATION
+            if source and target:
+                detail = row.get("Change") or row.get("Reason") or row.get("Confidence") or ""
+                rows.append((kind, source, target, relation, detail))
+    return {"metadata": entry["metadata"], "rows": rows}
+
+
+def _first(row, columns):
+    for column in columns:
+        if row.get(column):
+            return row[column]
+    return ""
+
+
+def _entry_id(cell):
+    cell = cell.strip()
+    match = _ENTRY_ID.match(cell)
+    if match:
+        cell = (match.group(1) or match.group(2)).strip()
+    if cell.endswith(".md"):
+        cell = os.path.splitext(os.path.basename(cell))[0]
+    return "" if _PLACEHOLDER.match(cell) else cell
+
+
+def _edge_key(edge):
+    return edge["source"], edge["target"], edge["relation"]
+
+
+# --- the adapter ---------------------------------------------------------------
+
+class StoreGraph:
+    """Nodes and edges of one memory store, kept current by `refresh()`."""
+
+    kind = "markdown"
+
+    def __init__(self, root, workers=None, persist=True):
+        self.root = os.path.abspath(os.path.expanduser(root))
+        self.id = "markdown-" + (os.path.basename(self.root) or "root")
+        self.workers = workers
+        self.persist = persist
+        self.version = 0
+        self.nodes = {}
+        self.last_refresh = {}
+        self._stamps = {}  # key -> stamp of the parsed file (relpath or segment location)
+        self._records = {}  # key -> parse_record()
+        self._claims = collections.defaultdict(list)  # id -> sorted keys claiming it
+        self._groups = {}  # id -> ({node id: key}, {scope/id: node id}) of its claimants
+        self._node_keys = {}  # node id -> key
+        self._aliases = {}  # scope/id -> node id
+        self._links = {}  # source node id -> link targets of its record
+        self._incoming = collections.defaultdict(set)  # link target -> sources linking to it
+        self._link_edges = {}  # edge key -> edge
+        self._link_out = collections.defaultdict(set)  # source id -> its edge keys
+        self._manifests = {}  # relpath -> (stamp, parse_manifest())
+        self._manifest_edges = {}
+        self._manifest_warnings = []
+        self._refs = collections.Counter()  # edge key -> origins holding it
+        self._members = ({}, None)  # segment members, and the .idx stamps they came from
+        self._cache = self._load_cache() if persist else {}
+        self._unsaved, self._saved_at = 0, time.monotonic()
+        self._lock = threading.Lock()
+
+    # -- Source interface -----------------------------------------------------
+
+    def capabilities(self):
+        return {"editable": False, "temporal": False, "reports_stages": False}
+
+    def graph(self, options=None):
+        """{nodes, edges}, sorted so that two calls return identical data."""
+        edges = dict(self._manifest_edges)
+        edges.update(self._link_edges)
+        return {
+            "nodes": [self.nodes[node_id] for node_id in sorted(self.nodes)],
+            "edges": [edges[key] for key in sorted(edges)],
+        }
+
+    def node(self, node_id):
+        """One node with its metadata and full markdown (None if unknown)."""
+        node = self.nodes.get(node_id)
+        if node is None:
+            return None
+        key = self._node_keys[node_id]
+        try:
+            if segments.is_segment_location(key):
+                text = segments.read_member(self.root, key).decode("utf-8", errors="replace")
+            else:
+                with open(os.path.join(self.root, key.replace("/", os.sep)), "r",
+                          encoding="utf-8", errors="replace") as handle:
+                    text = handle.read()
+        except (OSError, ValueError):
+            return None
+        detail = dict(node)
+        entry = parse_entry(text)
+        detail.update(content=text, metadata=entry["metadata"], links=entry["links"])
+        return detail
+
+    def query(self, text, options=None):
+        """Substring match over titles, ids, and tags; no retrieval stages."""
+        needle = text.strip().lower()
+        matches = []
+        for node_id in sorted(self.nodes):
+            node = self.nodes[node_id]
+            haystack = " ".join([node_id, node["title"]] + node["tags"]).lower()
+            if needle and needle in haystack:
+                matches.append({"id": node_id, "score": 1.0})
+        return {"matches": matches, "stages": []}
+
+    def warnings(self):
+        """Id collisions, dangling links, and manifest problems, as of the last refresh."""
+        found = []
+        for node_id in sorted(self._claims):
+            keys = self._claims[node_id]
+            if len(keys) > 1:
+                found.append(f"id collision: {node_id} in {', '.join(keys)}; using {keys[0]}, "
+                             "the others by scope")
+        for target in sorted(self._incoming):
+            if target not in self.nodes and target not in self._aliases:
+                for source in sorted(self._incoming[target]):
+                    found.append(f"dangling link: {source} -> [[{target}]]")
+        return found + self._manifest_warnings
+
+    # -- refresh --------------------------------------------------------------
+
+    def refresh(self):
+        """Catch up with the tree; returns the change set (see `empty()`)."""
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self):
+        started = time.perf_counter()
+        entries, manifests = self._walk()
+        entries.update(self._segment_members())
+
+        changed = [key for key, (stamp, _) in entries.items() if self._stamps.get(key) != stamp]
+        removed = [key for key in self._stamps if key not in entries]
+        parsed, work = self._parse([(key, entries[key][1]) for key in changed], entries)
+
+        touched = set()
+        for key in removed:
+            del self._stamps[key]
+            touched.add(self._unclaim(key))
+        for key, record in parsed:
+            if key in self._records:
+                touched.add(self._unclaim(key))
+            if record is None:  # unreadable right now: try again next refresh
+                continue
+            self._stamps[key] = entries[key][0]
+            self._records[key] = record
+            keys = self._claims[record["id"]]
+            keys.append(key)
+            keys.sort()
+            touched.add(record["id"])
+
+        changes = {"nodes": {"added": [], "changed": [], "removed": []},
+                   "edges": {"added": [], "removed": []}}
+        sources, appeared = self._update_nodes(touched, changes["nodes"])
+
+        # Links from changed nodes, plus links into nodes that came or went.
+        for node_id in appeared:
+            sources.update(self._incoming.get(node_id, ()))
+        for source in sources:
+            self._relink(source, changes["edges"])
+
+        manifests_changed = self._reload_manifests(manifests)
+        if manifests_changed or appeared:
+            self._apply_manifests(changes["edges"])
+
+        for group in (changes["nodes"], changes["edges"]):
+            for name, items in group.items():
+                items.sort(key=lambda item: item if isinstance(item, str) else
+                           item.get("id") or _edge_key(item))
+        if not empty(changes):
+            self.version += 1
+        changes["version"] = self.version
+        self._unsaved += work + len(removed)
+        if self._unsaved >= CHUNK_FILES or \
+                (self._unsaved and time.monotonic() - self._saved_at >= SAVE_INTERVAL):
+            self.save()
+        self.last_refresh = {
+            "files": len(entries), "parsed": work, "cached": len(parsed) - work,
+            "removed": len(removed),
+            "manifests": len(manifests), "ms": round((time.perf_counter() - started) * 1000, 1)}
+        return changes
+
+    def watch(self, interval=2.0, callback=None, stop=None):
+        """Poll every `interval` seconds and pass non-empty change sets to `callback`.
+
+        Runs until `stop` (a threading.Event) is set.
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            changes = self.refresh()
+            if callback is not None and not empty(changes):
+                callback(changes)
+            stop.wait(interval)
+
+    # -- scanning -------------------------------------------------------------
+
+    def _walk(self):
+        """({relpath: (stamp, None)} for entries, {relpath: stamp} for manifests)."""
+        entries, manifests = {}, {}
+        pending = [("", False)]
+        while pending:
+            relative, in_kg = pending.pop()
+            try:
+                iterator = os.scandir(os.path.join(self.root, relative) if relative else self.root)
+            except OSError:
+                continue
+            with iterator:
+                for item in iterator:
+                    name = item.name
+                    if name.startswith("."):
+                        continue
+                    relpath = f"{relative}/{name}" if relative else name
+                    try:
+                        if item.is_dir(follow_symlinks=False):
+                            if name == KG_DIR or in_kg:
+                                pending.append((relpath, True))
+                            elif name not in SKIP_DIRS:
+                                pending.append((relpath, False))
+                            continue
+                        if not name.endswith(".md") or (not relative and name == INDEX_FILE):
+                            continue
+                        stat = item.stat()
+                    except OSError:
+                        continue
+                    stamp = [stat.st_mtime_ns, stat.st_size]
+                    if in_kg:
+                        manifests[relpath] = stamp
+                    else:
+                        entries[relpath] = (stamp, None)
+        return entries, manifests
+
+    def _segment_members(self):
+        """{location: (location, (id, category, scope))} for live compacted entries.
+
+        Members are immutable, so the `.idx` files are only read again when
+        one of them (or the archive's) changes. A member archived by the
+        sweeper is hidden by its location, as in `MemoryStore.scan`.
+        """
+        stamps = []
+        for directory in (segments.SEGMENT_DIR, ARCHIVE_DIR):
+            try:
+                with os.scandir(os.path.join(self.root, directory)) as iterator:
+                    for item in iterator:
+                        if item.name.endswith(".idx"):
+                            stat = item.stat()
+                            stamps.append((directory, item.name, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                continue
+        stamps.sort()
+        members, previous = self._members
+        if stamps != previous:
+            archived = set(segments.member_origins(self.root, ARCHIVE_DIR).values())
+            members = {}
+            for row in segments.iter_segment_rows(self.root):
+                if row.location not in archived:
+                    members[row.location] = (row.location, (row.id, row.category, row.scope))
+            self._members = (members, stamps)
+        return members
+
+    def _parse(self, items, entries):
+        """([(key, record)] for `items`, how many were actually read).
+
+        Records come from the persisted cache when the stamp still matches,
+        else they are parsed inline or in a process pool.
+        """
+        results, work = [], []
+        for key, fallback in items:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == entries[key][0]:
+                results.append((key, cached[1]))
+            else:
+                work.append((key, fallback))
+        if len(work) < POOL_MIN_FILES or self.workers == 1:
+            results.extend(parse_chunk(self.root, work))
+            return results, len(work)
+        chunks = [work[start:start + CHUNK_FILES] for start in range(0, len(work), CHUNK_FILES)]
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as pool:
+                for batch in pool.map(parse_chunk, [self.root] * len(chunks), chunks):
+                    results.extend(batch)
+        except (OSError, RuntimeError):  # includes BrokenProcessPool
+            # No process support here (sandbox, frozen app): parse inline instead.
+            done = {key for key, _ in results}
+            results.extend(parse_chunk(self.root, [item for item in work if item[0] not in done]))
+        return results, len(work)
+
+    # -- nodes and link edges -------------------------------------------------
+
+    def _unclaim(self, key):
+        record = self._records.pop(key)
+        keys = self._claims[record["id"]]
+        keys.remove(key)
+        if not keys:
+            del self._claims[record["id"]]
+        return record["id"]
+
+    def _update_nodes(self, touched, changes):
+        """Recompute the nodes of `touched` ids.
+
+        Returns (node ids to relink, link targets that appeared, vanished, or
+        now name another node).
+        """
+        sources, appeared = set(), set()
+        for entry_id in touched:
+            old_nodes, old_aliases = self._groups.pop(entry_id, ({}, {}))
+            nodes, aliases = {}, {}
+            for key in self._claims.get(entry_id, ()):
+                alias = f"{self._records[key]['scope'] or '.'}/{entry_id}"
+                if alias in aliases:
+                    continue  # one stem twice in one scope: first scanned wins
+                node_id = alias if nodes else entry_id
+                nodes[node_id] = key
+                aliases[alias] = node_id
+            for node_id in set(old_nodes) - set(nodes):
+                del self.nodes[node_id]
+                del self._node_keys[node_id]
+                changes["removed"].append(node_id)
+                appeared.add(node_id)
+                self._set_links(node_id, ())
+            for node_id, key in nodes.items():
+                record = self._records[key]
+                old = self.nodes.get(node_id)
+                node = {"id": node_id, "title": record["title"], "type": record["type"],
+                        "scope": record["scope"], "tags": list(record["tags"]),
+                        "derived": False, "meta": {"location": key}}
+                if node != old:
+                    self.nodes[node_id] = node
+                    changes["changed" if old is not None else "added"].append(node)
+                    if old is None:
+                        appeared.add(node_id)
+                self._node_keys[node_id] = key
+                self._set_links(node_id, record["links"])
+            for alias in set(old_aliases) | set(aliases):
+                if old_aliases.get(alias) != aliases.get(alias):
+                    appeared.add(alias)
+                if alias in aliases:
+                    self._aliases[alias] = aliases[alias]
+                else:
+                    del self._aliases[alias]
+            if nodes:
+                self._groups[entry_id] = (nodes, aliases)
+            sources.update(old_nodes)
+            sources.update(nodes)
+        return sources, appeared
+
+    def _set_links(self, source, targets):
+        for target in self._links.get(source, ()):
+            sources = self._incoming.get(target)
+            if sources is not None:
+                sources.discard(source)
+                if not sources:
+                    del self._incoming[target]
+        if targets:
+            self._links[source] = tuple(targets)
+            for target in targets:
+                self._incoming[target].add(source)
+        else:
+            self._links.pop(source, None)
+
+    def _relink(self, source, changes):
+        """Make the link edges out of `source` match its links and the node set."""
+        wanted = {}
+        if source in self.nodes:
+            for target in self._links.get(source, ()):
+                target = target if target in self.nodes else self._aliases.get(target)
+                if target is not None and target != source:
+                    edge = {"source": source, "target": target, "relation": LINK_RELATION,
+                            "derived": False, "origin": "link"}
+                    wanted[_edge_key(edge)] = edge
+        current = self._link_out.get(source, set())
+        for key in current - set(wanted):
+            self._drop(self._link_edges, key, changes)
+        for key, edge in wanted.items():
+            if key not in current:
+                self._hold(self._link_edges, key, edge, changes)
+        if wanted:
+            self._link_out[source] = set(wanted)
+        else:
+            self._link_out.pop(source, None)
+
+    def _hold(self, edges, key, edge, changes):
+        edges[key] = edge
+        self._refs[key] += 1
+        if self._refs[key] == 1:
+            changes["added"].append(edge)
+
+    def _drop(self, edges, key, changes):
+        edge = edges.pop(key)
+        self._refs[key] -= 1
+        if not self._refs[key]:
+            del self._refs[key]
+            changes["removed"].append(edge)
+
+    # -- manifest edges -------------------------------------------------------
+
+    def _reload_manifests(self, manifests):
+        changed = False
+        for relpath in list(self._manifests):
+            if relpath not in manifests:
+                del self._manifests[relpath]
+                changed = True
+        for relpath, stamp in manifests.items():
+            known = self._manifests.get(relpath)
+            if known is not None and known[0] == stamp:
+                continue
+            try:
+                with open(os.path.join(self.root, relpath), "r", encoding="utf-8",
+                          errors="replace") as handle:
+                    parsed = parse_manifest(handle.read())
+            except OSError:
+                continue
+            self._manifests[relpath] = (stamp, parsed)
+            changed = True
+        return changed
+
+    def _manifest_groups(self):
+        """[(label, [(relpath, parsed)])]: every base, then every overlay branch.
+
+        Files within a group are ordered oldest first, by Generated metadata,
+        then the timestamped filename, then mtime.
+        """
+        groups = collections.defaultdict(list)
+        for relpath, (stamp, parsed) in self._manifests.items():
+            parts = relpath.split("/")
+            at = parts.index(KG_DIR)
+            kg_root, rest = "/".join(parts[:at + 1]), parts[at + 1:]
+            if rest[0] == "base":
+                label = (kg_root, 0, "base")
+            elif rest[0] == "overlays" and len(rest) > 2:
+                label = (kg_root, 1, rest[1])
+            else:
+                continue  # cross_branch/ and loose notes hold no edge registry
+            when = (parse_timestamp(parsed["metadata"].get("Generated"))
+                    or parse_timestamp(parts[-1]) or stamp[0] / 1e9)
+            groups[label].append((when, relpath, parsed))
+        return [(label, [(relpath, parsed) for _, relpath, parsed in sorted(groups[label])])
+                for label in sorted(groups)]
+
+    def _apply_manifests(self, changes):
+        """Re-apply every manifest row in recipe order and diff against the last pass."""
+        warnings = []
+        edges = {}
+        for (kg_root, _, branch), files in self._manifest_groups():
+            name = f"{kg_root}/{'base' if branch == 'base' else 'overlays/' + branch}"
+            statuses = [parsed["metadata"].get("Status", "") for _, parsed in files]
+            statuses = [status for status in statuses if status and not _PLACEHOLDER.match(status)]
+            if statuses and statuses[-1].strip().upper().startswith("STALE"):
+                warnings.append(f"stale overlay skipped: {name}")
+                continue
+            seen = set()
+            for _, parsed in files:
+                for row in parsed["rows"]:
+                    if row in seen:  # a manifest and its timestamped companion
+                        continue
+                    seen.add(row)
+                    problem = _apply_row(edges, row, self.nodes)
+                    if problem:
+                        warnings.append(f"{name}: {problem}")
+        self._manifest_warnings = warnings
+        old = self._manifest_edges
+        for key in [key for key in old if key not in edges or edges[key] != old[key]]:
+            self._drop(old, key, changes)
+        for key, edge in edges.items():
+            if key not in old:
+                self._hold(old, key, edge, changes)
+
+    # -- persisted parse cache ------------------------------------------------
+
+    def _cache_path(self):
+        return os.path.join(self.root, STATE_DIR, CACHE_FILE)
+
+    def _load_cache(self):
+        try:
+            with open(self._cache_path(), "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != CACHE_VERSION:
+            return {}
+        return {key: (stamp, record) for key, (stamp, record) in data.get("files", {}).items()}
+
+    def save(self):
+        """Write the parse cache now (no-op with `persist=False` or nothing new)."""
+        if not self.persist or not self._unsaved:
+            return
+        self._unsaved, self._saved_at = 0, time.monotonic()
+        files = {key: [self._stamps[key], self._records[key]] for key in sorted(self._records)}
+        self._cache = {key: tuple(value) for key, value in files.items()}
+        try:
+            os.makedirs(os.path.dirname(self._cache_path()), exist_ok=True)
+            atomic_write(self._cache_path(),
+                         json.dumps({"version": CACHE_VERSION, "files": files}, sort_keys=True))
+        except OSError:
+            pass  # a read-only store still works, it just starts cold next time
+
+
+def _apply_row(edges, row, nodes):
+    """Apply one manifest row to `edges`; returns a warning, or None."""
+    kind, source, target, relation, detail = row
+    missing = [node for node in (source, target) if node not in nodes]
+    if missing:
+        return f"{kind} edge {source} -> {target} names missing node {', '.join(missing)}"
+    if kind in ("base", "added"):
+        edge = {"source": source, "target": target, "relation": relation,
+                "derived": False, "origin": "manifest"}
+        edges[_edge_key(edge)] = edge
+        return None
+    matching = [key for key in edges if key[0] == source and key[1] == target]
+    exact = [key for key in matching if key[2] == relation]
+    matching = exact or matching
+    if not matching:
+        return f"{kind} edge {source} -> {target} matches no earlier edge"
+    for key in matching:
+        edge = edges.pop(key)
+        if kind == "modified":
+            edge = dict(edge, relation=relation)
+            if detail:
+                edge["change"] = detail
+            edges[_edge_key(edge)] = edge
+    return None
+
+
+def empty(changes):
+    """True when a change set from `refresh()` changed nothing."""
+    return not any(items for group in (changes["nodes"], changes["edges"])
+                   for items in group.values())
+
+
+def summarize(changes):
+    nodes, edges = changes["nodes"], changes["edges"]
+    return (f"v{changes['version']}: nodes +{len(nodes['added'])} ~{len(nodes['changed'])} "
+            f"-{len(nodes['removed'])}, edges +{len(edges['added'])} -{len(edges['removed'])}")
+
+
+# --- CLI -------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m agentic_rules.memory.graph",
+        description="Build the node/edge graph of a memory store, optionally watching it.")
+    parser.add_argument("--root", help="memory store root (default: storage.base_path)")
+    parser.add_argument("--settings", help="memory-rules settings.json to read")
+    parser.add_argument("--workers", type=int, help="parser processes (default: CPU count)")
+    parser.add_argument("--json", action="store_true", help="print the graph as JSON")
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="keep polling and print each change set")
+    args = parser.parse_args(argv)
+
+    settings = load_settings(args.settings)
+    root = args.root or settings["storage"]["base_path"]
+    source = StoreGraph(root, workers=args.workers)
+    source.refresh()
+    if args.json:
+        json.dump(source.graph(), sys.stdout, indent=2)
+        print()
+    else:
+        graph, stats = source.graph(), source.last_refresh
+        print(f"{len(graph['nodes'])} nodes, {len(graph['edges'])} edges "
+              f"(parsed {stats['parsed']} of {stats['files']} files in {stats['ms']} ms)")
+    for warning in source.warnings():
+        print(f"warning: {warning}", file=sys.stderr)
+    if args.watch:
+        try:
+            source.watch(args.watch, lambda changes: print(summarize(changes), flush=True))
+        except KeyboardInterrupt:
+            pass
+    source.save()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,415 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Git History Analysis (MEMORY-RULES.md) from one streamed `git log`.
+
+The algorithm has an agent read commit logs ad hoc, and
+`project_support.git_history_analysis` caps it at `max_commits_to_analyze`
+(100) to stay inside `analysis_timeout_seconds`. This tool reads the whole
+history through a single `git log --numstat -z` pipe and parses it as it
+streams, so memory stays flat and the time limit is checked per commit:
+
+- **File churn.** Per path: commits, lines added and deleted, last change.
+  A rename counts as an edit of the new path, not as every line deleted
+  and added again, unless `performance_mode` is "fast", which skips git's
+  rename detection.
+- **Commit types.** Conventional-commit prefixes (`feat:`, `fix(api):`),
+  else keywords in the subject; merges by parent count.
+- **Milestones.** Every tag on the analyzed history (one
+  `git for-each-ref`), with the commits since the previous one.
+- Velocity per month, the largest commits, and the file types touched.
+
+Results are cached in `<root>/.git_history/<repo>.json`, keyed by the HEAD
+they were computed at. When HEAD has moved forward, only `cached..HEAD` is
+read and added to the totals, so a rerun costs the new commits. A rewritten
+history (the cached HEAD is no longer an ancestor) is read again in full.
+
+Usage:
+    python -m agentic_rules.memory.history --repo .
+    python -m agentic_rules.memory.history --repo . --json
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from .._fs import atomic_write
+from ..gitkg import git
+from .store import format_timestamp, load_settings
+
+STATE_DIR = ".git_history"
+CACHE_VERSION = 1
+MAJOR_COMMITS = 50
+READ_SIZE = 1 << 16
+DAY = 86400
+
+RECORD, FIELD = "\x1e", "\x1f"
+LOG_FORMAT = "%x1e%H%x1f%P%x1f%at%x1f%an%x1f%s"
+
+_CONVENTIONAL = re.compile(r"^\s*([A-Za-z]+)(?:\([^)]*\))?!?:")
+CONVENTIONAL_TYPES = {
+    "feat": "feature", "feature": "feature", "fix": "fix", "bugfix": "fix", "hotfix": "fix",
+    "refactor": "refactor", "perf": "performance", "docs": "docs", "doc": "docs",
+    "test": "test", "tests": "test", "build": "build", "ci": "build", "chore": "chore",
+    "style": "style", "revert": "revert", "release": "release",
+}
+# Checked in order against the lowercased subject when there is no prefix.
+KEYWORD_TYPES = (
+    ("revert", re.compile(r"^revert\b")),
+    ("release", re.compile(r"\brelease\b|\bbump(ed)? (the )?version\b|^v?\d+\.\d+(\.\d+)?\b")),
+    ("fix", re.compile(r"\b(fix(es|ed)?|bug|crash|regression|hotfix|patch)\b")),
+    ("performance", re.compile(r"\b(perf|optimi[sz]e[sd]?|speed ?up|faster)\b")),
+    ("refactor", re.compile(r"\b(refactor\w*|clean ?up|rename[sd]?|restructure\w*|simplif\w*|"
+                            r"move[sd]?)\b")),
+    ("docs", re.compile(r"\b(docs?|documentation|readme|changelog)\b")),
+    ("test", re.compile(r"\btests?\b")),
+    ("feature", re.compile(r"\b(add(s|ed)?|implement\w*|introduce\w*|support\w*|new|"
+                           r"create[sd]?)\b")),
+)
+
+
+def history_settings(settings=None):
+    """memory_rules.project_support.git_history_analysis, or {}."""
+    settings = settings or load_settings()
+    return settings.get("memory_rules", {}).get("project_support", {}).get(
+        "git_history_analysis", {})
+
+
+def classify(subject, parents=1):
+    """The commit type of a subject line: feature, fix, refactor, ... or other."""
+    if parents > 1:
+        return "merge"
+    match = _CONVENTIONAL.match(subject)
+    if match and match.group(1).lower() in CONVENTIONAL_TYPES:
+        return CONVENTIONAL_TYPES[match.group(1).lower()]
+    lowered = subject.lower()
+    if lowered.startswith("merge "):
+        return "merge"
+    for kind, pattern in KEYWORD_TYPES:
+        if pattern.search(lowered):
+            return kind
+    return "other"
+
+
+def _tokens(stream):
+    """NUL-separated tokens of a binary stream, decoded, as they arrive."""
+    pending = b""
+    while True:
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            break
+        parts = (pending + chunk).split(b"\0")
+        pending = parts.pop()
+        for part in parts:
+            yield part.decode("utf-8", errors="replace")
+    if pending:
+        yield pending.decode("utf-8", errors="replace")
+
+
+def parse_log(stream):
+    """Yield (sha, parents, epoch, author, subject, [(path, added, deleted)]) per commit.
+
+    `stream` is the stdout of `git log -z --numstat --format=LOG_FORMAT`.
+    Binary files count 0 lines. A rename's churn goes to its new path.
+    """
+    commit, files, rename = None, [], None
+    for token in _tokens(stream):
+        token = token.lstrip("\n")
+        if rename is not None:
+            rename.append(token)
+            if len(rename) == 4:  # added, deleted, old path, new path
+                files.append((rename[3], rename[0], rename[1]))
+                rename = None
+            continue
+        if token.startswith(RECORD):
+            if commit is not None:
+                yield commit + (files,)
+            sha, parents, epoch, author, subject = (token[1:].split(FIELD, 4) + [""] * 5)[:5]
+            commit, files = (sha, parents.split(), int(epoch or 0), author, subject), []
+            continue
+        if not token:
+            continue
+        added, deleted, path = (token.split("\t", 2) + ["", ""])[:3]
+        added = int(added) if added.isdigit() else 0
+        deleted = int(deleted) if deleted.isdigit() else 0
+        if path:
+            files.append((path, added, deleted))
+        else:
+            rename = [added, deleted]
+    if commit is not None:
+        yield commit + (files,)
+
+
+class History:
+    """Running totals over a set of commits; what the cache stores.
+
+    `commits` is [sha, epoch, type, lines changed] per commit, newest first,
+    so milestones and windows can be counted without re-reading git.
+    """
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.commits = data.get("commits", [])
+        self.files = data.get("files", {})
+        self.authors = collections.Counter(data.get("authors", {}))
+        self.major = data.get("major", [])
+
+    def to_dict(self):
+        return {"commits": self.commits, "files": self.files, "authors": dict(self.authors),
+                "major": self.major}
+
+    def add(self, commits, authors=False):
+        """Fold newer commits (newest first) in front of the existing ones."""
+        newer = []
+        for sha, parents, epoch, author, subject, files in commits:
+            kind = classify(subject, len(parents))
+            lines = 0
+            for path, added, deleted in files:
+                row = self.files.get(path)
+                if row is None:
+                    row = self.files[path] = [0, 0, 0, epoch]
+                row[0] += 1
+                row[1] += added
+                row[2] += deleted
+                row[3] = max(row[3], epoch)
+                lines += added + deleted
+            if authors:
+                self.authors[author] += 1
+            newer.append([sha, epoch, kind, lines])
+            if kind != "merge" and lines:
+                self.major.append([sha, epoch, lines, len(files), subject])
+        self.commits[:0] = newer
+        self.major.sort(key=lambda row: (-row[2], -row[1], row[0]))
+        del self.major[MAJOR_COMMITS:]
+        return len(newer)
+
+
+def _cache_path(root, repo_root):
+    key = hashlib.sha1(os.path.abspath(repo_root).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(root, STATE_DIR, f"{os.path.basename(repo_root) or 'repo'}-{key}.json")
+
+
+def _load_cache(path, options):
+    try:
+        with open(path, encoding="utf-8") as handle:
+            data = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != CACHE_VERSION or data.get("options") != options:
+        return None
+    return data
+
+
+def _is_ancestor(repo, older, newer):
+    try:
+        git.run(repo, "merge-base", "--is-ancestor", older, newer)
+        return True
+    except git.GitError:
+        return False
+
+
+def stream_log(repo, revisions, renames=True, numstat=True, max_commits=None, deadline=None,
+               stats=None):
+    """Yield parsed commits of `git log <revisions>` from one pipe.
+
+    Stops early, killing git, when `deadline` (a perf_counter value)
+    passes, and sets `stats["stopped"]`.
+    """
+    args = ["git", "-C", repo, "log", "-z", f"--format={LOG_FORMAT}",
+            "--numstat" if numstat else "--no-patch", "-M" if renames else "--no-renames"]
+    if max_commits:
+        args.append(f"--max-count={max_commits}")
+    try:
+        proc = subprocess.Popen(args + list(revisions) + ["--"], stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE)
+    except OSError as exc:
+        raise git.GitError(f"cannot run git: {exc}") from exc
+    stopped = False
+    try:
+        for commit in parse_log(proc.stdout):
+            yield commit
+            if deadline is not None and time.perf_counter() > deadline:
+                stopped = True
+                if stats is not None:
+                    stats["stopped"] = True
+                break
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        errors = proc.stderr.read().decode("utf-8", errors="replace").strip()
+        proc.stderr.close()
+        if proc.wait() not in (0, -9) and not stopped and errors:
+            raise git.GitError(f"git log: {errors.splitlines()[-1]}")
+
+
+def tags(repo):
+    """[(tag, commit sha)] for every tag, peeled to its commit; one git process."""
+    out = git.run(repo, "for-each-ref", "--format=%(refname:short)%00%(objectname)%00"
+                  "%(*objectname)", "refs/tags")
+    found = []
+    for line in out.splitlines():
+        name, target, peeled = (line.split("\0") + ["", ""])[:3]
+        found.append((name, peeled or target))
+    return found
+
+
+def analyze(repo, root=None, settings=None, max_commits=None, timeout=None, use_cache=None,
+            top=20):
+    """The history report as a dict; see `render`.
+
+    `max_commits` None reads the full history. `timeout` and `use_cache`
+    default to `analysis_timeout_seconds` and `cache_analysis_results`. A
+    limited or timed-out run is not cached.
+    """
+    started = time.perf_counter()
+    settings = settings or load_settings()
+    config = history_settings(settings)
+    timeout = config.get("analysis_timeout_seconds", 30) if timeout is None else timeout
+    use_cache = config.get("cache_analysis_results", True) if use_cache is None else use_cache
+    if not git.is_repository(repo):
+        raise git.GitError(f"{repo} is not a git work tree")
+    repo_root = git.run(repo, "rev-parse", "--show-toplevel").strip()
+    try:
+        head = git.rev_parse(repo, "HEAD")
+    except git.GitError:
+        head = ""  # no commits yet
+    options = {"renames": config.get("performance_mode", "fast") != "fast",
+               "numstat": config.get("analyze_file_changes", True),
+               "authors": bool(config.get("include_author_info", False))}
+    root = os.path.expanduser(root or settings["storage"]["base_path"])
+    path = _cache_path(root, repo_root)
+    cache = _load_cache(path, options) if use_cache and not max_commits else None
+
+    history, revisions = History(), [head]
+    if cache is not None and cache.get("head") == head:
+        history, revisions = History(cache["history"]), None
+    elif cache is not None and cache.get("head") and _is_ancestor(repo, cache["head"], head):
+        history, revisions = History(cache["history"]), [f"{cache['head']}..{head}"]
+    reused = len(history.commits)
+    processed, truncated = 0, False
+    if revisions and head:
+        deadline = started + timeout if timeout else None
+        stats = {}
+        commits = list(stream_log(repo_root, revisions, options["renames"], options["numstat"],
+                                  max_commits, deadline, stats))
+        truncated = stats.get("stopped", False)
+        processed = history.add(commits, options["authors"])
+    if use_cache and not max_commits and not truncated and processed and head:
+        atomic_write(path, json.dumps({"version": CACHE_VERSION, "head": head, "options": options,
+                                       "history": history.to_dict()}, separators=(",", ":")))
+    report = summarize(history, tags(repo) if config.get("extract_project_milestones", True)
+                       else [], config.get("max_commit_history_days", 90), top)
+    report.update({"repo": repo_root, "head": head, "processed": processed, "cached": reused,
+                   "truncated": truncated,
+                   "ms": round((time.perf_counter() - started) * 1000, 1)})
+    return report
+
+
+def summarize(history, tag_list=(), days=90, top=20, now=None):
+    """Churn, types, milestones, velocity and major commits from a History."""
+    commits = history.commits
+    epochs = sorted(epoch for _, epoch, _, _ in commits)
+    now = time.time() if now is None else now
+    cutoff = now - days * DAY
+    recent = [row for row in commits if row[1] >= cutoff]
+    months = collections.Counter(time.strftime("%Y-%m", time.gmtime(epoch)) for epoch in epochs)
+
+    # Positions in the newest-first list, not dates: commits can share a second.
+    position = {row[0]: index for index, row in enumerate(commits)}
+    milestones, previous = [], len(commits)
+    for name, sha in sorted(((name, sha) for name, sha in tag_list if sha in position),
+                            key=lambda tag: (-position[tag[1]], tag[0])):
+        index = position[sha]
+        milestones.append({"tag": name, "commit": sha,
+                           "date": format_timestamp(commits[index][1]),
+                           "commits_since_previous": previous - index})
+        previous = index
+
+    files = sorted(history.files.items(), key=lambda item: (-item[1][0], item[0]))
+    extensions = collections.Counter(
+        os.path.splitext(path)[1].lower() or os.path.basename(path) for path in history.files)
+    report = {
+        "commits": len(commits),
+        "first": format_timestamp(epochs[0]) if epochs else None,
+        "last": format_timestamp(epochs[-1]) if epochs else None,
+        "types": dict(collections.Counter(row[2] for row in commits).most_common()),
+        "recent": {"days": days, "commits": len(recent),
+                   "types": dict(collections.Counter(row[2] for row in recent).most_common())},
+        "velocity": dict(sorted(months.items())[-12:]),
+        "files": [{"path": path, "commits": row[0], "added": row[1], "deleted": row[2],
+                   "last": format_timestamp(row[3])} for path, row in files[:top]],
+        "file_count": len(history.files),
+        "stack": dict(extensions.most_common(10)),
+        "milestones": milestones,
+        "major": [{"commit": sha, "date": format_timestamp(epoch), "lines": lines,
+                   "files": count, "subject": subject}
+                  for sha, epoch, lines, count, subject in history.major[:top]],
+    }
+    if history.authors:
+        report["authors"] = dict(history.authors.most_common(top))
+    return report
+
+
+def render(report):
+    """A plain-text summary of an `analyze` report."""
+    lines = [f"{report['repo']} @ {report['head'][:12]}: {report['commits']} commits "
+             f"({report['first']} to {report['last']}); {report['processed']} read, "
+             f"{report['cached']} from cache in {report['ms']:.0f} ms"
+             + (" [timed out; partial]" if report["truncated"] else "")]
+    lines.append("types: " + ", ".join(f"{kind} {count}" for kind, count in
+                                       report["types"].items()))
+    recent = report["recent"]
+    lines.append(f"last {recent['days']} days: {recent['commits']} commits")
+    if report["milestones"]:
+        lines.append("milestones:")
+        lines.extend(f"  {row['tag']:<20} {row['date'][:10]}  {row['commits_since_previous']} "
+                     "commits" for row in report["milestones"])
+    if report["files"]:
+        lines.append("most changed files:")
+        lines.extend(f"  {row['commits']:>5}  +{row['added']:<7} -{row['deleted']:<7} "
+                     f"{row['path']}" for row in report["files"])
+    if report["major"]:
+        lines.append("largest commits:")
+        lines.extend(f"  {row['commit'][:10]} {row['date'][:10]} {row['lines']:>7} lines  "
+                     f"{row['subject']}" for row in report["major"][:10])
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repo", default=".", help="git work tree (default: .)")
+    parser.add_argument("--root", help="memory store root, for the cache "
+                                       "(default: storage.base_path)")
+    parser.add_argument("--settings", help="memory-rules settings.json to read")
+    parser.add_argument("--max-commits", type=int,
+                        help="read only the newest N commits (default: all; not cached)")
+    parser.add_argument("--timeout", type=float,
+                        help="seconds (default: git_history_analysis.analysis_timeout_seconds)")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and keep no cache")
+    parser.add_argument("--top", type=int, default=20, help="files and commits to list")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args(argv)
+
+    try:
+        report = analyze(args.repo, args.root, load_settings(args.settings), args.max_commits,
+                         args.timeout, False if args.no_cache else None, args.top)
+    except git.GitError as exc:
+        print(f"history: {exc}", file=sys.stderr)
+        return 1
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(render(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Append-only compressed segment files for cold memory entries.
+
+A segment is a concatenation of independently compressed members, one per
+entry, so any entry can be read with a single seek + decompress:
+
+    segments/seg-000001.gz    member | member | member | ...
+    segments/seg-000001.idx   one TSV line per member (id, offset, length, ...)
+
+Members are only ever appended; the `.idx` line is written after the member
+bytes are fsynced, so an index line never points past the data. gzip is the
+default codec (stdlib); zstd is used when requested and the optional
+`zstandard` package is installed.
+"""
+
+import gzip
+import os
+
+SEGMENT_DIR = "segments"
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+
+try:  # optional dependency
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the host
+    zstandard = None
+
+CODEC_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+_EXTENSION_CODECS = {ext: codec for codec, ext in CODEC_EXTENSIONS.items()}
+
+
+def available_codec(preferred):
+    """Resolve a configured codec name to one this interpreter can write."""
+    if preferred == "zstd" and zstandard is not None:
+        return "zstd"
+    return "gzip"
+
+
+def compress(data, codec):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def decompress(data, codec):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("segment is zstd-compressed but 'zstandard' is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def codec_of(name):
+    return _EXTENSION_CODECS.get(os.path.splitext(name)[1], "gzip")
+
+
+# --- locations ---------------------------------------------------------------
+
+def is_segment_location(location):
+    return location.startswith(SEGMENT_DIR + "/") and "@" in location
+
+
+def format_location(name, offset, length, directory=SEGMENT_DIR):
+    return f"{directory}/{name}@{offset}+{length}"
+
+
+def parse_location(location):
+    """Split a location into (store-relative segment path, offset, length)."""
+    path, _, span = location.partition("@")
+    offset, _, length = span.partition("+")
+    return path, int(offset), int(length)
+
+
+def read_member(root, location):
+    """Decompress one member given its location string."""
+    relpath, offset, length = parse_location(location)
+    with open(os.path.join(root, relpath.replace("/", os.sep)), "rb") as handle:
+        handle.seek(offset)
+        data = handle.read(length)
+    if len(data) != length:
+        raise OSError(f"truncated segment member: {location}")
+    return decompress(data, codec_of(relpath))
+
+
+# --- segment listing ---------------------------------------------------------
+
+def segment_names(root, directory=SEGMENT_DIR):
+    try:
+        names = os.listdir(os.path.join(root, directory))
+    except FileNotFoundError:
+        return []
+    return sorted(
+        n for n in names
+        if n.startswith("seg-") and os.path.splitext(n)[1] in _EXTENSION_CODECS
+    )
+
+
+def _idx_path(root, name, directory=SEGMENT_DIR):
+    return os.path.join(root, directory, os.path.splitext(name)[0] + ".idx")
+
+
+def iter_members(root, directory=SEGMENT_DIR):
+    """Yield (row, original location) per member, reading only `.idx` files.
+
+    The row's location is the member reference. The original location is the
+    relpath the entry was appended from, or None for `.idx` lines without one.
+    """
+    from .store import IndexRow  # local import: store imports this module
+
+    for name in segment_names(root, directory):
+        try:
+            handle = open(_idx_path(root, name, directory), "r", encoding="utf-8")
+        except FileNotFoundError:
+            continue
+        with handle:
+            for line in handle:
+                cells = line.rstrip("\n").split("\t")
+                if len(cells) < 7:
+                    continue
+                entry_id, offset, length, category, scope, timestamp, tags = cells[:7]
+                row = IndexRow(
+                    entry_id, category, scope, timestamp,
+                    format_location(name, int(offset), int(length), directory),
+                    tuple(t for t in tags.split(",") if t),
+                )
+                yield row, (cells[7] if len(cells) > 7 else None)
+
+
+def iter_segment_rows(root, directory=SEGMENT_DIR, original=False):
+    """Yield index rows for every member, reading only `.idx` files.
+
+    With `original=True` the rows carry the entry's pre-compaction relpath as
+    their location instead of the member reference (used to restore entries).
+    """
+    for row, source in iter_members(root, directory):
+        yield row._replace(location=source) if original and source else row
+
+
+def member_origins(root, directory=SEGMENT_DIR):
+    """{member location: the location it was appended from}.
+
+    Ids are filename stems and repeat across scopes, so this is what ties a
+    member to the one entry it holds.
+    """
+    return {row.location: source for row, source in iter_members(root, directory) if source}
+
+
+def _open_segment(root, codec, directory):
+    """Return the name of the segment to append to, rolling at SEGMENT_MAX_BYTES."""
+    path = os.path.join(root, directory)
+    os.makedirs(path, exist_ok=True)
+    names = segment_names(root, directory)
+    extension = CODEC_EXTENSIONS[codec]
+    if names:
+        last = names[-1]
+        if last.endswith(extension) and \
+                os.path.getsize(os.path.join(path, last)) < SEGMENT_MAX_BYTES:
+            return last
+        number = int(last[4:10]) + 1
+    else:
+        number = 1
+    return f"seg-{number:06d}{extension}"
+
+
+def append_members(root, items, codec="gzip", directory=SEGMENT_DIR):
+    """Append (row, raw_bytes) pairs; return the rows relocated into segments.
+
+    The original relpath is kept in the `.idx` line so an entry can be restored
+    to its loose location later.
+    """
+    if not items:
+        return []
+    codec = available_codec(codec)
+    relocated = []
+    name = _open_segment(root, codec, directory)
+    data_path = os.path.join(root, directory, name)
+    idx_lines = []
+    with open(data_path, "ab") as handle:
+        offset = handle.tell()
+        for row, raw in items:
+            member = compress(raw, codec)
+            handle.write(member)
+            idx_lines.append("\t".join([
+                row.id, str(offset), str(len(member)), row.category, row.scope,
+                row.timestamp, ",".join(row.tags), row.location,
+            ]) + "\n")
+            relocated.append(row._replace(
+                location=format_location(name, offset, len(member), directory)))
+            offset += len(member)
+        handle.flush()
+        os.fsync(handle.fileno())
+    with open(_idx_path(root, name, directory), "a", encoding="utf-8") as handle:
+        handle.writelines(idx_lines)
+        handle.flush()
+        os.fsync(handle.fileno())
+    return relocated
@@ -0,0 +1,458 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Read/query layer over a framework memory store.
+
+A store is the directory tree MEMORY-RULES.md describes:
+
+    [storage.base_path]/
+    ├── common/<category>/*.md
+    ├── private/<category>/*.md
+    ├── projects/<project-id>/<category>/*.md
+    └── index.md
+
+`index.md` is the global index: one markdown table row per entry, sorted
+oldest first. Every tool in this package goes through `MemoryStore` rather
+than walking the tree itself, so entries that have been compacted into
+segment files (see compact.py) stay readable through the same `query()` /
+`read()` calls as loose markdown files.
+"""
+
+import calendar
+import collections
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+from .._fs import atomic_write, file_lock
+from . import segments
+
+INDEX_FILE = "index.md"
+INDEX_LOCK_FILE = ".index.lock"
+ARCHIVE_DIR = "archive"
+
+# Subtrees that hold structure or tooling state, not memory entries.
+SKIP_DIRS = {"knowledge_graph", segments.SEGMENT_DIR, ARCHIVE_DIR, "wal"}
+
+# Project directories are plural ("sessions/") while settings categories are
+# singular ("session"); entries without a Category bullet fall back to this.
+DIR_CATEGORIES = {
+    "sessions": "session",
+    "topics": "topic",
+    "interactions": "user_interaction",
+}
+
+INDEX_COLUMNS = ("ID", "Category", "Scope", "Timestamp", "Location", "Tags")
+
+IndexRow = collections.namedtuple(
+    "IndexRow", ["id", "category", "scope", "timestamp", "location", "tags"]
+)
+
+_DEFAULT_SETTINGS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "modules", "memory-rules", "settings.json",
+)
+
+_TS_PREFIX = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})(?:[T_ ](\d{2}):?(\d{2})(?::?(\d{2}))?)?"
+)
+_META_LINE = re.compile(r"^\s*(?:[-*]\s*)?\*\*(.+?)\*\*\s*:\s*(.*?)\s*$")
+_WIKI_LINK = re.compile(r"\[\[([^\]|#]+)(?:[|#][^\]]*)?\]\]")
+_LINK_SECTIONS = ("Related Memories", "Cross-References", "Related Interactions")
+
+
+# --- settings ----------------------------------------------------------------
+
+def load_settings(path=None):
+    """Load memory-rules settings.json (the module default when `path` is None)."""
+    with open(path or _DEFAULT_SETTINGS, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+# --- timestamps --------------------------------------------------------------
+
+def parse_timestamp(value):
+    """Parse a template timestamp or timestamped filename; return epoch seconds.
+
+    Accepts full ISO-8601 (`2026-06-16T14:30:00Z`, offsets allowed) and the
+    compact filename form (`2026-06-16T1430_technical_memory`). Returns None
+    when nothing date-like is found.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        parsed = None
+    if parsed is not None:
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    match = _TS_PREFIX.match(value)
+    if not match:
+        return None
+    parts = [int(p) if p else 0 for p in match.groups()]
+    try:
+        return float(calendar.timegm(tuple(parts) + (0, 0, 0)))
+    except (ValueError, OverflowError):
+        return None
+
+
+def format_timestamp(epoch):
+    """Normalized UTC form used in the index, so rows sort lexicographically."""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch))
+
+
+def normalize_category(value):
+    return re.sub(r"[\s\-]+", "_", (value or "").strip().lower())
+
+
+# --- entry parsing -----------------------------------------------------------
+
+def parse_entry(text):
+    """Split a memory entry into title, metadata, sections, tags, and links.
+
+    Tolerant by design (see KG_VISUALIZER_SPEC.md *Parser requirements*):
+    `- **Key**: value` bullets and loose `**Key**: value` lines both count as
+    metadata, and missing or placeholder sections simply come back empty.
+    """
+    title = ""
+    sections = collections.OrderedDict()
+    current = None
+    for line in text.splitlines():
+        if line.startswith("## "):
+            current = line[3:].strip()
+            sections[current] = []
+        elif line.startswith("# ") and not title and current is None:
+            title = line[2:].strip()
+        elif current is not None:
+            sections[current].append(line)
+    sections = collections.OrderedDict(
+        (name, "\n".join(lines).strip()) for name, lines in sections.items()
+    )
+
+    metadata = {}
+    for line in sections.get("Metadata", "").splitlines():
+        match = _META_LINE.match(line)
+        if match:
+            metadata[match.group(1).strip()] = match.group(2).strip()
+
+    tags = []
+    for line in sections.get("Tags", "").splitlines():
+        line = line.strip()
+        if line:
+            tags = [t.strip() for t in line.strip("[]").split(",") if t.strip()]
+            break
+
+    links = []
+    for name in _LINK_SECTIONS:
+        for target in _WIKI_LINK.findall(sections.get(name, "")):
+            target = target.strip()
+            if target and target not in links:
+                links.append(target)
+
+    return {
+        "title": title,
+        "metadata": metadata,
+        "sections": sections,
+        "tags": tags,
+        "links": links,
+    }
+
+
+def category_of(relpath, metadata):
+    """The `**Category**` value, else the parent directory (`sessions/` -> session)."""
+    category = normalize_category(metadata.get("Category"))
+    if not category:
+        parent = os.path.basename(os.path.dirname(relpath.replace("/", os.sep)))
+        category = DIR_CATEGORIES.get(parent, normalize_category(parent))
+    return category
+
+
+def scope_of(relpath):
+    """Map a store-relative path to its scope: common, private, projects/<id>."""
+    parts = relpath.replace(os.sep, "/").split("/")
+    if parts[0] == "projects" and len(parts) > 2:
+        return "projects/" + parts[1]
+    return parts[0] if len(parts) > 1 else ""
+
+
+def project_of(scope):
+    return scope[len("projects/"):] if scope.startswith("projects/") else ""
+
+
+# --- index file --------------------------------------------------------------
+
+def _cell(value):
+    return str(value).replace("|", "/").replace("\n", " ").strip()
+
+
+def render_index(rows):
+    lines = [
+        "# Memory Index",
+        "",
+        "<!-- Generated by agentic_rules.memory; rows are sorted oldest first. -->",
+        "",
+        "| " + " | ".join(INDEX_COLUMNS) + " |",
+        "|" + "|".join("---" for _ in INDEX_COLUMNS) + "|",
+    ]
+    for row in rows:
+        lines.append("| " + " | ".join([
+            _cell(row.id), _cell(row.category), _cell(row.scope),
+            _cell(row.timestamp), _cell(row.location), _cell(", ".join(row.tags)),
+        ]) + " |")
+    return "\n".join(lines) + "\n"
+
+
+def parse_index_line(line):
+    """Parse one index table row; None for headers, separators, and prose."""
+    if not line.startswith("| ") or line.startswith("| ID |"):
+        return None
+    cells = [c.strip() for c in line.strip().strip("|").split("|")]
+    if len(cells) != len(INDEX_COLUMNS):
+        return None
+    tags = tuple(t.strip() for t in cells[5].split(",") if t.strip())
+    return IndexRow(cells[0], cells[1], cells[2], cells[3], cells[4], tags)
+
+
+def iter_index(path):
+    """Stream rows from an index file without loading it whole."""
+    try:
+        handle = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with handle:
+        for line in handle:
+            row = parse_index_line(line)
+            if row is not None:
+                yield row
+
+
+def sort_rows(rows):
+    return sorted(rows, key=lambda r: (r.timestamp, r.id))
+
+
+def _matches(row, lo, hi, category=None, project=None, scope=None, tag=None):
+    if category is not None and row.category != category:
+        return False
+    if project is not None and project_of(row.scope) != project:
+        return False
+    if scope is not None and row.scope != scope:
+        return False
+    if lo is not None and row.timestamp < lo:
+        return False
+    if hi is not None and row.timestamp >= hi:
+        return False
+    return tag is None or tag in row.tags
+
+
+# --- the store ---------------------------------------------------------------
+
+class MemoryStore:
+    """A memory store rooted at `root` (the resolved storage.base_path)."""
+
+    def __init__(self, root, settings=None):
+        self.root = os.path.abspath(os.path.expanduser(root))
+        if settings is None:
+            settings = load_settings()
+        self.settings = settings.get("memory_rules", settings)
+
+    # -- layout ---------------------------------------------------------------
+
+    @property
+    def index_path(self):
+        return os.path.join(self.root, INDEX_FILE)
+
+    def path(self, relpath):
+        return os.path.join(self.root, relpath.replace("/", os.sep))
+
+    def relpath(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    # -- category policy ------------------------------------------------------
+
+    def category_policy(self, category):
+        return self.settings.get("categories", {}).get(category, {})
+
+    def retention_days(self, category):
+        """suggested_retention_days for a category, falling back to cleanup_guidance_days."""
+        policy = self.category_policy(category)
+        days = policy.get("suggested_retention_days")
+        if days is None:
+            days = self.settings.get("cleanup_guidance_days")
+        return days
+
+    # -- scanning -------------------------------------------------------------
+
+    def iter_files(self):
+        """Yield absolute paths of loose entry files, pruning structure subtrees."""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(
+                d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")
+            )
+            for name in sorted(filenames):
+                if not name.endswith(".md") or name.startswith("."):
+                    continue
+                if dirpath == self.root and name == INDEX_FILE:
+                    continue
+                yield os.path.join(dirpath, name)
+
+    def row_for_text(self, relpath, text, mtime=None):
+        """Build the index row for an entry, given its store-relative path."""
+        entry = parse_entry(text)
+        stem = os.path.splitext(os.path.basename(relpath))[0]
+        category = category_of(relpath, entry["metadata"])
+        epoch = (
+            parse_timestamp(entry["metadata"].get("Generated"))
+            or parse_timestamp(stem)
+            or mtime
+            or time.time()
+        )
+        return IndexRow(
+            stem, category, scope_of(relpath), format_timestamp(epoch),
+            relpath, tuple(entry["tags"]),
+        )
+
+    def row_for_file(self, path):
+        with open(path, "r", encoding="utf-8", errors="replace") as handle:
+            text = handle.read()
+        return self.row_for_text(self.relpath(path), text, os.path.getmtime(path))
+
+    def scan(self):
+        """Full O(store) scan of loose files plus segment indexes.
+
+        Compacted members that were later archived by the cleanup sweeper are
+        left out: the archive is the tombstone for an append-only segment, and
+        it records the member it archived by location.
+        """
+        for path in self.iter_files():
+            try:
+                yield self.row_for_file(path)
+            except OSError:
+                continue
+        archived = set(segments.member_origins(self.root, ARCHIVE_DIR).values())
+        for row in segments.iter_segment_rows(self.root):
+            if row.location not in archived:
+                yield row
+
+    # -- index ----------------------------------------------------------------
+
+    def rebuild_index(self):
+        """Re-derive index.md from the tree; returns the sorted rows."""
+        rows = sort_rows(self._dedupe(self.scan(), segments.member_origins(self.root)))
+        self.write_index(rows)
+        return rows
+
+    def write_index(self, rows):
+        """Write index.md and its binary sidecar (see binindex.py)."""
+        from . import binindex  # binindex builds on this module
+
+        rows = list(rows)
+        written = atomic_write(self.index_path, render_index(rows))
+        binindex.write_binary_index(binindex.binary_index_path(self), rows, written)
+
+    def index_rows(self):
+        """Rows of index.md alone, oldest first; builds the index on first use."""
+        if not os.path.isfile(self.index_path):
+            return self.rebuild_index()
+        return list(iter_index(self.index_path))
+
+    def rows(self):
+        """All rows, oldest first, including writes not yet merged from the WAL."""
+        from . import wal  # wal builds on this module
+
+        return wal.overlay(self.index_rows(), wal.pending_rows(self))
+
+    def index_lock(self, blocking=True):
+        """Exclusive lock for rewriting index.md; yields True when held.
+
+        Take it once, at the top of an operation: flock locks belong to an
+        open file, so a nested acquire in the same process deadlocks.
+        """
+        return file_lock(os.path.join(self.root, INDEX_LOCK_FILE), blocking=blocking)
+
+    @staticmethod
+    def _dedupe(rows, origins):
+        # Ids are filename stems and repeat across scopes, so an entry is known
+        # by the relpath it lives at, or was compacted from (`origins`). A loose
+        # file wins over a segment copy of itself: it can only exist if a
+        # compaction was interrupted before unlinking the original. Of two
+        # segment copies, the later one is the newer write.
+        seen = collections.OrderedDict()
+        for row in rows:
+            key = origins.get(row.location, row.location)
+            if key in seen and not segments.is_segment_location(seen[key].location):
+                continue
+            seen[key] = row
+        return list(seen.values())
+
+    # -- query API ------------------------------------------------------------
+
+    def query(self, category=None, project=None, scope=None, since=None,
+              until=None, tag=None):
+        """Filter index rows. Time bounds accept epoch seconds or ISO strings.
+
+        Served from the binary sidecar when it matches index.md, so only the
+        matching rows are materialized; otherwise index.md is parsed.
+        """
+        from . import binindex, wal
+
+        lo = format_timestamp(parse_timestamp(since)) if since is not None else None
+        hi = format_timestamp(parse_timestamp(until)) if until is not None else None
+        filters = dict(category=category, project=project, scope=scope, tag=tag)
+        index = binindex.open_for(self)
+        if index is None:
+            for row in self.rows():
+                if _matches(row, lo, hi, **filters):
+                    yield row
+            return
+        with index:
+            found = [index.row(i) for i in index.select(since=lo, until=hi, **filters)]
+        pending = wal.pending_rows(self)
+        if pending:
+            replaced = {row.location for row in pending}
+            found = sort_rows([row for row in found if row.location not in replaced] + [
+                row for row in pending if _matches(row, lo, hi, **filters)
+            ])
+        for row in found:
+            yield row
+
+    def get(self, entry, scope=None):
+        """The row for an entry id or location, or None.
+
+        Ids are filename stems and repeat across scopes, so pass `scope` or the
+        entry's location to pick one copy. A compacted entry is also found by
+        the relpath it was compacted from. An id that still names several rows
+        raises ValueError.
+        """
+        rows = self.rows()
+        found = [row for row in rows if row.location == entry]
+        if not found and "/" in entry:
+            origins = segments.member_origins(self.root)
+            found = [row for row in rows if origins.get(row.location) == entry]
+        if not found:
+            found = [row for row in rows
+                     if row.id == entry and (scope is None or row.scope == scope)]
+        if len(found) > 1:
+            raise ValueError(f"{entry!r} names {len(found)} entries "
+                             f"({', '.join(row.location for row in found)}); "
+                             "pass a scope or location")
+        return found[0] if found else None
+
+    def read(self, entry, scope=None):
+        """Return an entry's markdown, whether loose or compacted.
+
+        `entry` is an IndexRow, or an entry id or location as for `get`.
+        """
+        row = entry if isinstance(entry, IndexRow) else self.get(entry, scope)
+        if row is None:
+            raise KeyError(entry)
+        if segments.is_segment_location(row.location):
+            return segments.read_member(self.root, row.location).decode("utf-8")
+        with open(self.path(row.location), "r", encoding="utf-8") as handle:
+            return handle.read()
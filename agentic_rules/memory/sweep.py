@@ -0,0 +1,412 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Retention sweeper: the User-Guided Cleanup Algorithm, index-driven.
+
+MEMORY-RULES.md asks agents to flag memories older than their category's
+`suggested_retention_days` and clean them up only with the user's consent.
+Done by hand, that means opening every file. This tool uses `index.md`
+instead. Rows are sorted oldest first, so the scan stops at the first row
+newer than the most lenient cutoff. It reads O(overdue) rows and opens no
+entry files.
+
+Workflow (state lives in `<root>/.cleanup/proposals.json`):
+
+    propose   group overdue entries into batches of
+              cleanup_guidance.batch_cleanup_limit
+    approve   record the user's consent for specific batches
+    apply     archive each entry of an approved batch, then delete it
+    restore   put an archived entry back where it was
+
+Entries are named by location throughout. Ids are filename stems, so the
+same id can live in several scopes.
+
+When `cleanup_guidance.require_user_consent` is true, `apply` executes only
+approved batches. Archiving appends the entry to `archive/` in the segment
+format (see segments.py) before the loose file or index row is removed, so
+nothing is ever destroyed. Entries tagged `important`, `keep`, or `pinned`
+are never proposed while `preserve_important_memories` is on.
+
+Usage:
+    python -m agentic_rules.memory.sweep status  --root ~/memory
+    python -m agentic_rules.memory.sweep propose --root ~/memory
+    python -m agentic_rules.memory.sweep approve --root ~/memory <batch-id> ...
+    python -m agentic_rules.memory.sweep apply   --root ~/memory
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+from .._fs import atomic_write
+from . import binindex, segments, wal
+from .store import (
+    ARCHIVE_DIR, DIR_CATEGORIES, MemoryStore, format_timestamp, iter_index, load_settings,
+    sort_rows,
+)
+
+STATE_DIR = ".cleanup"
+PROPOSALS_FILE = "proposals.json"
+NOTIFIED_FILE = "last_notified"
+PRESERVE_TAGS = {"important", "keep", "pinned"}
+DAY = 86400
+_CATEGORY_DIRS = {category: directory for directory, category in DIR_CATEGORIES.items()}
+
+
+def cleanup_settings(store):
+    return store.settings.get("cleanup_guidance", {})
+
+
+class RetentionPolicy:
+    """Per-category cutoffs for one point in time."""
+
+    def __init__(self, store, now):
+        self.store = store
+        self.now = now
+        self._cutoffs = {}
+        days = [
+            policy.get("suggested_retention_days")
+            for policy in store.settings.get("categories", {}).values()
+        ]
+        days.append(store.settings.get("cleanup_guidance_days"))
+        days = [d for d in days if d is not None]
+        # Nothing newer than the most lenient (newest) cutoff can be overdue.
+        self.horizon = format_timestamp(now - min(days) * DAY) if days else None
+        self.preserve = bool(cleanup_settings(store).get("preserve_important_memories", True))
+
+    def cutoff(self, category):
+        if category not in self._cutoffs:
+            days = self.store.retention_days(category)
+            self._cutoffs[category] = (
+                None if days is None else format_timestamp(self.now - days * DAY)
+            )
+        return self._cutoffs[category]
+
+    def overdue(self, row):
+        cutoff = self.cutoff(row.category)
+        if cutoff is None or row.timestamp >= cutoff:
+            return False
+        return not (self.preserve and PRESERVE_TAGS.intersection(t.lower() for t in row.tags))
+
+
+def find_overdue(store, now=None):
+    """Yield overdue index rows, oldest first, stopping at the policy horizon.
+
+    Writes still in the WAL count as well: a pending record adds an entry the
+    index has not seen yet, or replaces the row at its location.
+    """
+    policy = RetentionPolicy(store, time.time() if now is None else now)
+    if policy.horizon is None:
+        return
+    pending = wal.pending_rows(store)
+    index = binindex.open_for(store)
+    if index is not None:
+        with index:
+            overdue = [index.row(i) for i in _overdue_positions(index, policy)]
+        if pending:
+            replaced = {row.location for row in pending}
+            overdue = sort_rows([row for row in overdue if row.location not in replaced] + [
+                row for row in pending
+                if row.timestamp < policy.horizon and policy.overdue(row)
+            ])
+        for row in overdue:
+            yield row
+        return
+    if os.path.isfile(store.index_path):
+        rows = iter_index(store.index_path)
+        if pending:
+            rows = wal.overlay(list(rows), pending)
+    else:
+        rows = store.rows()
+    for row in rows:
+        if row.timestamp >= policy.horizon:
+            break
+        if policy.overdue(row):
+            yield row
+
+
+def _overdue_positions(index, policy):
+    """`policy.overdue` over the sidecar's columns, decoding tags only when needed."""
+    cutoffs = []
+    for category in index.categories:
+        cutoff = policy.cutoff(category)
+        cutoffs.append(-1 if cutoff is None else binindex.pack_timestamp(cutoff))
+    preserve_mask = binindex.OTHER_TAGS if policy.preserve else 0
+    if policy.preserve:
+        for tag, bit in index.tag_bits.items():
+            if tag.lower() in PRESERVE_TAGS:
+                preserve_mask |= bit
+    ts, category, tags = index.ts, index.category, index.tags
+    _, end = index.span(until=policy.horizon)
+    for i in range(end):
+        if ts[i] >= cutoffs[category[i]]:
+            continue
+        if tags[i] & preserve_mask and PRESERVE_TAGS.intersection(
+                t.lower() for t in index.row_tags(i)):
+            continue
+        yield i
+
+
+# --- proposal state ----------------------------------------------------------
+
+def _state_path(store, name):
+    return os.path.join(store.root, STATE_DIR, name)
+
+
+def load_proposals(store):
+    try:
+        with open(_state_path(store, PROPOSALS_FILE), "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return {"batches": []}
+
+
+def save_proposals(store, state):
+    atomic_write(_state_path(store, PROPOSALS_FILE), json.dumps(state, indent=2) + "\n")
+
+
+def _batch_id(locations):
+    return "b-" + hashlib.sha1("\n".join(locations).encode("utf-8")).hexdigest()[:10]
+
+
+def propose(store, now=None):
+    """Replace pending batches with fresh ones; approved batches are kept."""
+    now = time.time() if now is None else now
+    config = cleanup_settings(store)
+    limit = max(1, int(config.get("batch_cleanup_limit", 10)))
+    state = load_proposals(store)
+    kept = [b for b in state["batches"] if b["status"] == "approved"]
+    # Entries are named by location: ids are filename stems, which repeat
+    # across scopes.
+    claimed = {e["location"] for b in kept for e in b["entries"]}
+
+    fresh, batch = [], []
+    for row in find_overdue(store, now):
+        if row.location in claimed:
+            continue
+        batch.append({
+            "id": row.id,
+            "category": row.category,
+            "scope": row.scope,
+            "timestamp": row.timestamp,
+            "location": row.location,
+            "retention_days": store.retention_days(row.category),
+        })
+        if len(batch) == limit:
+            fresh.append(batch)
+            batch = []
+    if batch:
+        fresh.append(batch)
+
+    created = format_timestamp(now)
+    state["batches"] = kept + [
+        {"id": _batch_id([e["location"] for e in entries]), "status": "pending",
+         "created": created, "entries": entries}
+        for entries in fresh
+    ]
+    save_proposals(store, state)
+    return state
+
+
+def approve(store, batch_ids, now=None):
+    """Record consent for the given batch ids; returns the ids approved."""
+    state = load_proposals(store)
+    approved = []
+    for batch in state["batches"]:
+        if batch["id"] in batch_ids and batch["status"] == "pending":
+            batch["status"] = "approved"
+            batch["approved"] = format_timestamp(time.time() if now is None else now)
+            approved.append(batch["id"])
+    save_proposals(store, state)
+    return approved
+
+
+def apply(store, batch_ids=None, now=None):
+    """Archive-then-delete the entries of approved batches.
+
+    Without consent required, pending batches named in `batch_ids` may be
+    applied too. Returns the list of archived entry ids.
+    """
+    state = load_proposals(store)
+    consent = bool(cleanup_settings(store).get("require_user_consent", True))
+    chosen = []
+    for batch in state["batches"]:
+        if batch_ids is not None and batch["id"] not in batch_ids:
+            continue
+        if batch["status"] == "approved" or (
+                batch["status"] == "pending" and not consent and batch_ids is not None):
+            chosen.append(batch)
+    if not chosen:
+        return []
+
+    with store.index_lock():
+        wal.fold(store)
+        archived = archive_entries(store, {e["location"] for b in chosen for e in b["entries"]})
+
+    stamp = format_timestamp(time.time() if now is None else now)
+    for batch in chosen:
+        batch["status"] = "applied"
+        batch["applied"] = stamp
+    save_proposals(store, state)
+    return sorted(row.id for row in archived)
+
+
+def archive_entries(store, wanted):
+    """Archive, unindex, then unlink the entries at the locations in `wanted`.
+
+    A location may also be the relpath a compacted entry came from. Returns
+    the archived rows. The caller holds `store.index_lock()` and has folded
+    the WAL.
+    """
+    rows = store.index_rows()
+    origins = segments.member_origins(store.root)
+    doomed = [row for row in rows
+              if row.location in wanted or origins.get(row.location) in wanted]
+    items = []
+    for row in doomed:
+        try:
+            items.append((row, store.read(row).encode("utf-8")))
+        except (OSError, KeyError):
+            continue
+    archived = {row.location for row, _ in items}
+    # 1. archive (fsynced), 2. drop index rows, 3. remove loose files.
+    segments.append_members(store.root, items, directory=ARCHIVE_DIR)
+    store.write_index([row for row in rows if row.location not in archived])
+    for row, _ in items:
+        if not segments.is_segment_location(row.location):
+            try:
+                os.unlink(store.path(row.location))
+            except OSError:
+                pass
+    return [row for row, _ in items]
+
+
+def _restore_location(member, archived_from, origins):
+    """The loose relpath an archived member goes back to."""
+    if archived_from is not None and not segments.is_segment_location(archived_from):
+        return archived_from
+    if archived_from in origins:
+        return origins[archived_from]  # archived from a compacted segment
+    # A segment line without its relpath: rebuild one from the row, with the
+    # category's directory name (session -> sessions/).
+    directory = _CATEGORY_DIRS.get(member.category, member.category)
+    return f"{member.scope or 'common'}/{directory}/{member.id}.md"
+
+
+def restore(store, entry):
+    """Write an archived entry back to its original location and index it.
+
+    `entry` is the entry's location (as proposed, or its loose relpath) or,
+    when only one archived location has it, its id. Returns the location.
+    """
+    origins = segments.member_origins(store.root)
+    exact, named = {}, {}
+    for member, archived_from in segments.iter_members(store.root, ARCHIVE_DIR):
+        location = _restore_location(member, archived_from, origins)
+        if entry in (location, archived_from):
+            exact[location] = member  # last archived copy wins
+        elif member.id == entry:
+            named[location] = member
+    found = exact or named
+    if not found:
+        raise KeyError(entry)
+    if len(found) > 1:
+        raise ValueError(f"{entry} was archived from {len(found)} locations "
+                         f"({', '.join(sorted(found))}); restore one by location")
+    [(location, member)] = found.items()
+    text = segments.read_member(store.root, member.location)
+    atomic_write(store.path(location), text)
+    with store.index_lock():
+        wal.fold(store)
+        rows = [row for row in store.index_rows() if row.location != location]
+        rows.append(member._replace(location=location))
+        store.write_index(sort_rows(rows))
+    return location
+
+
+# --- SessionStart notice -----------------------------------------------------
+
+def session_notice(root, now=None, settings=None):
+    """One-line overdue reminder for the SessionStart hook, or "".
+
+    Index-only and rate-limited by notification_frequency_days. It never
+    builds a missing index, because that would mean a full store scan at
+    session start.
+    """
+    now = time.time() if now is None else now
+    store = MemoryStore(root, settings)
+    config = cleanup_settings(store)
+    if not (config.get("enabled", True) and config.get("notify_overdue_memories", True)):
+        return ""
+    if not os.path.isfile(store.index_path):
+        return ""
+    marker = _state_path(store, NOTIFIED_FILE)
+    frequency = float(config.get("notification_frequency_days", 30)) * DAY
+    try:
+        if now - os.path.getmtime(marker) < frequency:
+            return ""
+    except OSError:
+        pass
+    count = sum(1 for _ in find_overdue(store, now))
+    if not count:
+        return ""
+    atomic_write(marker, format_timestamp(now) + "\n")
+    return (
+        f"{count} memor{'y' if count == 1 else 'ies'} in `{store.root}` exceed their "
+        "category's suggested_retention_days. Offer the user a cleanup review "
+        "(`python -m agentic_rules.memory.sweep propose`); never delete without consent."
+    )
+
+
+# --- CLI ---------------------------------------------------------------------
+
+def _print_batches(state):
+    if not state["batches"]:
+        print("No cleanup proposals.")
+    for batch in state["batches"]:
+        print(f"{batch['id']}  [{batch['status']}]  {len(batch['entries'])} entries")
+        for entry in batch["entries"]:
+            print(f"    {entry['timestamp']}  {entry['category']:<18} {entry['location']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["status", "propose", "approve", "apply", "restore"])
+    parser.add_argument("ids", nargs="*",
+                        help="batch ids (approve/apply) or entry locations or ids (restore)")
+    parser.add_argument("--root", help="memory store root (default: storage.base_path)")
+    parser.add_argument("--settings", help="memory-rules settings.json to read")
+    args = parser.parse_intermixed_args(argv)  # `approve --root R b-... b-...`
+
+    settings = load_settings(args.settings)
+    store = MemoryStore(args.root or settings["storage"]["base_path"], settings)
+    if args.command == "status":
+        count = sum(1 for _ in find_overdue(store))
+        print(f"{count} overdue entr{'y' if count == 1 else 'ies'}")
+        _print_batches(load_proposals(store))
+    elif args.command == "propose":
+        _print_batches(propose(store))
+    elif args.command == "approve":
+        approved = approve(store, set(args.ids))
+        print(f"Approved: {', '.join(approved) or 'nothing'}")
+    elif args.command == "apply":
+        archived = apply(store, set(args.ids) if args.ids else None)
+        print(f"Archived {len(archived)} entr{'y' if len(archived) == 1 else 'ies'}")
+    elif args.command == "restore":
+        for entry in args.ids:
+            try:
+                print(f"Restored {entry} -> {restore(store, entry)}")
+            except KeyError:
+                print(f"Not in the archive: {entry}", file=sys.stderr)
+                return 1
+            except ValueError as exc:
+                print(exc, file=sys.stderr)
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
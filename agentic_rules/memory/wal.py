@@ -0,0 +1,308 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Write-ahead log for memory writes, merged into index.md in batches.
+
+With `auto_recording.real_time_indexing`, taken literally, every recorded
+interaction rewrites `index.md`. Each write then costs O(index size), and two
+sessions that write at once can lose each other's rows. This module splits
+the write path in two:
+
+- **Writers** (`record`) write the entry file, then append one JSON line to
+  their own per-session log, `wal/<session>.log`. Sessions never share a log,
+  and appends take only a shared lock, so concurrent writers do not contend.
+  The session defaults to `$AGENTIC_RULES_SESSION`, which the Claude Code
+  SessionStart hook sets to the agent's session id, so the separate `record`
+  processes of one agent session append to one log. Without it, processes
+  of one login session (`os.getsid`) share a log.
+- **The merger** (`merge`) holds the store's index lock. It reads every log
+  from its checkpointed offset, folds the new rows into the index with one
+  atomic rewrite, and then advances the checkpoint. Replaying after a crash
+  is harmless, because rows are keyed by entry location.
+
+Readers never wait for a merge. `MemoryStore.rows()` overlays the unmerged
+log tails on the index, so an entry can be queried as soon as `record`
+returns. That is what `index_update_frequency: "realtime"` promises. The
+index file itself is rewritten in batches: once WAL_MERGE_BYTES are pending
+or WAL_MERGE_INTERVAL has passed since the last merge. With any other
+frequency value, merging runs only on demand.
+
+Usage:
+    python -m agentic_rules.memory.wal record --root ~/memory projects/acme/interactions/x.md
+    python -m agentic_rules.memory.wal merge  --root ~/memory
+    python -m agentic_rules.memory.wal status --root ~/memory
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import sys
+import time
+
+from .._fs import atomic_write, fcntl
+from .store import IndexRow, MemoryStore, load_settings, sort_rows
+
+WAL_DIR = "wal"
+CHECKPOINT_FILE = "checkpoint.json"
+WAL_MERGE_BYTES = 256 * 1024
+WAL_MERGE_INTERVAL = 60.0
+WAL_GC_GRACE = 3600.0
+SESSION_ENV = "AGENTIC_RULES_SESSION"
+
+
+def wal_dir(store):
+    return os.path.join(store.root, WAL_DIR)
+
+
+def default_session():
+    """Log name shared by every writer process of the current session."""
+    session = os.environ.get(SESSION_ENV, "").strip()
+    if not session:
+        owner = os.getsid(0) if hasattr(os, "getsid") else os.getppid()
+        session = f"{socket.gethostname()}-{owner}"
+    return re.sub(r"[^A-Za-z0-9._-]", "_", session)
+
+
+def log_names(store):
+    try:
+        return sorted(n for n in os.listdir(wal_dir(store)) if n.endswith(".log"))
+    except FileNotFoundError:
+        return []
+
+
+# --- checkpoint --------------------------------------------------------------
+
+def _checkpoint_path(store):
+    return os.path.join(wal_dir(store), CHECKPOINT_FILE)
+
+
+def load_checkpoint(store):
+    try:
+        with open(_checkpoint_path(store), "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return {"logs": {}, "merged_at": 0.0}
+
+
+def _save_checkpoint(store, checkpoint):
+    atomic_write(_checkpoint_path(store), json.dumps(checkpoint, indent=2) + "\n")
+
+
+# --- writers -----------------------------------------------------------------
+
+def _replaced(fd, path):
+    """True when `path` no longer names the inode behind `fd` (GC unlinked it)."""
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        return True
+    opened = os.fstat(fd)
+    return (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+
+
+def _append(path, data, durable=True):
+    """Append one record with a single O_APPEND write under a shared lock."""
+    while True:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_SH)
+                if _replaced(fd, path):
+                    continue  # collected between open and lock; reopen
+            os.write(fd, data)
+            if durable:
+                os.fsync(fd)
+            return
+        finally:
+            os.close(fd)
+
+
+def record(store, relpath, text=None, session=None, durable=True, auto_merge=True):
+    """Persist an entry and log it; returns its IndexRow.
+
+    When `text` is None the file at `relpath` is assumed to be written already
+    (an agent wrote it by hand) and is only logged.
+    """
+    path = store.path(relpath)
+    if text is not None:
+        atomic_write(path, text)
+    with open(path, "r", encoding="utf-8", errors="replace") as handle:
+        row = store.row_for_text(store.relpath(path), handle.read(), os.path.getmtime(path))
+    line = json.dumps(dict(row._asdict(), tags=list(row.tags), recorded=time.time()))
+    os.makedirs(wal_dir(store), exist_ok=True)
+    log = os.path.join(wal_dir(store), f"{session or default_session()}.log")
+    _append(log, (line + "\n").encode("utf-8"), durable)
+    if auto_merge and merge_due(store):
+        merge(store, blocking=False)
+    return row
+
+
+# --- readers -----------------------------------------------------------------
+
+def _read_tail(path, offset):
+    """Return (complete lines after offset, new offset). A torn last line waits."""
+    try:
+        with open(path, "rb") as handle:
+            handle.seek(offset)
+            data = handle.read()
+    except FileNotFoundError:
+        return [], offset
+    end = data.rfind(b"\n") + 1
+    return data[:end].splitlines(), offset + end
+
+
+def _parse(line):
+    try:
+        data = json.loads(line)
+        return IndexRow(data["id"], data["category"], data["scope"], data["timestamp"],
+                        data["location"], tuple(data.get("tags", ())))
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def pending(store, checkpoint=None):
+    """Unmerged rows per log: {log name: (rows, end offset)}."""
+    checkpoint = checkpoint or load_checkpoint(store)
+    out = {}
+    for name in log_names(store):
+        lines, end = _read_tail(os.path.join(wal_dir(store), name),
+                                checkpoint["logs"].get(name, 0))
+        rows = [row for row in map(_parse, lines) if row is not None]
+        out[name] = (rows, end)
+    return out
+
+
+def pending_rows(store):
+    """Unmerged rows across all logs, later records of one location winning."""
+    if not os.path.isdir(wal_dir(store)):
+        return []
+    latest = {}
+    for rows, _ in pending(store).values():
+        for row in rows:
+            latest[row.location] = row
+    return list(latest.values())
+
+
+def overlay(rows, extra):
+    """Index rows with `extra` rows replacing or adding by location, re-sorted.
+
+    Ids are filename stems and repeat across scopes, so they cannot say which
+    index row a record replaces.
+    """
+    if not extra:
+        return rows
+    replaced = {row.location for row in extra}
+    return sort_rows([row for row in rows if row.location not in replaced] + extra)
+
+
+def merge_due(store, now=None):
+    frequency = store.settings.get("index_update_frequency", "realtime")
+    if frequency != "realtime":
+        return False
+    now = time.time() if now is None else now
+    checkpoint = load_checkpoint(store)
+    backlog = 0
+    for name in log_names(store):
+        try:
+            size = os.path.getsize(os.path.join(wal_dir(store), name))
+        except OSError:
+            continue
+        backlog += max(0, size - checkpoint["logs"].get(name, 0))
+    if not backlog:
+        return False
+    return (backlog >= WAL_MERGE_BYTES
+            or now - checkpoint.get("merged_at", 0.0) >= WAL_MERGE_INTERVAL)
+
+
+# --- merger ------------------------------------------------------------------
+
+def merge(store, blocking=True, now=None):
+    """Fold pending log records into index.md; returns rows merged, or None if busy."""
+    with store.index_lock(blocking=blocking) as held:
+        if not held:
+            return None
+        return fold(store, now)
+
+
+def fold(store, now=None):
+    """The body of `merge`; the caller must hold `store.index_lock()`.
+
+    Tools that rewrite the index themselves (compaction, the sweeper) fold
+    first, so a pending row cannot reappear after they drop it.
+    """
+    checkpoint = load_checkpoint(store)
+    tails = pending(store, checkpoint)
+    latest = {}
+    for rows, _ in tails.values():
+        for row in rows:
+            latest[row.location] = row
+    if latest:
+        store.write_index(overlay(store.index_rows(), list(latest.values())))
+    if not tails and not checkpoint["logs"]:
+        return 0
+    for name, (_, end) in tails.items():
+        checkpoint["logs"][name] = end
+    checkpoint["merged_at"] = time.time() if now is None else now
+    _collect(store, checkpoint, checkpoint["merged_at"])
+    _save_checkpoint(store, checkpoint)
+    return len(latest)
+
+
+def _collect(store, checkpoint, now):
+    """Delete fully merged logs idle for WAL_GC_GRACE (POSIX only)."""
+    if fcntl is None:
+        return
+    for name in list(checkpoint["logs"]):
+        path = os.path.join(wal_dir(store), name)
+        try:
+            idle = now - os.path.getmtime(path)
+        except FileNotFoundError:
+            del checkpoint["logs"][name]
+            continue
+        if idle < WAL_GC_GRACE:
+            continue
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue  # a writer is appending right now
+            if os.fstat(fd).st_size == checkpoint["logs"][name]:
+                os.unlink(path)
+                del checkpoint["logs"][name]
+        finally:
+            os.close(fd)
+
+
+# --- CLI ---------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["record", "merge", "status"])
+    parser.add_argument("paths", nargs="*", help="store-relative entry paths (record)")
+    parser.add_argument("--root", help="memory store root (default: storage.base_path)")
+    parser.add_argument("--settings", help="memory-rules settings.json to read")
+    parser.add_argument("--session",
+                        help=f"log name for this writer (default: ${SESSION_ENV}, else host-sid)")
+    args = parser.parse_intermixed_args(argv)  # `record --root R path ...`
+
+    settings = load_settings(args.settings)
+    store = MemoryStore(args.root or settings["storage"]["base_path"], settings)
+    if args.command == "record":
+        for relpath in args.paths:
+            row = record(store, relpath, session=args.session)
+            print(f"Recorded {row.id} ({row.category}, {row.scope or 'root'})")
+    elif args.command == "merge":
+        merged = merge(store)
+        print(f"Merged {merged} row{'' if merged == 1 else 's'} into {store.index_path}")
+    else:
+        count = sum(len(rows) for rows, _ in pending(store).values())
+        print(f"{count} unmerged record{'' if count == 1 else 's'} "
+              f"in {len(log_names(store))} log(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,866 @@
+#!/usr/bin/env python3
+"""Test harness for the git-aware KG tooling (agentic_rules.gitkg).
+
+Hermetic: every check writes base manifests and branch overlays in the
+MEMORY-RULES.md templates under a temp directory. It never touches a real
+memory store or repository.
+
+Covers:
+  * overlay merge resolution: removal cascades, node and edge
+    modifications, additions, orphan and duplicate warnings, and the same
+    result as a deep-copy merge
+  * the merge cache: branch switches served from cached views, one
+    changed overlay re-merged alone, base changes invalidating every view
+  * overlay construction from one `git diff`: edits, deletions, renames,
+    and dependents re-analyzed, merging to the same graph as a full
+    extraction of the branch; the configured default branch override
+  * base refresh: the changed files and their dependents re-extracted
+    into the same manifest a full build writes, overlapping overlays
+    marked STALE and the others validated against the new base; the
+    post-merge `--on-pull` refresh off until the git-aware KG is enabled
+  * overlay lifecycle: one `for-each-ref` classifying every overlay,
+    rebuilds of stale and outdated ones in a shared worktree, prunes of
+    expired ones only after consent, and the retention and rebuild settings
+  * the binary base snapshot: the same nodes, edges, incidence, and
+    merges as the parsed manifest, kept across a touch, replaced after an
+    edit
+  * code extraction: definitions, imports (relative ones too), inheritance,
+    and call sites resolved across modules; the content-hash cache
+    re-parsing only changed files, and hitting on renames and touched
+    mtimes; the base manifest built from it
+  * cross-branch analysis: CONVERGENT and DIVERGENT collisions, conflict
+    scores against the threshold, stale overlays left out, merge order,
+    the Cross-Branch Analysis Template, the same collisions as an
+    all-pairs comparison, and the threshold and branch cap from settings
+
+Run:  python agentic_rules/tests/test_gitkg.py
+Exit: 0 if all pass, 1 otherwise.
+"""
+
+import contextlib
+import copy
+import io
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+from agentic_rules.gitkg import (base, cross_branch, extract, git, lifecycle,  # noqa: E402
+                                 manifest, merge, overlay, snapshot)
+from agentic_rules.gitkg import __main__ as cli  # noqa: E402
+from agentic_rules.memory.graph import parse_tables  # noqa: E402
+
+_results = []
+
+
+def test(fn):
+    _results.append(fn)
+    return fn
+
+
+# --- helpers ---------------------------------------------------------------
+
+def table(header, rows):
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    lines += ["| " + " | ".join(str(cell) for cell in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def base_text(nodes, edges, commit="c0ffee1", branch="main"):
+    """Base KG Manifest; `nodes` are (id, type, file) and `edges` (source, target, type)."""
+    return (
+        f"# Base KG Manifest: demo - 2026-06-01T00:00:00Z\n\n"
+        "## Metadata\n"
+        f"- **Base Commit**: {commit}\n- **Default Branch**: {branch}\n"
+        "- **Generated**: 2026-06-01T00:00:00Z\n\n"
+        "## Node Registry\n"
+        + table(["Node ID", "Type", "Source File", "Content Hash"],
+                [(n, t, f, "h-" + n) for n, t, f in nodes]) + "\n\n"
+        "## Edge Registry\n"
+        + table(["Edge Key", "Source Node", "Target Node", "Type", "Content Hash"],
+                [(f"e{i}", s, t, r, "") for i, (s, t, r) in enumerate(edges)]) + "\n"
+    )
+
+
+def overlay_text(branch, merge_base="c0ffee1", status="VALID", generated="2026-06-02T00:00:00Z",
+                 added_nodes=(), removed_nodes=(), modified_nodes=(),
+                 added_edges=(), removed_edges=(), modified_edges=()):
+    return (
+        f"# KG Branch Overlay: {branch} - {generated}\n\n"
+        "## Metadata\n"
+        f"- **Branch**: {branch}\n- **Merge Base Commit**: {merge_base}\n"
+        f"- **Generated**: {generated}\n- **Status**: {status}\n\n"
+        "## Added Nodes\n"
+        + table(["Node ID", "Type", "Source File", "Attributes"],
+                [(n, t, f, "") for n, t, f in added_nodes]) + "\n\n"
+        "## Removed Nodes\n" + table(["Node ID", "Reason"], [(n, "deleted") for n in removed_nodes])
+        + "\n\n## Modified Nodes\n"
+        + table(["Node ID", "Field Changed", "Old Value Summary", "New Value Summary"],
+                modified_nodes) + "\n\n"
+        "## Added Edges\n"
+        + table(["Source", "Target", "Type", "Confidence"],
+                [(s, t, r, "0.9") for s, t, r in added_edges]) + "\n\n"
+        "## Removed Edges\n"
+        + table(["Source", "Target", "Type", "Reason"], [(s, t, r, "") for s, t, r in removed_edges])
+        + "\n\n## Modified Edges\n"
+        + table(["Source", "Target", "Type", "Change"], modified_edges) + "\n"
+    )
+
+
+class KGDir:
+    """A temp knowledge_graph/ directory; `add()` writes a document."""
+
+    def __init__(self):
+        self.root = tempfile.mkdtemp(prefix="gitkg-")
+
+    def add(self, relpath, text):
+        path = os.path.join(self.root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(text)
+        return path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class GitRepo:
+    """A temp git work tree; `write()` and `commit()` shape its history."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root)
+        self.git("init", "-q", "-b", "main")
+
+    def git(self, *args):
+        return subprocess.run(["git", "-C", self.root, "-c", "user.name=t", "-c", "user.email=t@t",
+                               "-c", "commit.gpgsign=false"] + list(args),
+                              check=True, stdout=subprocess.PIPE).stdout.decode().strip()
+
+    def write(self, relpath, text):
+        path = os.path.join(self.root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(text)
+
+    def commit(self, message="change"):
+        self.git("add", "-A")
+        self.git("commit", "-q", "-m", message)
+        return self.git("rev-parse", "HEAD")
+
+    def graph(self):
+        """Full extraction of the working tree: ({id: (type, source, hash)}, {edge keys})."""
+        files = self.git("ls-files").splitlines()
+        nodes, edges = {}, set()
+        for path, (found, links) in extract.extract_files(self.root, files, workers=1).items():
+            nodes.update((n["id"], (n["type"], n["source"], n["hash"])) for n in found)
+            edges.update(manifest.edge_key(e) for e in links)
+        return nodes, edges
+
+
+def small_base(kg):
+    kg.add("base/base_manifest.md", base_text(
+        [("a", "module", "a.py"), ("b", "module", "b.py"), ("c", "class", "c.py"),
+         ("d", "function", "c.py")],
+        [("a", "b", "imports"), ("b", "c", "imports"), ("c", "d", "defines"),
+         ("a", "c", "calls"), ("d", "a", "calls")]))
+
+
+def deep_copy_merge(base, overlay):
+    """Overlay_Merge_Resolution exactly as RAG-RULES.md words it, for comparison."""
+    nodes = copy.deepcopy(base.nodes)
+    edges = copy.deepcopy(base.edges)
+
+    def matching(edge):
+        key = manifest.edge_key(edge)
+        if key in edges:
+            return [key]
+        return [k for k in edges if k[0] == edge["source"] and k[1] == edge["target"]]
+
+    for node_id, _ in overlay.removed_nodes:
+        nodes.pop(node_id, None)
+        for key in [k for k in edges if node_id in k[:2]]:
+            del edges[key]
+    for edge in overlay.removed_edges:
+        for key in matching(edge):
+            del edges[key]
+    for node_id, field, _, new in overlay.modified_nodes:
+        if node_id in nodes:
+            column = manifest.NODE_FIELDS.get(field.lower())
+            if column:
+                nodes[node_id] = dict(nodes[node_id], **{column: new})
+            else:
+                nodes[node_id] = dict(nodes[node_id], changes=dict(
+                    nodes[node_id].get("changes", {}), **{field: new}))
+    for edge in overlay.modified_edges:
+        for key in matching(edge):
+            replaced = dict(edges.pop(key), type=edge["type"] or key[2])
+            if edge["change"]:
+                replaced["change"] = edge["change"]
+            edges[manifest.edge_key(replaced)] = replaced
+    for node in overlay.added_nodes:
+        nodes[node["id"]] = node
+    for edge in overlay.added_edges:
+        if edge["source"] in nodes and edge["target"] in nodes:
+            edges[manifest.edge_key(edge)] = edge
+    return {"nodes": sorted(nodes.values(), key=lambda n: n["id"]),
+            "edges": sorted(edges.values(), key=manifest.edge_key)}
+
+
+# --- overlay merge ----------------------------------------------------------
+
+@test
+def merge_applies_removals_modifications_then_additions():
+    with KGDir() as kg:
+        small_base(kg)
+        kg.add("overlays/feature--x/2026-06-02T0000_overlay.md", overlay_text(
+            "feature/x",
+            removed_nodes=["b"],
+            modified_nodes=[("c", "Content Hash", "h-c", "h-c2"), ("c", "visibility", "", "public")],
+            added_nodes=[("e", "function", "e.py"), ("a", "module", "a2.py")],
+            added_edges=[("e", "c", "calls"), ("e", "ghost", "calls")],
+            removed_edges=[("d", "a", "calls"), ("x", "y", "calls")],
+            modified_edges=[("a", "c", "imports", "calls -> imports")]))
+        view = merge.OverlayMerger(kg.root).effective("feature/x")
+        assert view.overlay.branch == "feature/x"
+        assert not view.has_node("b") and view.has_node("e")
+        assert view.node("c")["hash"] == "h-c2"
+        assert view.node("c")["changes"] == {"visibility": "public"}
+        assert view.node("a")["source"] == "a2.py", "an added node replaces the base one"
+        keys = {manifest.edge_key(e) for e in view.edges()}
+        assert keys == {("c", "d", "defines"), ("a", "c", "imports"), ("e", "c", "calls")}, keys
+        assert view.edge(("a", "c", "imports"))["change"] == "calls -> imports"
+        assert (view.node_count, view.edge_count) == (4, 3)
+        assert sorted(view.edges_of("c")) == [("a", "c", "imports"), ("c", "d", "defines"),
+                                             ("e", "c", "calls")]
+        warnings = "\n".join(view.warnings)
+        assert "orphaned: no node ghost" in warnings
+        assert "x -> y matches no edge" in warnings
+        assert "added node a already exists" in warnings
+        base = manifest.load_base(kg.root)
+        assert len(base.nodes) == 4 and len(base.edges) == 5, "the base is never modified"
+
+
+@test
+def copy_on_write_merge_matches_a_deep_copy_merge():
+    rng = random.Random(7)
+    nodes = [(f"n{i}", "function", f"f{i % 30}.py") for i in range(300)]
+    edges = sorted({(f"n{rng.randrange(300)}", f"n{rng.randrange(300)}",
+                     rng.choice(["calls", "imports"])) for _ in range(900)})
+    with KGDir() as kg:
+        kg.add("base/base_manifest.md", base_text(nodes, edges))
+        picked = rng.sample(edges, 60)
+        kg.add("overlays/topic/overlay.md", overlay_text(
+            "topic",
+            removed_nodes=[f"n{i}" for i in rng.sample(range(300), 15)],
+            modified_nodes=[(f"n{i}", "Type", "function", "method") for i in range(0, 300, 37)],
+            added_nodes=[(f"new{i}", "class", "new.py") for i in range(10)],
+            added_edges=[(f"new{i}", f"n{rng.randrange(300)}", "calls") for i in range(20)],
+            removed_edges=picked[:30],
+            modified_edges=[(s, t, "uses", "retyped") for s, t, _ in picked[30:]]))
+        view = merge.OverlayMerger(kg.root).effective("topic")
+        expected = deep_copy_merge(view.base, view.overlay)
+        assert view.to_dict() == expected
+        assert (view.node_count, view.edge_count) == (len(expected["nodes"]),
+                                                      len(expected["edges"]))
+
+
+@test
+def merger_reuses_views_across_branch_switches():
+    with KGDir() as kg:
+        small_base(kg)
+        one = kg.add("overlays/one/overlay.md", overlay_text("one", removed_nodes=["d"]))
+        kg.add("overlays/two/overlay.md", overlay_text("two", added_nodes=[("z", "class", "z.py")]))
+        merger = merge.OverlayMerger(kg.root)
+        first, second = merger.effective("one"), merger.effective("two")
+        assert merger.effective("one") is first and merger.effective("two") is second
+        assert merger.effective("main").overlay is None, "the default branch is the base"
+        assert merger.stats()["hits"] == 2
+
+        kg.add("overlays/one/overlay.md", overlay_text("one", removed_nodes=["c"]))
+        os.utime(one, ns=(0, 10 ** 18))
+        changed = merger.effective("one")
+        assert changed is not first and changed.has_node("d") and not changed.has_node("c")
+        assert merger.effective("two") is second, "other branches keep their views"
+        assert changed.base is second.base, "the base is not re-read for an overlay change"
+
+        kg.add("overlays/two/overlay_manifest.md",
+               "# Overlay Manifest\n\n## Metadata\n- **Generated**: 2026-07-01T00:00:00Z\n"
+               "- **Status**: STALE\n")
+        stale = merger.effective("two")
+        assert stale.overlay.stale and stale.summary()["stale"]
+        assert any("STALE" in warning for warning in stale.warnings)
+
+        kg.add("base/base_manifest.md", base_text([("a", "module", "a.py")], [], commit="beef"))
+        rebased = merger.effective("one")
+        assert rebased.base.commit == "beef" and not rebased.has_node("d")
+        assert any("built against c0ffee1" in warning for warning in rebased.warnings)
+
+
+@test
+def snapshot_serves_the_same_base_until_the_manifest_changes():
+    rng = random.Random(11)
+    nodes = [(f"pkg/m{i}.py::Ünï{i}", rng.choice(["class", "function"]), f"pkg/m{i % 40}.py")
+             for i in range(400)]
+    ids = [n for n, _, _ in nodes] + ["ghost", "zz/outside"]  # edge ends outside the registry
+    edges = sorted({(rng.choice(ids), rng.choice(ids), rng.choice(["calls", "imports"]))
+                    for _ in range(1500)} | {(ids[0], ids[0], "calls")})
+    with KGDir() as kg:
+        path = kg.add("base/base_manifest.md", base_text(nodes, edges))
+        parsed = manifest.load_base(kg.root, use_snapshot=False)
+        assert manifest.load_base(kg.root).__class__ is manifest.Base, "first load parses"
+        snapped = manifest.load_base(kg.root)
+        assert isinstance(snapped, snapshot.SnapshotBase)
+        assert snapped.digest == parsed.digest and snapped.metadata == parsed.metadata
+        assert dict(snapped.nodes.items()) == parsed.nodes and len(snapped.nodes) == 400
+        assert dict(snapped.edges.items()) == parsed.edges
+        assert list(snapped.edges) == list(parsed.edges)
+        assert len(snapped.edges) == len(parsed.edges)
+        for node_id in ids + ["missing", ""]:
+            assert (node_id in snapped.nodes) == (node_id in parsed.nodes), node_id
+            assert sorted(snapped.incident(node_id)) == sorted(parsed.incident(node_id)), node_id
+        assert ("ghost", "nowhere", "calls") not in snapped.edges
+        assert snapped.nodes.get("ghost") is None, "an edge end is not a registry node"
+
+        kg.add("overlays/topic/overlay.md", overlay_text(
+            "topic", removed_nodes=[ids[3]], added_nodes=[("new", "class", "new.py")],
+            added_edges=[("new", ids[5], "calls")], removed_edges=edges[:20]))
+        from_markdown = merge.EffectiveGraph(parsed, manifest.load_overlay(kg.root, "topic"))
+        from_snapshot = merge.EffectiveGraph(snapped, manifest.load_overlay(kg.root, "topic"))
+        assert from_snapshot.to_dict() == from_markdown.to_dict()
+
+        os.utime(path, ns=(1, 1))  # same bytes: the digest still matches
+        assert isinstance(manifest.load_base(kg.root), snapshot.SnapshotBase)
+        reopened = snapshot.Snapshot(snapshot.snapshot_path(kg.root))
+        assert reopened.manifest_stat[2] == 1, "the new stat is recorded, so no more hashing"
+        reopened.close()
+        with open(path, encoding="utf-8") as handle:
+            text = handle.read()
+        kg.add("base/base_manifest.md", text.replace("| ghost |", "| spectre |", 1)
+               if "| ghost |" in text else text + "\n")
+        edited = manifest.load_base(kg.root)
+        assert edited.__class__ is manifest.Base, "a hand edit invalidates the snapshot"
+        assert edited.digest != parsed.digest
+        assert manifest.load_base(kg.root).digest == edited.digest, "rewritten from markdown"
+
+
+# --- code extraction ------------------------------------------------------------
+
+def write_tree(root, files):
+    for relpath, text in files.items():
+        path = os.path.join(root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(text)
+
+
+def extracted_graph(root, relpaths, **options):
+    nodes, edges = {}, set()
+    for found, links in extract.extract_files(root, relpaths, **options).values():
+        nodes.update((node["id"], (node["type"], node["hash"])) for node in found)
+        edges.update(manifest.edge_key(edge) for edge in links)
+    return nodes, edges
+
+
+@test
+def extractor_resolves_imports_inheritance_and_calls():
+    with KGDir() as kg:
+        write_tree(kg.root, {
+            "app/__init__.py": "",
+            "app/models.py": "class Model:\n    def save(self):\n        return self.validate()\n\n"
+                             "    def validate(self):\n        return True\n",
+            "app/users.py": "import os\nfrom .models import Model\nfrom app import models as m\n\n\n"
+                            "class User(Model):\n    def save(self):\n        os.getcwd()\n"
+                            "        return super().save()\n\n\n"
+                            "class Admin(m.Model):\n    pass\n\n\n"
+                            "def make():\n    return User()\n\n\nmake()\n",
+            "broken.py": "def (:\n",
+            "notes.txt": "hello\n",
+        })
+        nodes, edges = extracted_graph(kg.root, extract.repository_files(kg.root), workers=1)
+        assert nodes["app/users.py::User.save"][0] == "method"
+        assert nodes["notes.txt"][0] == "file" and "broken.py" in nodes
+        expected = {
+            ("app/users.py", "app/models.py", "imports"),
+            ("app/users.py", "app/users.py::User", "defines"),
+            ("app/users.py::User", "app/users.py::User.save", "defines"),
+            ("app/users.py::User", "app/models.py::Model", "inherits"),
+            ("app/users.py::Admin", "app/models.py::Model", "inherits"),
+            ("app/models.py::Model.save", "app/models.py::Model.validate", "calls"),
+            ("app/users.py::make", "app/users.py::User", "calls"),
+            ("app/users.py", "app/users.py::make", "calls"),
+        }
+        assert expected <= edges, expected - edges
+        assert not [key for key in edges if "os" in key[1].split("/")], "stdlib is not a node"
+
+        # Linking sees nodes outside the batch only through `exists`.
+        alone = extract.extract_files(kg.root, ["app/users.py"], workers=1)["app/users.py"][1]
+        assert not [e for e in alone if e["type"] == "inherits"]
+        linked = extract.extract_files(kg.root, ["app/users.py"], workers=1,
+                                       exists=lambda node_id: node_id in nodes)
+        assert ("app/users.py::User", "app/models.py::Model", "inherits") in {
+            manifest.edge_key(e) for e in linked["app/users.py"][1]}
+
+
+@test
+def extract_cache_reparses_only_changed_content():
+    with KGDir() as kg:
+        files = {f"pkg/m{i}.py": f"from pkg import m{(i + 1) % 40}\n\n\ndef f{i}():\n"
+                                 f"    return m{(i + 1) % 40}.f{(i + 1) % 40}()\n"
+                 for i in range(40)}
+        files["pkg/__init__.py"] = ""
+        write_tree(os.path.join(kg.root, "repo"), files)
+        root = os.path.join(kg.root, "repo")
+        relpaths = sorted(files)
+
+        def run():
+            cache = extract.ExtractCache.for_kg_dir(kg.root)
+            stats = {}
+            graph = extracted_graph(root, relpaths, cache=cache, stats=stats)
+            cache.retain(relpaths)
+            cache.save()
+            return graph, stats
+
+        cold, stats = run()
+        assert stats["parsed"] == 41 and stats["cached"] == 0, stats
+        assert ("pkg/m3.py::f3", "pkg/m4.py::f4", "calls") in cold[1]
+        warm, stats = run()
+        assert warm == cold and stats["parsed"] == 0, stats
+
+        write_tree(root, {"pkg/m5.py": "def f5():\n    return 0\n"})
+        os.utime(os.path.join(root, "pkg/m7.py"), ns=(1, 10 ** 18))  # mtime only
+        os.rename(os.path.join(root, "pkg/m9.py"), os.path.join(root, "pkg/n9.py"))
+        relpaths = sorted(set(relpaths) - {"pkg/m9.py"} | {"pkg/n9.py"})
+        changed, stats = run()
+        assert stats["parsed"] == 1, f"only the edited file is parsed: {stats}"
+        assert changed == extracted_graph(root, relpaths, workers=1), "same as no cache"
+        assert ("pkg/m4.py::f4", "pkg/m5.py::f5", "calls") in changed[1]
+        assert ("pkg/m5.py", "pkg/m6.py", "imports") not in changed[1]
+
+        path = os.path.join(kg.root, extract.CACHE_FILE)
+        with open(path, encoding="utf-8") as handle:
+            data = json.load(handle)
+        assert "pkg/n9.py" in data["files"] and "pkg/m9.py" not in data["files"]
+        data["extractor"] = -1
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(data, handle)
+        _, stats = run()
+        assert stats["parsed"] == 41, "a cache from another extractor version is ignored"
+
+
+@test
+def base_manifest_is_built_from_the_extraction():
+    with KGDir() as kg:
+        repo = GitRepo(os.path.join(kg.root, "repo"))
+        repo.write("a.py", "import b\n\n\ndef run():\n    return b.go()\n")
+        repo.write("b.py", "def go():\n    return 1\n")
+        commit = repo.commit("base")
+        kg_dir = os.path.join(kg.root, "kg")
+        summary = base.build_base(repo.root, kg_dir, workers=1)
+        loaded = manifest.load_base(kg_dir)
+        assert loaded.commit == commit and loaded.branch == "main"
+        nodes, edges = repo.graph()
+        assert {n: (v["type"], v["source"], v["hash"]) for n, v in loaded.nodes.items()} == nodes
+        assert set(loaded.edges) == edges and ("a.py::run", "b.py::go", "calls") in edges
+        assert summary["nodes"] == len(nodes) and summary["parsed"] == 2
+        assert base.build_base(repo.root, kg_dir, workers=1)["parsed"] == 0
+        repo.git("checkout", "-q", "-b", "topic")
+        try:
+            base.build_base(repo.root, kg_dir)
+            raise AssertionError("built a base off the default branch")
+        except manifest.GitKGError:
+            pass
+
+
+# --- overlay construction ---------------------------------------------------
+
+@test
+def overlay_from_git_diff_merges_to_a_full_extraction():
+    with KGDir() as kg:
+        repo = GitRepo(os.path.join(kg.root, "repo"))
+        repo.write("pkg/__init__.py", "")
+        repo.write("pkg/util.py", "def helper():\n    return 1\n")
+        repo.write("pkg/core.py", "from pkg import util\n\n\nclass Engine:\n"
+                                  "    def run(self):\n        return util.helper()\n\n\n"
+                                  "def start():\n    return Engine()\n")
+        repo.write("pkg/cli.py", "from pkg import util\n")
+        repo.write("pkg/old.py", "import pkg.core\n\n\ndef legacy():\n    pass\n")
+        repo.write("README.md", "demo\n")
+        commit = repo.commit("base")
+        nodes, edges = repo.graph()
+        kg.add("kg/base/base_manifest.md", manifest.render_base(
+            "demo", {"Base Commit": commit, "Default Branch": "main",
+                     "Generated": "2026-06-01T00:00:00Z"},
+            [{"id": i, "type": t, "source": f, "hash": h} for i, (t, f, h) in nodes.items()],
+            [{"source": a, "target": b, "type": r} for a, b, r in edges]))
+
+        repo.git("checkout", "-q", "-b", "feature/x")
+        repo.write("pkg/core.py", "from pkg import util\n\n\nclass Engine:\n"
+                                  "    def run(self):\n        return util.helper() + 1\n\n"
+                                  "    def stop(self):\n        pass\n\n\n"
+                                  "def start():\n    return Engine()\n")
+        os.remove(os.path.join(repo.root, "pkg/old.py"))
+        repo.git("mv", "pkg/util.py", "pkg/helpers.py")  # cli.py depends on it
+        repo.write("pkg/new.py", "from . import helpers\n\n\ndef fresh():\n    pass\n")
+        repo.commit("feature")
+        repo.write("README.md", "demo, edited\n")  # uncommitted, still in the overlay
+
+        calls = []
+        run = git.run
+
+        def counting(path, *args):
+            calls.append(args[0])
+            return run(path, *args)
+
+        git.run = counting
+        try:
+            summary = overlay.build_overlay(repo.root, os.path.join(kg.root, "kg"), depth=1)
+        finally:
+            git.run = run
+        assert calls.count("diff") == 1, calls
+        assert summary["files_changed"] == 6 and summary["dependents"] == 1, summary
+        assert os.path.exists(os.path.join(kg.root, "kg/overlays/feature--x/overlay_manifest.md"))
+
+        view = merge.OverlayMerger(os.path.join(kg.root, "kg")).effective("feature/x")
+        assert view.overlay.branch == "feature/x" and not view.warnings, view.warnings
+        assert {f for f, _ in view.overlay.files} >= {"pkg/util.py", "pkg/helpers.py", "README.md"}
+        expected_nodes, expected_edges = repo.graph()
+        merged = {n["id"]: (n["type"], n["source"], n["hash"]) for n in view.nodes()}
+        assert merged == expected_nodes, set(merged) ^ set(expected_nodes)
+        assert {manifest.edge_key(e) for e in view.edges()} == expected_edges
+        assert ("pkg/cli.py", "pkg/__init__.py", "imports") in expected_edges, \
+            "the unchanged importer of a renamed module was re-analyzed"
+
+        repo.git("checkout", "-q", "main")
+        repo.git("checkout", "-q", "--", ".")
+        skipped = overlay.build_overlay(repo.root, os.path.join(kg.root, "kg"))
+        assert skipped["written"] is None and "default branch" in skipped["skipped"]
+
+
+@test
+def base_refresh_patches_the_delta_and_invalidates_overlapping_overlays():
+    with KGDir() as kg:
+        repo = GitRepo(os.path.join(kg.root, "repo"))
+        repo.write("pkg/__init__.py", "")
+        repo.write("pkg/util.py", "def helper():\n    return 1\n")
+        repo.write("pkg/core.py", "from pkg import util\n\n\ndef start():\n"
+                                  "    return util.helper()\n")
+        repo.write("pkg/cli.py", "from pkg import core\n")
+        for number in range(6):
+            repo.write(f"pkg/mod{number}.py", f"def f{number}():\n    return {number}\n")
+        first = repo.commit("base")
+        kg_dir = os.path.join(kg.root, "kg")
+        base.build_base(repo.root, kg_dir, workers=1)
+        for branch, path in (("feature/core", "pkg/core.py"), ("feature/mod", "pkg/mod5.py")):
+            repo.git("checkout", "-q", "-b", branch, "main")
+            repo.write(path, "def edited():\n    pass\n")
+            repo.commit(branch)
+            overlay.build_overlay(repo.root, kg_dir, workers=1)
+        repo.git("checkout", "-q", "main")
+
+        # util.py renames helper(), so core.py (a dependent) loses its call
+        # edge; mod0.py is deleted, and mod1.py gains a call into util.py.
+        repo.write("pkg/util.py", "def helper2():\n    return 2\n")
+        os.remove(os.path.join(repo.root, "pkg/mod0.py"))
+        repo.write("pkg/mod1.py", "from pkg import util\n\n\ndef f1():\n"
+                                  "    return util.helper2()\n")
+        head = repo.commit("main moves on")
+        summary = base.refresh_base(repo.root, kg_dir, workers=1)
+        assert summary["mode"] == "incremental" and summary["refreshed_from"] == first
+        assert summary["parsed"] == 3, summary  # util.py, mod1.py, and core.py
+        assert summary["stale_overlays"] == ["feature/core"], summary
+
+        loaded = manifest.load_base(kg_dir)
+        nodes, edges = repo.graph()
+        assert loaded.commit == head
+        assert {n: (v["type"], v["source"], v["hash"]) for n, v in loaded.nodes.items()} == nodes
+        assert set(loaded.edges) == edges and ("pkg/mod1.py::f1", "pkg/util.py::helper2",
+                                               "calls") in edges
+        assert [node_id for node_id in loaded.nodes] == sorted(loaded.nodes), "registry order"
+        keys = [edge["key"] for edge in loaded.edges.values()]
+        assert len(set(keys)) == len(keys), "edge keys stay unique"
+        assert loaded.metadata["Node Count"] == str(len(nodes))
+
+        stale = manifest.load_overlay(kg_dir, "feature/core")
+        assert stale.stale and stale.base_commit == first
+        valid = manifest.load_overlay(kg_dir, "feature/mod")
+        assert not valid.stale and valid.base_commit == head and valid.merge_base == first
+        view = merge.OverlayMerger(kg_dir).effective("feature/mod")
+        assert not any("built against" in warning for warning in view.warnings), view.warnings
+
+        again = base.refresh_base(repo.root, kg_dir, workers=1)
+        assert again["mode"] == "unchanged" and again["stale_overlays"] == []
+        manifest_path = os.path.join(kg_dir, "base", "base_manifest.md")
+        with open(manifest_path, encoding="utf-8") as handle:
+            text = handle.read()
+        with open(manifest_path, "w", encoding="utf-8") as handle:
+            handle.write(text.replace("**Extractor Version**:", "**Extractor Version**: 0 ("))
+        assert base.refresh_base(repo.root, kg_dir, workers=1)["mode"] == "full"
+
+
+@test
+def default_branch_override_comes_from_project_support_settings():
+    with KGDir() as kg:
+        repo = GitRepo(os.path.join(kg.root, "repo"))
+        repo.write("a.py", "def a():\n    return 1\n")
+        repo.commit("base")
+        repo.git("checkout", "-q", "-b", "trunk")
+        kg_dir = os.path.join(kg.root, "kg")
+        try:
+            base.build_base(repo.root, kg_dir, workers=1)
+            raise AssertionError("trunk is not the default branch without the override")
+        except manifest.GitKGError:
+            pass
+        settings = copy.deepcopy(overlay.load_memory_settings())
+        git_aware = settings["memory_rules"]["project_support"]["git_aware_kg"]
+        git_aware["default_branch_override"] = "trunk"
+        load = overlay.load_memory_settings
+        overlay.load_memory_settings = lambda: settings
+        try:
+            assert overlay.git_aware_settings()[0] == "trunk"
+            assert base.build_base(repo.root, kg_dir, workers=1)["branch"] == "trunk"
+        finally:
+            overlay.load_memory_settings = load
+
+
+@test
+def refresh_on_pull_is_off_until_the_git_aware_kg_is_enabled():
+    with KGDir() as kg:
+        repo = GitRepo(os.path.join(kg.root, "repo"))
+        repo.write("a.py", "def a():\n    return 1\n")
+        first = repo.commit("base")
+        kg_dir = os.path.join(kg.root, "kg")
+        base.build_base(repo.root, kg_dir, workers=1)
+        repo.write("a.py", "def a():\n    return 2\n")
+        head = repo.commit("pulled")
+        argv = ["refresh", "--on-pull", "--repo", repo.root, "--kg-dir", kg_dir, "--workers", "1"]
+        settings = copy.deepcopy(overlay.load_memory_settings())
+        git_aware = settings["memory_rules"]["project_support"]["git_aware_kg"]
+        assert git_aware["enabled"] is False, "the shipped default"
+        load = overlay.load_memory_settings
+        overlay.load_memory_settings = lambda: settings
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                assert cli.main(argv) == 0
+                assert manifest.load_base(kg_dir).commit == first, "refreshed while disabled"
+                git_aware.update(enabled=True, base_refresh_on_pull=False)
+                assert cli.main(argv) == 0
+                assert manifest.load_base(kg_dir).commit == first, "refreshed with the hook off"
+                git_aware["base_refresh_on_pull"] = True
+                assert cli.main(argv) == 0
+        finally:
+            overlay.load_memory_settings = load
+        assert manifest.load_base(kg_dir).commit == head
+
+
+# --- overlay lifecycle ------------------------------------------------------
+
+@test
+def overlay_gc_joins_branches_once_and_prunes_only_with_consent():
+    with KGDir() as kg:
+        repo = GitRepo(os.path.join(kg.root, "repo"))
+        repo.write("a.py", "def a():\n    return 1\n")
+        repo.write("b.py", "import a\n")
+        repo.commit("base")
+        kg_dir = os.path.join(kg.root, "kg")
+        base.build_base(repo.root, kg_dir, workers=1)
+        branches = ("feature/live", "feature/moved", "feature/stale", "feature/old",
+                    "feature/recent")
+        for number, branch in enumerate(branches):
+            repo.git("checkout", "-q", "-b", branch, "main")
+            repo.write("a.py", f"def a():\n    return {number + 2}\n")
+            repo.commit(branch)
+            overlay.build_overlay(repo.root, kg_dir, workers=1)
+        repo.git("checkout", "-q", "feature/moved")
+        repo.write("b.py", "import a\n\n\ndef b():\n    return a.a()\n")
+        moved = repo.commit("moved on")
+        repo.git("checkout", "-q", "main")
+        for branch in ("feature/old", "feature/recent"):
+            repo.git("branch", "-q", "-D", branch)
+        old_dir = os.path.join(kg_dir, "overlays", "feature--old")
+        for name in os.listdir(old_dir):
+            path = os.path.join(old_dir, name)
+            with open(path, encoding="utf-8") as handle:
+                text = handle.read()
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write(text.replace("**Generated**: 2026", "**Generated**: 2025"))
+        stale_manifest = os.path.join(kg_dir, "overlays", "feature--stale",
+                                      manifest.OVERLAY_MANIFEST)
+        with open(stale_manifest, encoding="utf-8") as handle:
+            text = handle.read()
+        with open(stale_manifest, "w", encoding="utf-8") as handle:
+            handle.write(text.replace("**Status**: VALID", "**Status**: STALE"))
+
+        settings = copy.deepcopy(overlay.load_memory_settings())
+        settings["memory_rules"]["cleanup_guidance"].update(batch_cleanup_limit=10,
+                                                            require_user_consent=True)
+        calls = []
+        run = git.run
+
+        def counting(path, *args):
+            calls.append(args[0])
+            return run(path, *args)
+
+        git.run = counting
+        try:
+            records = {r["branch"]: r for r in lifecycle.scan(repo.root, kg_dir, settings)}
+        finally:
+            git.run = run
+        assert calls == ["for-each-ref"], calls
+        assert {b: r["state"] for b, r in records.items()} == {
+            "feature/live": "active", "feature/moved": "outdated", "feature/stale": "stale",
+            "feature/old": "expired", "feature/recent": "orphaned"}, records
+        assert records["feature/old"]["action"] == "prune"
+        assert records["feature/recent"]["action"] is None
+        kept = copy.deepcopy(settings)
+        kept["memory_rules"]["project_support"]["git_aware_kg"].update(
+            overlay_retention_days=3650, stale_overlay_auto_rebuild=False)
+        kept = {r["branch"]: r for r in lifecycle.scan(repo.root, kg_dir, kept)}
+        assert kept["feature/old"]["state"] == "orphaned", "overlay_retention_days applies"
+        assert not any(r["action"] for r in kept.values()), "stale_overlay_auto_rebuild applies"
+
+        state = lifecycle.propose(repo.root, kg_dir, settings)
+        batches = {b["action"]: b for b in state["batches"]}
+        assert batches["prune"]["status"] == "pending"
+        assert batches["rebuild"]["status"] == "approved"
+        assert {o["branch"] for o in batches["rebuild"]["overlays"]} == {"feature/moved",
+                                                                          "feature/stale"}
+        done = lifecycle.apply(repo.root, kg_dir, settings=settings)
+        assert done["pruned"] == [] and sorted(done["rebuilt"]) == ["feature/moved",
+                                                                    "feature/stale"], done
+        assert os.path.isdir(old_dir), "pruned without consent"
+        rebuilt = manifest.load_overlay(kg_dir, "feature/moved")
+        assert rebuilt.metadata["Head Commit"] == moved and not rebuilt.stale
+        assert git.current_branch(repo.root) == "main"
+        assert "gitkg-gc" not in repo.git("worktree", "list")
+
+        assert lifecycle.approve(kg_dir, [batches["prune"]["id"]]) == [batches["prune"]["id"]]
+        done = lifecycle.apply(repo.root, kg_dir, settings=settings)
+        assert done["pruned"] == ["feature/old"] and not os.path.exists(old_dir)
+        assert os.listdir(os.path.join(kg_dir, "overlays", lifecycle.PRUNED_DIR))
+        states = {r["branch"]: r["state"] for r in lifecycle.scan(repo.root, kg_dir, settings)}
+        assert states == {"feature/live": "active", "feature/moved": "active",
+                          "feature/stale": "active", "feature/recent": "orphaned"}, states
+
+
+# --- cross-branch analysis --------------------------------------------------
+
+@test
+def cross_branch_scores_collisions_and_orders_merges():
+    with KGDir() as kg:
+        small_base(kg)
+        kg.add("overlays/one/overlay.md", overlay_text(
+            "one", removed_nodes=["d"],
+            modified_nodes=[("c", "Content Hash", "h-c", "h-one"), ("c", "Type", "class", "enum")]))
+        kg.add("overlays/two/overlay.md", overlay_text(
+            "two", modified_nodes=[("c", "Content Hash", "h-c", "h-two")],
+            added_nodes=[("z", "class", "z.py")], added_edges=[("z", "a", "imports")]))
+        kg.add("overlays/three/overlay.md", overlay_text(
+            "three", modified_nodes=[("d", "Content Hash", "h-d", "h-three")],
+            added_nodes=[("z", "class", "z.py")], added_edges=[("z", "a", "imports")]))
+        kg.add("overlays/four/overlay.md", overlay_text("four", added_nodes=[("y", "class", "y.py")]))
+        kg.add("overlays/old/overlay.md", overlay_text("old", merge_base="0ld", removed_nodes=["c"]))
+
+        report = cross_branch.analyze(kg.root, threshold=0.5)
+        assert report["compared"] == ["four", "one", "three", "two"], report["compared"]
+        assert {row["branch"]: row["status"] for row in report["branches"]}["old"] == "STALE"
+        kinds = {row["entity"]: (row["kind"], row["risk"], row["branches"])
+                 for row in report["conflicts"]}
+        assert kinds["c"] == ("DIVERGENT", 0.7, ["one", "two"]), kinds["c"]
+        assert kinds["d"] == ("DIVERGENT", 0.9, ["one", "three"])
+        assert kinds["z"] == ("CONVERGENT", 0.1, ["three", "two"])
+        assert kinds["z -> a (imports)"][0] == "CONVERGENT"
+        assert report["pairs_compared"] == 3, "pairs without a shared entity are never compared"
+        assert [(row["entity"], row["score"]) for row in report["semantic"]] == [("d", 0.9),
+                                                                                 ("c", 0.7)]
+        order = [name for name, _ in report["merge_order"]]
+        assert order[0] == "four" and order[-1] == "one", order
+
+        path = cross_branch.write_report(kg.root, report, "demo")
+        assert os.path.dirname(path) == os.path.join(kg.root, "cross_branch")
+        with open(path, encoding="utf-8") as handle:
+            tables = parse_tables(handle.read())
+        assert len(tables["Semantic Conflicts"]) == 2 and len(tables["Branch Summary"]) == 5
+        assert cross_branch.analyze(kg.root, include_stale=True)["compared"][1] == "old"
+
+
+@test
+def cross_branch_index_finds_what_all_pairs_comparison_finds():
+    rng = random.Random(11)
+    nodes = [(f"n{i}", "function", f"f{i % 40}.py") for i in range(400)]
+    with KGDir() as kg:
+        kg.add("base/base_manifest.md", base_text(nodes, []))
+        for b in range(40):
+            picked = rng.sample(range(400), 8)
+            kg.add(f"overlays/b{b}/overlay.md", overlay_text(
+                f"b{b}", removed_nodes=[f"n{i}" for i in picked[:2]],
+                modified_nodes=[(f"n{i}", "Content Hash", "", rng.choice("xy"))
+                                for i in picked[2:]]))
+        report = cross_branch.analyze(kg.root, threshold=0.0, max_branches=0)
+        assert len(report["compared"]) == 40
+        overlays = {name: manifest.load_overlay(kg.root, name) for name in report["compared"]}
+        expected = set()
+        for first, second in itertools.combinations(sorted(overlays), 2):
+            mine = cross_branch.signatures(overlays[first])
+            theirs = cross_branch.signatures(overlays[second])
+            for entity in set(mine) & set(theirs):
+                expected.add((entity[1], first, second))
+        found = {(row["entity"], row["branch_a"].split(":")[0], row["branch_b"].split(":")[0])
+                 for row in report["semantic"]}
+        assert found == expected, len(found ^ expected)
+        assert report["pairs_compared"] == len({(a, b) for _, a, b in expected})
+
+
+@test
+def cross_branch_reads_project_support_settings():
+    with KGDir() as kg:
+        small_base(kg)
+        kg.add("overlays/one/overlay.md", overlay_text(
+            "one", removed_nodes=["d"], modified_nodes=[("c", "Content Hash", "h-c", "h-one")]))
+        kg.add("overlays/two/overlay.md", overlay_text(
+            "two", modified_nodes=[("c", "Content Hash", "h-c", "h-two")]))
+        kg.add("overlays/three/overlay.md", overlay_text(
+            "three", modified_nodes=[("d", "Content Hash", "h-d", "h-three")]))
+        settings = copy.deepcopy(overlay.load_memory_settings())
+        git_aware = settings["memory_rules"]["project_support"]["git_aware_kg"]
+        git_aware["cross_branch_analysis"].update(conflict_score_threshold=0.8,
+                                                  max_branches_to_compare=2)
+        load = overlay.load_memory_settings
+        overlay.load_memory_settings = lambda: settings
+        try:
+            report = cross_branch.analyze(kg.root)
+        finally:
+            overlay.load_memory_settings = load
+        assert report["threshold"] == 0.8 and report["compared"] == ["one", "three"], report
+        assert [(row["entity"], row["score"]) for row in report["semantic"]] == [("d", 0.9)]
+        assert len(cross_branch.analyze(kg.root)["compared"]) == 3, "default cap is 10"
+
+
+# --- runner ----------------------------------------------------------------
+
+def main():
+    passed = failed = 0
+    for fn in _results:
+        try:
+            fn()
+            print(f"PASS  {fn.__name__}")
+            passed += 1
+        except Exception as exc:  # noqa: BLE001
+            print(f"FAIL  {fn.__name__}: {exc}")
+            failed += 1
+    print(f"\n{passed}/{passed + failed} passed, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,831 @@
+#!/usr/bin/env python3
+"""Test harness for the reference kg MCP server (agentic_rules.kg).
+
+Hermetic: every check opens a throwaway SQLite graph under a temp directory
+and never touches a real knowledge_graph directory.
+
+Covers:
+  * add / get_node round trip, validation errors, list filters
+  * the bi-temporal write path: supersedes invalidates only a still-valid
+    target, as_of reconstructs the past, retire invalid/expired/restore
+  * the interval index against a brute-force visibility scan, the
+    materialized current view across writes, and index rebuilds after
+    another process (a second graph instance) writes
+  * the supersession index: heads and lengths of deep chains, forks,
+    merged histories, rebuilding it for older databases, and kg_context
+    following an edge to an old version through to its head
+  * hybrid retrieval: subword matches from the vector channel, both
+    fusion modes, a pluggable reranker, bounded recency decay, stage
+    timings, and BM25-only answers while a large vector backlog warms up
+  * precomputed centrality: PageRank and hop counts on a star, incremental
+    refreshes equal to a full rebuild (including weight upserts), the
+    edge-aware boost, and a large edge backlog refreshed in the background
+  * the result cache: normalized keys, per-scope invalidation (including
+    neighbours in other scopes), writes from another process, expiry at
+    the next validity boundary, hit and savings counters
+  * links: relation validation, contradicts keeps both sides visible,
+    superseded neighbours surface as pointers in kg_context
+  * MCP dispatch: initialize, tools/list, tools/call, isError results,
+    JSON-RPC errors, notifications
+  * the HTTP transport end to end, and concurrent kg_context readers
+    sharing the connection pool with a writer
+  * bulk JSONL export and import: a round trip that keeps temporal fields
+    and supersession chains, resuming an interrupted import from its
+    checkpoint, idempotent re-imports, and rejected lines
+  * the analysis script sandbox: parallel runs, the import allow-list,
+    memory, CPU, wall-clock and output limits, and the run log
+
+Run:  python agentic_rules/tests/test_kg.py
+Exit: 0 if all pass, 1 otherwise.
+"""
+
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+from agentic_rules.kg import KGError, KnowledgeGraph  # noqa: E402
+from agentic_rules.kg import (centrality, retrieval, sandbox, server, temporal, tools,  # noqa: E402
+                              transfer)
+from agentic_rules.kg.interval import END_OF_TIME, IntervalIndex  # noqa: E402
+
+_results = []
+
+
+def test(fn):
+    _results.append(fn)
+    return fn
+
+
+# --- helpers ---------------------------------------------------------------
+
+class Graph:
+    """A temp graph for one test: `with Graph() as kg: ...`."""
+
+    def __enter__(self):
+        self.dir = tempfile.mkdtemp(prefix="kg-test-")
+        self.kg = KnowledgeGraph(os.path.join(self.dir, "kg.sqlite3"), pool_size=4)
+        return self.kg
+
+    def __exit__(self, *exc):
+        self.kg.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def expect_error(fn, *args, **kwargs):
+    try:
+        fn(*args, **kwargs)
+    except KGError as exc:
+        return str(exc)
+    raise AssertionError(f"{fn.__name__} accepted {args} {kwargs}")
+
+
+def rpc(mcp, method, params=None, message_id=1):
+    message = {"jsonrpc": "2.0", "id": message_id, "method": method}
+    if params is not None:
+        message["params"] = params
+    return mcp.handle(message)
+
+
+# --- graph -----------------------------------------------------------------
+
+@test
+def add_and_get_node_round_trip():
+    with Graph() as kg:
+        node = kg.add("gotcha", "Pool leak in fixtures", "Release connections in finally.",
+                      scope="proj-a", tags=["testing", "db"], priority=7)
+        got = kg.get_node(node["id"])
+        assert got["title"] == "Pool leak in fixtures"
+        assert got["tags"] == ["testing", "db"]
+        assert got["status"] == "current"
+        assert got["chain"] == [node["id"]]
+        assert got["valid_at"] == got["created_at"]
+        assert "type must be" in expect_error(kg.add, "opinion", "t", "c")
+        assert "priority" in expect_error(kg.add, "rule", "t", "c", priority=11)
+        assert "unknown node" in expect_error(kg.get_node, "missing")
+        assert "already exists" in expect_error(kg.add, "rule", "t", "c", id=node["id"])
+
+
+@test
+def supersedes_invalidates_old_node_and_as_of_sees_the_past():
+    with Graph() as kg:
+        old = kg.add("fact", "Deploy target", "Deploys go to the staging-eu cluster.",
+                     valid_from="2026-01-01")
+        new = kg.add("fact", "Deploy target", "Deploys go to the staging-us cluster.",
+                     valid_from="2026-06-01", supersedes=old["id"])
+        old_now = kg.node(old["id"])
+        assert old_now["invalid_at"] == new["valid_at"], "ended when the replacement began"
+        assert old_now["expired_at"] is None, "superseding is not a retraction"
+        assert [n["id"] for n in kg.query("deploy cluster")] == [new["id"]]
+        past = kg.query("deploy cluster", as_of="2026-03-01")
+        assert [n["id"] for n in past] == [old["id"]]
+        both = kg.query("deploy cluster", include_expired=True)
+        assert {n["status"] for n in both} == {"current", "invalid"}
+        assert kg.chain(old["id"]) == [old["id"], new["id"]]
+
+        # A second replacement never rewrites the history already recorded.
+        kg.link(kg.add("fact", "Deploy target", "Deploys go to staging-ap.")["id"],
+                old["id"], "supersedes")
+        assert kg.node(old["id"])["invalid_at"] == new["valid_at"]
+
+
+@test
+def retire_modes_and_restore():
+    with Graph() as kg:
+        node = kg.add("rule", "Use tabs", "Indent with tabs.", valid_from="2026-01-01")
+        kg.retire(node["id"], "invalid", at="2026-05-01")
+        assert kg.query("indent tabs") == []
+        assert kg.query("indent tabs", as_of="2026-04-01")[0]["id"] == node["id"]
+        kg.retire(node["id"], "restore")
+        assert kg.get_node(node["id"])["status"] == "current"
+        kg.retire(node["id"], "expired")
+        assert kg.get_node(node["id"])["status"] == "expired"
+        assert kg.list_nodes() == []
+        assert kg.list_nodes(include_expired=True)[0]["status"] == "expired"
+        assert "mode must be" in expect_error(kg.retire, node["id"], "delete")
+
+
+@test
+def supersession_index_resolves_heads_of_deep_chains():
+    with Graph() as kg:
+        versions = [kg.add("fact", "Timeout", "Version 0 of the timeout.")["id"]]
+        for i in range(1, 30):
+            versions.append(kg.add("fact", "Timeout", f"Version {i} of the timeout.",
+                                   supersedes=versions[-1])["id"])
+        assert kg.head(versions[0]) == kg.head(versions[17]) == (versions[-1], 30)
+        assert kg.chain(versions[17]) == versions
+        assert kg.get_node(versions[3])["head"] == versions[-1]
+
+        fork = kg.add("fact", "Timeout", "A rival edit.", supersedes=versions[5])["id"]
+        assert kg.head(fork) == (fork, 1) and kg.head(versions[5]) == (versions[-1], 30)
+
+        a1 = kg.add("rule", "Style A", "Old style.")["id"]
+        a2 = kg.add("rule", "Style A", "New style.", supersedes=a1)["id"]
+        b1 = kg.add("rule", "Style B", "Other style.")["id"]
+        b2 = kg.add("rule", "Style B", "Other style, revised.", supersedes=b1)["id"]
+        kg.link(b1, a2, "supersedes")
+        assert kg.chain(a1) == [a1, a2, b1, b2] and kg.head(a1) == (b2, 4)
+        kg.link(a1, b2, "supersedes")  # would close a cycle: the index ignores it
+        assert kg.head(b2) == (b2, 4)
+
+        user = kg.add("pattern", "Client config", "Clients read the timeout setting.")["id"]
+        kg.link(user, versions[2], "depends_on")
+        related = kg.context("client config")["related"]
+        assert [n["id"] for n in related] == [versions[-1]]
+        assert f"{versions[2]} (now {versions[-1]})" in related[0]["via"]
+
+        # A database from before the index: rebuilt from the edges on open.
+        with kg.pool.connection() as conn:
+            conn.execute("DELETE FROM versions")
+            conn.execute("DELETE FROM chains")
+            conn.execute("DELETE FROM graph_meta WHERE key = 'versions'")
+        reopened = KnowledgeGraph(kg.path, pool_size=1)
+        try:
+            assert reopened.head(versions[0]) == (versions[-1], 30)
+            assert reopened.chain(a2) == [a1, a2, b1, b2]
+        finally:
+            reopened.close()
+
+
+@test
+def future_valid_until_stays_in_the_current_view():
+    with Graph() as kg:
+        node = kg.add("fact", "Freeze window", "Merges are frozen for the release.",
+                      valid_until="2999-01-01")
+        assert [n["id"] for n in kg.query("merges frozen")] == [node["id"]]
+        assert temporal.status(kg.node(node["id"])) == "current"
+        assert "after valid_from" in expect_error(
+            kg.add, "fact", "x", "y", valid_from="2026-02-01", valid_until="2026-01-01")
+
+
+def random_stamp(rng):
+    return temporal.normalize(f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+
+
+@test
+def interval_index_matches_brute_force_under_updates():
+    rng = random.Random(7)
+    windows = {}
+    for key in range(3000):
+        start = random_stamp(rng)
+        end = random_stamp(rng) if rng.random() < 0.6 else None
+        windows[key] = (start, end)
+    index = IntervalIndex((k, s, e) for k, (s, e) in windows.items())
+
+    def brute(point):
+        return sorted(k for k, (s, e) in windows.items() if s <= point < (e or END_OF_TIME))
+
+    for step in range(1500):
+        key = rng.randrange(3500)
+        if rng.random() < 0.2:
+            windows.pop(key, None)
+            index.update(key, None)
+        else:
+            windows[key] = (random_stamp(rng), random_stamp(rng) if rng.random() < 0.5 else None)
+            index.update(key, *windows[key])
+        if step % 100 == 0:
+            point = random_stamp(rng)
+            assert sorted(index.stab(point)) == brute(point), f"step {step}"
+    for point in ("2025-06-01", "2026-01-01", "2026-06-15", "2026-12-28", "2030-01-01"):
+        point = temporal.normalize(point)
+        assert sorted(index.stab(point)) == brute(point), point
+
+
+@test
+def as_of_and_current_view_match_the_visibility_predicate():
+    rng = random.Random(11)
+    with Graph() as kg:
+        ids = []
+        for i in range(120):
+            supersedes = rng.choice(ids) if ids and rng.random() < 0.3 else None
+            node = kg.add("fact", f"Fact {i}", "shared marker text", valid_from=random_stamp(rng),
+                          supersedes=supersedes)
+            ids.append(node["id"])
+            if i == 60:
+                kg.visible_ids("2026-06-01")  # build mid-way: later writes patch it
+            if rng.random() < 0.15:
+                kg.retire(rng.choice(ids), rng.choice(("invalid", "expired", "restore")),
+                          at=random_stamp(rng))
+        nodes = [kg.node(node_id) for node_id in ids]
+        for day in ("2026-02-01", "2026-05-15", "2026-09-30", "2026-12-31"):
+            as_of = temporal.normalize(day)
+            expected = sorted(n["id"] for n in nodes if temporal.visible(n, as_of))
+            assert sorted(kg.visible_ids(as_of)) == expected, day
+            found = sorted(n["id"] for n in kg.query("marker", as_of=as_of, limit=200))
+            assert found == expected, f"query as_of {day}"
+        current = sorted(n["id"] for n in nodes if temporal.visible(n))
+        assert sorted(n["id"] for n in kg.list_nodes(limit=500)) == current
+        assert sorted(n["id"] for n in kg.query("marker", limit=200)) == current
+
+
+@test
+def interval_index_rebuilds_after_another_process_writes():
+    with Graph() as kg:
+        node = kg.add("rule", "Old rule", "Old marker.", valid_from="2026-01-01")
+        assert kg.visible_ids("2026-03-01") == [node["id"]]
+        other = KnowledgeGraph(kg.path, pool_size=1)
+        try:
+            other.retire(node["id"], "expired", at="2026-02-01")
+            late = other.add("rule", "New rule", "New marker.", valid_from="2026-01-15")
+        finally:
+            other.close()
+        assert kg.visible_ids("2026-03-01") == [late["id"]]
+        assert kg.visible_ids("2026-01-10") == [node["id"]]
+
+
+@test
+def current_view_is_materialized_for_existing_databases():
+    with Graph() as kg:
+        keep = kg.add("rule", "Keep", "Still current.")
+        gone = kg.add("rule", "Gone", "Retired.")
+        kg.retire(gone["id"], "invalid")
+        with kg.pool.connection() as conn:  # simulate a database from before the view
+            conn.execute("DELETE FROM current_nodes")
+            conn.execute("DELETE FROM graph_meta WHERE key = 'current_view'")
+        reopened = KnowledgeGraph(kg.path, pool_size=1)
+        try:
+            assert [n["id"] for n in reopened.list_nodes()] == [keep["id"]]
+        finally:
+            reopened.close()
+
+
+@test
+def vector_channel_finds_subword_matches_bm25_misses():
+    with Graph() as kg:
+        target = kg.add("gotcha", "Connection pooling", "Pooled connections leak under load.")
+        kg.add("fact", "Deploy target", "Deploys go to the staging cluster.")
+        view = kg._view()
+        assert kg.retrieval.lexical("connecting pools", view, 10, True) == []
+        hits = kg.query("connecting pools")
+        assert hits and hits[0]["id"] == target["id"]
+
+
+@test
+def fusion_modes_and_pluggable_reranker():
+    with Graph() as kg:
+        a = kg.add("pattern", "Retry with jitter", "Back off exponentially with jitter.")
+        b = kg.add("pattern", "Retry budget", "Cap retries per request; jitter is optional.")
+        for mode in ("rrf", "score"):
+            kg.retrieval.config["fusion"] = mode
+            assert {n["id"] for n in kg.query("retry jitter")} == {a["id"], b["id"]}, mode
+        calls = []
+
+        def prefer_budget(query, nodes):
+            calls.append(query)
+            return [1.0 if "budget" in node["title"].lower() else 0.0 for node in nodes]
+
+        kg.retrieval.reranker = prefer_budget
+        kg.retrieval.config["rerank_weight"] = 0.9
+        assert kg.query("retry jitter")[0]["id"] == b["id"]
+        assert calls == ["retry jitter"]
+
+
+@test
+def recency_breaks_near_ties_but_is_bounded_and_skipped_for_as_of():
+    with Graph() as kg:
+        old = kg.add("fact", "Cache size", "The cache holds ten entries.", valid_from="2025-01-01")
+        new = kg.add("fact", "Cache size", "The cache holds ten entries.", valid_from="2025-01-01")
+        with kg.pool.connection() as conn:
+            conn.execute("UPDATE nodes SET updated_at = ? WHERE id = ?",
+                         (temporal.normalize("2024-01-01"), old["id"]))
+        hits = kg.query("cache entries")
+        assert [n["id"] for n in hits] == [new["id"], old["id"]]
+        assert hits[1]["score"] >= hits[0]["score"] * (1 - kg.retrieval.config["recency_weight"])
+        view = kg._view(as_of=temporal.normalize("2026-01-01"))
+        _, timings = kg.retrieval.search("cache entries", view, 5, as_of="2026-01-01")
+        assert "recency" not in timings
+        stats = kg.retrieval.stats()
+        assert {"lexical", "vector", "fusion", "rerank", "boost", "total"} <= set(stats)
+        assert stats["total"]["count"] == 2 and stats["recency"]["count"] == 1
+
+
+@test
+def large_vector_backlog_warms_in_the_background():
+    saved = retrieval.SYNC_CATCHUP
+    retrieval.SYNC_CATCHUP = 5
+    try:
+        with Graph() as kg:
+            for i in range(20):
+                kg.add("fact", f"Pooling note {i}", "Pooled sockets are reused.")
+            _, timings = kg.retrieval.search("pooled", kg._view(), 5)
+            assert "vector" not in timings, "BM25 only while warming"
+            kg.retrieval._warming.join(timeout=30)
+            assert kg.retrieval.refresh() and len(kg.retrieval.vectors) == 20
+            assert len(kg.query("pooling", limit=50)) == 20
+    finally:
+        retrieval.SYNC_CATCHUP = saved
+
+
+def centrality_columns(table):
+    return {name: list(getattr(table, name)) for name in (
+        "ids", "src", "dst", "weight", "degree_in", "degree_out", "hop1", "hop2")}
+
+
+@test
+def centrality_ranks_hubs_and_refreshes_incrementally():
+    with Graph() as kg:
+        hub = kg.add("rule", "Hub", "Everything depends on this.")["id"]
+        leaves = [kg.add("fact", f"Leaf {i}", "A leaf.")["id"] for i in range(4)]
+        for leaf in leaves:
+            kg.link(leaf, hub, "depends_on")
+        table = kg.centrality
+        assert table.refresh()
+        assert abs(sum(table.tables.pagerank) - 1.0) < 1e-6
+        assert table.summary(hub)["rank"] == 1.0
+        assert all(table.summary(leaf)["pagerank"] < table.summary(hub)["pagerank"]
+                   for leaf in leaves)
+        assert (table.summary(hub)["hop1"], table.summary(hub)["degree_in"]) == (4, 4)
+        assert (table.summary(leaves[0])["hop1"], table.summary(leaves[0])["hop2"]) == (1, 4)
+        assert kg.get_node(hub)["centrality"]["degree_in"] == 4
+
+        # Incremental: new nodes and edges, then a weight upsert.
+        extra = kg.add("fact", "Late leaf", "Added after the first refresh.")["id"]
+        kg.link(extra, leaves[0], "related_to", weight=0.9)
+        kg.link(leaves[1], leaves[2], "contradicts")
+        assert table.refresh()
+        fresh = centrality.Centrality(kg)
+        fresh.refresh()
+        assert centrality_columns(table.tables) == centrality_columns(fresh.tables)
+        assert all(abs(x - y) < 1e-5 for x, y in zip(table.tables.pagerank, fresh.tables.pagerank))
+        assert table.summary(leaves[1])["degree_out"] == 2
+        assert table.summary(leaves[2])["pagerank"] == table.summary(leaves[3])["pagerank"], \
+            "contradicts passes no rank"
+        kg.link(leaves[0], hub, "depends_on", weight=0.1)
+        table.refresh()
+        assert 0.1 in table.tables.weight and len(table.tables.src) == 6, "an upsert rebuilds"
+        rank, linked = table.lookup([hub, leaves[0], extra])[leaves[0]]
+        assert abs(linked - (0.1 + 0.9)) < 1e-9
+
+
+@test
+def boost_prefers_central_and_linked_candidates():
+    saved = centrality.SYNC_EDGES
+    centrality.SYNC_EDGES = 3
+    try:
+        with Graph() as kg:
+            plain = kg.add("fact", "Timeout", "Requests time out after five seconds.")
+            cited = kg.add("fact", "Timeout", "Requests time out after five seconds.")
+            for i in range(5):
+                source = kg.add("procedure", f"Step {i}", "Follow the runbook.")
+                kg.link(source["id"], cited["id"], "depends_on")
+            kg.retrieval.config["recency"] = False
+            kg.query("requests time out")  # backlog of 5 > 3: refreshed in the background
+            kg.centrality._worker.join(timeout=30)
+            hits = kg.query("requests time out")
+            assert [n["id"] for n in hits[:2]] == [cited["id"], plain["id"]]
+            assert hits[0]["score"] <= hits[1]["score"] * (1 + kg.retrieval.config["edge_boost"])
+    finally:
+        centrality.SYNC_EDGES = saved
+
+
+@test
+def context_cache_is_invalidated_per_scope():
+    with Graph() as kg:
+        step = kg.add("procedure", "Deploy steps", "Build, tag, push.", scope="proj-a")
+        other = kg.add("fact", "Deploy window", "Deploys run on Tuesdays.", scope="proj-b")
+        kg.link(step["id"], other["id"], "related_to")
+        first = kg.context("Deploy steps", scope="proj-a")
+        first["nodes"][0]["title"] = "edited by the caller"
+        again = kg.context("  deploy   STEPS ", scope="proj-a")
+        assert again["task"] == "  deploy   STEPS "
+        assert again["nodes"][0]["title"] == "Deploy steps", "callers get copies"
+        assert [n["id"] for n in again["related"]] == [other["id"]]
+        assert kg.cache.stats()["hits"] == 1
+
+        kg.add("fact", "Unrelated", "Another project.", scope="proj-c")
+        kg.context("deploy steps", scope="proj-a")
+        assert kg.cache.stats()["hits"] == 2, "a write elsewhere keeps the entry"
+        kg.retire(other["id"], "invalid")  # proj-b, but shown as a neighbour
+        assert kg.context("deploy steps", scope="proj-a")["related"] == []
+        kg.add("fact", "Deploy freeze", "No deploys in December.")  # global
+        assert len(kg.context("deploy steps", scope="proj-a")["nodes"]) == 2
+        stats = kg.cache.stats()
+        assert (stats["hits"], stats["stale"]) == (2, 2), stats
+        assert stats["saved_ms"] > 0 and 0 < stats["hit_rate"] < 1
+
+        # Another process writes: its scopes are unknown, so everything is stale.
+        kg.context("deploy steps", scope="proj-a")
+        second = KnowledgeGraph(kg.path, pool_size=1)
+        try:
+            second.add("fact", "Deploy tokens", "Rotate them.", scope="proj-z")
+        finally:
+            second.close()
+        before = kg.cache.stats()["stale"]
+        kg.context("deploy steps", scope="proj-a")
+        assert kg.cache.stats()["stale"] == before + 1
+
+
+@test
+def cache_expires_when_a_node_ends_and_can_be_disabled():
+    with Graph() as kg:
+        until = time.time() + 1.0
+        stamp = temporal.normalize(datetime.fromtimestamp(until, timezone.utc))
+        kg.add("fact", "Feature flag", "The beta flag is on.", valid_until=stamp)
+        assert len(kg.query("beta flag")) == 1
+        assert len(kg.query("beta flag")) == 1 and kg.cache.stats()["hits"] == 1
+        time.sleep(max(0.0, until - time.time()) + 0.1)
+        assert kg.query("beta flag") == []
+        assert kg.cache.stats()["expired"] == 1
+    off = KnowledgeGraph(":memory:", settings={"retrieval": {"cache_ttl_seconds": 0}})
+    try:
+        off.add("fact", "Feature flag", "The beta flag is on.")
+        off.query("beta flag")
+        off.query("beta flag")
+        assert not off.cache.enabled and off.cache.stats()["hits"] == 0
+    finally:
+        off.close()
+
+
+@test
+def links_validate_and_contradicts_keeps_both_sides():
+    with Graph() as kg:
+        a = kg.add("fact", "Retries", "The client retries three times.")
+        b = kg.add("fact", "Retries", "The client retries five times.")
+        kg.link(a["id"], b["id"], "contradicts", weight=0.9)
+        assert len(kg.query("client retries")) == 2, "a conflict hides neither side"
+        assert "relation must be" in expect_error(kg.link, a["id"], b["id"], "likes")
+        assert "two different" in expect_error(kg.link, a["id"], a["id"], "related_to")
+        assert "unknown node" in expect_error(kg.link, a["id"], "missing", "related_to")
+        kg.link(a["id"], b["id"], "contradicts", weight=0.2)
+        outgoing, _ = kg.edges(a["id"])
+        assert [e["weight"] for e in outgoing] == [0.2], "re-linking updates, never duplicates"
+
+
+@test
+def list_filters_by_type_and_scope():
+    with Graph() as kg:
+        kg.add("rule", "R1", "Global rule.")
+        kg.add("rule", "R2", "Project rule.", scope="proj-a")
+        kg.add("pattern", "P1", "Project pattern.", scope="proj-a")
+        assert len(kg.list_nodes()) == 3
+        assert {n["title"] for n in kg.list_nodes(type="rule")} == {"R1", "R2"}
+        assert {n["title"] for n in kg.list_nodes(scope="proj-a")} == {"R2", "P1"}
+        assert len(kg.list_nodes(limit=1, offset=1)) == 1
+
+
+@test
+def context_adds_neighbours_and_supersession_pointers():
+    with Graph() as kg:
+        old = kg.add("procedure", "Release steps", "Tag, build wheels, upload.")
+        new = kg.add("procedure", "Release steps", "Tag, build wheels, sign, upload.",
+                     supersedes=old["id"])
+        dep = kg.add("fact", "Signing key", "The signing key lives in the vault.")
+        kg.link(new["id"], dep["id"], "depends_on")
+        ctx = kg.context("publish a release with wheels")
+        assert [n["id"] for n in ctx["nodes"]] == [new["id"]]
+        assert [n["id"] for n in ctx["related"]] == [dep["id"]]
+        assert ctx["pointers"] and f"supersedes: {old['id']}" in ctx["pointers"][0]
+
+
+@test
+def scoped_query_includes_global_nodes():
+    with Graph() as kg:
+        kg.add("rule", "Lint before commit", "Run the linter before commit.")
+        kg.add("rule", "Lint config", "The linter reads setup.cfg before commit.", scope="a")
+        kg.add("rule", "Lint other", "Other project linter before commit.", scope="b")
+        titles = {n["title"] for n in kg.query("linter commit", scope="a")}
+        assert titles == {"Lint before commit", "Lint config"}
+
+
+# --- MCP -------------------------------------------------------------------
+
+@test
+def mcp_initialize_list_and_call():
+    with Graph() as kg:
+        mcp = server.MCPServer(kg, log=lambda message: None)
+        init = rpc(mcp, "initialize", {"protocolVersion": "2025-03-26"})["result"]
+        assert init["protocolVersion"] == "2025-03-26"
+        assert "tools" in init["capabilities"]
+        assert mcp.handle({"jsonrpc": "2.0", "method": "notifications/initialized"}) is None
+        names = {t["name"] for t in rpc(mcp, "tools/list")["result"]["tools"]}
+        assert names == tools.TOOL_NAMES and len(names) == 7
+
+        added = rpc(mcp, "tools/call", {"name": "kg_add", "arguments": {
+            "type": "pattern", "title": "Retry with jitter",
+            "content": "Back off exponentially with jitter."}})["result"]
+        assert added["isError"] is False
+        node_id = added["structuredContent"]["id"]
+        assert json.loads(added["content"][0]["text"])["id"] == node_id
+        found = rpc(mcp, "tools/call", {"name": "kg_query",
+                                        "arguments": {"query": "jitter"}})["result"]
+        assert found["structuredContent"]["results"][0]["id"] == node_id
+
+        bad = rpc(mcp, "tools/call", {"name": "kg_add", "arguments": {"type": "rule"}})
+        assert bad["result"]["isError"] is True and "missing" in bad["result"]["content"][0]["text"]
+        extra = rpc(mcp, "tools/call", {"name": "kg_list", "arguments": {"colour": "red"}})
+        assert extra["result"]["isError"] is True
+        assert rpc(mcp, "tools/call", {"name": "kg_nope"})["error"]["code"] == server.INVALID_PARAMS
+        assert rpc(mcp, "resources/list")["error"]["code"] == server.METHOD_NOT_FOUND
+        assert mcp.handle_payload(b"{not json")["error"]["code"] == server.PARSE_ERROR
+
+
+@test
+def mcp_stdio_transport_answers_line_by_line():
+    with Graph() as kg:
+        mcp = server.MCPServer(kg, log=lambda message: None)
+        lines = [
+            {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+            {"jsonrpc": "2.0", "method": "notifications/initialized"},
+            {"jsonrpc": "2.0", "id": 2, "method": "ping"},
+        ]
+        out = io.StringIO()
+        server.serve_stdio(mcp, io.StringIO("\n".join(map(json.dumps, lines)) + "\n\n"), out)
+        replies = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [r["id"] for r in replies] == [1, 2]
+
+
+@test
+def mcp_http_round_trip():
+    with Graph() as kg:
+        httpd = server.start_http_thread(server.MCPServer(kg, log=lambda message: None))
+        url = f"http://127.0.0.1:{httpd.server_address[1]}/mcp"
+        try:
+            def post(message, session=None):
+                headers = {"Content-Type": "application/json",
+                           "Accept": "application/json, text/event-stream"}
+                if session:
+                    headers["Mcp-Session-Id"] = session
+                request = urllib.request.Request(url, json.dumps(message).encode(), headers)
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    body = response.read()
+                    return (response.status, response.headers.get("Mcp-Session-Id"),
+                            json.loads(body) if body else None)
+
+            status, session, reply = post(
+                {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}})
+            assert status == 200 and session and reply["result"]["serverInfo"]
+            status, _, reply = post({"jsonrpc": "2.0", "method": "notifications/initialized"},
+                                    session)
+            assert status == 202 and reply is None
+            post({"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {
+                "name": "kg_add", "arguments": {"type": "fact", "title": "HTTP works",
+                                                "content": "Round trip over HTTP."}}}, session)
+            _, echoed, reply = post([
+                {"jsonrpc": "2.0", "id": 3, "method": "tools/call",
+                 "params": {"name": "kg_list", "arguments": {}}},
+                {"jsonrpc": "2.0", "id": 4, "method": "ping"},
+            ], session)
+            assert echoed == session
+            assert [r["id"] for r in reply] == [3, 4]
+            assert reply[0]["result"]["structuredContent"]["nodes"][0]["title"] == "HTTP works"
+            stats_url = url.replace("/mcp", "/stats")
+            with urllib.request.urlopen(stats_url, timeout=10) as response:
+                stats = json.loads(response.read())
+            assert set(stats) == {"cache", "stages"} and "hit_rate" in stats["cache"]
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+
+@test
+def concurrent_context_readers_share_the_pool_with_a_writer():
+    with Graph() as kg:
+        for i in range(200):
+            kg.add("fact", f"Service {i}", f"Service {i} talks to the queue broker.",
+                   scope=f"proj-{i % 5}")
+        errors = []
+
+        def reader():
+            try:
+                for _ in range(20):
+                    assert kg.context("queue broker service", scope="proj-1")["nodes"]
+            except Exception as exc:  # noqa: BLE001
+                errors.append(exc)
+
+        def writer():
+            try:
+                for i in range(50):
+                    kg.add("fact", f"Late {i}", "Added while readers run.")
+            except Exception as exc:  # noqa: BLE001
+                errors.append(exc)
+
+        threads = [threading.Thread(target=reader) for _ in range(8)]
+        threads.append(threading.Thread(target=writer))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors, errors
+        assert len(kg.list_nodes(limit=500)) == 250
+        assert kg.pool._created <= kg.pool.size
+
+
+# --- bulk export / import --------------------------------------------------
+
+def rows_of(kg):
+    with kg.pool.connection() as conn:
+        nodes = [tuple(row) for row in conn.execute(
+            f"SELECT {', '.join(transfer.NODE_FIELDS)} FROM nodes ORDER BY id")]
+        edges = [tuple(row) for row in conn.execute(
+            f"SELECT {', '.join(transfer.EDGE_FIELDS)} FROM edges "
+            "ORDER BY source_id, target_id, relation")]
+        current = [tuple(row) for row in conn.execute("SELECT * FROM current_nodes ORDER BY id")]
+    return nodes, edges, current
+
+
+@test
+def jsonl_export_import_round_trip_resumes_from_its_checkpoint():
+    with Graph() as source, Graph() as target:
+        first = source.add("rule", "Pin deps v1", "Pin versions.", id="pin-1",
+                           valid_from="2026-01-01T00:00:00Z")
+        source.add("rule", "Pin deps v2", "Pin and hash.", id="pin-2", supersedes=first["id"],
+                   valid_from="2026-03-01T00:00:00Z")
+        source.add("rule", "Pin deps v3", "Use a lockfile.", id="pin-3", supersedes="pin-2")
+        source.add("fact", "Sunset", "Ends soon.", id="sunset", tags=["ops", "x"],
+                   valid_until="2099-01-01")
+        source.add("gotcha", "Old trap", "Retired.", id="trap", scope="proj-a", priority=9)
+        source.retire("trap", "expired")
+        for i in range(20):
+            source.add("fact", f"Fact {i}", f"Body {i}", id=f"fact-{i}", scope="proj-a")
+            source.link(f"fact-{i}", "pin-3", "applies_to", weight=0.25)
+        source.link("sunset", "trap", "contradicts")
+
+        path = target.path + ".jsonl"
+        counts = transfer.export_jsonl(source, path)
+        assert counts == {"nodes": 25, "edges": 23}, counts
+
+        # Interrupted after two batches of ten records: the checkpoint says where.
+        partial = transfer.import_jsonl(target, path, batch_size=10, max_batches=2)
+        assert not partial["done"] and partial["lines"] == 20
+        assert transfer.load_checkpoint(target, path)["line"] == 20
+        assert len(target.list_nodes(include_expired=True, limit=100)) == 19
+
+        resumed = transfer.import_jsonl(target, path, batch_size=10)
+        assert resumed["done"] and resumed["resumed_at_line"] == 20, resumed
+        assert (resumed["nodes"], resumed["edges"], resumed["rejected"]) == (25, 23, 0)
+        assert rows_of(target) == rows_of(source)
+        assert target.head("pin-1") == ("pin-3", 3)
+        assert target.chain("pin-2") == ["pin-1", "pin-2", "pin-3"]
+        assert target.get_node("pin-1")["invalid_at"] == "2026-03-01T00:00:00.000000Z"
+        assert [n["id"] for n in target.query("lockfile")] == ["pin-3"]
+
+        # A finished import is not repeated; a restarted one finds everything present.
+        assert transfer.import_jsonl(target, path)["batches"] == 0
+        again = transfer.import_jsonl(target, path, restart=True)
+        assert (again["nodes"], again["edges"], again["existing"]) == (0, 0, 48), again
+
+        scoped = transfer.export_jsonl(source, path, scope="proj-a", current_only=True)
+        assert scoped == {"nodes": 20, "edges": 0}, scoped
+
+        with open(path, "w") as handle:
+            handle.write('{"kind": "node", "id": "ok", "type": "fact", "title": "T", '
+                         '"content": "C", "valid_at": "2026-05-01T09:00:00+02:00"}\n'
+                         "not json\n"
+                         '{"kind": "node", "id": "bad", "type": "opinion", "title": "T", '
+                         '"content": "C"}\n'
+                         '{"kind": "edge", "source_id": "ok", "target_id": "nowhere", '
+                         '"relation": "related_to"}\n')
+        report = transfer.import_jsonl(target, path)
+        assert (report["nodes"], report["rejected"]) == (1, 3), report
+        assert report["errors"][0].startswith("line 2:")
+        assert "unknown node: nowhere" in report["errors"][2]
+        assert target.get_node("ok")["valid_at"] == "2026-05-01T07:00:00.000000Z"
+
+
+# --- script sandbox --------------------------------------------------------
+
+SCRIPTS = {
+    "ok.py": "import ast, sys\nprint(type(ast.parse('x = 1').body[0]).__name__, sys.argv[1:])\n",
+    "socket.py": "import socket\n",
+    "dynamic.py": "import importlib\nimportlib.import_module('subprocess')\n",
+    "memory.py": "block = bytearray(200 * 1024 * 1024)\n",
+    "spin.py": "while True:\n    pass\n",
+    "chatty.py": "import sys\nwhile True:\n    sys.stdout.write('x' * 65536)\n",
+    "fails.py": "raise ValueError('boom')\n",
+}
+
+
+def write_scripts(directory):
+    paths = {}
+    for name, text in SCRIPTS.items():
+        paths[name] = os.path.join(directory, name)
+        with open(paths[name], "w", encoding="utf-8") as handle:
+            handle.write(text)
+    return paths
+
+
+@test
+def sandbox_runs_scripts_in_parallel_and_logs_each_run():
+    if sandbox.check_environment():
+        return  # no rlimits here; run() refuses, which the algorithm allows for
+    directory = tempfile.mkdtemp(prefix="kg-sandbox-")
+    try:
+        paths = write_scripts(directory)
+        log = os.path.join(directory, "kg", sandbox.LOG_FILE)
+        runner = sandbox.ScriptRunner(log, allowed_modules=["ast", "sys", "importlib"],
+                                      cpu_seconds=5, memory_mb=50, timeout=5, workers=3)
+        records = runner.run_many([(paths["ok.py"], ["a"]), paths["fails.py"], paths["ok.py"]])
+        assert [record["status"] for record in records] == ["ok", "error", "ok"]
+        assert records[0]["output"] == "Assign ['a']\n" and records[2]["output"] == "Assign []\n"
+        assert records[1]["reason"] == "ValueError: boom"
+        assert records[0]["peak_rss_kb"] > 0 and records[0]["output_bytes"] == 13
+
+        logged = sandbox.read_log(log)
+        assert len(logged) == 3 and "output" not in logged[0]
+        kept = os.path.join(directory, "kg", sandbox.SCRIPTS_DIR, records[0]["sha256"] + ".py")
+        with open(kept, encoding="utf-8") as handle:
+            assert handle.read() == SCRIPTS["ok.py"]
+        assert [record["status"] for record in sandbox.read_log(log, status="error")] == ["error"]
+        assert len(sandbox.read_log(log, script="ok.py", limit=1)) == 1
+        assert sandbox.read_log(log, since="9999") == []
+        summary = sandbox.summarize(logged)
+        assert summary["by_status"] == {"ok": 2, "error": 1}
+        assert summary["duration_ms"]["p50"] <= summary["duration_ms"]["max"]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@test
+def sandbox_enforces_the_allow_list_and_resource_limits():
+    if sandbox.check_environment():
+        return
+    directory = tempfile.mkdtemp(prefix="kg-sandbox-")
+    try:
+        paths = write_scripts(directory)
+        runner = sandbox.ScriptRunner(None, allowed_modules=["sys", "importlib"],
+                                      cpu_seconds=1, memory_mb=50, timeout=10, output_mb=1)
+        denied = runner.run(paths["socket.py"])
+        assert denied["status"] == "import_denied" and "'socket'" in denied["reason"]
+        assert runner.run(paths["dynamic.py"])["status"] == "import_denied"
+        assert runner.run(paths["memory.py"])["status"] == "memory_limit"
+        spun = runner.run(paths["spin.py"])
+        assert spun["status"] == "cpu_limit" and spun["cpu_ms"] >= 900, spun
+        chatty = runner.run(paths["chatty.py"])
+        assert chatty["status"] == "output_limit" and chatty["output_bytes"] <= 1024 * 1024
+
+        runner = sandbox.ScriptRunner(None, cpu_seconds=30, timeout=0.3)
+        started = time.perf_counter()
+        slow = runner.run(paths["spin.py"])
+        assert slow["status"] == "timeout" and time.perf_counter() - started < 5
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+# --- runner ----------------------------------------------------------------
+
+def main():
+    passed = failed = 0
+    for fn in _results:
+        try:
+            fn()
+            print(f"PASS  {fn.__name__}")
+            passed += 1
+        except Exception as exc:  # noqa: BLE001
+            print(f"FAIL  {fn.__name__}: {exc}")
+            failed += 1
+    print(f"\n{passed}/{passed + failed} passed, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1023 @@
+#!/usr/bin/env python3
+"""Test harness for the memory-store tooling (agentic_rules.memory).
+
+Hermetic: every check builds a throwaway store under a temp directory from
+fixture entries written in the MEMORY-RULES.md Standard Memory Template. It
+never touches a real memory store.
+
+Covers:
+  * entry parsing (metadata bullets and loose lines, tags, wiki-links)
+  * index build/read round trip and the query API
+  * compaction into compressed segments: cold/hot tiering from
+    suggested_retention_days, encryption_required categories left alone,
+    settings gates, read-through of compacted entries, and entries that
+    share a filename stem across scopes
+  * the retention sweeper: index-only early exit, batching, consent,
+    archive-before-delete with restore, entries named by location, so a
+    namesake in another scope is left alone, and overdue writes still in the
+    WAL
+  * the binary sidecar index: same answers as index.md, staleness
+    fallback after hand edits, and tags beyond the 63-bit bitset
+  * cross-scope dedup: MinHash/LSH candidates, merge vs link proposals,
+    wiki-links written under Related Memories, archived merges, and copies
+    that share a template filename, linked by scope
+  * the write-ahead log: read-through before merge, idempotent merges,
+    concurrent writer processes without lost rows, same-stem records in
+    two scopes, folding before the sweeper rewrites the index, and one log
+    per session across CLI calls
+  * the store -> graph adapter: the visualizer recipe's fixture cases,
+    manifest Added/Removed/Modified rows and stale overlays, incremental
+    refresh equal to a full scan, the persisted parse cache, compacted
+    entries dropped once the sweeper archives them, and same-stem entries
+    kept apart as scope-qualified nodes
+  * git history analysis: commit-type classification, churn across a
+    rename, tag milestones, and cached reruns that read only new commits
+    (or everything again after a rewrite)
+
+Run:  python agentic_rules/tests/test_memory.py
+Exit: 0 if all pass, 1 otherwise.
+"""
+
+import contextlib
+import copy
+import io
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+from agentic_rules.memory import (  # noqa: E402
+    binindex, compact, dedup, graph, history, segments, sweep, wal,
+)
+from agentic_rules.memory.store import (  # noqa: E402
+    IndexRow, MemoryStore, format_timestamp, load_settings, parse_entry, parse_timestamp,
+)
+
+DAY = 86400
+NOW = parse_timestamp("2026-10-01T00:00:00Z")
+
+_results = []
+
+
+def test(fn):
+    _results.append(fn)
+    return fn
+
+
+# --- helpers ---------------------------------------------------------------
+
+def entry_text(category, generated, tags=(), related=(), body="Body text."):
+    related_lines = "\n".join(f"[[{r}]]" for r in related) or "none"
+    return (
+        f"# Memory Entry: {category} - {generated}\n\n"
+        "## Metadata\n"
+        "- **Version**: 1.5.4\n"
+        f"- **Generated**: {generated}\n"
+        f"- **Category**: {category}\n\n"
+        "## Context\nFixture.\n\n"
+        f"## Understanding\n{body}\n\n"
+        "## Decision/Action\nNone.\n\n"
+        f"## Related Memories\n{related_lines}\n\n"
+        f"## Tags\n[{', '.join(tags)}]\n"
+    )
+
+
+def days_ago(days):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(NOW - days * DAY))
+
+
+class Fixture:
+    """A temp store; `add()` writes an entry and returns its relpath."""
+
+    def __init__(self, settings=None):
+        self.root = tempfile.mkdtemp(prefix="memstore-")
+        self.settings = settings or load_settings()
+
+    def add(self, relpath, text):
+        path = os.path.join(self.root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(text)
+        return relpath
+
+    def store(self):
+        return MemoryStore(self.root, self.settings)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def settings_with(**compression):
+    settings = copy.deepcopy(load_settings())
+    settings["memory_rules"]["compression"].update(compression)
+    return settings
+
+
+def standard_fixture(fx):
+    """Old and new entries across project, common, and private scopes."""
+    fx.add("projects/acme/interactions/old_interaction.md",
+           entry_text("user_interaction", days_ago(40), tags=["ci"]))
+    fx.add("projects/acme/interactions/new_interaction.md",
+           entry_text("user_interaction", days_ago(2), tags=["ci"]))
+    fx.add("projects/acme/sessions/2026-06-01T0900_session_memory.md",
+           "# Session Memory: s1\n\nNo metadata at all.\n")
+    fx.add("common/technical/old_technical.md",
+           entry_text("technical", days_ago(200), tags=["async", "pool"],
+                      related=["new_interaction"]))
+    fx.add("private/credentials/service-key.md",
+           entry_text("credentials", days_ago(5000)))
+
+
+# --- parsing ---------------------------------------------------------------
+
+@test
+def parse_entry_reads_metadata_tags_and_links():
+    text = entry_text("technical", "2026-06-16T14:30:00Z", tags=["a", "b"],
+                      related=["x_memory", "y_memory"])
+    text += "\n**Loose**: value\n"
+    entry = parse_entry(text.replace("## Tags", "## Metadata2\n**Owner**: me\n\n## Tags"))
+    assert entry["title"] == "Memory Entry: technical - 2026-06-16T14:30:00Z"
+    assert entry["metadata"]["Category"] == "technical"
+    assert entry["tags"] == ["a", "b"], entry["tags"]
+    assert entry["links"] == ["x_memory", "y_memory"], entry["links"]
+    loose = parse_entry("## Metadata\n**Category**: behavioral\n")
+    assert loose["metadata"] == {"Category": "behavioral"}
+
+
+@test
+def timestamps_accept_iso_and_filename_forms():
+    assert parse_timestamp("2026-06-16T14:30:00Z") == parse_timestamp("2026-06-16T1430_technical_memory")
+    assert parse_timestamp("2026-06-16T16:30:00+02:00") == parse_timestamp("2026-06-16T14:30:00Z")
+    assert parse_timestamp("service-key") is None
+
+
+# --- index & query ---------------------------------------------------------
+
+@test
+def index_round_trip_and_query():
+    with Fixture() as fx:
+        standard_fixture(fx)
+        store = fx.store()
+        built = store.rebuild_index()
+        assert os.path.isfile(store.index_path)
+        assert [r.id for r in built] == [r.id for r in store.rows()]
+        assert [r.timestamp for r in built] == sorted(r.timestamp for r in built)
+        by_id = {r.id: r for r in built}
+        assert by_id["2026-06-01T0900_session_memory"].category == "session"
+        assert by_id["old_technical"].scope == "common"
+        assert by_id["old_interaction"].scope == "projects/acme"
+        assert [r.id for r in store.query(project="acme", tag="ci")] == \
+            ["old_interaction", "new_interaction"]
+        assert [r.id for r in store.query(since=NOW - 10 * DAY)] == ["new_interaction"]
+
+
+@test
+def index_skips_structure_subtrees():
+    with Fixture() as fx:
+        fx.add("projects/acme/knowledge_graph/base/base_manifest.md", "# Base KG Manifest\n")
+        fx.add("projects/acme/technical/t.md", entry_text("technical", days_ago(1)))
+        ids = [r.id for r in fx.store().rebuild_index()]
+        assert ids == ["t"], ids
+
+
+# --- compaction ------------------------------------------------------------
+
+@test
+def compaction_disabled_by_default_setting():
+    with Fixture() as fx:
+        standard_fixture(fx)
+        report = compact.compact(fx.store(), now=NOW)
+        assert report["skipped"] and report["compacted"] == 0, report
+        assert not os.path.isdir(os.path.join(fx.root, segments.SEGMENT_DIR))
+
+
+@test
+def compaction_respects_threshold():
+    with Fixture(settings_with(enabled=True, threshold_mb=50)) as fx:
+        standard_fixture(fx)
+        report = compact.compact(fx.store(), now=NOW)
+        assert "threshold" in (report["skipped"] or ""), report
+
+
+@test
+def compaction_moves_only_cold_unencrypted_entries():
+    with Fixture(settings_with(enabled=True, threshold_mb=0)) as fx:
+        standard_fixture(fx)
+        store = fx.store()
+        before = {r.id: store.read(r) for r in store.rebuild_index()}
+        report = compact.compact(store, now=NOW)
+        # user_interaction retention 30d -> cold after 15d; technical 90d -> 45d.
+        # The session fixture (2026-06-01) is older than 60d/2 as well.
+        assert report["compacted"] == 3, report
+        moved = {r.id for r in store.rows() if segments.is_segment_location(r.location)}
+        assert moved == {"old_interaction", "old_technical",
+                         "2026-06-01T0900_session_memory"}, moved
+        assert not os.path.exists(os.path.join(fx.root, "common/technical/old_technical.md"))
+        assert os.path.exists(os.path.join(fx.root, "private/credentials/service-key.md")), \
+            "encryption_required categories must never be compacted"
+        # Same query API, same bytes.
+        after = {r.id: store.read(r) for r in store.rows()}
+        assert after == before
+        assert [r.id for r in store.query(category="technical")] == ["old_technical"]
+
+
+@test
+def compacted_entries_survive_index_rebuild_and_appends():
+    with Fixture(settings_with(enabled=True, threshold_mb=0)) as fx:
+        standard_fixture(fx)
+        store = fx.store()
+        compact.compact(store, now=NOW)
+        fx.add("projects/acme/interactions/later.md",
+               entry_text("user_interaction", days_ago(20)))
+        store.rebuild_index()  # compaction is index-driven
+        compact.compact(store, now=NOW)
+        names = segments.segment_names(fx.root)
+        assert len(names) == 1, f"second run must append to the open segment: {names}"
+        rebuilt = {r.id: r for r in store.rebuild_index()}
+        assert segments.is_segment_location(rebuilt["later"].location)
+        assert "Fixture." in store.read("old_interaction")
+
+
+@test
+def interrupted_compaction_does_not_duplicate_members():
+    with Fixture(settings_with(enabled=True, threshold_mb=0)) as fx:
+        fx.add("common/technical/t.md", entry_text("technical", days_ago(100)))
+        store = fx.store()
+        rows = store.rebuild_index()
+        # Simulate a crash after the append but before the index rewrite.
+        with open(store.path(rows[0].location), "rb") as handle:
+            segments.append_members(fx.root, [(rows[0], handle.read())])
+        compact.compact(store, now=NOW)
+        assert len(list(segments.iter_segment_rows(fx.root))) == 1
+        assert not os.path.exists(os.path.join(fx.root, "common/technical/t.md"))
+        assert "Fixture." in store.read("t")
+
+
+@test
+def same_stem_entries_in_two_scopes_stay_apart():
+    with Fixture(settings_with(enabled=True, threshold_mb=0)) as fx:
+        name = "technical/2020-06-16T1430_technical_memory.md"
+        fx.add(f"projects/a/{name}", entry_text("technical", days_ago(100), body="Alpha."))
+        fx.add(f"projects/b/{name}", entry_text("technical", days_ago(100), body="Beta."))
+        store = fx.store()
+        assert len(store.rebuild_index()) == 2, "one stem, two entries"
+        assert len(list(store.query(project="a"))) == 1
+        stem = "2020-06-16T1430_technical_memory"
+        try:
+            store.get(stem)
+            raise AssertionError("an ambiguous id must not pick a copy")
+        except ValueError:
+            pass
+        assert store.get(stem, scope="projects/b").location == f"projects/b/{name}"
+        assert store.get(f"projects/a/{name}").scope == "projects/a"
+        for _ in range(2):
+            compact.compact(store, now=NOW, force=True)
+        assert len(list(segments.iter_segment_rows(fx.root))) == 2
+        bodies = sorted(store.read(row) for row in store.rebuild_index())
+        assert len(bodies) == 2 and "Alpha." in bodies[0] and "Beta." in bodies[1]
+        [row] = store.query(project="a")
+        assert "Alpha." in store.read(row)
+        assert "Beta." in store.read(stem, scope="projects/b")
+        assert "Alpha." in store.read(f"projects/a/{name}"), "by pre-compaction location"
+
+
+# --- retention sweeper -----------------------------------------------------
+
+def settings_with_cleanup(**cleanup):
+    settings = copy.deepcopy(load_settings())
+    settings["memory_rules"]["cleanup_guidance"].update(cleanup)
+    return settings
+
+
+@test
+def sweeper_finds_overdue_without_reading_past_horizon():
+    with Fixture() as fx:
+        standard_fixture(fx)
+        fx.add("projects/acme/interactions/pinned.md",
+               entry_text("user_interaction", days_ago(90), tags=["important"]))
+        store = fx.store()
+        store.rebuild_index()
+        overdue = [r.id for r in sweep.find_overdue(store, NOW)]
+        # credentials 3650d, technical 90d, interaction 30d; the 2026-06-01
+        # session is 122 days old against 60d; the pinned entry is preserved.
+        assert overdue == ["service-key", "old_technical",
+                           "2026-06-01T0900_session_memory", "old_interaction"], overdue
+        # Plant an out-of-order ancient row after the horizon: an index-driven
+        # sweep stops before it, proving it never reads the whole index.
+        with open(store.index_path, "a", encoding="utf-8") as handle:
+            handle.write("| ancient | technical | common | 2001-01-01T00:00:00Z | x.md |  |\n")
+        assert "ancient" not in [r.id for r in sweep.find_overdue(store, NOW)]
+
+
+@test
+def sweeper_finds_overdue_entries_still_in_the_wal():
+    with Fixture() as fx:
+        standard_fixture(fx)
+        store = fx.store()
+        store.rebuild_index()
+        wal.record(store, "projects/acme/interactions/logged.md",
+                   entry_text("user_interaction", days_ago(45)),
+                   session="s1", auto_merge=False)
+        # A pending rewrite of an overdue entry makes it current again.
+        wal.record(store, "projects/acme/interactions/old_interaction.md",
+                   entry_text("user_interaction", days_ago(1)),
+                   session="s1", auto_merge=False)
+        assert "logged" not in {r.id for r in store.index_rows()}, "index untouched"
+        want = ["service-key", "old_technical", "2026-06-01T0900_session_memory", "logged"]
+        assert [r.id for r in sweep.find_overdue(store, NOW)] == want
+        os.remove(binindex.binary_index_path(store))
+        assert [r.id for r in sweep.find_overdue(store, NOW)] == want, "index.md path"
+
+
+@test
+def sweeper_batches_and_requires_consent():
+    with Fixture(settings_with_cleanup(batch_cleanup_limit=2)) as fx:
+        standard_fixture(fx)
+        store = fx.store()
+        store.rebuild_index()
+        state = sweep.propose(store, NOW)
+        sizes = [len(b["entries"]) for b in state["batches"]]
+        assert sizes == [2, 2], sizes
+        assert sweep.apply(store) == [], "nothing applies before approval"
+        assert sweep.apply(store, {state["batches"][0]["id"]}) == [], \
+            "require_user_consent blocks applying a pending batch by id"
+        first = state["batches"][0]
+        assert sweep.approve(store, {first["id"]}, NOW) == [first["id"]]
+        archived = sweep.apply(store, now=NOW)
+        assert archived == sorted(e["id"] for e in first["entries"]), archived
+        remaining = {r.id for r in store.rows()}
+        assert not remaining & set(archived)
+        assert not os.path.exists(os.path.join(fx.root, "common/technical/old_technical.md"))
+        # Re-proposing keeps applied entries out and re-batches the rest.
+        again = sweep.propose(store, NOW)
+        pending = [e["id"] for b in again["batches"] for e in b["entries"]]
+        assert pending == ["2026-06-01T0900_session_memory", "old_interaction"], pending
+
+
+@test
+def sweeper_applies_pending_by_id_without_consent_and_restores():
+    with Fixture(settings_with_cleanup(require_user_consent=False)) as fx:
+        standard_fixture(fx)
+        store = fx.store()
+        store.rebuild_index()
+        original = store.read("old_technical")
+        batch = sweep.propose(store, NOW)["batches"][0]
+        assert sweep.apply(store, now=NOW) == [], "unnamed pending batches never apply"
+        archived = sweep.apply(store, {batch["id"]}, NOW)
+        assert "old_technical" in archived
+        assert store.get("old_technical") is None
+        assert store.rebuild_index() and store.get("old_technical") is None
+        location = sweep.restore(store, "old_technical")
+        assert location == "common/technical/old_technical.md", location
+        assert store.read("old_technical") == original
+
+
+@test
+def sweeper_archives_compacted_entries_and_tombstones_them():
+    with Fixture(settings_with_cleanup(require_user_consent=False)) as fx:
+        standard_fixture(fx)
+        store = fx.store()
+        store.rebuild_index()
+        compact.compact(store, now=NOW, force=True)
+        batch = sweep.propose(store, NOW)["batches"][0]
+        sweep.apply(store, {batch["id"]}, NOW)
+        rebuilt = {r.id for r in store.rebuild_index()}
+        assert "old_technical" not in rebuilt, "archived segment members must not resurrect"
+
+
+@test
+def sweeper_archives_and_restores_by_location():
+    with Fixture(settings_with_cleanup(require_user_consent=False, batch_cleanup_limit=1)) as fx:
+        name = "technical/2020-06-16T1430_technical_memory.md"
+        fx.add(f"projects/a/{name}", entry_text("technical", days_ago(200), body="Alpha."))
+        fx.add(f"projects/b/{name}", entry_text("technical", days_ago(100), body="Beta."))
+        store = fx.store()
+        store.rebuild_index()
+        batches = sweep.propose(store, NOW)["batches"]
+        assert [b["entries"][0]["location"] for b in batches] == [
+            f"projects/a/{name}", f"projects/b/{name}"]
+        sweep.apply(store, {batches[0]["id"]}, NOW)
+        assert not os.path.exists(os.path.join(fx.root, "projects/a", name))
+        assert os.path.exists(os.path.join(fx.root, "projects/b", name)), \
+            "approving one scope's entry must not archive its namesake"
+        assert [r.scope for r in store.rows()] == ["projects/b"]
+        sweep.apply(store, {batches[1]["id"]}, NOW)
+        try:
+            sweep.restore(store, "2020-06-16T1430_technical_memory")
+            raise AssertionError("a bare id archived from two scopes is ambiguous")
+        except ValueError:
+            pass
+        with contextlib.redirect_stdout(io.StringIO()) as out:  # the CLI, options first
+            assert sweep.main(["restore", "--root", fx.root, f"projects/a/{name}"]) == 0
+        assert out.getvalue().endswith(f"-> projects/a/{name}\n"), out.getvalue()
+        [row] = store.rows()
+        assert "Alpha." in store.read(row)
+
+
+@test
+def sweeper_restores_compacted_entries_to_their_directory():
+    with Fixture(settings_with_cleanup(require_user_consent=False)) as fx:
+        standard_fixture(fx)
+        store = fx.store()
+        store.rebuild_index()
+        compact.compact(store, now=NOW, force=True)
+        original = store.read("2026-06-01T0900_session_memory")
+        for batch in sweep.propose(store, NOW)["batches"]:
+            sweep.apply(store, {batch["id"]}, NOW)
+        location = sweep.restore(store, "2026-06-01T0900_session_memory")
+        assert location == "projects/acme/sessions/2026-06-01T0900_session_memory.md", location
+        assert store.read("2026-06-01T0900_session_memory") == original
+        assert "2026-06-01T0900_session_memory" in {r.id for r in store.rebuild_index()}
+
+
+@test
+def session_notice_is_rate_limited_and_index_only():
+    with Fixture() as fx:
+        standard_fixture(fx)
+        assert sweep.session_notice(fx.root, NOW, fx.settings) == "", \
+            "no index -> no notice (never a full scan at session start)"
+        fx.store().rebuild_index()
+        notice = sweep.session_notice(fx.root, NOW, fx.settings)
+        assert notice.startswith("4 memories"), notice
+        assert sweep.session_notice(fx.root, NOW, fx.settings) == ""
+
+
+# --- binary sidecar index --------------------------------------------------
+
+SIDECAR_QUERIES = [
+    {},
+    {"category": "technical"},
+    {"project": "p3"},
+    {"scope": "common", "tag": "t5"},
+    {"since": "2026-01-02T00:00:00Z", "until": "2026-01-05T00:00:00Z"},
+    {"category": "topic", "since": "2026-01-03T00:00:00Z", "tag": "t1"},
+    {"tag": "t90"},
+    {"category": "nonexistent"},
+]
+
+
+def synthetic_rows(count):
+    categories = ["technical", "topic", "user_interaction"]
+    start = parse_timestamp("2026-01-01T00:00:00Z")
+    return [
+        IndexRow(f"e{i:04d}", categories[i % 3],
+                 f"projects/p{i % 7}" if i % 2 else "common",
+                 format_timestamp(start + i * 900), f"common/x/e{i:04d}.md",
+                 (f"t{i % 100}", "shared" if i % 4 else "important"))
+        for i in range(count)
+    ]
+
+
+@test
+def sidecar_answers_match_markdown_index():
+    with Fixture() as fx:
+        store = fx.store()
+        store.write_index(synthetic_rows(600))
+        assert binindex.open_for(store) is not None, "write_index writes the sidecar"
+        fast = [list(store.query(**q)) for q in SIDECAR_QUERIES]
+        os.utime(store.index_path, (0, 0))  # stale sidecar -> markdown path
+        assert binindex.open_for(store) is None
+        slow = [list(store.query(**q)) for q in SIDECAR_QUERIES]
+        for query, a, b in zip(SIDECAR_QUERIES, fast, slow):
+            assert a == b, f"{query}: {len(a)} vs {len(b)}"
+        assert len(fast[6]) == 6, "tags past the 63 bitset slots still match"
+
+
+@test
+def sidecar_goes_stale_on_hand_edit_and_recovers_on_rewrite():
+    with Fixture() as fx:
+        standard_fixture(fx)
+        store = fx.store()
+        store.rebuild_index()
+        with open(store.index_path, "a", encoding="utf-8") as handle:
+            handle.write("| manual | technical | common | 2026-09-30T00:00:00Z "
+                         "| common/technical/manual.md |  |\n")
+        assert binindex.open_for(store) is None, "hand edit must not be shadowed"
+        assert store.get("manual") is not None
+        assert [r.id for r in store.query(category="technical")][-1] == "manual"
+        store.write_index(store.index_rows())
+        with binindex.open_for(store) as index:
+            assert len(index) == len(store.index_rows())
+
+
+@test
+def sidecar_sweeper_matches_markdown_scan():
+    with Fixture(settings_with_cleanup()) as fx:
+        store = fx.store()
+        store.write_index(synthetic_rows(600))
+        now = parse_timestamp("2026-09-01T00:00:00Z")
+        fast = list(sweep.find_overdue(store, now))
+        os.utime(store.index_path, (0, 0))
+        slow = list(sweep.find_overdue(store, now))
+        assert fast and fast == slow, (len(fast), len(slow))
+
+
+# --- cross-scope dedup -----------------------------------------------------
+
+POOL_FACT = (
+    "The hang traced to an async DB connection acquired in a test fixture that "
+    "was never released when an assertion failed mid-test, exhausting the pool "
+    "on the next test. Local runs passed because the local pool was larger."
+)
+ZETA_NOTE = " The zeta service hit the same problem during its nightly load tests."
+OTHER_FACT = (
+    "Release builds strip debug symbols with a post-link step; the symbol files "
+    "are uploaded to the crash reporter before the artifacts are signed."
+)
+
+
+def dedup_fixture(fx, with_common=True):
+    fx.add("projects/acme/technical/acme_pool.md",
+           entry_text("technical", days_ago(3), body=POOL_FACT))
+    fx.add("projects/zeta/technical/zeta_pool.md",
+           entry_text("technical", days_ago(2), body=POOL_FACT + ZETA_NOTE))
+    if with_common:
+        fx.add("common/technical/common_pool.md",
+               entry_text("technical", days_ago(5), body=POOL_FACT))
+    fx.add("projects/acme/technical/acme_release.md",
+           entry_text("technical", days_ago(1), body=OTHER_FACT))
+    fx.add("private/credentials/pool_key.md",
+           entry_text("credentials", days_ago(1), body=POOL_FACT))
+
+
+@test
+def dedup_signatures_estimate_jaccard():
+    same = dedup.signature(POOL_FACT)
+    assert dedup.similarity(same, dedup.signature(POOL_FACT)) == 1.0
+    near = dedup.similarity(same, dedup.signature(POOL_FACT + ZETA_NOTE))
+    far = dedup.similarity(same, dedup.signature(OTHER_FACT))
+    assert near > 0.7 and far < 0.2, (near, far)
+    assert dedup.signature("") is None
+
+
+@test
+def dedup_merges_project_copies_into_common_entry():
+    with Fixture(settings_with_cleanup(require_user_consent=False)) as fx:
+        dedup_fixture(fx)
+        store = fx.store()
+        store.rebuild_index()
+        state = dedup.propose(store, NOW)
+        assert len(state["proposals"]) == 1, state
+        proposal = state["proposals"][0]
+        assert proposal["canonical"]["id"] == "common_pool", "common copy is canonical"
+        assert {m["id"] for m in proposal["members"]} == {"acme_pool", "zeta_pool"}
+        assert proposal["action"] == "link", "zeta copy is below the merge threshold"
+
+        state = dedup.propose(store, NOW, merge_threshold=0.7)
+        assert state["proposals"][0]["action"] == "merge"
+        result = dedup.apply(store, {state["proposals"][0]["id"]}, NOW)
+        assert result["archived"] == ["acme_pool", "zeta_pool"], result
+        assert store.get("acme_pool") is None and store.get("common_pool") is not None
+        assert "Merged near-duplicates" in store.read("common_pool")
+        sweep.restore(store, "acme_pool")
+        assert store.get("acme_pool") is not None, "merged copies stay restorable"
+
+
+@test
+def dedup_links_project_copies_without_common_entry():
+    with Fixture() as fx:
+        dedup_fixture(fx, with_common=False)
+        store = fx.store()
+        store.rebuild_index()
+        state = dedup.propose(store, NOW)
+        (proposal,) = state["proposals"]
+        assert proposal["action"] == "link", "merging would hide the fact from a project"
+        assert dedup.apply(store, None, NOW) == {"linked": [], "archived": []}, \
+            "consent required: pending proposals are not applied"
+        with contextlib.redirect_stdout(io.StringIO()) as out:  # the CLI, options first
+            assert dedup.main(["approve", "--root", fx.root, proposal["id"]]) == 0
+        assert out.getvalue() == f"Approved: {proposal['id']}\n", out.getvalue()
+        dedup.apply(store, None, NOW)
+        links = {row: parse_entry(store.read(row))["links"] for row in ("acme_pool", "zeta_pool")}
+        assert links == {"acme_pool": ["zeta_pool"], "zeta_pool": ["acme_pool"]}, links
+        assert "none" not in parse_entry(store.read("acme_pool"))["sections"]["Related Memories"]
+        assert os.path.isfile(os.path.join(fx.root, dedup.STATE_DIR, dedup.SIGNATURES_FILE))
+
+
+@test
+def dedup_tells_same_stem_copies_apart():
+    name = "2020-06-16T1430_technical_memory.md"
+    with Fixture(settings_with_cleanup(require_user_consent=False)) as fx:
+        fx.add(f"common/technical/{name}",
+               entry_text("technical", days_ago(3), body=POOL_FACT))
+        fx.add(f"projects/acme/technical/{name}",
+               entry_text("technical", days_ago(2), body=POOL_FACT))
+        store = fx.store()
+        store.rebuild_index()
+        (proposal,) = dedup.propose(store, NOW)["proposals"]
+        (member,) = proposal["members"]
+        assert proposal["canonical"]["location"] == f"common/technical/{name}"
+        assert member["location"] == f"projects/acme/technical/{name}"
+        assert proposal["action"] == "merge", proposal
+        assert dedup.apply(store, {proposal["id"]}, NOW)["archived"] == [name[:-3]]
+        assert os.path.isfile(os.path.join(fx.root, "common", "technical", name))
+        assert not os.path.exists(os.path.join(fx.root, member["location"])), \
+            "the duplicate, not the canonical copy, is archived"
+
+
+@test
+def dedup_links_same_stem_copies_by_scope():
+    name = "2020-06-16T1430_technical_memory"
+    with Fixture(settings_with_cleanup(require_user_consent=False)) as fx:
+        for scope in ("acme", "zeta"):
+            fx.add(f"projects/{scope}/technical/{name}.md",
+                   entry_text("technical", days_ago(2), body=POOL_FACT))
+        store = fx.store()
+        store.rebuild_index()
+        (proposal,) = dedup.propose(store, NOW)["proposals"]
+        assert proposal["action"] == "link", proposal
+        dedup.apply(store, {proposal["id"]}, NOW)
+        links = {row.scope: parse_entry(store.read(row))["links"] for row in store.rows()}
+        assert links == {"projects/acme": [f"projects/zeta/{name}"],
+                         "projects/zeta": [f"projects/acme/{name}"]}, links
+        source = graph.StoreGraph(fx.root, persist=False)
+        source.refresh()
+        assert sorted(source.nodes) == [name, f"projects/zeta/{name}"], sorted(source.nodes)
+        assert edge_set(source) == {(name, f"projects/zeta/{name}", "related_to"),
+                                    (f"projects/zeta/{name}", name, "related_to")}
+        assert not [w for w in source.warnings() if w.startswith("dangling")]
+
+
+# --- write-ahead log -------------------------------------------------------
+
+def _wal_writer(root, worker, count):
+    store = MemoryStore(root, load_settings())
+    for n in range(count):
+        relpath = f"projects/acme/interactions/w{worker}-{n:03d}.md"
+        wal.record(store, relpath, entry_text("user_interaction", days_ago(1)),
+                   session=f"worker-{worker}", durable=False)
+
+
+@test
+def wal_records_are_visible_before_merge():
+    with Fixture() as fx:
+        standard_fixture(fx)
+        store = fx.store()
+        store.rebuild_index()
+        row = wal.record(store, "common/technical/fresh.md",
+                         entry_text("technical", days_ago(1), tags=["wal"]),
+                         session="s1", auto_merge=False)
+        assert row.id == "fresh"
+        assert "fresh" not in {r.id for r in store.index_rows()}, "index untouched"
+        assert [r.id for r in store.query(tag="wal")] == ["fresh"], "read-through"
+        assert wal.merge(store) == 1
+        assert "fresh" in {r.id for r in store.index_rows()}
+        assert wal.merge(store) == 0, "second merge has nothing left"
+        assert [r.id for r in store.query(tag="wal")] == ["fresh"], "no duplicate row"
+
+
+@test
+def wal_keeps_same_stem_records_in_two_scopes():
+    with Fixture() as fx:
+        store = fx.store()
+        store.rebuild_index()
+        for scope in ("projects/acme", "projects/zeta"):
+            wal.record(store, f"{scope}/technical/pool.md",
+                       entry_text("technical", days_ago(1), tags=["pool"]),
+                       session="s1", auto_merge=False)
+        want = ["projects/acme/technical/pool.md", "projects/zeta/technical/pool.md"]
+        assert sorted(r.location for r in store.query(tag="pool")) == want, "read-through"
+        wal.merge(store)
+        assert sorted(r.location for r in store.index_rows()) == want
+
+
+@test
+def wal_merge_replays_safely_after_lost_checkpoint():
+    with Fixture() as fx:
+        store = fx.store()
+        store.rebuild_index()
+        for n in range(3):
+            wal.record(store, f"common/technical/e{n}.md",
+                       entry_text("technical", days_ago(n + 1)), session="s1",
+                       auto_merge=False)
+        wal.merge(store)
+        before = open(store.index_path, encoding="utf-8").read()
+        os.unlink(os.path.join(fx.root, wal.WAL_DIR, wal.CHECKPOINT_FILE))
+        assert wal.merge(store) == 3, "crash before checkpoint: whole log replays"
+        assert open(store.index_path, encoding="utf-8").read() == before
+
+
+@test
+def wal_concurrent_writers_lose_no_rows():
+    with Fixture() as fx:
+        fx.store().rebuild_index()
+        workers, count = 4, 25
+        procs = [multiprocessing.Process(target=_wal_writer, args=(fx.root, w, count))
+                 for w in range(workers)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join(60)
+        assert all(proc.exitcode == 0 for proc in procs), "writer crashed"
+        store = fx.store()
+        assert len(store.rows()) == workers * count, len(store.rows())
+        wal.merge(store)
+        ids = [r.id for r in store.index_rows()]
+        assert len(ids) == len(set(ids)) == workers * count, len(ids)
+
+
+@test
+def wal_is_folded_before_the_sweeper_rewrites_the_index():
+    with Fixture(settings_with_cleanup(require_user_consent=False)) as fx:
+        store = fx.store()
+        store.rebuild_index()
+        wal.record(store, "common/technical/old.md",
+                   entry_text("technical", days_ago(400)), session="s1", auto_merge=False)
+        store.rebuild_index()  # as if a scan picked the file up before the merge
+        state = sweep.propose(store, NOW)
+        archived = sweep.apply(store, {b["id"] for b in state["batches"]}, NOW)
+        assert "old" in archived, archived
+        wal.merge(store)
+        assert store.get("old") is None, "merged WAL row must not resurrect an archived entry"
+
+
+@test
+def wal_garbage_collects_consumed_idle_logs():
+    with Fixture() as fx:
+        store = fx.store()
+        store.rebuild_index()
+        wal.record(store, "common/technical/a.md", entry_text("technical", days_ago(1)),
+                   session="s1", auto_merge=False)
+        log = os.path.join(fx.root, wal.WAL_DIR, "s1.log")
+        wal.merge(store)
+        assert os.path.exists(log), "recent log kept for its writer"
+        wal.merge(store, now=time.time() + wal.WAL_GC_GRACE + 1)
+        assert not os.path.exists(log), "idle, fully merged log removed"
+        assert store.get("a") is not None
+
+
+@test
+def wal_cli_records_of_one_session_share_a_log():
+    with Fixture() as fx:
+        for name in ("a", "b"):
+            fx.add(f"common/technical/{name}.md", entry_text("technical", days_ago(1)))
+
+        def record(name, env):
+            subprocess.run(
+                [sys.executable, "-m", "agentic_rules.memory.wal", "record", "--root", fx.root,
+                 f"common/technical/{name}.md"],
+                cwd=REPO, env=env, check=True, capture_output=True)
+
+        env = {k: v for k, v in os.environ.items() if k != wal.SESSION_ENV}
+        for name in ("a", "b"):
+            record(name, env)
+        assert len(wal.log_names(fx.store())) == 1, "one login session, one log"
+        for name in ("a", "b"):
+            record(name, dict(env, **{wal.SESSION_ENV: "agent-42"}))
+        assert "agent-42.log" in wal.log_names(fx.store())
+        assert len(wal.log_names(fx.store())) == 2, wal.log_names(fx.store())
+
+
+# --- store -> graph adapter -------------------------------------------------------
+
+def manifest_fixture(fx):
+    """The recipe's Phase 1 fixture store, with a base manifest and two overlays."""
+    fx.add("common/technical/full.md",
+           entry_text("technical", days_ago(3), tags=["pool"], related=["loose", "ghost"]))
+    fx.add("common/technical/loose.md",
+           "# Loose lines\n\n## Metadata\n**Category**: technical\n\n"
+           "## Tags\n[a, b]\n")
+    fx.add("projects/acme/sessions/2026-06-01T0900_session_memory.md",
+           "# Session Memory: s1\n\nNo metadata at all.\n")
+    fx.add("projects/acme/topics/pooling.md",
+           "## Metadata\n\n## Tags\n\n## Related Memories\n[placeholder]\n")
+    fx.add("index.md", "# Memory Index\n")
+    kg = "knowledge_graph"
+    fx.add(f"{kg}/base/base_manifest.md",
+           "# Base KG Manifest\n\n## Edge Registry\n"
+           "| Edge Key | Source Node | Target Node | Type | Content Hash |\n"
+           "|---|---|---|---|---|\n"
+           "| e1 | full | pooling | explains | abc |\n"
+           "| e2 | loose | pooling | cites | def |\n"
+           "| e3 | full | 2026-06-01T0900_session_memory | depends_on | 123 |\n"
+           "| [key] | [source] | [target] | [type] | [hash] |\n")
+    fx.add(f"{kg}/overlays/feature/2026-06-02T1000_overlay.md",
+           "# Branch Overlay\n\n## Metadata\n- **Status**: VALID\n\n"
+           "## Added Edges\n| Source | Target | Type | Confidence |\n|---|---|---|---|\n"
+           "| pooling | loose | related_to | 0.9 |\n"
+           "| pooling | nowhere | related_to | 0.9 |\n\n"
+           "## Removed Edges\n| Source | Target | Type | Reason |\n|---|---|---|---|\n"
+           "| loose | pooling | cites | deleted |\n\n"
+           "## Modified Edges\n| Source | Target | Type | Change |\n|---|---|---|---|\n"
+           "| full | pooling | supersedes | rewritten |\n")
+    fx.add(f"{kg}/overlays/old/overlay_manifest.md",
+           "# Overlay Manifest\n\n## Metadata\n**Generated**: 2026-06-01T00:00:00Z\n"
+           "**Status**: VALID\n")
+    fx.add(f"{kg}/overlays/old/2026-06-03T1000_overlay.md",
+           "# Branch Overlay\n\n## Metadata\n**Status**: STALE\n\n"
+           "## Removed Edges\n| Source | Target | Type | Reason |\n|---|---|---|---|\n"
+           "| full | 2026-06-01T0900_session_memory | depends_on | gone |\n")
+
+
+def edge_set(source):
+    return {(e["source"], e["target"], e["relation"]) for e in source.graph()["edges"]}
+
+
+@test
+def store_graph_follows_the_recipe_fixture():
+    with Fixture() as fx:
+        manifest_fixture(fx)
+        source = graph.StoreGraph(fx.root, persist=False)
+        source.refresh()
+        nodes = {n["id"]: n for n in source.graph()["nodes"]}
+        assert sorted(nodes) == ["2026-06-01T0900_session_memory", "full", "loose", "pooling"]
+        assert nodes["loose"]["type"] == "technical" and nodes["loose"]["tags"] == ["a", "b"]
+        assert nodes["loose"]["title"] == "Loose lines"
+        assert nodes["2026-06-01T0900_session_memory"]["type"] == "session"
+        assert nodes["pooling"]["title"] == "pooling" and nodes["pooling"]["tags"] == []
+        assert nodes["full"]["scope"] == "common" and nodes["pooling"]["scope"] == "projects/acme"
+        assert edge_set(source) == {
+            ("full", "loose", "related_to"),  # wiki-link
+            ("full", "pooling", "supersedes"),  # base row, modified by the overlay
+            ("pooling", "loose", "related_to"),  # overlay Added
+            ("full", "2026-06-01T0900_session_memory", "depends_on"),  # stale removal ignored
+        }, edge_set(source)
+        warnings = "\n".join(source.warnings())
+        assert "dangling link: full -> [[ghost]]" in warnings
+        assert "stale overlay skipped: knowledge_graph/overlays/old" in warnings
+        assert "missing node nowhere" in warnings
+        assert source.graph() == source.graph()
+        assert "Loose lines" in source.node("loose")["content"]
+
+
+@test
+def store_graph_refresh_is_incremental():
+    with Fixture(settings_with(enabled=True, threshold_mb=0)) as fx:
+        standard_fixture(fx)
+        compact.compact(fx.store(), now=NOW)  # old_technical now lives in a segment
+        fx.add("common/technical/hub.md", entry_text("technical", days_ago(1),
+                                                     related=["old_technical", "later"]))
+        source = graph.StoreGraph(fx.root, workers=1)
+        source.refresh()
+        assert "old_technical" in source.nodes
+        assert edge_set(source) == {("hub", "old_technical", "related_to"),
+                                    ("old_technical", "new_interaction", "related_to")}
+
+        changes = source.refresh()
+        assert graph.empty(changes) and source.last_refresh["parsed"] == 0
+
+        fx.add("projects/acme/topics/later.md", entry_text("topic", days_ago(1), tags=["x"]))
+        changes = source.refresh()
+        assert source.last_refresh["parsed"] == 1, source.last_refresh
+        assert [n["id"] for n in changes["nodes"]["added"]] == ["later"]
+        assert [(e["source"], e["target"]) for e in changes["edges"]["added"]] == [("hub", "later")]
+
+        os.remove(os.path.join(fx.root, "projects/acme/interactions/new_interaction.md"))
+        changes = source.refresh()
+        assert changes["nodes"]["removed"] == ["new_interaction"]
+        assert [(e["source"], e["target"]) for e in changes["edges"]["removed"]] == \
+            [("old_technical", "new_interaction")]
+        assert "dangling link: old_technical -> [[new_interaction]]" in source.warnings()
+
+        fx.add("common/technical/hub.md", entry_text("technical", days_ago(1), tags=["hub"]))
+        changes = source.refresh()
+        assert [n["id"] for n in changes["nodes"]["changed"]] == ["hub"]
+        assert len(changes["edges"]["removed"]) == 2 and changes["version"] == 4
+
+        source.save()
+        fresh = graph.StoreGraph(fx.root)
+        fresh.refresh()
+        assert fresh.graph() == source.graph(), "incremental state must equal a full scan"
+        assert fresh.last_refresh["parsed"] == 0, "a new process reads the parse cache"
+
+
+@test
+def store_graph_drops_archived_segment_members():
+    with Fixture(settings_with_cleanup(require_user_consent=False)) as fx:
+        standard_fixture(fx)
+        store = fx.store()
+        store.rebuild_index()
+        compact.compact(store, now=NOW, force=True)
+        source = graph.StoreGraph(fx.root, persist=False)
+        source.refresh()
+        assert "old_technical" in source.nodes
+        for batch in sweep.propose(store, NOW)["batches"]:
+            sweep.apply(store, {batch["id"]}, NOW)
+        changes = source.refresh()
+        assert "old_technical" in changes["nodes"]["removed"], changes["nodes"]
+        assert set(source.nodes) == {r.id for r in store.rows()}
+
+@test
+def store_graph_reapplies_manifests_when_they_or_their_nodes_change():
+    with Fixture() as fx:
+        manifest_fixture(fx)
+        source = graph.StoreGraph(fx.root, persist=False)
+        source.refresh()
+        fx.add("knowledge_graph/overlays/old/2026-06-04T1000_overlay.md",
+               "# Branch Overlay\n\n## Metadata\n**Status**: VALID\n")
+        changes = source.refresh()
+        assert [e["relation"] for e in changes["edges"]["removed"]] == ["depends_on"]
+        assert not any("stale" in w for w in source.warnings())
+
+        fx.add("common/technical/nowhere.md", entry_text("technical", days_ago(1)))
+        changes = source.refresh()
+        assert [(e["source"], e["target"]) for e in changes["edges"]["added"]] == \
+            [("pooling", "nowhere")]
+        assert source.last_refresh["parsed"] == 1
+
+
+# --- git history -----------------------------------------------------------------
+
+def git(repo, *args):
+    return subprocess.run(["git", "-C", repo, "-c", "user.name=t", "-c", "user.email=t@t",
+                           "-c", "commit.gpgsign=false", "-c", "tag.gpgsign=false"] + list(args),
+                          check=True, stdout=subprocess.PIPE).stdout.decode().strip()
+
+
+def commit(repo, message, **files):
+    for name, text in files.items():
+        with open(os.path.join(repo, name.replace("__", ".")), "w", encoding="utf-8") as handle:
+            handle.write(text)
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", message)
+    return git(repo, "rev-parse", "HEAD")
+
+
+@test
+def history_classifies_commit_subjects():
+    assert history.classify("feat(api)!: drop v1 routes") == "feature"
+    assert history.classify("fix: off-by-one in pager") == "fix"
+    assert history.classify("Fix crash when the index is empty") == "fix"
+    assert history.classify("Refactor the parser into two passes") == "refactor"
+    assert history.classify("Add support for tags") == "feature"
+    assert history.classify("Update README") == "docs"
+    assert history.classify("Release 1.5.4") == "release"
+    assert history.classify("Revert \"feat: x\"") == "revert"
+    assert history.classify("Merge pull request #4") == "merge"
+    assert history.classify("anything", parents=2) == "merge"
+    assert history.classify("wip") == "other"
+
+
+@test
+def history_reruns_read_only_new_commits():
+    settings = copy.deepcopy(load_settings())
+    settings["memory_rules"]["project_support"]["git_history_analysis"].update(
+        performance_mode="thorough", include_author_info=True)
+    with Fixture(settings) as fx:
+        repo = os.path.join(fx.root, "repo")
+        os.makedirs(repo)
+        git(repo, "init", "-q", "-b", "main")
+        commit(repo, "feat: add the pager", pager__py="one\ntwo\nthree\n")
+        commit(repo, "fix(pager): handle empty pages", notes__md="x\n")
+        git(repo, "tag", "v1.0")
+        git(repo, "mv", "pager.py", "paging.py")
+        commit(repo, "refactor: rename the pager module", paging__py="one\ntwo\nthree\nfour\n")
+
+        first = history.analyze(repo, fx.root, settings)
+        assert (first["commits"], first["processed"], first["cached"]) == (3, 3, 0)
+        assert first["types"] == {"feature": 1, "fix": 1, "refactor": 1}
+        churn = {row["path"]: row for row in first["files"]}
+        # The rename is one added line on the new path, not a rewrite.
+        assert (churn["paging.py"]["added"], churn["paging.py"]["deleted"]) == (1, 0)
+        assert churn["pager.py"]["added"] == 3
+        assert [(row["tag"], row["commits_since_previous"]) for row in first["milestones"]] == \
+            [("v1.0", 2)]
+        assert first["authors"] == {"t": 3}
+
+        commit(repo, "Add a second page size", paging__py="one\ntwo\nthree\nfour\nfive\n")
+        git(repo, "tag", "-a", "v2.0", "-m", "second release")
+        second = history.analyze(repo, fx.root, settings)
+        assert (second["commits"], second["processed"], second["cached"]) == (4, 1, 3)
+        assert [(row["tag"], row["commits_since_previous"]) for row in second["milestones"]] == \
+            [("v1.0", 2), ("v2.0", 2)]
+        full = history.analyze(repo, fx.root, settings, use_cache=False)
+        for key in ("commits", "types", "files", "milestones", "major", "authors", "velocity"):
+            assert second[key] == full[key], key
+        assert history.analyze(repo, fx.root, settings)["processed"] == 0
+
+        git(repo, "reset", "-q", "--hard", "HEAD~2")
+        commit(repo, "docs: describe the pager", notes__md="x\ny\n")
+        rewritten = history.analyze(repo, fx.root, settings)
+        assert (rewritten["commits"], rewritten["processed"], rewritten["cached"]) == (3, 3, 0)
+        assert [row["tag"] for row in rewritten["milestones"]] == ["v1.0"]
+
+        assert history.analyze(repo, fx.root, settings, max_commits=1)["commits"] == 1
+
+
+# --- runner ----------------------------------------------------------------
+
+def main():
+    passed = failed = 0
+    for fn in _results:
+        try:
+            fn()
+            print(f"PASS  {fn.__name__}")
+            passed += 1
+        except Exception as exc:  # noqa: BLE001
+            print(f"FAIL  {fn.__name__}: {exc}")
+            failed += 1
+    print(f"\n{passed}/{passed + failed} passed, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
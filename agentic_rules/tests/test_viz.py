@@ -0,0 +1,547 @@
+#!/usr/bin/env python3
+"""Test harness for the visualizer's graph API (agentic_rules.viz).
+
+Hermetic: every check builds a throwaway memory store (and, where needed, a
+throwaway kg database) under a temp directory.
+
+Covers:
+  * the graph model: namespaced ids, directory and tag hubs that appear at
+    two members and disappear below that, and a model patched from change
+    sets that equals one built from scratch
+  * keyset pages with source and derived filters, stable while the graph
+    changes between pages
+  * level-of-detail clusters with drill-down, neighbourhoods, and viewports
+    that fall back to clusters when too many nodes are in view
+  * the multilevel force layout in pure Python and (when installed) NumPy,
+    incremental placement that never moves a placed node, and the layout
+    file that keeps positions across restarts
+  * the runtime-KG source: the current view only, and a supersession
+    arriving as a change set
+  * the change feed: bursts coalesced into one net diff that replays onto
+    the client's copy, resuming from an event id or a version, and resets
+    when history or the layout cannot be followed
+  * the HTTP API end to end: cursors, positions, ETag revalidation, gzip,
+    404s and 400s, and the server-sent event stream
+
+Run:  python agentic_rules/tests/test_viz.py
+Exit: 0 if all pass, 1 otherwise.
+"""
+
+import gzip
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO)
+
+from agentic_rules.kg import KnowledgeGraph  # noqa: E402
+from agentic_rules.memory.graph import StoreGraph  # noqa: E402
+from agentic_rules.viz import GraphModel, KGSource, ModelError, layout, server  # noqa: E402
+from agentic_rules.viz.events import ChangeFeed  # noqa: E402
+
+_results = []
+
+
+def test(fn):
+    _results.append(fn)
+    return fn
+
+
+# --- helpers ---------------------------------------------------------------
+
+GENERATED = "2026-06-01T09:00:00Z"
+
+
+def entry_text(category, tags=(), related=()):
+    related_lines = "\n".join(f"[[{r}]]" for r in related) or "none"
+    return (
+        f"# Memory Entry: {category} - {GENERATED}\n\n"
+        "## Metadata\n"
+        "- **Version**: 1.5.4\n"
+        f"- **Generated**: {GENERATED}\n"
+        f"- **Category**: {category}\n\n"
+        "## Context\nFixture.\n\n"
+        "## Understanding\nBody text.\n\n"
+        "## Decision/Action\nNone.\n\n"
+        f"## Related Memories\n{related_lines}\n\n"
+        f"## Tags\n[{', '.join(tags)}]\n"
+    )
+
+
+class Store:
+    """A temp memory store: `with Store() as st: st.add(...)`."""
+
+    def __enter__(self):
+        self.root = tempfile.mkdtemp(prefix="viz-test-")
+        return self
+
+    def __exit__(self, *exc):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def add(self, relpath, text):
+        path = os.path.join(self.root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(text)
+
+    def remove(self, relpath):
+        os.remove(os.path.join(self.root, relpath))
+
+    def model(self):
+        source = StoreGraph(self.root, persist=False, workers=1)
+        model = GraphModel([source])
+        model.refresh()
+        return model
+
+
+def small_store(st):
+    st.add("common/technical/pool.md", entry_text("technical", ["db", "pool"], ["retry"]))
+    st.add("common/technical/retry.md", entry_text("technical", ["net"]))
+    st.add("common/technical/cache.md", entry_text("technical", ["db"]))
+    st.add("projects/acme/decisions/schema.md", entry_text("decision", ["db"], ["pool"]))
+
+
+def snapshot(model):
+    return ({node_id: node for node_id, node in model.nodes.items()},
+            {key: edge for key, edge in model.edges.items()})
+
+
+def all_pages(model, kind, limit, **kwargs):
+    items, after = [], None
+    while True:
+        page, after = model.page(kind, after, limit, **kwargs)
+        items += page
+        if after is None:
+            return items
+
+
+def all_pages_from(model, after):
+    items = []
+    while after is not None:
+        page, after = model.page("nodes", after, 40, derived=False)
+        items += page
+    return items
+
+
+def get(port, path, headers=None):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as exc:
+        return exc.code, dict(exc.headers), exc.read()
+
+
+def replay(data, nodes, edges):
+    """Apply a `changes` event to a client's copy of the graph."""
+    for node_id in data["nodes"]["removed"]:
+        del nodes[node_id]
+    for edge in data["edges"]["removed"]:
+        del edges[(edge["source"], edge["target"], edge["relation"])]
+    for node in data["nodes"]["added"] + data["nodes"]["changed"]:
+        nodes[node["id"]] = {key: value for key, value in node.items() if key not in "xy"}
+    for edge in data["edges"]["added"]:
+        edges[(edge["source"], edge["target"], edge["relation"])] = edge
+
+
+def read_events(response, count):
+    """The next `count` (event, id, data) messages of a text/event-stream response."""
+    events, fields = [], {}
+    while len(events) < count:
+        line = response.readline().decode("utf-8").rstrip("\n")
+        if line:
+            name, _, value = line.partition(": ")
+            fields[name] = value
+        elif "event" in fields:
+            events.append((fields["event"], fields["id"], json.loads(fields["data"])))
+            fields = {}
+    return events
+
+
+# --- model -----------------------------------------------------------------
+
+@test
+def model_derives_hubs_and_keeps_them_current():
+    with Store() as st:
+        small_store(st)
+        model = st.model()
+        src = "markdown-" + os.path.basename(st.root)
+        stored = sorted(n for n, node in model.nodes.items() if not node["derived"])
+        assert stored == [f"{src}:{name}" for name in ("cache", "pool", "retry", "schema")]
+        assert f"{src}:dir/common/technical" in model.nodes
+        assert f"{src}:dir/projects/acme/decisions" not in model.nodes, "one member: no hub"
+        assert f"{src}:tag/db" in model.nodes and f"{src}:tag/net" not in model.nodes
+        hub = model.node(f"{src}:tag/db")
+        assert hub["derived"] and hub["members"] == [f"{src}:cache", f"{src}:pool",
+                                                     f"{src}:schema"]
+        assert (f"{src}:schema", f"{src}:pool", "related_to") in model.edges
+
+        st.add("common/technical/retry.md", entry_text("technical", ["net", "db"]))
+        st.remove("common/technical/cache.md")
+        st.add("projects/acme/decisions/naming.md", entry_text("decision", ["net"]))
+        version = model.version
+        changes = model.refresh()
+        assert model.version == version + 1 == changes["version"]
+        assert f"{src}:cache" in changes["nodes"]["removed"]
+        assert f"{src}:tag/net" in [n["id"] for n in changes["nodes"]["added"]]
+        assert f"{src}:dir/projects/acme/decisions" in model.nodes
+        assert model.node(f"{src}:tag/db")["member_count"] == 3
+
+        st.remove("projects/acme/decisions/naming.md")
+        st.remove("common/technical/retry.md")
+        model.refresh()
+        assert f"{src}:tag/net" not in model.nodes
+        assert f"{src}:dir/projects/acme/decisions" not in model.nodes
+        assert not any(key[2] == "tagged" and key[1].endswith("tag/net") for key in model.edges)
+        assert snapshot(model) == snapshot(st.model()), "patched model must equal a fresh build"
+        assert model.refresh()["version"] == model.version, "no change: no new version"
+
+
+@test
+def pages_are_keyset_ordered_and_filterable():
+    with Store() as st:
+        for i in range(120):
+            st.add(f"common/d{i % 6}/n{i:03d}.md",
+                   entry_text("technical", [f"t{i % 4}"], [f"n{(i + 1) % 120:03d}"]))
+        model = st.model()
+        src = "markdown-" + os.path.basename(st.root)
+        nodes = all_pages(model, "nodes", 7)
+        assert [n["id"] for n in nodes] == sorted(model.nodes)
+        assert len(all_pages(model, "edges", 11)) == len(model.edges)
+        stored = all_pages(model, "nodes", 50, derived=False)
+        assert len(stored) == 120 and not any(n["derived"] for n in stored)
+        assert len(all_pages(model, "nodes", 50, source=src)) == len(model.nodes)
+        assert model.counts(src) == model.counts()
+        try:
+            model.page("nodes", source="nope")
+            raise AssertionError("unknown source accepted")
+        except ModelError:
+            pass
+
+        first, after = model.page("nodes", None, 40, derived=False)
+        st.add("common/d0/a000.md", entry_text("technical"))  # sorts before the cursor
+        st.remove("common/d5/n119.md")
+        model.refresh()
+        rest = all_pages_from(model, after)
+        ids = [n["id"] for n in first + rest]
+        assert len(ids) == len(set(ids)) == 119, "no duplicates and no skips across a change"
+        assert f"{src}:a000" not in ids
+
+
+@test
+def clusters_neighbourhoods_and_viewports():
+    with Store() as st:
+        small_store(st)
+        st.add("projects/acme/decisions/naming.md", entry_text("decision"))
+        model = st.model()
+        src = "markdown-" + os.path.basename(st.root)
+        top = model.clusters(0)
+        assert [(c["id"], c["count"]) for c in top["clusters"]] == [(src, 5)]
+        scopes = model.clusters(1, parent=src)
+        assert [c["label"] for c in scopes["clusters"]] == ["common", "projects/acme"]
+        assert scopes["edges"] == [{"source": f"{src}:scope/common",
+                                    "target": f"{src}:scope/projects/acme", "count": 1}]
+        dirs = model.clusters(2, parent=f"{src}:scope/common")
+        assert [(c["label"], c["count"], c["internal_edges"]) for c in dirs["clusters"]] == \
+            [("common/technical", 3, 1)]
+        assert dirs["clusters"][0]["types"] == {"technical": 3}
+        try:
+            model.clusters(3)
+            raise AssertionError("bad level accepted")
+        except ModelError:
+            raise AssertionError("a bad level is a bad request, not a missing thing")
+        except ValueError:
+            pass
+
+        one = model.neighborhood(f"{src}:schema", hops=1)
+        assert [n["id"] for n in one["nodes"]] == [f"{src}:pool", f"{src}:schema"]
+        two = model.neighborhood(f"{src}:schema", hops=2)
+        assert {n["id"]: n["hops"] for n in two["nodes"]}[f"{src}:retry"] == 2
+        hubs = model.neighborhood(f"{src}:schema", hops=1, derived=True)
+        assert f"{src}:tag/db" in [n["id"] for n in hubs["nodes"]]
+        capped = model.neighborhood(f"{src}:schema", hops=2, derived=True, limit=2)
+        assert capped["truncated"] and len(capped["nodes"]) == 2
+
+        positions = {node_id: xy for node_id, xy in model.positions().items()
+                     if not model.nodes[node_id]["derived"]}
+        assert len(positions) == 5 and len(model.positions()) == len(model.nodes)
+        xs = [x for x, _ in positions.values()]
+        ys = [y for _, y in positions.values()]
+        box = (min(xs) - 1, min(ys) - 1, max(xs) + 1, max(ys) + 1)
+        full = model.viewport(*box)
+        assert full["level"] is None and len(full["nodes"]) == 5 and full["total"] == 5
+        assert all("x" in n for n in full["nodes"]) and len(full["edges"]) == 2
+        coarse = model.viewport(*box, limit=2)
+        assert coarse["level"] == 2 and sum(c["count"] for c in coarse["clusters"]) == 5
+        assert coarse["edges"] == [{"source": f"{src}:dir/common/technical",
+                                    "target": f"{src}:dir/projects/acme/decisions",
+                                    "count": 1}]
+        assert model.viewport(*box, limit=1)["level"] == 0
+        x, y = positions[f"{src}:pool"]
+        assert [n["id"] for n in model.viewport(x - 0.1, y - 0.1, x + 0.1, y + 0.1)["nodes"]] \
+            == [f"{src}:pool"]
+
+
+@test
+def kg_source_shows_the_current_view_and_its_changes():
+    with Store() as st:
+        small_store(st)
+        kg = KnowledgeGraph(os.path.join(st.root, "kg.sqlite3"))
+        try:
+            old = kg.add("rule", "Pool size", "Use ten connections.", scope="acme", tags=["db"])
+            other = kg.add("gotcha", "Pool leak", "Release in finally.", scope="acme",
+                           tags=["db"])
+            kg.link(other["id"], old["id"], "related_to")
+            model = GraphModel([StoreGraph(st.root, persist=False, workers=1), KGSource(kg)])
+            model.refresh()
+            assert f"runtime-kg:{old['id']}" in model.nodes
+            assert "runtime-kg:tag/db" in model.nodes
+            assert "runtime-kg:dir/acme/rule" in [c["id"] for c in model.clusters(2)["clusters"]]
+            assert model.node(f"runtime-kg:{old['id']}")["content"] == "Use ten connections."
+
+            new = kg.add("rule", "Pool size", "Use twenty connections.", scope="acme",
+                         supersedes=old["id"])
+            changes = model.refresh()
+            assert f"runtime-kg:{old['id']}" in changes["nodes"]["removed"]
+            assert f"runtime-kg:{new['id']}" in [n["id"] for n in changes["nodes"]["added"]]
+            assert f"runtime-kg:{old['id']}" not in model.nodes
+            assert not any(f"runtime-kg:{old['id']}" in key for key in model.edges)
+            assert model.refresh()["nodes"] == {"added": [], "changed": [], "removed": []}
+
+            result = model.query("twenty connections", source="runtime-kg")
+            assert result["matches"][0]["id"] == f"runtime-kg:{new['id']}"
+            assert result["stages"]["runtime-kg"]
+            assert [s["kind"] for s in model.describe()] == ["markdown", "runtime-kg"]
+        finally:
+            kg.close()
+
+
+def grid_graph(side):
+    ids = [f"{r}.{c}" for r in range(side) for c in range(side)]
+    edges = [(f"{r}.{c}", f"{r}.{c + 1}") for r in range(side) for c in range(side - 1)]
+    edges += [(f"{r}.{c}", f"{r + 1}.{c}") for r in range(side - 1) for c in range(side)]
+    return ids, edges
+
+
+@test
+def force_layout_unfolds_a_grid_and_keeps_placed_nodes_fixed():
+    ids, edges = grid_graph(12)
+    for vectorized in [False] + ([True] if layout.numpy is not None else []):
+        placed = layout.force_layout(ids, edges, vectorized=vectorized)
+        assert placed == layout.force_layout(ids, edges, vectorized=vectorized), "deterministic"
+        lengths = [math.dist(placed[a], placed[b]) for a, b in edges]
+        mean = sum(lengths) / len(lengths)
+        diagonal = math.dist(placed["0.0"], placed["11.11"])
+        assert 0.8 < diagonal / (math.sqrt(2) * 11 * mean) < 1.2, "the grid is unfolded"
+        assert max(lengths) < 2 * mean, vectorized
+
+        grown = ids + ["n1", "n2", "far1", "far2"]
+        more = edges + [("n1", "5.5"), ("n2", "n1"), ("far1", "far2")]
+        updated = layout.update_layout(grown, more, placed, vectorized=vectorized)
+        assert all(updated[node_id] == placed[node_id] for node_id in ids)
+        assert math.dist(updated["n1"], updated["5.5"]) < 3 * layout.EDGE_LENGTH
+        right = max(x for x, _ in placed.values())
+        assert min(updated["far1"][0], updated["far2"][0]) > right, "unconnected: beside"
+        assert layout.update_layout(grown, more, updated, vectorized=vectorized) == updated
+
+    mostly_new = layout.update_layout(ids, edges, {"0.0": (5000.0, 5000.0)})
+    assert len(mostly_new) == len(ids) and mostly_new["0.0"] == (5000.0, 5000.0), \
+        "a full relayout is shifted onto the old positions"
+
+
+@test
+def model_layout_is_incremental_and_survives_a_restart():
+    with Store() as st:
+        small_store(st)
+        path = os.path.join(st.root, ".graph", "layout.json")
+        model = GraphModel([StoreGraph(st.root, persist=False, workers=1)], layout_path=path)
+        model.refresh()
+        first = dict(model.positions())
+        assert set(first) == set(model.nodes)
+        model.save_layout()
+
+        st.add("common/technical/queue.md", entry_text("technical", ["net"], ["retry"]))
+        model.refresh()
+        second = model.positions()
+        src = "markdown-" + os.path.basename(st.root)
+        assert all(second[node_id] == xy for node_id, xy in first.items()), "nothing moves"
+        assert set(second) - set(first) == {f"{src}:queue", f"{src}:tag/net"}
+
+        restarted = GraphModel([StoreGraph(st.root, persist=False, workers=1)],
+                               layout_path=path)
+        restarted.refresh()
+        third = restarted.positions()
+        assert all(third[node_id] == xy for node_id, xy in first.items()), "kept on disk"
+        restarted.relayout()
+        assert set(restarted.positions()) == set(restarted.nodes)
+        clusters = GraphModel([StoreGraph(st.root, persist=False, workers=1)],
+                              layout="clusters")
+        clusters.refresh()
+        assert len(clusters.positions()) == 5 and clusters.bounds() is not None
+
+
+# --- change feed -------------------------------------------------------------
+
+@test
+def change_feed_coalesces_bursts_and_resumes():
+    with Store() as st:
+        small_store(st)
+        model = st.model()
+        src = "markdown-" + os.path.basename(st.root)
+        feed = ChangeFeed(model, window=0.3, history=3)
+        event, cursor = feed.resume()
+        assert event["event"] == "ready" and event["data"]["version"] == model.version
+        nodes, edges = snapshot(model)
+        start = cursor
+
+        # a burst: three versions, one of which adds a node the last removes
+        st.add("common/technical/flaky.md", entry_text("technical", ["db"]))
+        model.refresh()
+        st.add("common/technical/retry.md", entry_text("technical", ["net", "db"]))
+        model.refresh()
+        st.remove("common/technical/flaky.md")
+        st.add("projects/acme/decisions/naming.md", entry_text("decision", ["net"]))
+        model.refresh()
+        event, cursor = feed.next_event(cursor, 5)
+        data = event["data"]
+        assert event["event"] == "changes" and data["batched"] == 3
+        assert (data["from_version"], data["version"]) == (start[0], model.version)
+        assert event["id"] == f"{feed.boot}.{model.version}"
+        touched = [node["id"] for node in data["nodes"]["added"] + data["nodes"]["changed"]]
+        assert f"{src}:flaky" not in touched + data["nodes"]["removed"], "net diff only"
+        assert f"{src}:naming" in touched and f"{src}:tag/net" in touched
+        placed = model.positions()
+        assert all((node["x"], node["y"]) == placed[node["id"]]
+                   for node in data["nodes"]["added"])
+        replay(data, nodes, edges)
+        assert (nodes, edges) == snapshot(model), "replaying the diff gives the new graph"
+        assert feed.next_event(cursor, 0.05) == (None, cursor)
+
+        # the window: one change is held back until it has had time to gather company
+        st.remove("projects/acme/decisions/naming.md")
+        started = time.monotonic()
+        threading.Timer(0.05, model.refresh).start()
+        event, cursor = feed.next_event(cursor, 5)
+        assert time.monotonic() - started >= 0.3 and event["data"]["batched"] == 1
+
+        # resuming: from an event id or a version in the log, else a reset
+        replayed, _ = feed.resume(f"{feed.boot}.{model.version - 1}")
+        assert replayed["event"] == "changes" and replayed["data"]["batched"] == 1
+        assert feed.resume(str(model.version))[0]["event"] == "ready"
+        assert feed.resume(start[0])[0]["data"]["reason"] == "unknown version", "history=3"
+        assert feed.resume(f"feed0.{model.version - 1}")[0]["event"] == "reset"
+
+        # a full relayout moves every node: clients must refetch
+        model.relayout()
+        st.add("common/technical/late.md", entry_text("technical"))
+        model.refresh()
+        event, cursor = feed.next_event(cursor, 5)
+        assert event["event"] == "reset" and event["data"]["reason"] == "layout"
+        assert cursor == (model.version, model.layout_epoch)
+        feed.close()
+        assert feed.next_event(cursor, 5) == (None, cursor)
+
+
+# --- HTTP ------------------------------------------------------------------
+
+@test
+def http_api_pages_revalidates_and_compresses():
+    with Store() as st:
+        for i in range(60):
+            st.add(f"common/d{i % 3}/n{i:03d}.md", entry_text("technical", ["shared"]))
+        model = st.model()
+        src = "markdown-" + os.path.basename(st.root)
+        httpd = server.start_http_thread(model)
+        port = httpd.server_address[1]
+        try:
+            status, headers, body = get(port, "/api/sources")
+            assert status == 200 and json.loads(body)["sources"][0]["id"] == src
+            etag = headers["ETag"]
+            assert etag == f'"v{model.version}"'
+            status, _, body = get(port, "/api/sources", {"If-None-Match": etag})
+            assert status == 304 and body == b""
+
+            ids, after = [], ""
+            while after is not None:
+                status, _, body = get(port, f"/api/nodes?limit=25&derived=0&after={after}")
+                page = json.loads(body)
+                ids += [n["id"] for n in page["items"]]
+                after = page["next"]
+            assert len(ids) == 60 and ids == sorted(ids)
+            assert page["total"] == len(model.nodes)
+            assert all("x" in node and "y" in node for node in page["items"])
+            status, _, body = get(port, "/api/layout")
+            placed = json.loads(body)
+            assert placed["algorithm"] == "force" and placed["count"] == len(model.nodes)
+            assert len(placed["bounds"]) == 4
+
+            status, headers, body = get(port, "/api/nodes?limit=60",
+                                        {"Accept-Encoding": "gzip"})
+            assert headers.get("Content-Encoding") == "gzip"
+            assert len(json.loads(gzip.decompress(body))["items"]) == 60
+            status, headers, _ = get(port, "/api/clusters?level=1")
+            assert status == 200 and "Content-Encoding" not in headers
+
+            status, _, body = get(port, f"/api/node?id={src}:n001")
+            assert status == 200 and json.loads(body)["title"]
+            status, headers, _ = get(port, f"/api/node?id={src}:n001")
+            assert headers["Cache-Control"] == "no-store"
+            for path, code in (("/api/node?id=nope:x", 404), ("/api/nodes?source=nope", 404),
+                               ("/api/clusters?level=9", 400), ("/api/viewport?box=1,2", 400),
+                               ("/api/nodes?after=%%%", 400), ("/api/neighborhood", 400),
+                               ("/api/nope", 404)):
+                status, _, body = get(port, path)
+                assert status == code and "error" in json.loads(body), (path, status)
+
+            st.add("common/d0/late.md", entry_text("technical"))
+            model.refresh()
+            status, _, _ = get(port, "/api/sources", {"If-None-Match": etag})
+            assert status == 200, "a new version invalidates the ETag"
+
+            version = model.version
+            url = f"http://127.0.0.1:{port}/api/events?version={version}"
+            with urllib.request.urlopen(url, timeout=10) as response:
+                assert response.headers["Content-Type"].startswith("text/event-stream")
+                [(name, _, data)] = read_events(response, 1)
+                assert name == "ready" and data["version"] == version
+                st.add("common/d1/later.md", entry_text("technical", ["shared"]))
+                model.refresh()
+                [(name, event_id, data)] = read_events(response, 1)
+                assert name == "changes" and data["version"] == version + 1
+                assert [n["id"] for n in data["nodes"]["added"]] == [f"{src}:later"]
+            request = urllib.request.Request(url, headers={"Last-Event-ID": event_id})
+            with urllib.request.urlopen(request, timeout=10) as response:
+                assert read_events(response, 1)[0][0] == "ready", "resumed at the head"
+            status, _, body = get(port, "/api/events?version=x")
+            assert status == 400 and "error" in json.loads(body)
+        finally:
+            httpd.feed.close()
+            httpd.shutdown()
+            httpd.server_close()
+
+
+# --- runner ----------------------------------------------------------------
+
+def main():
+    passed = failed = 0
+    for fn in _results:
+        try:
+            fn()
+            print(f"PASS  {fn.__name__}")
+            passed += 1
+        except Exception as exc:  # noqa: BLE001
+            print(f"FAIL  {fn.__name__}: {exc}")
+            failed += 1
+    print(f"\n{passed}/{passed + failed} passed, {failed} failed")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Graph API for knowledge visualizers (KG_VISUALIZER_RECIPE.md Phases 2-3).
+
+`GraphModel` unions the markdown store (`memory.graph.StoreGraph`) and,
+optionally, the runtime knowledge graph (`KGSource`) into one model with
+derived directory and tag hubs, and keeps it current from their change
+sets. `server.py` serves it read-only over local HTTP in pages, cluster
+summaries, neighbourhoods, and viewports, so a browser never has to load
+the whole graph, and streams what changes as server-sent events
+(`events.py`). Run it with
+
+    python -m agentic_rules.viz serve --root ~/memory --port 8766
+"""
+
+from .model import GraphModel, ModelError
+from .sources import KGSource
+
+__all__ = ["GraphModel", "KGSource", "ModelError"]
@@ -0,0 +1,108 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Command line for the graph API: `python -m agentic_rules.viz <command>`."""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from ..memory.graph import STATE_DIR, StoreGraph
+from ..memory.store import load_settings
+from . import server
+from .events import COALESCE_WINDOW
+from .model import LAYOUTS, GraphModel
+
+LAYOUT_FILE = "layout.json"
+
+
+def build_model(args):
+    """The model over `--root` (default: storage.base_path) and, with `--kg-db`, the kg graph."""
+    settings = load_settings(args.settings)
+    store = StoreGraph(args.root or settings["storage"]["base_path"], workers=args.workers)
+    sources = [store]
+    if args.kg_db:
+        from ..kg import KnowledgeGraph  # only when asked: it opens the database
+        from .sources import KGSource
+
+        sources.append(KGSource(KnowledgeGraph(args.kg_db)))
+    layout_path = args.layout_file or os.path.join(store.root, STATE_DIR, LAYOUT_FILE)
+    model = GraphModel(sources, args.layout, layout_path)
+    model.refresh()
+    store.save()
+    return model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m agentic_rules.viz", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("serve", "serve the read-only graph API over local HTTP"),
+                            ("stats", "build the model once and print its size"),
+                            ("layout", "lay out new nodes (or, with --full, everything) "
+                                       "and save the layout")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--root", help="memory store root (default: storage.base_path)")
+        command.add_argument("--settings", help="memory-rules settings.json to read")
+        command.add_argument("--kg-db", help="also show this kg SQLite database")
+        command.add_argument("--workers", type=int, help="parser processes (default: CPU count)")
+        command.add_argument("--layout", choices=LAYOUTS, default=LAYOUTS[0],
+                             help="node positions: force-directed (default) or by cluster")
+        command.add_argument("--layout-file",
+                             help="saved force layout (default: <root>/.graph/layout.json)")
+        if name == "serve":
+            command.add_argument("--host", default="127.0.0.1",
+                                 help="bind address (default: loopback only)")
+            command.add_argument("--port", type=int, default=server.DEFAULT_PORT)
+            command.add_argument("--interval", type=float, default=server.DEFAULT_INTERVAL,
+                                 help="seconds between refreshes (0: never)")
+            command.add_argument("--coalesce", type=float, default=COALESCE_WINDOW,
+                                 help="seconds to batch changes into one event "
+                                      f"(default: {COALESCE_WINDOW})")
+            command.add_argument("--verbose", action="store_true",
+                                 help="log every HTTP request")
+        elif name == "layout":
+            command.add_argument("--full", action="store_true",
+                                 help="ignore the saved layout and lay out from scratch")
+        else:
+            command.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    model = build_model(args)
+    built_ms = (time.perf_counter() - started) * 1000
+    if args.command == "stats":
+        stats = {"sources": model.describe(), "version": model.version,
+                 "clusters": {level: len(model.clusters(level)["clusters"]) for level in range(3)},
+                 "build_ms": round(built_ms, 1)}
+        if args.json:
+            print(json.dumps(stats, indent=2))
+        else:
+            for source in stats["sources"]:
+                print(f"{source['id']} ({source['kind']}): {source['counts']['nodes']} nodes, "
+                      f"{source['counts']['edges']} edges")
+            print(f"clusters: {stats['clusters'][0]} sources, {stats['clusters'][1]} scopes, "
+                  f"{stats['clusters'][2]} directories; built in {built_ms:.0f} ms")
+        return 0
+    if args.command == "layout":
+        if args.full:
+            model.relayout()
+        started = time.perf_counter()
+        placed = model.positions()
+        model.save_layout()
+        saved = f" -> {model.layout_path}" if args.layout == "force" else ""
+        print(f"{args.layout} layout of {len(placed)} nodes in "
+              f"{time.perf_counter() - started:.1f} s{saved}")
+        return 0
+    started = time.perf_counter()
+    model.positions()  # precompute, so the first client does not wait
+    model.save_layout()
+    print(f"viz: {args.layout} layout ready in {time.perf_counter() - started:.1f} s",
+          file=sys.stderr)
+    server.serve_http(model, args.host, args.port, args.interval, args.verbose, args.coalesce)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Graph diffs for server-sent events (KG_VISUALIZER_RECIPE.md Phase 5).
+
+A client that shows a live store should not poll the whole graph. A
+`ChangeFeed` listens to a `GraphModel` and keeps the change set of each of
+its recent versions, with the layout position of every added or changed
+node. Each subscriber holds a cursor, the model version it has, and gets
+the versions after it as one net diff:
+
+- **Coalescing.** A subscriber waits `window` seconds after the first change
+  it has not seen, then merges every version that arrived meanwhile. A
+  burst of writes is one event, and a node added and removed within it is
+  not in it at all.
+- **Resuming.** Event ids are `<boot>.<version>`, where `boot` tells server
+  runs apart. A client that reconnects with `Last-Event-ID`, or starts from
+  the `version` of the pages it fetched, gets what it missed, from the log
+  of the last `history` versions.
+- **Resets.** When the diff cannot be given, because the client's version is
+  not in the log, the force layout was redone from scratch, or the diff has
+  more than `MAX_EVENT_ITEMS` items, the event is a `reset`: refetch the
+  graph, then carry on from its `version`.
+
+An event is `ready` (the stream is live at `version`), `changes`, or
+`reset`. Apply a `changes` event's removals first, then its added and
+changed items, which carry their final state.
+"""
+
+import collections
+import json
+import threading
+import time
+
+COALESCE_WINDOW = 0.5  # seconds to wait for more changes before sending
+HISTORY_VERSIONS = 1000  # versions kept for clients that reconnect
+HISTORY_ITEMS = 200_000  # ... and at most this many changed items
+MAX_EVENT_ITEMS = 20_000  # larger diffs are a reset: refetching is cheaper
+MAX_STREAMS = 32  # each open stream holds one server thread
+
+
+class ChangeFeed:
+    """Per-version change log of a `GraphModel`, merged per subscriber. Thread-safe."""
+
+    def __init__(self, model, window=COALESCE_WINDOW, history=HISTORY_VERSIONS):
+        self.model = model
+        self.window = window
+        self.history = history
+        self.boot = format(time.time_ns() // 1000, "x")
+        self.streams = 0
+        self.closed = False
+        self._cond = threading.Condition()
+        self._log = collections.deque()  # (version, layout epoch, published at, changes)
+        self._items = 0
+        self._floor = (model.version, model.layout_epoch)  # the state before the log
+        self._head = self._floor
+        model.listeners.append(self.publish)
+
+    # -- publishing ---------------------------------------------------------------
+
+    def publish(self, changes):
+        """Record one model change set; the model calls this after every change."""
+        placed = self.model.positions()  # lays out the new nodes, once per version
+        changes = dict(changes, nodes=dict(changes["nodes"]))
+        for kind in ("added", "changed"):
+            changes["nodes"][kind] = [
+                dict(node, x=placed[node["id"]][0], y=placed[node["id"]][1])
+                if node["id"] in placed else node for node in changes["nodes"][kind]]
+        epoch = self.model.layout_epoch
+        with self._cond:
+            self._log.append((changes["version"], epoch, time.monotonic(), changes))
+            self._items += _size(changes)
+            self._head = (changes["version"], epoch)
+            while len(self._log) > self.history or \
+                    (self._items > HISTORY_ITEMS and len(self._log) > 1):
+                version, epoch, _, dropped = self._log.popleft()
+                self._items -= _size(dropped)
+                self._floor = (version, epoch)
+            self._cond.notify_all()
+
+    def close(self):
+        """End every stream: waiting subscribers return at once."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    # -- subscribing --------------------------------------------------------------
+
+    def join(self):
+        """Count one more stream; False when `MAX_STREAMS` are open."""
+        with self._cond:
+            if self.streams >= MAX_STREAMS:
+                return False
+            self.streams += 1
+            return True
+
+    def leave(self):
+        with self._cond:
+            self.streams -= 1
+
+    def resume(self, since=None):
+        """(first event, cursor) for a client that has the graph as of `since`.
+
+        `since` is an event id, a bare model version, or None for "now". The
+        first event is `ready` when the client is current, a `changes`
+        event with what it missed, or a `reset`.
+        """
+        boot, version = self._parse(since)
+        with self._cond:
+            head = self._head
+            if version is None or (boot in (None, self.boot) and version == head[0]):
+                return self._event("ready", head, {"version": head[0]}), head
+            epoch = self._epoch_at(version) if boot in (None, self.boot) else None
+        if epoch is None:
+            return self._reset("unknown version")
+        return self.next_event((version, epoch), 0)
+
+    def next_event(self, cursor, timeout):
+        """(event, cursor) with the changes after `cursor`, or (None, cursor) after `timeout`."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self.closed:
+                    return None, cursor
+                now = time.monotonic()
+                if self._head[0] > cursor[0]:
+                    pending = [entry for entry in self._log if entry[0] > cursor[0]]
+                    if not pending or pending[0][0] != cursor[0] + 1:
+                        return self._reset("history")  # the log no longer reaches back
+                    ready = pending[0][2] + self.window
+                    if timeout == 0 or now >= ready:
+                        break
+                    self._cond.wait(ready - now)
+                elif now < deadline:
+                    self._cond.wait(deadline - now)
+                else:
+                    return None, cursor
+        if any(epoch != cursor[1] for _, epoch, _, _ in pending):
+            return self._reset("layout")
+        diff = merge([changes for _, _, _, changes in pending])
+        if _size(diff) > MAX_EVENT_ITEMS:
+            return self._reset("too many changes")
+        head = pending[-1][:2]
+        diff = dict(diff, from_version=cursor[0], version=head[0], batched=len(pending))
+        return self._event("changes", head, diff), head
+
+    # -- helpers ------------------------------------------------------------------
+
+    def _epoch_at(self, version):
+        if version == self._floor[0]:
+            return self._floor[1]
+        for logged, epoch, _, _ in self._log:
+            if logged == version:
+                return epoch
+        return None
+
+    def _reset(self, reason):
+        with self._cond:
+            head = self._head
+        return self._event("reset", head, {"version": head[0], "reason": reason}), head
+
+    def _event(self, name, head, data):
+        return {"event": name, "id": f"{self.boot}.{head[0]}", "data": data}
+
+    @staticmethod
+    def _parse(since):
+        if since is None or since == "":
+            return None, None
+        boot, _, version = str(since).rpartition(".")
+        try:
+            return boot or None, int(version)
+        except ValueError:
+            raise ValueError("version must be an integer or an event id") from None
+
+
+def merge(change_sets):
+    """One change set equivalent to applying `change_sets` in order."""
+    nodes = {}  # id -> [present before, final node or None]
+    edges = {}  # key -> [edge before or None, final edge or None]
+    for changes in change_sets:
+        for node_id in changes["nodes"]["removed"]:
+            nodes.setdefault(node_id, [True, None])[1] = None
+        for kind in ("added", "changed"):
+            for node in changes["nodes"][kind]:
+                nodes.setdefault(node["id"], [kind == "changed", None])[1] = node
+        for edge in changes["edges"]["removed"]:
+            edges.setdefault(_key(edge), [edge, None])[1] = None
+        for edge in changes["edges"]["added"]:
+            edges.setdefault(_key(edge), [None, None])[1] = edge
+    merged = {"nodes": {"added": [], "changed": [], "removed": []},
+              "edges": {"added": [], "removed": []}}
+    for node_id in sorted(nodes):
+        before, node = nodes[node_id]
+        if node is None:
+            if before:
+                merged["nodes"]["removed"].append(node_id)
+        else:
+            merged["nodes"]["changed" if before else "added"].append(node)
+    for key in sorted(edges):
+        before, edge = edges[key]
+        if before == edge:
+            continue
+        if before is not None:
+            merged["edges"]["removed"].append(before)
+        if edge is not None:
+            merged["edges"]["added"].append(edge)
+    return merged
+
+
+def format_event(event):
+    """`event` as a text/event-stream message."""
+    data = json.dumps(event["data"], ensure_ascii=False, separators=(",", ":"))
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {data}\n\n".encode("utf-8")
+
+
+def _key(edge):
+    return edge["source"], edge["target"], edge["relation"]
+
+
+def _size(changes):
+    return sum(len(items) for group in (changes["nodes"], changes["edges"])
+               for items in group.values())
@@ -0,0 +1,502 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Node positions, computed on the server (KG_VISUALIZER_RECIPE.md Phase 4).
+
+Two layouts:
+
+- `cluster_layout` places every directory cluster as a disc of members on a
+  sunflower (Vogel) spiral, in id order, and packs the discs in rows,
+  ordered by source, scope, and directory. It is deterministic and O(n),
+  but it ignores edges.
+- `force_layout` is a multilevel force-directed layout (Walshaw's
+  multilevel Fruchterman-Reingold). The graph is coarsened by repeated
+  matching until a handful of nodes is left: each node is paired with its
+  heaviest free neighbour, and nodes left over are paired with another
+  leftover hanging off the same neighbour, so stars (a hub and its members)
+  shrink as fast as everything else. The coarsest graph is laid out from
+  random positions. Each finer level starts from its parent's position
+  and is relaxed with a natural length `sqrt(4/7)` times the coarser one.
+  Repulsion is global but approximated on a grid, in the spirit of
+  Barnes-Hut: nodes in the 3x3 cells around a node repel it exactly, and
+  farther nodes act through the centroids of ever coarser cells, so one
+  iteration is O(n log n + m). The cell size is chosen so that about
+  `CELL_OCCUPANCY` nodes share a cell around a typical node.
+
+`update_layout` is what a server calls on every new graph version. Nodes
+that already have a position keep it. New nodes start next to their placed
+neighbours, or as a separately laid-out block beside the drawing when
+nothing connects them to it, and only they are relaxed, around fixed
+positions. So the picture stays stable between versions and between
+restarts. Only when most of the graph is new is it laid out again from
+scratch, and then it is rotated and shifted to match the old positions as
+closely as possible.
+
+The force loop is vectorized with NumPy when it is installed. Without NumPy,
+the same algorithm runs in pure Python over `array` columns and a dict grid.
+"""
+
+import array
+import collections
+import math
+import random
+
+try:  # optional dependency
+    import numpy
+except ImportError:  # pragma: no cover - depends on the host
+    numpy = None
+
+SPACING = 20.0  # cluster layout: units between neighbouring members of a cluster
+EDGE_LENGTH = 30.0  # force layout: natural edge length at the finest level
+REPULSION = 0.2  # repulsion relative to attraction (Walshaw and Hu: 0.2)
+COOLING = 0.85  # temperature factor per iteration
+TOLERANCE = 0.05  # a level has converged when no node moves more than this * k
+COARSEST = 8  # stop coarsening at this many nodes
+STALL = 0.9  # ... or when a matching keeps more than this fraction of them
+CELL_OCCUPANCY = 3  # repulsion grid: nodes per cell around a typical node
+FULL_RELAYOUT_FRACTION = 0.5  # more new nodes than this: lay out from scratch
+_GROWTH = math.sqrt(7 / 4)  # k of a level over k of the next finer one
+_GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+_NEAR = tuple((ox, oy) for ox in (-1, 0, 1) for oy in (-1, 0, 1))
+# The children of the parent's neighbours.
+_FAR = tuple((ox, oy) for ox in range(-2, 4) for oy in range(-2, 4))
+
+
+def _spiral(i, step):
+    """Offset of the i-th point of a sunflower spiral with `step` spacing."""
+    r = step * math.sqrt(i + 0.5)
+    return r * math.cos(i * _GOLDEN_ANGLE), r * math.sin(i * _GOLDEN_ANGLE)
+
+
+def cluster_layout(nodes):
+    """{node id: (x, y)} for `nodes` (stored nodes with `meta.directory`)."""
+    groups = collections.defaultdict(list)
+    for node in nodes:
+        groups[(node["meta"]["source"], node["scope"], node["meta"]["directory"])].append(
+            node["id"])
+    discs = []
+    for key in sorted(groups):
+        members = sorted(groups[key])
+        discs.append((SPACING * (0.6 * math.sqrt(len(members)) + 1), members))
+    width = math.sqrt(sum((2 * radius) ** 2 for radius, _ in discs)) * 1.2
+    positions = {}
+    x = y = row_height = 0.0
+    for radius, members in discs:
+        if x > 0 and x + 2 * radius > width:
+            x, y, row_height = 0.0, y + row_height, 0.0
+        cx, cy = x + radius, y + radius
+        for i, node_id in enumerate(members):
+            dx, dy = _spiral(i, SPACING * 0.6)
+            positions[node_id] = (round(cx + dx, 2), round(cy + dy, 2))
+        x += 2 * radius
+        row_height = max(row_height, 2 * radius)
+    return positions
+
+
+# --- force layout ------------------------------------------------------------------
+
+def _adjacency(ids, edges):
+    """Per node index, {neighbour index: weight}; parallel edges add up."""
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    adj = [{} for _ in ids]
+    for a, b in edges:
+        i, j = index.get(a), index.get(b)
+        if i is None or j is None or i == j:
+            continue
+        adj[i][j] = adj[i].get(j, 0) + 1
+        adj[j][i] = adj[j].get(i, 0) + 1
+    return adj
+
+
+def _match(adj, mass, rng):
+    """(parent index per node, number of parents) for one coarsening step."""
+    parent = [-1] * len(adj)
+    order = list(range(len(adj)))
+    rng.shuffle(order)
+    count = 0
+    for i in order:  # heavy-edge matching
+        if parent[i] >= 0:
+            continue
+        best, best_weight = -1, 0
+        for j, weight in adj[i].items():
+            if parent[j] < 0 and (weight > best_weight or
+                                  (weight == best_weight and mass[j] < mass[best])):
+                best, best_weight = j, weight
+        if best >= 0:
+            parent[i] = parent[best] = count
+            count += 1
+    leftovers = collections.defaultdict(list)  # heaviest neighbour -> unmatched nodes
+    for i in order:
+        if parent[i] < 0:
+            anchor = max(adj[i], key=lambda j: (adj[i][j], -j)) if adj[i] else -1
+            leftovers[anchor].append(i)
+    for group in leftovers.values():
+        for at in range(0, len(group), 2):
+            for i in group[at:at + 2]:
+                parent[i] = count
+            count += 1
+    return parent, count
+
+
+def _contract(adj, mass, parent, count):
+    coarse = [{} for _ in range(count)]
+    coarse_mass = [0.0] * count
+    for i, row in enumerate(adj):
+        a = parent[i]
+        coarse_mass[a] += mass[i]
+        target = coarse[a]
+        for j, weight in row.items():
+            b = parent[j]
+            if a != b:
+                target[b] = target.get(b, 0) + weight
+    return coarse, coarse_mass
+
+
+def _relax(x, y, mass, adj, k, movable, t, vectorized):
+    """Move the `movable` nodes until they settle; returns the new (x, y)."""
+    if vectorized:
+        return _relax_numpy(x, y, mass, adj, k, movable, t)
+    return _relax_python(x, y, mass, adj, k, movable, t)
+
+
+def _cell_width(k, typical):
+    """Grid cell size for `typical` nodes in a k-wide cell: about three per cell."""
+    return min(4 * k, max(k / 4, k * math.sqrt(CELL_OCCUPANCY / typical)))
+
+
+def _repulsion_python(x, y, mass, query, k):
+    """Repulsive force on each query node from all other nodes, as ([fx], [fy])."""
+    left, bottom = min(x), min(y)
+    occupancy = collections.Counter((int((a - left) // k), int((b - bottom) // k))
+                                    for a, b in zip(x, y))
+    typical = sorted(occupancy[(int((a - left) // k), int((b - bottom) // k))]
+                     for a, b in zip(x, y))[len(x) // 2]
+    push, width = REPULSION * k * k, _cell_width(k, typical)
+    gx = [int((value - left) // width) for value in x]
+    gy = [int((value - bottom) // width) for value in y]
+    cells = collections.defaultdict(list)
+    sums = {}
+    for i in range(len(x)):
+        cells[(gx[i], gy[i])].append(i)
+        total = sums.get((gx[i], gy[i]))
+        if total is None:
+            sums[(gx[i], gy[i])] = [mass[i], mass[i] * x[i], mass[i] * y[i]]
+        else:
+            total[0] += mass[i]
+            total[1] += mass[i] * x[i]
+            total[2] += mass[i] * y[i]
+    fx, fy = [0.0] * len(query), [0.0] * len(query)
+    for at, i in enumerate(query):  # near field: exact, from the 3x3 block of cells
+        xi, yi, cx, cy = x[i], y[i], gx[i], gy[i]
+        for ox, oy in _NEAR:
+            for j in cells.get((cx + ox, cy + oy), ()):
+                if j == i:
+                    continue
+                dx, dy = xi - x[j], yi - y[j]
+                d2 = dx * dx + dy * dy
+                if d2 == 0:  # coincident: push apart along x, by index
+                    dx = (i - j) * 1e-3 * k
+                    d2 = dx * dx
+                force = push * mass[j] / d2
+                fx[at] += dx * force
+                fy[at] += dy * force
+    qx, qy = [gx[i] for i in query], [gy[i] for i in query]
+    while True:  # far field: cell centroids, one level of the hierarchy at a time
+        for at, i in enumerate(query):
+            cx, cy = qx[at], qy[at]
+            bx, by = cx >> 1 << 1, cy >> 1 << 1
+            for ox, oy in _FAR:
+                tx, ty = bx + ox, by + oy
+                if -1 <= tx - cx <= 1 and -1 <= ty - cy <= 1:
+                    continue
+                total = sums.get((tx, ty))
+                if total is None:
+                    continue
+                dx, dy = x[i] - total[1] / total[0], y[i] - total[2] / total[0]
+                force = push * total[0] / max(dx * dx + dy * dy, 1e-9)
+                fx[at] += dx * force
+                fy[at] += dy * force
+        parents = {(cx >> 1, cy >> 1) for cx, cy in sums}
+        if len(parents) == 1:
+            return fx, fy
+        merged = {}
+        for (cx, cy), (m, sx, sy) in sums.items():
+            total = merged.setdefault((cx >> 1, cy >> 1), [0.0, 0.0, 0.0])
+            total[0] += m
+            total[1] += sx
+            total[2] += sy
+        sums = merged
+        qx, qy = [cx >> 1 for cx in qx], [cy >> 1 for cy in qy]
+
+
+def _relax_python(x, y, mass, adj, k, movable, t):
+    x, y = array.array("d", x), array.array("d", y)
+    movable = list(movable)
+    while t > TOLERANCE * k:
+        fx, fy = _repulsion_python(x, y, mass, movable, k)
+        largest = 0.0
+        moves = []
+        for at, i in enumerate(movable):
+            xi, yi = x[i], y[i]
+            for j, weight in adj[i].items():
+                dx, dy = x[j] - xi, y[j] - yi
+                force = weight * math.sqrt(dx * dx + dy * dy) / k
+                fx[at] += dx * force
+                fy[at] += dy * force
+            length = math.sqrt(fx[at] * fx[at] + fy[at] * fy[at])
+            scale = t / length if length > t else 1.0
+            largest = max(largest, min(length, t))
+            moves.append((i, fx[at] * scale, fy[at] * scale))
+        for i, dx, dy in moves:
+            x[i] += dx
+            y[i] += dy
+        if largest < TOLERANCE * k:
+            break
+        t *= COOLING
+    return x, y
+
+
+def _near_pairs_numpy(gx, gy, query, symmetric):
+    """(i, j) of the nodes in the same or adjacent cells, i in `query`.
+
+    With `symmetric`, `query` is every node and each pair comes once.
+    """
+    height = int(gy.max()) + 3
+    key = (gx + 1) * height + gy + 1
+    order = numpy.argsort(key, kind="stable")
+    sorted_key = key[order]
+    offsets = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)) if symmetric else _NEAR
+    found_i, found_j = [], []
+    for ox, oy in offsets:
+        target = key[query] + ox * height + oy
+        low = numpy.searchsorted(sorted_key, target, "left")
+        counts = numpy.searchsorted(sorted_key, target, "right") - low
+        total = int(counts.sum())
+        if not total:
+            continue
+        i = numpy.repeat(query, counts)
+        j = order[numpy.repeat(low - (numpy.cumsum(counts) - counts), counts)
+                  + numpy.arange(total)]
+        keep = (i < j) if symmetric and (ox, oy) == (0, 0) else (i != j)
+        found_i.append(i[keep])
+        found_j.append(j[keep])
+    if not found_i:
+        return numpy.zeros(0, numpy.int64), numpy.zeros(0, numpy.int64)
+    return numpy.concatenate(found_i), numpy.concatenate(found_j)
+
+
+def _repulsion_numpy(x, y, mass, query, k, symmetric):
+    """Repulsive force on each query node from all other nodes, as (fx, fy) arrays."""
+    n = len(x)
+    left, bottom = x.min(), y.min()
+    gx = numpy.floor((x - left) / k).astype(numpy.int64)
+    gy = numpy.floor((y - bottom) / k).astype(numpy.int64)
+    _, inverse, counts = numpy.unique(gx * (int(gy.max()) + 1) + gy, return_inverse=True,
+                                      return_counts=True)
+    width = _cell_width(k, float(numpy.median(counts[inverse])))
+    push = REPULSION * k * k
+    gx = numpy.floor((x - left) / width).astype(numpy.int64)
+    gy = numpy.floor((y - bottom) / width).astype(numpy.int64)
+    i, j = _near_pairs_numpy(gx, gy, query, symmetric)
+    dx, dy = x[i] - x[j], y[i] - y[j]
+    d2 = dx * dx + dy * dy
+    zero = d2 == 0
+    if zero.any():  # coincident: push apart along x, by index
+        dx[zero] = (i[zero] - j[zero]) * 1e-3 * k
+        d2[zero] = dx[zero] * dx[zero]
+    force = push / d2
+    fx, fy = numpy.zeros(n), numpy.zeros(n)
+    if len(i):  # (bincount of nothing is an integer array)
+        fx += numpy.bincount(i, dx * force * mass[j], n)
+        fy += numpy.bincount(i, dy * force * mass[j], n)
+        if symmetric:
+            fx -= numpy.bincount(j, dx * force * mass[i], n)
+            fy -= numpy.bincount(j, dy * force * mass[i], n)
+    fx, fy = fx[query], fy[query]
+    # far field: per level, cell masses and centroids, looked up per query cell
+    height = int(gy.max()) + 1
+    cells, inverse = numpy.unique(gx * height + gy, return_inverse=True)
+    cx, cy = cells // height, cells % height
+    total = numpy.bincount(inverse, mass)
+    sx, sy = numpy.bincount(inverse, mass * x), numpy.bincount(inverse, mass * y)
+    qcell = inverse.reshape(-1)[query]
+    qx, qy = x[query], y[query]
+    while True:
+        height = int(cy.max()) + 8
+        keys = (cx + 2) * height + cy + 2  # sorted, like `cells`
+        centre_x, centre_y = sx / total, sy / total
+        # the query nodes grouped by their own cell, as ranges of `members`
+        members = numpy.argsort(qcell, kind="stable")
+        own, first, size = numpy.unique(qcell[members], return_index=True, return_counts=True)
+        ocx, ocy = cx[own], cy[own]
+        for ox, oy in _FAR:
+            tx, ty = (ocx >> 1 << 1) + ox, (ocy >> 1 << 1) + oy
+            target = (tx + 2) * height + ty + 2
+            at = numpy.minimum(numpy.searchsorted(keys, target), len(keys) - 1)
+            hit = numpy.nonzero(((numpy.abs(tx - ocx) > 1) | (numpy.abs(ty - ocy) > 1)) &
+                                (keys[at] == target) & (tx >= 0) & (ty >= 0))[0]
+            if not len(hit):
+                continue
+            counts = size[hit]
+            total_hits = int(counts.sum())
+            sel = members[numpy.repeat(first[hit] - (numpy.cumsum(counts) - counts), counts)
+                          + numpy.arange(total_hits)]
+            c = numpy.repeat(at[hit], counts)
+            dx, dy = qx[sel] - centre_x[c], qy[sel] - centre_y[c]
+            force = push * total[c] / numpy.maximum(dx * dx + dy * dy, 1e-9)
+            fx[sel] += dx * force
+            fy[sel] += dy * force
+        px, py = cx >> 1, cy >> 1
+        if px.min() == px.max() and py.min() == py.max():
+            return fx, fy
+        height = int(py.max()) + 1
+        cells, inverse = numpy.unique(px * height + py, return_inverse=True)
+        cx, cy = cells // height, cells % height
+        total = numpy.bincount(inverse, total)
+        sx, sy = numpy.bincount(inverse, sx), numpy.bincount(inverse, sy)
+        qcell = inverse.reshape(-1)[qcell]
+
+
+def _relax_numpy(x, y, mass, adj, k, movable, t):
+    x, y = numpy.array(x, dtype=float), numpy.array(y, dtype=float)
+    mass = numpy.asarray(mass, dtype=float)
+    query = numpy.asarray(movable, dtype=numpy.int64)
+    n = len(x)
+    symmetric = len(query) == n
+    pairs = [(i, j, weight) for i, row in enumerate(adj) for j, weight in row.items() if i < j]
+    src = numpy.fromiter((p[0] for p in pairs), numpy.int64, len(pairs))
+    dst = numpy.fromiter((p[1] for p in pairs), numpy.int64, len(pairs))
+    weight = numpy.fromiter((p[2] for p in pairs), float, len(pairs))
+    while t > TOLERANCE * k:
+        fx, fy = _repulsion_numpy(x, y, mass, query, k, symmetric)
+        if len(src):
+            dx, dy = x[dst] - x[src], y[dst] - y[src]
+            pull = weight * numpy.sqrt(dx * dx + dy * dy) / k
+            fx += (numpy.bincount(src, dx * pull, n) - numpy.bincount(dst, dx * pull, n))[query]
+            fy += (numpy.bincount(src, dy * pull, n) - numpy.bincount(dst, dy * pull, n))[query]
+        length = numpy.sqrt(fx * fx + fy * fy)
+        scale = numpy.where(length > t, t / numpy.maximum(length, 1e-12), 1.0)
+        x[query] += fx * scale
+        y[query] += fy * scale
+        if float(numpy.minimum(length, t).max(initial=0.0)) < TOLERANCE * k:
+            break
+        t *= COOLING
+    return x.tolist(), y.tolist()
+
+
+def _multilevel(adj, rng, vectorized):
+    levels, parents = [(adj, [1.0] * len(adj))], []
+    while len(levels[-1][0]) > COARSEST:
+        adj, mass = levels[-1]
+        parent, count = _match(adj, mass, rng)
+        if count > STALL * len(adj):
+            break
+        levels.append(_contract(adj, mass, parent, count))
+        parents.append(parent)
+    k = EDGE_LENGTH * _GROWTH ** (len(levels) - 1)
+    adj, mass = levels[-1]
+    side = k * math.sqrt(len(adj))
+    x = [rng.uniform(0, side) for _ in adj]
+    y = [rng.uniform(0, side) for _ in adj]
+    x, y = _relax(x, y, mass, adj, k, range(len(adj)), side / 4, vectorized)
+    for level in range(len(levels) - 2, -1, -1):
+        parent = parents[level]
+        adj, mass = levels[level]
+        k /= _GROWTH
+        x = [x[parent[i]] + rng.uniform(-k, k) / 4 for i in range(len(adj))]
+        y = [y[parent[i]] + rng.uniform(-k, k) / 4 for i in range(len(adj))]
+        x, y = _relax(x, y, mass, adj, k, range(len(adj)), k, vectorized)
+    return x, y
+
+
+def force_layout(ids, edges, seed=0, vectorized=None):
+    """{id: (x, y)} for `ids`, laid out from scratch; `edges` are (id, id) pairs.
+
+    `vectorized` picks the NumPy loop (default: when NumPy is installed).
+    """
+    ids = list(ids)
+    if not ids:
+        return {}
+    vectorized = numpy is not None if vectorized is None else vectorized
+    x, y = _multilevel(_adjacency(ids, edges), random.Random(seed), vectorized)
+    return {node_id: (round(x[i], 2), round(y[i], 2)) for i, node_id in enumerate(ids)}
+
+
+def _align(placed, previous):
+    """Rotate and shift `placed` to best match the nodes it shares with `previous`."""
+    shared = [node_id for node_id in placed if node_id in previous]
+    if not shared:
+        return placed
+    ax = sum(placed[n][0] for n in shared) / len(shared)
+    ay = sum(placed[n][1] for n in shared) / len(shared)
+    bx = sum(previous[n][0] for n in shared) / len(shared)
+    by = sum(previous[n][1] for n in shared) / len(shared)
+    dot = cross = 0.0
+    for node_id in shared:  # 2D Procrustes: the rotation that best maps new onto old
+        px, py = placed[node_id][0] - ax, placed[node_id][1] - ay
+        qx, qy = previous[node_id][0] - bx, previous[node_id][1] - by
+        dot += px * qx + py * qy
+        cross += px * qy - py * qx
+    angle = math.atan2(cross, dot)
+    cos, sin = math.cos(angle), math.sin(angle)
+    return {node_id: (round(bx + (x - ax) * cos - (y - ay) * sin, 2),
+                      round(by + (x - ax) * sin + (y - ay) * cos, 2))
+            for node_id, (x, y) in placed.items()}
+
+
+def update_layout(ids, edges, previous=None, seed=0, vectorized=None):
+    """{id: (x, y)} for `ids`, keeping every position `previous` already has.
+
+    New nodes are placed next to their placed neighbours and relaxed around
+    the fixed rest. When more than `FULL_RELAYOUT_FRACTION` of `ids` is new,
+    the graph is laid out from scratch and aligned to `previous` instead.
+    """
+    ids = list(ids)
+    previous = previous or {}
+    fresh = [node_id for node_id in ids if node_id not in previous]
+    if not fresh:
+        return {node_id: tuple(previous[node_id]) for node_id in ids}
+    if len(fresh) > FULL_RELAYOUT_FRACTION * len(ids):
+        return _align(force_layout(ids, edges, seed, vectorized), previous)
+    vectorized = numpy is not None if vectorized is None else vectorized
+    adj = _adjacency(ids, edges)
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    x, y = [0.0] * len(ids), [0.0] * len(ids)
+    placed = [False] * len(ids)
+    for i, node_id in enumerate(ids):
+        if node_id in previous:
+            x[i], y[i] = previous[node_id]
+            placed[i] = True
+    # breadth first from the placed nodes: each new node starts at the mean of
+    # its placed neighbours, spread on a spiral around the first of them
+    around = collections.Counter()
+    queue = collections.deque(index[node_id] for node_id in fresh
+                              if any(placed[j] for j in adj[index[node_id]]))
+    while queue:
+        i = queue.popleft()
+        if placed[i]:
+            continue
+        anchors = sorted(j for j in adj[i] if placed[j])
+        dx, dy = _spiral(around[anchors[0]], EDGE_LENGTH * 0.6)
+        around[anchors[0]] += 1
+        x[i] = sum(x[j] for j in anchors) / len(anchors) + dx
+        y[i] = sum(y[j] for j in anchors) / len(anchors) + dy
+        placed[i] = True
+        queue.extend(j for j in adj[i] if not placed[j])
+    # whatever is still unplaced is not connected to the drawing: lay it out on
+    # its own and put it beside the drawing's right edge
+    rest = [node_id for node_id in fresh if not placed[index[node_id]]]
+    if rest:
+        block = force_layout(rest, edges, seed, vectorized)
+        right = max(x[i] for i in range(len(ids)) if placed[i]) + 2 * EDGE_LENGTH
+        top = min(y[i] for i in range(len(ids)) if placed[i])
+        left = min(bx for bx, _ in block.values())
+        low = min(by for _, by in block.values())
+        for node_id, (bx, by) in block.items():
+            x[index[node_id]], y[index[node_id]] = right + bx - left, top + by - low
+    movable = [index[node_id] for node_id in fresh]
+    x, y = _relax(x, y, [1.0] * len(ids), adj, EDGE_LENGTH, movable, EDGE_LENGTH, vectorized)
+    positions = {node_id: tuple(previous[node_id]) for node_id in ids if node_id in previous}
+    for i in movable:
+        positions[ids[i]] = (round(x[i], 2), round(y[i], 2))
+    return positions
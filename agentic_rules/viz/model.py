@@ -0,0 +1,652 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""The unified graph model (KG_VISUALIZER_RECIPE.md Phase 2), kept current.
+
+`GraphModel` unions the `graph()` of every registered source, with node ids
+namespaced as `<source id>:<node id>`, and derives the grouping structure:
+
+- a directory hub (`<source>:dir/<path>`) for every physical directory of
+  one source with at least two members. Entries that live in a compaction
+  segment have no directory of their own and group under
+  `<scope>/<category>`; runtime-KG nodes group the same way;
+- a tag hub (`<source>:tag/<tag>`) for every tag that two nodes of one
+  source share. Tag hubs are per source, like directory hubs, so a single
+  source's graph is exactly the id range `<source>:` of the full graph.
+
+Derived nodes and edges carry `derived: True`. The model is built once from
+`graph()` and then patched from the change sets each source's `refresh()`
+returns, so it costs O(change) per refresh. Every refresh that changes
+something bumps `version` and returns the model's own change set, hubs
+included, and hands it to every callable in `listeners`. A change set lists
+each added or changed node and edge once, in its final state, so applying
+its removals first and then the rest turns the previous version into this
+one.
+
+The model keeps node ids and edge keys in sorted lists, so a page of either
+is a bisect plus a slice (`page`), and a source filter is an id-prefix
+range. It also answers:
+
+- `clusters(level, parent)`: level-of-detail summaries. Every stored node
+  belongs to one cluster per level: its source (0), its scope (1), and its
+  directory (2), so a client can start from a handful of sources and drill
+  down. Each cluster reports its size and types, and edges between clusters
+  are aggregated into counts. Answers are computed once per version.
+- `neighborhood(id, hops)`: the recipe's Phase 4 focus, a BFS over the
+  model's edges, capped at `limit` nodes.
+- `positions()`: node coordinates from `layout.py`, computed once per
+  version. The default force layout is precomputed by the server, moves
+  only new nodes from one version to the next, and is kept in
+  `layout_path` between runs, so a client can paint at once and finds
+  every node where it left it.
+- `viewport(box)`: the nodes whose layout position falls in a box, from a
+  uniform grid over those positions. When more than `limit`
+  nodes are in view, the answer is the deepest level of clusters that fits,
+  at the centroids of their members in view, with the same edge counts
+  `clusters()` reports between them.
+"""
+
+import bisect
+import collections
+import json
+import math
+import threading
+import time
+
+from .._fs import atomic_write
+from ..memory import segments
+from . import layout
+
+LEVELS = ("source", "scope", "directory")
+HUB_MIN_MEMBERS = 2
+DIRECTORY_RELATION = "in_directory"
+TAG_RELATION = "tagged"
+DEFAULT_PAGE = 500
+MAX_PAGE = 5000
+GRID_CELL = 200.0  # layout units per viewport grid cell
+LAYOUTS = ("force", "clusters")
+LAYOUT_FORMAT = "agentic-rules-layout"
+LAYOUT_VERSION = 1
+LAYOUT_SAVE_INTERVAL = 60.0  # seconds between layout writes while serving
+_BULK = 64  # more inserts than this re-sort the order instead of bisecting each in
+
+
+class ModelError(ValueError):
+    """A request for something the model does not have (unknown id or source)."""
+
+
+def split_id(model_id):
+    """(source id, node id) of a namespaced id."""
+    source, _, node_id = model_id.partition(":")
+    return source, node_id
+
+
+def _edge_key(edge):
+    return edge["source"], edge["target"], edge["relation"]
+
+
+def _directory(node):
+    location = (node.get("meta") or {}).get("location") or ""
+    if location and not segments.is_segment_location(location):
+        head = location.rsplit("/", 1)[0] if "/" in location else ""
+        if head:
+            return head
+    return f"{node['scope']}/{node['type']}"
+
+
+def cluster_of(node, level):
+    """The id of `node`'s cluster at `level` (0 source, 1 scope, 2 directory)."""
+    source = node["meta"]["source"]
+    if level == 0:
+        return source
+    if level == 1:
+        return f"{source}:scope/{node['scope']}"
+    return f"{source}:dir/{node['meta']['directory']}"
+
+
+def empty_changes():
+    return {"nodes": {"added": [], "changed": [], "removed": []},
+            "edges": {"added": [], "removed": []}}
+
+
+def is_empty(changes):
+    return not any(items for group in (changes["nodes"], changes["edges"])
+                   for items in group.values())
+
+
+class _Order:
+    """A sorted list of keys with batched inserts and bisect removals."""
+
+    def __init__(self):
+        self.keys = []
+        self._pending = []
+
+    def add(self, key):
+        self._pending.append(key)
+
+    def remove(self, key):
+        self.flush()
+        at = bisect.bisect_left(self.keys, key)
+        if at < len(self.keys) and self.keys[at] == key:
+            del self.keys[at]
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        if len(pending) > _BULK:
+            self.keys.extend(pending)
+            self.keys.sort()
+        else:
+            for key in pending:
+                bisect.insort(self.keys, key)
+
+    def range(self, low, high, after=None):
+        """Keys in [low, high), starting after `after` when given."""
+        self.flush()
+        start = bisect.bisect_left(self.keys, low) if low is not None else 0
+        if after is not None:
+            start = max(start, bisect.bisect_right(self.keys, after))
+        stop = bisect.bisect_left(self.keys, high) if high is not None else len(self.keys)
+        return start, stop
+
+
+class GraphModel:
+    """Union of several sources plus derived hubs, patched per refresh. Thread-safe."""
+
+    def __init__(self, sources, layout="force", layout_path=None):
+        if layout not in LAYOUTS:
+            raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}")
+        self.sources = {}
+        self.version = 0
+        self.layout = layout
+        self.layout_path = layout_path
+        self._placed = self._load_layout()  # the latest positions, of any version
+        self.layout_epoch = 0  # bumped when nodes that had a position move
+        self.listeners = []  # called with each non-empty change set, outside the lock
+        self._layout_unsaved = False
+        self._layout_saved_at = None
+        self.nodes = {}
+        self.edges = {}
+        self._node_order = _Order()
+        self._edge_order = _Order()
+        self._incident = collections.defaultdict(set)  # node id -> edge keys
+        self._hubs = collections.defaultdict(set)  # hub id -> member ids
+        self._cache = {}
+        self._lock = threading.RLock()
+        for source in sources:
+            if ":" in source.id or source.id in self.sources:
+                raise ModelError(f"bad or duplicate source id: {source.id}")
+            self.sources[source.id] = source
+            graph = source.graph()
+            self._apply(source.id, {"nodes": {"added": graph["nodes"], "changed": [],
+                                              "removed": []},
+                                    "edges": {"added": graph["edges"], "removed": []}},
+                        empty_changes())
+
+    # -- keeping current --------------------------------------------------------
+
+    def refresh(self):
+        """Refresh every source and patch the model; returns the model's change set."""
+        updates = [(source_id, source.refresh()) for source_id, source in self.sources.items()]
+        return self.apply(updates)
+
+    def apply(self, updates):
+        """Patch the model with [(source id, change set)]; returns its own change set."""
+        changes = empty_changes()
+        with self._lock:
+            for source_id, update in updates:
+                self._apply(source_id, update, changes)
+            self._settle(changes)
+            changed = not is_empty(changes)
+            if changed:
+                self.version += 1
+                self._cache.clear()
+            changes["version"] = self.version
+        if changed:
+            for listener in list(self.listeners):
+                listener(changes)
+        return changes
+
+    def _settle(self, changes):
+        """Keep one entry per node and edge, its final state, in `changes`.
+
+        A node or edge can be touched several times by one apply, e.g. a hub
+        that appears when one member arrives and disappears when another
+        leaves, and entries that are no longer current are dropped.
+        """
+        nodes, edges = changes["nodes"], changes["edges"]
+        added = {node["id"] for node in nodes["added"]}
+        final = {node["id"]: node for node in nodes["added"] + nodes["changed"]
+                 if self.nodes.get(node["id"]) is node}
+        nodes["added"] = [node for node_id, node in final.items() if node_id in added]
+        nodes["changed"] = [node for node_id, node in final.items() if node_id not in added]
+        nodes["removed"] = list(dict.fromkeys(nodes["removed"]))
+        edges["added"] = [edge for edge in edges["added"]
+                          if self.edges.get(_edge_key(edge)) is edge]
+
+    def _apply(self, source_id, update, changes):
+        prefix = source_id + ":"
+        for edge in update["edges"]["removed"]:
+            self._drop_edge((prefix + edge["source"], prefix + edge["target"], edge["relation"]),
+                            changes)
+        for node_id in update["nodes"]["removed"]:
+            self._drop_node(prefix + node_id, changes)
+        for kind in ("added", "changed"):
+            for node in update["nodes"][kind]:
+                self._put_node(source_id, node, changes)
+        for edge in update["edges"]["added"]:
+            edge = dict(edge, source=prefix + edge["source"], target=prefix + edge["target"])
+            if edge["source"] in self.nodes and edge["target"] in self.nodes:
+                self._put_edge(edge, changes)
+
+    def _put_node(self, source_id, node, changes):
+        node = dict(node, id=f"{source_id}:{node['id']}", tags=list(node.get("tags") or ()),
+                    derived=False)
+        meta = dict(node.get("meta") or {}, source=source_id)
+        meta["directory"] = _directory(dict(node, meta=meta))
+        node["meta"] = meta
+        old = self.nodes.get(node["id"])
+        if old == node:
+            return
+        hubs = self._hub_ids(node)
+        if old is None:
+            self._node_order.add(node["id"])
+        else:
+            for hub in self._hub_ids(old) - hubs:
+                self._leave(hub, old["id"], changes)
+        self.nodes[node["id"]] = node
+        changes["nodes"]["changed" if old is not None else "added"].append(node)
+        for hub in sorted(hubs - (self._hub_ids(old) if old is not None else set())):
+            self._join(hub, node, changes)
+
+    def _drop_node(self, node_id, changes):
+        node = self.nodes.get(node_id)
+        if node is None:
+            return
+        for hub in self._hub_ids(node):
+            self._leave(hub, node_id, changes)
+        for key in list(self._incident.get(node_id, ())):
+            self._drop_edge(key, changes)
+        del self.nodes[node_id]
+        self._node_order.remove(node_id)
+        changes["nodes"]["removed"].append(node_id)
+
+    def _put_edge(self, edge, changes):
+        key = _edge_key(edge)
+        old = self.edges.get(key)
+        if old == edge:
+            return
+        if old is not None:
+            self._drop_edge(key, changes)
+        self.edges[key] = edge
+        self._edge_order.add(key)
+        self._incident[edge["source"]].add(key)
+        self._incident[edge["target"]].add(key)
+        changes["edges"]["added"].append(edge)
+
+    def _drop_edge(self, key, changes):
+        edge = self.edges.pop(key, None)
+        if edge is None:
+            return
+        self._edge_order.remove(key)
+        for end in (edge["source"], edge["target"]):
+            keys = self._incident.get(end)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._incident[end]
+        changes["edges"]["removed"].append(edge)
+
+    # -- derived hubs -----------------------------------------------------------
+
+    @staticmethod
+    def _hub_ids(node):
+        source = node["meta"]["source"]
+        hubs = {f"{source}:dir/{node['meta']['directory']}"}
+        hubs.update(f"{source}:tag/{tag}" for tag in node["tags"])
+        return hubs
+
+    @staticmethod
+    def _hub_edge(member, hub):
+        relation = DIRECTORY_RELATION if ":dir/" in hub else TAG_RELATION
+        return {"source": member, "target": hub, "relation": relation, "derived": True}
+
+    def _join(self, hub, node, changes):
+        members = self._hubs[hub]
+        members.add(node["id"])
+        if len(members) < HUB_MIN_MEMBERS:
+            return
+        if len(members) == HUB_MIN_MEMBERS:
+            source, rest = split_id(hub)
+            kind, _, label = rest.partition("/")
+            scope = node["scope"] if kind == "dir" else ""
+            hub_node = {"id": hub, "title": label if kind == "dir" else f"#{label}",
+                        "type": "directory" if kind == "dir" else "tag", "scope": scope,
+                        "tags": [], "derived": True,
+                        "meta": {"source": source, "directory": label if kind == "dir" else ""}}
+            self.nodes[hub] = hub_node
+            self._node_order.add(hub)
+            changes["nodes"]["added"].append(hub_node)
+            for member in sorted(members):
+                self._put_edge(self._hub_edge(member, hub), changes)
+        else:
+            self._put_edge(self._hub_edge(node["id"], hub), changes)
+
+    def _leave(self, hub, node_id, changes):
+        members = self._hubs.get(hub)
+        if members is None or node_id not in members:
+            return
+        members.discard(node_id)
+        if len(members) + 1 >= HUB_MIN_MEMBERS:
+            self._drop_edge((node_id, hub, self._hub_edge(node_id, hub)["relation"]), changes)
+        if len(members) == HUB_MIN_MEMBERS - 1:
+            for member in members:
+                self._drop_edge(_edge_key(self._hub_edge(member, hub)), changes)
+            del self.nodes[hub]
+            self._node_order.remove(hub)
+            changes["nodes"]["removed"].append(hub)
+        if not members:
+            del self._hubs[hub]
+
+    # -- pages ------------------------------------------------------------------
+
+    def page(self, kind, after=None, limit=DEFAULT_PAGE, source=None, derived=True):
+        """One page of nodes or edges in key order, after the key `after`.
+
+        Returns (items, last key or None when this was the last page).
+        Keyset pagination: an item added or removed elsewhere never shifts
+        the rest, so a client paging while the graph changes sees every
+        unchanged item exactly once.
+        """
+        if source is not None and source not in self.sources:
+            raise ModelError(f"unknown source: {source}")
+        limit = max(1, min(int(limit), MAX_PAGE))
+        with self._lock:
+            order, table = ((self._node_order, self.nodes) if kind == "nodes"
+                            else (self._edge_order, self.edges))
+            low = high = None
+            if source is not None:  # ";" sorts right after ":"
+                low, high = ((source + ":", source + ";") if kind == "nodes"
+                             else ((source + ":",), (source + ";",)))
+            start, stop = order.range(low, high, after)
+            items = []
+            for at in range(start, stop):
+                key = order.keys[at]
+                item = table[key]
+                if derived or not item["derived"]:
+                    items.append(item)
+                    if len(items) == limit:
+                        return items, (key if at + 1 < stop else None)
+            return items, None
+
+    def counts(self, source=None):
+        with self._lock:
+            if source is None:
+                return {"nodes": len(self.nodes), "edges": len(self.edges)}
+            start, stop = self._node_order.range(source + ":", source + ";")
+            low, high = self._edge_order.range((source + ":",), (source + ";",))
+            return {"nodes": stop - start, "edges": high - low}
+
+    # -- level of detail --------------------------------------------------------
+
+    def clusters(self, level, parent=None):
+        """Clusters at `level` (children of `parent` if given) and the edges between them."""
+        if not 0 <= level < len(LEVELS):
+            raise ValueError(f"level must be 0-{len(LEVELS) - 1} ({', '.join(LEVELS)})")
+        with self._lock:
+            answer = self._cache.get(("clusters", level, parent))
+            if answer is None:
+                clusters, edges = self._summary(level)
+                shown = {cluster_id: cluster for cluster_id, cluster in clusters.items()
+                         if parent is None or cluster["parent"] == parent}
+                answer = self._cache[("clusters", level, parent)] = {
+                    "level": level, "name": LEVELS[level], "parent": parent,
+                    "version": self.version,
+                    "clusters": [shown[cluster_id] for cluster_id in sorted(shown)],
+                    "edges": self._cluster_edges(edges, shown)}
+            return answer
+
+    def _summary(self, level):
+        summary = self._cache.get(("summary", level))
+        if summary is None:
+            summary = self._cache[("summary", level)] = self._summarize(level)
+        return summary
+
+    @staticmethod
+    def _cluster_edges(edges, shown):
+        return [{"source": a, "target": b, "count": count}
+                for (a, b), count in sorted(edges.items()) if a in shown and b in shown]
+
+    def _summarize(self, level):
+        clusters = {}
+        of = {}
+        for node_id, node in self.nodes.items():
+            if node["derived"]:
+                continue
+            cluster_id = of[node_id] = cluster_of(node, level)
+            cluster = clusters.get(cluster_id)
+            if cluster is None:
+                label = cluster_id.split(":", 1)[1].split("/", 1)[1] if level else cluster_id
+                cluster = clusters[cluster_id] = {
+                    "id": cluster_id, "label": label,
+                    "parent": cluster_of(node, level - 1) if level else None,
+                    "count": 0, "types": collections.Counter(), "internal_edges": 0,
+                    "external_edges": 0}
+            cluster["count"] += 1
+            cluster["types"][node["type"]] += 1
+        edges = collections.Counter()
+        for (source, target, _), edge in self.edges.items():
+            if edge["derived"]:
+                continue
+            a, b = of[source], of[target]
+            if a == b:
+                clusters[a]["internal_edges"] += 1
+            else:
+                clusters[a]["external_edges"] += 1
+                clusters[b]["external_edges"] += 1
+                edges[(a, b) if a < b else (b, a)] += 1
+        for cluster in clusters.values():
+            cluster["types"] = dict(sorted(cluster["types"].items()))
+        return clusters, edges
+
+    # -- neighbourhoods and viewports -------------------------------------------
+
+    def neighborhood(self, node_id, hops=1, limit=DEFAULT_PAGE, derived=False):
+        """Nodes within `hops` edges of `node_id` (BFS, at most `limit`) and their edges."""
+        with self._lock:
+            if node_id not in self.nodes:
+                raise ModelError(f"unknown node: {node_id}")
+            limit = max(1, min(int(limit), MAX_PAGE))
+            seen = {node_id: 0}
+            frontier = [node_id]
+            truncated = False
+            for depth in range(1, max(0, int(hops)) + 1):
+                following = []
+                for current in frontier:
+                    for key in sorted(self._incident.get(current, ())):
+                        edge = self.edges[key]
+                        if edge["derived"] and not derived:
+                            continue
+                        other = edge["target"] if edge["source"] == current else edge["source"]
+                        if other in seen:
+                            continue
+                        if len(seen) >= limit:
+                            truncated = True
+                            break
+                        seen[other] = depth
+                        following.append(other)
+                frontier = following
+            nodes = [dict(self.nodes[n], hops=depth) for n, depth in sorted(seen.items())]
+            edges = self._edges_among(seen, derived)
+        return {"center": node_id, "nodes": nodes, "edges": edges, "truncated": truncated,
+                "version": self.version}
+
+    def _edges_among(self, ids, derived):
+        keys = set()
+        for node_id in ids:
+            for key in self._incident.get(node_id, ()):
+                if key[0] in ids and key[1] in ids:
+                    keys.add(key)
+        return [self.edges[key] for key in sorted(keys)
+                if derived or not self.edges[key]["derived"]]
+
+    def positions(self):
+        """{node id: (x, y)} for the current version (hubs included in the force layout)."""
+        return self._positions()[0]
+
+    def _positions(self):
+        """(positions, viewport grid over the stored nodes) for the current version."""
+        with self._lock:
+            cached = self._cache.get("positions")
+            if cached is not None:
+                return cached
+            version = self.version
+            stored = [node for node in self.nodes.values() if not node["derived"]]
+            if self.layout == "force":
+                self._node_order.flush()
+                self._edge_order.flush()
+                ids = list(self._node_order.keys)
+                edges = [(source, target) for source, target, _ in self._edge_order.keys]
+            previous = self._placed
+        # laid out without the lock: a full force layout of a large graph takes seconds
+        if self.layout == "force":
+            placed = layout.update_layout(ids, edges, previous)
+        else:
+            placed = layout.cluster_layout(stored)
+        grid = collections.defaultdict(list)
+        for node in stored:
+            x, y = placed[node["id"]]
+            grid[(math.floor(x / GRID_CELL), math.floor(y / GRID_CELL))].append(node["id"])
+        with self._lock:
+            if self.layout == "force" and previous is self._placed:
+                if any(placed.get(node_id, xy) != xy for node_id, xy in previous.items()):
+                    self.layout_epoch += 1  # a full relayout
+                self._placed = placed
+                self._layout_unsaved = True
+            if self.version == version:
+                self._cache["positions"] = (placed, grid)
+        return placed, grid
+
+    def relayout(self):
+        """Forget every position, so the next `positions()` lays out from scratch."""
+        with self._lock:
+            self._placed = {}
+            self._cache.pop("positions", None)
+            self.layout_epoch += 1
+
+    def save_layout(self, force=True):
+        """Write the force layout to `layout_path` if it moved since the last write.
+
+        With `force=False`, at most once every `LAYOUT_SAVE_INTERVAL` seconds.
+        """
+        with self._lock:
+            if self.layout_path is None or not self._layout_unsaved:
+                return
+            if not force and self._layout_saved_at is not None and \
+                    time.monotonic() - self._layout_saved_at < LAYOUT_SAVE_INTERVAL:
+                return
+            placed = self._placed
+            self._layout_unsaved, self._layout_saved_at = False, time.monotonic()
+        data = {"format": LAYOUT_FORMAT, "version": LAYOUT_VERSION,
+                "edge_length": layout.EDGE_LENGTH,
+                "positions": {node_id: list(placed[node_id]) for node_id in sorted(placed)}}
+        try:
+            atomic_write(self.layout_path, json.dumps(data, separators=(",", ":")))
+        except OSError:
+            pass  # a read-only store still works, it just lays out again next time
+
+    def _load_layout(self):
+        if self.layout != "force" or self.layout_path is None:
+            return {}
+        try:
+            with open(self.layout_path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return {}
+        if data.get("format") != LAYOUT_FORMAT or data.get("version") != LAYOUT_VERSION:
+            return {}
+        return {node_id: tuple(xy) for node_id, xy in data.get("positions", {}).items()}
+
+    def bounds(self):
+        """[x0, y0, x1, y1] around every position, or None for an empty graph."""
+        placed = self.positions()
+        if not placed:
+            return None
+        xs = [x for x, _ in placed.values()]
+        ys = [y for _, y in placed.values()]
+        return [min(xs), min(ys), max(xs), max(ys)]
+
+    def viewport(self, x0, y0, x1, y1, limit=DEFAULT_PAGE):
+        """What to draw in a box: the nodes, or the deepest clusters that fit in `limit`."""
+        x0, x1 = sorted((float(x0), float(x1)))
+        y0, y1 = sorted((float(y0), float(y1)))
+        limit = max(1, min(int(limit), MAX_PAGE))
+        placed, grid = self._positions()
+        with self._lock:
+            inside = []
+            for cx in range(math.floor(x0 / GRID_CELL), math.floor(x1 / GRID_CELL) + 1):
+                for cy in range(math.floor(y0 / GRID_CELL), math.floor(y1 / GRID_CELL) + 1):
+                    for node_id in grid.get((cx, cy), ()):
+                        x, y = placed[node_id]
+                        if x0 <= x <= x1 and y0 <= y <= y1 and node_id in self.nodes:
+                            inside.append(node_id)
+            answer = {"box": [x0, y0, x1, y1], "version": self.version, "total": len(inside)}
+            if len(inside) <= limit:
+                ids = set(inside)
+                answer.update(level=None, nodes=[
+                    dict(self.nodes[n], x=placed[n][0], y=placed[n][1]) for n in sorted(ids)],
+                    edges=self._edges_among(ids, False))
+                return answer
+            for level in range(len(LEVELS) - 1, -1, -1):
+                groups = collections.defaultdict(list)
+                for node_id in inside:
+                    groups[cluster_of(self.nodes[node_id], level)].append(node_id)
+                if len(groups) <= limit or level == 0:
+                    break
+            clusters = []
+            for cluster_id in sorted(groups):
+                members = groups[cluster_id]
+                clusters.append({
+                    "id": cluster_id, "count": len(members),
+                    "x": sum(placed[n][0] for n in members) / len(members),
+                    "y": sum(placed[n][1] for n in members) / len(members)})
+            answer.update(level=level, clusters=clusters,
+                          edges=self._cluster_edges(self._summary(level)[1], groups))
+            return answer
+
+    # -- Source passthrough -----------------------------------------------------
+
+    def node(self, model_id):
+        """NodeDetail for a namespaced id; hubs list their members."""
+        with self._lock:
+            node = self.nodes.get(model_id)
+            if node is None:
+                raise ModelError(f"unknown node: {model_id}")
+            if node["derived"]:
+                members = sorted(self._hubs.get(model_id, ()))
+                return dict(node, members=members[:MAX_PAGE], member_count=len(members))
+        source_id, node_id = split_id(model_id)
+        detail = self.sources[source_id].node(node_id)
+        if detail is None:
+            raise ModelError(f"unknown node: {model_id}")
+        return dict(node, **{key: value for key, value in detail.items()
+                             if key not in ("id", "meta", "derived")})
+
+    def query(self, text, source=None, limit=50):
+        """Each source's own `query()`, namespaced; stages are kept per source."""
+        if source is not None and source not in self.sources:
+            raise ModelError(f"unknown source: {source}")
+        matches, stages = [], {}
+        for source_id in ([source] if source else sorted(self.sources)):
+            result = self.sources[source_id].query(text, {"limit": limit})
+            matches += [dict(match, id=f"{source_id}:{match['id']}")
+                        for match in result["matches"]]
+            if result["stages"]:
+                stages[source_id] = result["stages"]
+        matches.sort(key=lambda match: (-match["score"], match["id"]))
+        return {"matches": matches[:int(limit)], "stages": stages}
+
+    def describe(self):
+        """[{id, kind, capabilities, counts}] for every source."""
+        return [{"id": source_id, "kind": source.kind, "capabilities": source.capabilities(),
+                 "counts": self.counts(source_id)}
+                for source_id, source in sorted(self.sources.items())]
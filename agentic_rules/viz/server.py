@@ -0,0 +1,303 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""Read-only HTTP API over a `GraphModel` (KG_VISUALIZER_RECIPE.md Phase 3).
+
+The recipe's Phase 3 serves the whole `build_model` graph in one response,
+which is several megabytes for a large store. This server is built for
+clients that only fetch what is on screen. Every endpoint is a GET that
+returns JSON:
+
+    /api/sources                          [{id, kind, capabilities, counts}]
+    /api/nodes?source=&after=&limit=&derived=0|1
+    /api/edges?source=&after=&limit=&derived=0|1
+    /api/clusters?level=0|1|2&parent=     level-of-detail summaries
+    /api/neighborhood?id=&hops=&limit=&derived=0|1
+    /api/layout                           {algorithm, bounds, count}
+    /api/viewport?box=x0,y0,x1,y1&limit=  nodes in a box, or their clusters
+    /api/node?id=                         NodeDetail
+    /api/query?q=&source=&limit=          {matches, stages}
+    /api/events?version=                  text/event-stream of graph diffs
+
+- **Pages.** `nodes` and `edges` return `{items, next, total, version}`.
+  `next` is an opaque cursor for the `after` parameter, and null on the
+  last page. Omitting `source` gives the full graph, and `source=<id>` gives
+  that source's own graph, including its hubs. Nodes carry their layout
+  position as `x` and `y`.
+- **Caching.** Answers that depend only on the model carry an ETag of the
+  model version, so a client that polls gets `304 Not Modified` until
+  something changes.
+- **Compression.** Bodies over `GZIP_MIN_BYTES` are gzip-compressed when the
+  client accepts it.
+- **Live updates.** `events` streams server-sent events with node and edge
+  diffs from `events.ChangeFeed`, so a client that shows a changing store
+  fetches the graph once instead of polling it. `Last-Event-ID`, or
+  `version` from the pages a client fetched, resumes the stream.
+- A background thread refreshes the model every `interval` seconds and lays
+  out what changed right away, so no request waits for a layout.
+
+Unknown ids and sources are 404s and bad parameters are 400s, both with an
+`error` message. The server binds to 127.0.0.1 unless told otherwise; it
+has no authentication, and `private/` entries are in the graph.
+"""
+
+import base64
+import gzip
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .events import COALESCE_WINDOW, ChangeFeed, format_event
+from .model import DEFAULT_PAGE, ModelError
+
+SERVER_NAME = "agentic-rules-viz"
+SERVER_VERSION = "1.5.4"
+DEFAULT_PORT = 8766
+DEFAULT_INTERVAL = 2.0
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+KEEPALIVE = 15.0  # seconds between comments on an idle event stream
+RETRY_MS = 2000  # how soon an EventSource reconnects
+
+
+def encode_cursor(key):
+    data = json.dumps(key, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(data)
+    except ValueError:
+        raise ValueError("bad cursor") from None
+    return tuple(key) if isinstance(key, list) else key
+
+
+def _flag(params, name, default):
+    value = params.get(name)
+    if value is None:
+        return default
+    return value.lower() not in ("0", "false", "no", "")
+
+
+def _int(params, name, default):
+    value = params.get(name)
+    try:
+        return default if value is None else int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = f"{SERVER_NAME}/{SERVER_VERSION}"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler API
+        if self.server.verbose:
+            print(f"viz http: {format % args}", file=sys.stderr)
+
+    def _send(self, status, body, etag=None):
+        headers = [("Vary", "Accept-Encoding")]
+        if etag is not None:
+            headers += [("ETag", etag), ("Cache-Control", "no-cache")]
+        else:
+            headers.append(("Cache-Control", "no-store"))
+        if status == 304:
+            self.send_response(304)
+            for key, value in headers:
+                self.send_header(key, value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        data = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if len(data) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", ""):
+            data = gzip.compress(data, GZIP_LEVEL)
+            headers.append(("Content-Encoding", "gzip"))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers:
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        route = url.path.rstrip("/")
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if route == EVENTS_ROUTE:
+            self._stream(params)
+            return
+        if route not in ROUTES:
+            self._send(404, {"error": f"no such endpoint: {route or '/'}"})
+            return
+        handler, cacheable = ROUTES[route]
+        model = self.server.model
+        etag = f'"v{model.version}"' if cacheable else None
+        if etag is not None and self.headers.get("If-None-Match") == etag:
+            self._send(304, None, etag)
+            return
+        try:
+            body = handler(model, params)
+        except ModelError as exc:
+            self._send(404, {"error": str(exc)})
+            return
+        except ValueError as exc:
+            self._send(400, {"error": str(exc)})
+            return
+        self._send(200, body, etag)
+
+    def _stream(self, params):
+        """Serve `/api/events` until the client goes away or the server stops."""
+        feed = self.server.feed
+        try:
+            event, cursor = feed.resume(self.headers.get("Last-Event-ID") or params.get("version"))
+        except ValueError as exc:
+            self._send(400, {"error": str(exc)})
+            return
+        if not feed.join():
+            self._send(503, {"error": "too many event streams"})
+            return
+        self.close_connection = True
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(f"retry: {RETRY_MS}\n\n".encode("ascii"))
+            while not feed.closed:
+                self.wfile.write(format_event(event) if event is not None else b": keepalive\n\n")
+                self.wfile.flush()
+                event, cursor = feed.next_event(cursor, KEEPALIVE)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client went away
+        finally:
+            feed.leave()
+
+
+# --- endpoints: (model, params) -> body -------------------------------------------
+
+def _sources(model, params):
+    return {"sources": model.describe(), "version": model.version}
+
+
+def _page(kind):
+    def handler(model, params):
+        after = params.get("after")
+        source = params.get("source")
+        items, last = model.page(kind, decode_cursor(after) if after else None,
+                                 _int(params, "limit", DEFAULT_PAGE), source,
+                                 _flag(params, "derived", True))
+        if kind == "nodes":
+            placed = model.positions()
+            items = [dict(node, x=placed[node["id"]][0], y=placed[node["id"]][1])
+                     if node["id"] in placed else node for node in items]
+        return {"items": items, "next": encode_cursor(last) if last is not None else None,
+                "total": model.counts(source)[kind], "version": model.version}
+    return handler
+
+
+def _clusters(model, params):
+    return model.clusters(_int(params, "level", 0), params.get("parent"))
+
+
+def _neighborhood(model, params):
+    if not params.get("id"):
+        raise ValueError("id is required")
+    return model.neighborhood(params["id"], _int(params, "hops", 1),
+                              _int(params, "limit", DEFAULT_PAGE),
+                              _flag(params, "derived", False))
+
+
+def _layout(model, params):
+    return {"algorithm": model.layout, "bounds": model.bounds(),
+            "count": len(model.positions()), "version": model.version}
+
+
+def _viewport(model, params):
+    try:
+        box = [float(value) for value in params.get("box", "").split(",")]
+    except ValueError:
+        box = []
+    if len(box) != 4:
+        raise ValueError("box must be x0,y0,x1,y1")
+    return model.viewport(*box, limit=_int(params, "limit", DEFAULT_PAGE))
+
+
+def _node(model, params):
+    if not params.get("id"):
+        raise ValueError("id is required")
+    return model.node(params["id"])
+
+
+def _query(model, params):
+    return model.query(params.get("q", ""), params.get("source"),
+                       _int(params, "limit", 50))
+
+
+EVENTS_ROUTE = "/api/events"  # a stream, not a JSON answer
+# route -> (handler, whether the answer depends only on the model version)
+ROUTES = {
+    "/api/sources": (_sources, True),
+    "/api/nodes": (_page("nodes"), True),
+    "/api/edges": (_page("edges"), True),
+    "/api/clusters": (_clusters, True),
+    "/api/neighborhood": (_neighborhood, True),
+    "/api/layout": (_layout, True),
+    "/api/viewport": (_viewport, True),
+    "/api/node": (_node, False),  # reads the entry itself, which can be ahead of the model
+    "/api/query": (_query, False),
+}
+
+
+# --- serving ---------------------------------------------------------------------
+
+def refresh_loop(model, interval, stop):
+    """Refresh `model` every `interval` seconds until `stop` is set, laying out changes."""
+    while not stop.wait(interval):
+        try:
+            model.refresh()
+            model.positions()
+            model.save_layout(force=False)
+        except Exception as exc:  # noqa: BLE001 - keep serving the last good model
+            print(f"viz: refresh failed: {exc}", file=sys.stderr)
+
+
+def make_http_server(model, host="127.0.0.1", port=DEFAULT_PORT, verbose=False,
+                     window=COALESCE_WINDOW):
+    httpd = ThreadingHTTPServer((host, port), _Handler)
+    httpd.daemon_threads = True
+    httpd.model = model
+    httpd.feed = ChangeFeed(model, window)
+    httpd.verbose = verbose
+    return httpd
+
+
+def serve_http(model, host="127.0.0.1", port=DEFAULT_PORT, interval=DEFAULT_INTERVAL,
+               verbose=False, window=COALESCE_WINDOW):
+    httpd = make_http_server(model, host, port, verbose, window)
+    stop = threading.Event()
+    if interval:
+        threading.Thread(target=refresh_loop, args=(model, interval, stop), daemon=True).start()
+    print(f"viz: serving the graph API on http://{host}:{httpd.server_address[1]}/api/sources",
+          file=sys.stderr)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        httpd.feed.close()
+        httpd.server_close()
+        model.save_layout()
+
+
+def start_http_thread(model, host="127.0.0.1", port=0, window=COALESCE_WINDOW):
+    """Serve on a background thread without refreshing; returns the HTTP server (for tests)."""
+    httpd = make_http_server(model, host, port, window=window)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
@@ -0,0 +1,120 @@
+# Copyright (c) 2025-2026 Paulus Ery Wasito Adhi
+#
+# Licensed under the MIT License. See LICENSE file for details.
+"""The runtime-KG source (KG_VISUALIZER_RECIPE.md Phase 1, runtime-KG variant).
+
+`KGSource` implements the recipe's `Source` interface over a
+`KnowledgeGraph` instead of re-parsing anything: `graph()` is the server's
+own current view (superseded, retired, and pending nodes are left out),
+`node()` is `get_node`, and `query()` runs the server's retrieval pipeline
+and reports its stage timings.
+
+Like `StoreGraph`, it has a `refresh()` that returns a change set. The
+graph's version counter says whether anything was written, and the next
+validity boundary says when the current view changes without a write.
+Only then is the view read again and diffed against the last one.
+"""
+
+import time
+
+from ..kg import KGError, temporal
+
+KIND = "runtime-kg"
+
+
+class KGSource:
+    """Nodes and edges of a `KnowledgeGraph`'s current view."""
+
+    kind = KIND
+
+    def __init__(self, kg, source_id=KIND):
+        self.kg = kg
+        self.id = source_id
+        self.version = 0
+        self._nodes = None  # id -> node, as of the last snapshot
+        self._edges = None  # (source, target, relation) -> edge
+        self._seen = None  # graph version of that snapshot
+        self._boundary = None  # monotonic time when the current view changes by itself
+
+    def capabilities(self):
+        return {"editable": False, "temporal": True, "reports_stages": True}
+
+    def graph(self, options=None):
+        if self._nodes is None:
+            self._snapshot()
+        return {"nodes": [self._nodes[node_id] for node_id in sorted(self._nodes)],
+                "edges": [self._edges[key] for key in sorted(self._edges)]}
+
+    def node(self, node_id):
+        try:
+            node = self.kg.get_node(node_id)
+        except KGError:
+            return None
+        node.update(derived=False, meta={"status": node["status"]})
+        return node
+
+    def query(self, text, options=None):
+        limit = int((options or {}).get("limit", 10))
+        if not text.strip():
+            return {"matches": [], "stages": []}
+        hits, timings = self.kg.retrieval.search(text, self.kg._view(), limit)
+        return {"matches": [{"id": hit["id"], "score": round(hit["score"], 4)}
+                            for hit in hits[:limit]],
+                "stages": [{"name": stage, "ms": round(ms, 2)} for stage, ms in timings.items()]}
+
+    def refresh(self):
+        """Re-read the current view if it can have changed; returns the diff."""
+        changes = {"nodes": {"added": [], "changed": [], "removed": []},
+                   "edges": {"added": [], "removed": []}}
+        with self.kg.pool.connection() as conn:
+            version = self.kg._version(conn)
+        if self._nodes is not None and version == self._seen and \
+                (self._boundary is None or time.monotonic() < self._boundary):
+            changes["version"] = self.version
+            return changes
+        old_nodes, old_edges = self._nodes or {}, self._edges or {}
+        self._snapshot()
+        for node_id, node in self._nodes.items():
+            old = old_nodes.get(node_id)
+            if old is None:
+                changes["nodes"]["added"].append(node)
+            elif old != node:
+                changes["nodes"]["changed"].append(node)
+        changes["nodes"]["removed"] = sorted(set(old_nodes) - set(self._nodes))
+        changes["edges"]["added"] = [edge for key, edge in sorted(self._edges.items())
+                                     if old_edges.get(key) != edge]
+        changes["edges"]["removed"] = [edge for key, edge in sorted(old_edges.items())
+                                       if self._edges.get(key) != edge]
+        if any(changes["nodes"].values()) or any(changes["edges"].values()):
+            self.version += 1
+        changes["version"] = self.version
+        return changes
+
+    def _snapshot(self):
+        at = temporal.now()
+        with self.kg.pool.connection() as conn:
+            conn.execute("BEGIN")  # nodes and edges from one snapshot
+            try:
+                version = self.kg._version(conn)
+                nodes = {}
+                for row in conn.execute(
+                        "SELECT n.id, n.title, n.type, n.scope, n.tags FROM current_nodes c "
+                        "JOIN nodes n ON n.id = c.id WHERE c.valid_at <= ? "
+                        "AND (c.invalid_at IS NULL OR c.invalid_at > ?)", (at, at)):
+                    nodes[row["id"]] = {
+                        "id": row["id"], "title": row["title"], "type": row["type"],
+                        "scope": row["scope"],
+                        "tags": [tag for tag in (row["tags"] or "").split(",") if tag],
+                        "derived": False, "meta": {}}
+                edges = {}
+                for source, target, relation, weight in conn.execute(
+                        "SELECT source_id, target_id, relation, weight FROM edges"):
+                    if source in nodes and target in nodes:
+                        edges[(source, target, relation)] = {
+                            "source": source, "target": target, "relation": relation,
+                            "derived": False, "weight": weight}
+            finally:
+                conn.execute("COMMIT")
+        seconds = self.kg._seconds_to_boundary()
+        self._boundary = None if seconds is None else time.monotonic() + max(0.0, seconds)
+        self._nodes, self._edges, self._seen = nodes, edges, version
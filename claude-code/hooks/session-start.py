@@ -12,7 +12,9 @@ results in a clean no-op.
 
 Reads configuration from environment variables that Claude Code populates from
 the plugin's userConfig (CLAUDE_PLUGIN_OPTION_<KEY>), and locates bundled rule
-files via CLAUDE_PLUGIN_ROOT.
+files via CLAUDE_PLUGIN_ROOT. When Claude Code offers CLAUDE_ENV_FILE, the
+session id from the hook input is exported there as AGENTIC_RULES_SESSION, so
+every memory write-ahead-log record of one session lands in one log.
 """
 
 import json
@@ -159,7 +161,51 @@ def clean(text):
     return text.strip()
 
 
+def export_session(env_file):
+    """Append AGENTIC_RULES_SESSION=<session_id> to CLAUDE_ENV_FILE (never raises).
+
+    Claude Code sources that file before each Bash command, so the memory WAL
+    (agentic_rules.memory.wal.default_session) names its log after the agent
+    session instead of the short-lived process that records an entry.
+    """
+    try:
+        session = str(json.load(sys.stdin).get("session_id") or "")
+    except Exception:
+        return
+    if not re.fullmatch(r"[A-Za-z0-9._-]+", session):
+        return
+    try:
+        with open(env_file, "a", encoding="utf-8") as handle:
+            handle.write(f"export AGENTIC_RULES_SESSION={session}\n")
+    except OSError:
+        pass
+
+
+def overdue_notice(root, memory_path):
+    """Retention reminder from the memory index, or "" (never raises).
+
+    Uses the bundled agentic_rules package (claude-code/agentic_rules ->
+    ../agentic_rules, shipped like modules/). The sweeper reads only index.md,
+    stops at the newest retention cutoff, and is rate-limited by
+    notification_frequency_days, so it stays cheap on large stores.
+    """
+    memory_path = (memory_path or "").strip()
+    if not memory_path or not os.path.isdir(memory_path):
+        return ""
+    try:
+        if root not in sys.path:
+            sys.path.insert(0, root)
+        from agentic_rules.memory import sweep
+        return sweep.session_notice(memory_path)
+    except Exception:
+        return ""
+
+
 def main():
+    env_file = os.environ.get("CLAUDE_ENV_FILE", "")
+    if env_file:
+        export_session(env_file)
+
     if not is_true(opt("ALWAYS_ON_INJECTION"), default=True):
         return  # Opted out: skills load on demand; inject nothing.
 
@@ -203,6 +249,10 @@ def main():
 
     kg_configured = bool(opt("KG_MCP_URL").strip())
     context = activation_preamble(kg_configured, opt("MEMORY_PATH")) + "\n\n---\n\n".join(sections)
+    if is_true(opt("ENABLE_MEMORY"), default=True):
+        notice = overdue_notice(root, opt("MEMORY_PATH"))
+        if notice:
+            context += "\n\n---\n\n**Memory cleanup due.** " + notice
 
     print(
         json.dumps(
@@ -13,7 +13,9 @@ Covers:
   * skill + command frontmatter; skill deep-links resolve to real repo files
   * rule text is symlinked (claude-code/modules -> ../modules), never copied, and
     the injector still works as-installed with no sibling repo modules/ (regression)
-  * the SessionStart injector across the full settings matrix
+  * the SessionStart injector across the full settings matrix, including the
+    index-driven memory retention notice (bundled agentic_rules symlink) and
+    the session id exported through CLAUDE_ENV_FILE for the memory WAL
   * cross-check that documented settings == manifest settings == what the
     injector actually consumes (no phantom or undocumented settings)
 
@@ -401,6 +403,58 @@ def preamble_names_configured_memory_path():
     assert "/srv/agentic-mem" in ctx
 
 
+@test
+def injector_surfaces_overdue_memory_notice():
+    """With a memory_path whose index lists an entry past its retention, the
+    injector appends a cleanup reminder once per notification period; with
+    memory disabled it stays out. Uses the bundled agentic_rules symlink."""
+    import tempfile
+    tmp = tempfile.mkdtemp()
+    try:
+        entry = os.path.join(tmp, "projects", "p", "interactions", "old.md")
+        os.makedirs(os.path.dirname(entry))
+        with open(entry, "w", encoding="utf-8") as handle:
+            handle.write("# User Interaction: s - 2020-01-01T00:00:00Z\n\n"
+                         "## Metadata\n- **Generated**: 2020-01-01T00:00:00Z\n")
+        sys.path.insert(0, REPO)
+        try:
+            from agentic_rules.memory.store import MemoryStore
+        finally:
+            sys.path.remove(REPO)
+        MemoryStore(tmp).rebuild_index()
+        off = injected_context({"memory_path": tmp, "enable_memory": "false"})
+        assert "Memory cleanup due" not in off
+        first = injected_context({"memory_path": tmp})
+        assert "Memory cleanup due" in first and "1 memory" in first, first[-400:]
+        again = injected_context({"memory_path": tmp})
+        assert "Memory cleanup due" not in again, "notice must respect notification_frequency_days"
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+@test
+def injector_exports_session_for_memory_wal():
+    """The hook input's session_id lands in CLAUDE_ENV_FILE, so every `wal
+    record` of one agent session appends to one log; odd ids are refused."""
+    import tempfile
+    tmp = tempfile.mkdtemp()
+    try:
+        env_file = os.path.join(tmp, "env.sh")
+        env = {"PATH": os.environ.get("PATH", ""), "CLAUDE_PLUGIN_ROOT": PLUGIN,
+               "CLAUDE_ENV_FILE": env_file}
+        for session in ("abc-123", "x; rm -rf /"):
+            proc = subprocess.run(
+                [sys.executable, HOOK], env=env, capture_output=True, text=True,
+                input=json.dumps({"session_id": session}), timeout=30,
+            )
+            assert proc.returncode == 0, proc.stderr
+            assert json.loads(proc.stdout)["hookSpecificOutput"]["additionalContext"]
+        with open(env_file, encoding="utf-8") as handle:
+            assert handle.read() == "export AGENTIC_RULES_SESSION=abc-123\n"
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
 @test
 def injector_no_root_is_silent():
     out, err, code = run_hook({"always_on_injection": "true"}, plugin_root=None)